@@ -1,10 +1,18 @@
+import json
+
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html
 from .models import (
-    Usuario, Plano, Matricula, Exercicio, Treino, TreinoExercicio, 
-    Avaliacao, Frequencia, Pedido, Torneio, ParticipanteTorneio, 
-    FaseTorneio, ExercicioFase, Chave, ResultadoPartida
+    Usuario, Plano, Matricula, Exercicio, Treino, TreinoExercicio, TreinoModelo, TreinoModeloExercicio,
+    Avaliacao, Frequencia, FrequenciaDiaria, Pedido, PedidoArquivado, Torneio, ParticipanteTorneio, 
+    FaseTorneio, ExercicioFase, Chave, ResultadoPartida, PerfilRequisicao
 )
+from .perfis import para_speedscope
 
 @admin.register(Usuario)
 class UsuarioAdmin(UserAdmin):
@@ -80,7 +88,7 @@ class MatriculaAdmin(admin.ModelAdmin):
     list_filter = ['status', 'data_inicio', 'data_fim', 'plano']
     search_fields = ['usuario__username', 'usuario__email', 'plano__nome']
     ordering = ['-created_at']
-    readonly_fields = ['created_at', 'updated_at']
+    readonly_fields = ['created_at', 'updated_at', 'lembrete_renovacao_em']
     
     fieldsets = (
         ('Informações da Matrícula', {
@@ -93,7 +101,7 @@ class MatriculaAdmin(admin.ModelAdmin):
             'fields': ('valor_pago',)
         }),
         ('Datas', {
-            'fields': ('created_at', 'updated_at')
+            'fields': ('created_at', 'updated_at', 'lembrete_renovacao_em')
         }),
     )
 
@@ -150,6 +158,24 @@ class TreinoAdmin(admin.ModelAdmin):
         }),
     )
 
+class TreinoModeloExercicioInline(admin.TabularInline):
+    """Inline para exercícios em modelos de treino"""
+    
+    model = TreinoModeloExercicio
+    extra = 1
+    fields = ['exercicio', 'series', 'repeticoes', 'peso', 'tempo_descanso', 'ordem']
+    ordering = ['ordem']
+
+@admin.register(TreinoModelo)
+class TreinoModeloAdmin(admin.ModelAdmin):
+    """Admin para modelos de treino"""
+    
+    list_display = ['nome', 'criado_por', 'ativo', 'data_criacao']
+    list_filter = ['ativo', 'data_criacao']
+    search_fields = ['nome', 'descricao']
+    readonly_fields = ['data_criacao']
+    inlines = [TreinoModeloExercicioInline]
+
 @admin.register(Avaliacao)
 class AvaliacaoAdmin(admin.ModelAdmin):
     """Admin para o modelo Avaliacao"""
@@ -208,6 +234,22 @@ class FrequenciaAdmin(admin.ModelAdmin):
         }),
     )
 
+@admin.register(FrequenciaDiaria)
+class FrequenciaDiariaAdmin(admin.ModelAdmin):
+    """Admin para a consolidação diária de frequência (somente leitura; use recalcular_frequencia_diaria)"""
+    
+    list_display = ['usuario', 'data', 'visitas', 'segundos_permanencia']
+    list_filter = ['data']
+    search_fields = ['usuario__username', 'usuario__email']
+    date_hierarchy = 'data'
+    list_select_related = ['usuario']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
 # Customizar o título do admin
 admin.site.site_header = "Academia AthleTech  - Administração"
 admin.site.site_title = "Academia Admin"
@@ -220,6 +262,20 @@ class PedidoAdmin(admin.ModelAdmin):
     search_fields = ['usuario__email', 'usuario__username', 'plano__nome', 'id_publico']
     readonly_fields = ['id_publico', 'criado_em', 'atualizado_em', 'pix_payload', 'pix_qr']
 
+@admin.register(PedidoArquivado)
+class PedidoArquivadoAdmin(admin.ModelAdmin):
+    """Admin para pedidos arquivados (somente leitura; preenchido por manutencao_pedidos)"""
+    
+    list_display = ['id_publico', 'usuario_id', 'plano_id', 'valor', 'metodo', 'status', 'criado_em', 'arquivado_em']
+    list_filter = ['status', 'metodo', 'criado_em']
+    search_fields = ['id_publico', 'mercado_pago_payment_id']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
 class ExercicioFaseInline(admin.TabularInline):
     """Inline para exercícios de uma fase"""
     model = ExercicioFase
@@ -303,3 +359,56 @@ class ResultadoPartidaAdmin(admin.ModelAdmin):
     search_fields = ['chave__participante1__usuario__username', 'chave__participante2__usuario__username']
     readonly_fields = ['data_registro']
     ordering = ['-data_registro']
+
+@admin.register(PerfilRequisicao)
+class PerfilRequisicaoAdmin(admin.ModelAdmin):
+    """Admin para perfis de requisições (somente leitura; download em pstats ou speedscope)"""
+    
+    list_display = ['criado_em', 'metodo', 'caminho', 'status_code', 'duracao_ms', 'consultas', 'consultas_ms', 'motivo', 'usuario', 'downloads']
+    list_filter = ['motivo', 'metodo', 'rota', 'criado_em']
+    search_fields = ['caminho', 'rota']
+    exclude = ['estatisticas']
+    readonly_fields = ['downloads']
+    list_select_related = ['usuario']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def get_queryset(self, request):
+        # A listagem não carrega o blob do cProfile
+        return super().get_queryset(request).defer('estatisticas', 'sql')
+    
+    def get_urls(self):
+        return [
+            path('<int:pk>/pstats/', self.admin_site.admin_view(self.baixar_pstats), name='academia_perfilrequisicao_pstats'),
+            path('<int:pk>/speedscope/', self.admin_site.admin_view(self.baixar_speedscope), name='academia_perfilrequisicao_speedscope'),
+        ] + super().get_urls()
+    
+    @admin.display(description='Download')
+    def downloads(self, obj):
+        return format_html(
+            '<a href="{}">pstats</a> | <a href="{}">speedscope</a>',
+            reverse('admin:academia_perfilrequisicao_pstats', args=[obj.pk]),
+            reverse('admin:academia_perfilrequisicao_speedscope', args=[obj.pk]),
+        )
+    
+    def _perfil(self, request, pk):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        return get_object_or_404(PerfilRequisicao, pk=pk)
+    
+    def baixar_pstats(self, request, pk):
+        perfil = self._perfil(request, pk)
+        response = HttpResponse(bytes(perfil.estatisticas), content_type='application/octet-stream')
+        response['Content-Disposition'] = f'attachment; filename="perfil-{perfil.pk}.pstats"'
+        return response
+    
+    def baixar_speedscope(self, request, pk):
+        perfil = self._perfil(request, pk)
+        dados = para_speedscope(perfil.estatisticas, f'{perfil.metodo} {perfil.caminho}')
+        response = HttpResponse(json.dumps(dados), content_type='application/json')
+        response['Content-Disposition'] = f'attachment; filename="perfil-{perfil.pk}.speedscope.json"'
+        return response
@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class AcademiaConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'academia'
+
+    def ready(self):
+        from django.db.models.signals import post_migrate
+
+        from . import metricas, signals  # noqa: F401
+        from .services.busca import instalar_indices
+        metricas.instalar_medidor_serializacao()
+        post_migrate.connect(instalar_indices, sender=self, dispatch_uid='academia_indice_busca')
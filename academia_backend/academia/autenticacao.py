@@ -0,0 +1,62 @@
+"""
+Usuário das requisições autenticadas por sessão lido do cache
+As páginas (portal, dashboards, admin) carregavam o usuário do banco a cada requisição.
+Com a sessão em cached_db e este backend (ativados só com REDIS_URL, ver settings.py), o
+caminho de autenticação não lê o banco: o usuário fica em cache por id, numa chave com a
+versão do usuário, que muda a cada save()/delete() (sinais em signals.py, após o commit).
+A versão evita que uma requisição que leu a linha antiga antes do commit grave o usuário
+desatualizado por cima da invalidação: ela grava na chave da versão anterior, que ninguém lê mais.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+PREFIXO = 'usuarios:sessao'
+
+
+def _chave_versao(usuario_id):
+    return f'{PREFIXO}:{usuario_id}:versao'
+
+
+def _versao(usuario_id):
+    chave = _chave_versao(usuario_id)
+    versao = cache.get(chave)
+    if versao is None:
+        # Começa de um valor novo (e não de 1): se a chave de versão for despejada do cache,
+        # os usuários gravados nas versões anteriores não voltam a ser lidos
+        cache.add(chave, time.time_ns(), timeout=None)
+        versao = cache.get(chave)
+    return versao
+
+
+def invalidar_usuario(usuario_id):
+    """Chamado quando o usuário é salvo/excluído: muda a versão usada na chave de cache"""
+    try:
+        cache.incr(_chave_versao(usuario_id))
+    except ValueError:
+        pass  # Sem versão em cache: a próxima leitura já começa uma nova
+
+
+def usuario_em_cache(usuario_id):
+    """Usuário pelo id, do cache ou (na primeira vez após cada alteração) do banco; None se não existir"""
+    chave = f'{PREFIXO}:{usuario_id}:{_versao(usuario_id)}'
+    usuario = cache.get(chave)
+    if usuario is None:
+        modelo = get_user_model()
+        try:
+            usuario = modelo._default_manager.get(pk=usuario_id)
+        except modelo.DoesNotExist:
+            return None
+        cache.set(chave, usuario, timeout=settings.USUARIO_CACHE_TIMEOUT)
+    return usuario
+
+
+class BackendUsuarioEmCache(ModelBackend):
+    """ModelBackend cujo get_user (chamado pelo AuthenticationMiddleware) usa usuario_em_cache"""
+
+    def get_user(self, user_id):
+        usuario = usuario_em_cache(user_id)
+        return usuario if usuario is not None and self.user_can_authenticate(usuario) else None
@@ -0,0 +1,213 @@
+"""
+Monitoramento de consultas SQL (detecção de N+1)
+As consultas são agrupadas pela "impressão digital" do SQL: parâmetros já vêm
+separados pelo driver e listas IN (%s, %s, ...) são colapsadas, então a mesma
+consulta feita uma vez por linha de uma listagem aparece como um único padrão repetido.
+Quando um padrão passa do limite, a pilha do código do projeto que o disparou é guardada
+para a mensagem. Nos testes, OrcamentoConsultasMixin conta também por teste e confere
+orçamentos de consultas por endpoint.
+"""
+from collections import Counter
+from contextlib import contextmanager
+import logging
+import os
+import re
+import traceback
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_LISTA_PARAMETROS = re.compile(r'\((?:\s*%s\s*,)+\s*%s\s*\)')
+_ESPACOS = re.compile(r'\s+')
+_NUMEROS = re.compile(r'\b\d+\b')
+_TEXTOS = re.compile(r"'(?:[^']|'')*'")
+_SAVEPOINTS = re.compile(r'"s\d+_x\d+"')
+# Infraestrutura que aparece em toda pilha e não ajuda a achar a origem da consulta
+_ARQUIVOS_IGNORADOS = {'consultas.py', 'middleware.py', 'metricas.py', 'perfis.py'}
+_monitores_teste = []  # MonitorTeste ativos (um por teste em execução)
+
+
+class ConsultasRepetidasError(AssertionError):
+    """Uma requisição repetiu o mesmo padrão de consulta além do limite (provável N+1)"""
+
+
+def impressao_digital(sql):
+    """Normaliza o SQL para agrupar consultas que só diferem nos valores"""
+    sql = _TEXTOS.sub('?', sql)
+    sql = _NUMEROS.sub('?', sql)
+    sql = _SAVEPOINTS.sub('?', sql)
+    sql = _LISTA_PARAMETROS.sub('(...)', sql)
+    return _ESPACOS.sub(' ', sql).strip()
+
+
+class MonitorConsultas:
+    """
+    Context manager que conta as consultas executadas por padrão (impressão digital)
+    Usa connection.execute_wrapper, então funciona com DEBUG=False.
+
+        with MonitorConsultas() as monitor:
+            ...
+        monitor.repetidas(limite=10)  # [(padrão, vezes), ...]
+    """
+
+    def __init__(self, using='default', somente_leitura=True, limite=None):
+        self.conexao = connections[using]
+        self.somente_leitura = somente_leitura
+        self.limite = limite
+        self.padroes = Counter()
+        self.exemplos = {}
+        self.pilhas = {}
+        self.total = 0
+        self._contexto = None
+
+    def __call__(self, execute, sql, params, many, context):
+        self.total += 1
+        if not self.somente_leitura or sql.lstrip()[:6].upper() == 'SELECT':
+            padrao = impressao_digital(sql)
+            self.padroes[padrao] += 1
+            self.exemplos.setdefault(padrao, sql)
+            # A pilha só é extraída na repetição que passa do limite (custo zero no caso comum)
+            if self.limite is not None and self.padroes[padrao] == self.limite + 1:
+                self.pilhas[padrao] = pilha_origem()
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self._contexto = self.conexao.execute_wrapper(self)
+        self._contexto.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._contexto.__exit__(*exc_info)
+        self._contexto = None
+
+    def repetidas(self, limite):
+        """Padrões executados mais de `limite` vezes, do mais repetido ao menos"""
+        return [(padrao, vezes) for padrao, vezes in self.padroes.most_common() if vezes > limite]
+
+    def descrever(self, limite):
+        linhas = []
+        for padrao, vezes in self.repetidas(limite):
+            linhas.append(f'{vezes}x {padrao[:300]}')
+            linhas.extend(f'    {frame}' for frame in self.pilhas.get(padrao, ()))
+        return '\n'.join(linhas)
+
+
+def pilha_origem(profundidade=6):
+    """Últimos frames do código do projeto (fora de bibliotecas e do middleware) na pilha atual"""
+    base = str(settings.BASE_DIR)
+    frames = [
+        frame for frame in traceback.extract_stack()[:-2]
+        if frame.filename.startswith(base)
+        and 'site-packages' not in frame.filename
+        and os.path.basename(frame.filename) not in _ARQUIVOS_IGNORADOS
+    ]
+    return [
+        f'{os.path.relpath(frame.filename, base)}:{frame.lineno} em {frame.name}: {frame.line}'
+        for frame in frames[-profundidade:]
+    ]
+
+
+class MonitorTeste(MonitorConsultas):
+    """
+    MonitorConsultas de um teste inteiro (OrcamentoConsultasMixin)
+    As requisições feitas pelo client não entram em `padroes`: cada uma é registrada à parte em
+    `requisicoes` (método, caminho, rota, total, SELECTs e padrões) por monitorar_requisicao.
+    """
+
+    def __init__(self, limite=None):
+        super().__init__(limite=limite)
+        self.requisicoes = []
+        self._em_requisicao = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        if self._em_requisicao:
+            return execute(sql, params, many, context)
+        return super().__call__(execute, sql, params, many, context)
+
+    def __enter__(self):
+        _monitores_teste.append(self)
+        return super().__enter__()
+
+    def __exit__(self, *exc_info):
+        _monitores_teste.remove(self)
+        super().__exit__(*exc_info)
+
+
+@contextmanager
+def monitorar_requisicao(request, limite):
+    """Monitor de uma requisição (ConsultasRepetidasMiddleware), repassado aos MonitorTeste ativos"""
+    testes = list(_monitores_teste)
+    for teste in testes:
+        teste._em_requisicao += 1
+    monitor = MonitorConsultas(limite=limite)
+    try:
+        with monitor:
+            yield monitor
+    finally:
+        match = getattr(request, 'resolver_match', None)
+        for teste in testes:
+            teste._em_requisicao -= 1
+            teste.requisicoes.append({
+                'metodo': request.method,
+                'caminho': request.path,
+                'rota': match.view_name if match else None,
+                'total': monitor.total,
+                'selects': sum(monitor.padroes.values()),
+                'padroes': monitor.padroes,
+            })
+
+
+def monitorando_testes():
+    return bool(_monitores_teste)
+
+
+class OrcamentoConsultasMixin:
+    """
+    Mixin de TestCase: orçamento de consultas por endpoint e detecção de N+1 no teste todo
+
+        class PlanosTest(OrcamentoConsultasMixin, APITestCase):
+            orcamento_consultas = {'plano-list': 3, '/api/auth/user/': 5}
+
+    Toda requisição do client a uma rota (nome da URL ou caminho) do orçamento falha o teste se
+    fizer mais SELECTs que o previsto (escritas, savepoints e transações não entram no orçamento). No código chamado direto pelo teste (fora das
+    requisições), um padrão repetido mais que limite_repeticoes (padrão: CONSULTAS_REPETIDAS_LIMITE)
+    falha o teste com CONSULTAS_REPETIDAS_ESTRITO ou gera um aviso com a pilha de origem.
+    setUp e fixtures não entram na contagem.
+    """
+    orcamento_consultas = {}
+    limite_repeticoes = None
+
+    def _callTestMethod(self, method):
+        limite = self.limite_repeticoes
+        if limite is None:
+            limite = getattr(settings, 'CONSULTAS_REPETIDAS_LIMITE', None)
+        with MonitorTeste(limite=limite) as self.monitor_consultas:
+            super()._callTestMethod(method)
+        self._verificar_consultas(limite)
+
+    def _verificar_consultas(self, limite):
+        monitor = self.monitor_consultas
+        estouros = []
+        for requisicao in monitor.requisicoes:
+            orcamento = self.orcamento_consultas.get(requisicao['rota'])
+            if orcamento is None:
+                orcamento = self.orcamento_consultas.get(requisicao['caminho'])
+            if orcamento is not None and requisicao['selects'] > orcamento:
+                mais_frequentes = '\n'.join(
+                    f'    {vezes}x {padrao[:200]}' for padrao, vezes in requisicao['padroes'].most_common(5)
+                )
+                estouros.append(
+                    f"{requisicao['metodo']} {requisicao['caminho']} ({requisicao['rota']}): "
+                    f"{requisicao['selects']} SELECTs ({requisicao['total']} consultas no total), "
+                    f"orçamento {orcamento}\n{mais_frequentes}"
+                )
+        if estouros:
+            self.fail('Orçamento de consultas excedido:\n' + '\n'.join(estouros))
+
+        if limite is not None and monitor.repetidas(limite):
+            mensagem = f'{self.id()}: consulta repetida mais de {limite} vezes (provável N+1)\n{monitor.descrever(limite)}'
+            if getattr(settings, 'CONSULTAS_REPETIDAS_ESTRITO', False):
+                self.fail(mensagem)
+            logger.warning(mensagem)
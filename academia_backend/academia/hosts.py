@@ -0,0 +1,60 @@
+"""
+Validação de host compilada (substitui a varredura linear de ALLOWED_HOSTS)
+HOSTS_PERMITIDOS é compilado uma vez num conjunto de hosts exatos e num conjunto de
+sufixos curinga ('.railway.app' ou '*.railway.app' aceitam o domínio e qualquer subdomínio).
+A consulta testa o host e cada sufixo seu (um por rótulo DNS): custo constante,
+independente do tamanho da lista, e as configurações nunca são alteradas.
+"""
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+
+class ValidadorHosts:
+    """Conjunto compilado de hosts permitidos, com a mesma semântica de ALLOWED_HOSTS"""
+
+    def __init__(self, padroes):
+        self.qualquer = False
+        self.exatos = set()
+        self.sufixos = set()
+        for padrao in padroes:
+            padrao = padrao.strip().lower().rstrip('.')
+            if padrao == '*':
+                self.qualquer = True
+            elif padrao.startswith('*.'):
+                self.sufixos.add(padrao[1:])
+            elif padrao.startswith('.'):
+                self.sufixos.add(padrao)
+            elif padrao:
+                self.exatos.add(padrao)
+
+    def permitido(self, host):
+        """host sem porta (como devolvido por split_domain_port)"""
+        if self.qualquer:
+            return True
+        host = host.lower().rstrip('.')
+        if not host:
+            return False
+        if host in self.exatos or ('.' + host) in self.sufixos:
+            return True
+        # '.a.b.railway.app' -> '.b.railway.app' -> '.railway.app' -> '.app'
+        posicao = host.find('.')
+        while posicao != -1:
+            if host[posicao:] in self.sufixos:
+                return True
+            posicao = host.find('.', posicao + 1)
+        return False
+
+
+@lru_cache(maxsize=1)
+def validador_hosts():
+    """Validador compilado a partir de HOSTS_PERMITIDOS (recompilado se a configuração mudar)"""
+    return ValidadorHosts(getattr(settings, 'HOSTS_PERMITIDOS', settings.ALLOWED_HOSTS))
+
+
+@receiver(setting_changed)
+def _recompilar(sender, setting, **kwargs):
+    if setting in ('HOSTS_PERMITIDOS', 'ALLOWED_HOSTS'):
+        validador_hosts.cache_clear()
@@ -0,0 +1,48 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from academia.services.importacao import TAMANHO_LOTE, ArquivoInvalido, importar_membros
+
+
+class Command(BaseCommand):
+    help = 'Importa alunos (e matrículas, se houver a coluna "plano") de um arquivo CSV ou XLSX'
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', help='Caminho do .csv ou .xlsx')
+        parser.add_argument('--lote', type=int, default=TAMANHO_LOTE, help='Alunos por bulk_create')
+        parser.add_argument('--processos', type=int, help='Processos para gerar as senhas (padrão: CPUs)')
+        parser.add_argument('--relatorio', help='Grava as linhas rejeitadas neste CSV')
+        parser.add_argument('--convites', help='Grava e-mail, uid e token de convite dos alunos sem senha neste CSV')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['arquivo'], 'rb') as arquivo:
+                resultado = importar_membros(
+                    arquivo, options['arquivo'],
+                    tamanho_lote=max(options['lote'], 1), processos=options['processos'],
+                )
+        except (OSError, ArquivoInvalido) as e:
+            raise CommandError(str(e))
+
+        if options['relatorio']:
+            with open(options['relatorio'], 'w', newline='', encoding='utf-8') as saida:
+                escritor = csv.writer(saida)
+                escritor.writerow(['linha', 'email', 'erros'])
+                escritor.writerows([e['linha'], e['email'], ' | '.join(e['erros'])] for e in resultado.erros)
+        else:
+            for erro in resultado.erros[:20]:
+                self.stdout.write(self.style.WARNING(f"Linha {erro['linha']} ({erro['email']}): {' '.join(erro['erros'])}"))
+            if len(resultado.erros) > 20:
+                self.stdout.write(f'... e mais {len(resultado.erros) - 20} (use --relatorio)')
+
+        if options['convites']:
+            with open(options['convites'], 'w', newline='', encoding='utf-8') as saida:
+                escritor = csv.DictWriter(saida, fieldnames=['email', 'uid', 'token'])
+                escritor.writeheader()
+                escritor.writerows(resultado.convites)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{resultado.linhas} linha(s): {resultado.criados} aluno(s) e {resultado.matriculas} matrícula(s) '
+            f'criados, {len(resultado.erros)} rejeitada(s)'
+        ))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from academia.services.sincronizacao import limpar_exclusoes_antigas
+
+
+class Command(BaseCommand):
+    help = 'Remove marcas de exclusão da sincronização mais antigas que SYNC_RETENCAO_EXCLUSOES_DIAS'
+
+    def handle(self, *args, **options):
+        removidas = limpar_exclusoes_antigas()
+        self.stdout.write(self.style.SUCCESS(f'{removidas} marca(s) de exclusão removida(s)'))
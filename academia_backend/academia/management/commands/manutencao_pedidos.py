@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+from academia.services.pedidos import TAMANHO_LOTE, arquivar_pedidos, expirar_pedidos_pendentes
+
+
+class Command(BaseCommand):
+    help = (
+        'Expira pedidos pendentes além de PEDIDO_PENDENTE_TTL_HORAS e move pedidos finalizados '
+        'além de PEDIDOS_RETENCAO_DIAS para a tabela de arquivo, em lotes'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=TAMANHO_LOTE, help='Pedidos por transação')
+        parser.add_argument(
+            '--tempo-maximo', type=float, default=0,
+            help='Segundos de trabalho por etapa (0 = sem limite); o restante fica para a próxima execução',
+        )
+        parser.add_argument('--pausa', type=float, default=0, help='Segundos de espera entre lotes')
+        parser.add_argument('--sem-arquivamento', action='store_true', help='Somente expirar pendentes')
+
+    def handle(self, *args, **options):
+        parametros = {
+            'tamanho_lote': max(options['lote'], 1),
+            'tempo_maximo': options['tempo_maximo'] or None,
+            'pausa': options['pausa'],
+            'ao_progredir': self._progresso if options['verbosity'] > 1 else None,
+        }
+
+        expirados, concluido = expirar_pedidos_pendentes(**parametros)
+        self.stdout.write(f'{expirados} pedido(s) expirado(s)' + ('' if concluido else ' (tempo esgotado)'))
+
+        if not options['sem_arquivamento']:
+            arquivados, concluido = arquivar_pedidos(**parametros)
+            self.stdout.write(f'{arquivados} pedido(s) arquivado(s)' + ('' if concluido else ' (tempo esgotado)'))
+
+        self.stdout.write(self.style.SUCCESS('Manutenção de pedidos concluída'))
+
+    def _progresso(self, etapa, progresso):
+        self.stdout.write(
+            f"{etapa}: {progresso['processados']}/{progresso['total']} "
+            f"({progresso['por_segundo'] or 0}/s, {progresso['lotes']} lote(s))"
+        )
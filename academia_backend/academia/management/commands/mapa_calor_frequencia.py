@@ -0,0 +1,48 @@
+from datetime import timedelta
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from academia.services.mapa_calor import obter_mapa_calor
+
+
+class Command(BaseCommand):
+    help = 'Calcula o mapa de calor da ocupação (dia da semana x hora) e grava no cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help='Data inicial (AAAA-MM-DD). Padrão: 90 dias atrás')
+        parser.add_argument('--ate', help='Data final (AAAA-MM-DD). Padrão: hoje')
+        parser.add_argument('--sem-cache', action='store_true', help='Ignora o resultado em cache e recalcula')
+
+    def handle(self, *args, **options):
+        ate = self._data(options['ate'], '--ate') or timezone.localdate()
+        desde = self._data(options['desde'], '--desde') or ate - timedelta(days=89)
+        if desde > ate:
+            raise CommandError('--desde deve ser anterior a --ate')
+
+        inicio = time.perf_counter()
+        mapa = obter_mapa_calor(desde, ate, usar_cache=not options['sem_cache'])
+        duracao = time.perf_counter() - inicio
+
+        self.stdout.write(f"{mapa['visitas']} visitas de {desde} a {ate} ({duracao:.2f}s)")
+        self.stdout.write('          ' + ' '.join(f'{h:>4}' for h in range(24)))
+        for dia, linha in zip(mapa['dias_semana'], mapa['media_pessoas']):
+            self.stdout.write(f'{dia:<10}' + ' '.join(f'{v:>4.0f}' for v in linha))
+        if mapa['pico']:
+            pico = mapa['pico']
+            self.stdout.write(self.style.SUCCESS(
+                f"Pico: {pico['dia_semana']} às {pico['hora']}h ({pico['media_pessoas']} pessoas em média)"
+            ))
+
+    def _data(self, valor, opcao):
+        if not valor:
+            return None
+        try:
+            data = parse_date(valor)
+        except ValueError:
+            data = None
+        if data is None:
+            raise CommandError(f'{opcao} deve estar no formato AAAA-MM-DD')
+        return data
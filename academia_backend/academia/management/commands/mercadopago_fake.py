@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+from academia.services.mercadopago_fake import ConfiguracaoFake, ServidorMercadoPagoFake
+
+
+class Command(BaseCommand):
+    help = (
+        'Sobe um servidor local que imita a API do Mercado Pago (preferências, pagamentos, busca, '
+        'assinaturas e webhooks) com latência, erros e webhooks duplicados configuráveis'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--porta', type=int, default=8001)
+        parser.add_argument('--latencia', type=float, default=0, help='Milissegundos por resposta da API')
+        parser.add_argument('--variacao', type=float, default=0, help='Milissegundos aleatórios somados à latência')
+        parser.add_argument('--erros', type=float, default=0, help='Fração das chamadas respondidas com 500 (0 a 1)')
+        parser.add_argument('--webhook-duplicado', type=float, default=0, help='Fração dos webhooks entregues duas vezes')
+        parser.add_argument('--atraso-webhook', type=float, default=0, help='Milissegundos até a entrega do webhook')
+        parser.add_argument('--aprovar-apos', type=float, help='Paga cada preferência sozinho após N segundos')
+        parser.add_argument('--status', default='approved', help='Status dos pagamentos criados (approved, rejected...)')
+
+    def handle(self, *args, **options):
+        configuracao = ConfiguracaoFake(
+            latencia=options['latencia'] / 1000,
+            variacao=options['variacao'] / 1000,
+            taxa_erros=options['erros'],
+            taxa_webhook_duplicado=options['webhook_duplicado'],
+            atraso_webhook=options['atraso_webhook'] / 1000,
+            aprovar_apos=options['aprovar_apos'],
+            status_pagamento=options['status'],
+        )
+        servidor = ServidorMercadoPagoFake((options['host'], options['porta']), configuracao)
+        self.stdout.write(self.style.SUCCESS(f'Mercado Pago fake em {servidor.url}'))
+        self.stdout.write(f'Backend: MERCADOPAGO_API_URL={servidor.url} (Ctrl+C para encerrar)')
+        try:
+            servidor.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            servidor.server_close()
+            self.stdout.write('Servidor encerrado')
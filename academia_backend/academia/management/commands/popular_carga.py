@@ -0,0 +1,209 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from academia.models import (
+    Frequencia, Matricula, ParticipanteTorneio, Pedido, Plano, Torneio, Usuario,
+)
+from academia.services.frequencia_diaria import recalcular_periodo
+
+NOMES = ('Ana', 'Bruno', 'Carla', 'Diego', 'Eduarda', 'Felipe', 'Gabriela', 'Heitor', 'Isabela', 'João',
+         'Larissa', 'Marcos', 'Natália', 'Otávio', 'Paula', 'Rafael', 'Sofia', 'Thiago', 'Vitória', 'Yuri')
+SOBRENOMES = ('Silva', 'Santos', 'Oliveira', 'Souza', 'Rodrigues', 'Ferreira', 'Alves', 'Pereira', 'Lima',
+              'Gomes', 'Costa', 'Ribeiro', 'Martins', 'Carvalho', 'Araújo', 'Melo', 'Barbosa', 'Conceição')
+PLANOS_PADRAO = (
+    ('Básico', Decimal('89.90'), 30),
+    ('Premium', Decimal('149.90'), 30),
+    ('Elite', Decimal('1499.90'), 365),
+)
+SENHA_PADRAO = 'carga12345'
+
+
+class Command(BaseCommand):
+    help = (
+        'Popula o banco com volume de produção para benchmarks (scripts/benchmark_endpoints.py): '
+        'usuários, matrículas, frequências, pedidos e torneios via bulk_create, em lotes'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuarios', type=int, default=50000)
+        parser.add_argument('--matriculas', type=int, default=200000)
+        parser.add_argument('--frequencias', type=int, default=1000000)
+        parser.add_argument('--pedidos', type=int, default=500000)
+        parser.add_argument('--torneios', type=int, default=4)
+        parser.add_argument('--participantes', type=int, default=256, help='Participantes por torneio')
+        parser.add_argument('--escala', type=float, default=1.0, help='Multiplica todos os volumes (ex.: 0.01)')
+        parser.add_argument('--lote', type=int, default=5000, help='Linhas por bulk_create/transação')
+        parser.add_argument('--dias', type=int, default=365, help='Janela de histórico das frequências')
+        parser.add_argument('--prefixo', default='carga', help='Prefixo dos usernames/emails gerados')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--limpar', action='store_true', help='Remove antes os dados gerados com o mesmo prefixo')
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        self.lote = max(options['lote'], 1)
+        self.prefixo = options['prefixo']
+        self.verbosity = options['verbosity']
+        escala = options['escala']
+        volumes = {
+            nome: max(int(options[nome] * escala), 0)
+            for nome in ('usuarios', 'matriculas', 'frequencias', 'pedidos', 'torneios')
+        }
+        if volumes['usuarios'] < 3:
+            raise CommandError('São necessários ao menos 3 usuários (admin, professor e aluno)')
+
+        if options['limpar']:
+            removidos, _ = Usuario.objects.filter(username__startswith=f'{self.prefixo}-').delete()
+            Torneio.objects.filter(nome__startswith=f'[{self.prefixo}]').delete()
+            self.stdout.write(f'{removidos} registro(s) anterior(es) removido(s)')
+        elif Usuario.objects.filter(username__startswith=f'{self.prefixo}-').exists():
+            raise CommandError(f'Já existem usuários "{self.prefixo}-*"; use --limpar ou outro --prefixo')
+
+        inicio = time.perf_counter()
+        planos = self._planos()
+        alunos, admin = self._usuarios(volumes['usuarios'])
+        self._matriculas(volumes['matriculas'], alunos, planos)
+        self._frequencias(volumes['frequencias'], alunos, options['dias'])
+        self._pedidos(volumes['pedidos'], alunos, planos)
+        self._torneios(volumes['torneios'], options['participantes'], alunos, admin)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Dados de carga gerados em {time.perf_counter() - inicio:.1f}s '
+            f'(login: {self.prefixo}-admin / {self.prefixo}-professor / {self.prefixo}-0, senha "{SENHA_PADRAO}")'
+        ))
+
+    def _gravar(self, modelo, total, gerar):
+        """bulk_create em lotes de self.lote, cada um na sua transação; gerar(i) devolve uma instância"""
+        inicio = time.perf_counter()
+        for comeco in range(0, total, self.lote):
+            objetos = [gerar(i) for i in range(comeco, min(comeco + self.lote, total))]
+            with transaction.atomic():
+                modelo.objects.bulk_create(objetos, batch_size=self.lote)
+            if self.verbosity > 1:
+                self.stdout.write(f'  {modelo._meta.verbose_name_plural}: {comeco + len(objetos)}/{total}')
+        duracao = time.perf_counter() - inicio
+        self.stdout.write(
+            f'{total} {modelo._meta.verbose_name_plural.lower()} em {duracao:.1f}s '
+            f'({int(total / duracao) if duracao else total}/s)'
+        )
+
+    def _planos(self):
+        planos = list(Plano.objects.filter(ativo=True))
+        if not planos:
+            planos = [
+                Plano.objects.create(nome=nome, descricao=f'Plano {nome}', preco=preco, duracao_dias=dias)
+                for nome, preco, dias in PLANOS_PADRAO
+            ]
+        return planos
+
+    def _usuarios(self, total):
+        # Hash calculado uma vez: PBKDF2 por usuário levaria horas para 50 mil contas
+        senha = make_password(SENHA_PADRAO)
+        professores = max(total // 100, 1)
+
+        def gerar(i):
+            nome, sobrenome = random.choice(NOMES), random.choice(SOBRENOMES)
+            if i == 0:
+                username, role = f'{self.prefixo}-admin', Usuario.Role.ADMIN
+            elif i <= professores:
+                username, role = (f'{self.prefixo}-professor' if i == 1 else f'{self.prefixo}-professor-{i}',
+                                  Usuario.Role.PROFESSOR)
+            else:
+                username, role = f'{self.prefixo}-{i - professores - 1}', Usuario.Role.ALUNO
+            usuario = Usuario(
+                username=username, email=f'{username}@example.com', password=senha,
+                first_name=nome, last_name=sobrenome, role=role,
+                is_staff=role == Usuario.Role.ADMIN,
+                gender=random.choice(('male', 'female')),
+                is_active_member=role == Usuario.Role.ALUNO and random.random() < 0.6,
+            )
+            # bulk_create não chama save(): o texto da busca indexada é montado aqui
+            usuario.texto_busca = usuario.montar_texto_busca()
+            return usuario
+
+        self._gravar(Usuario, total, gerar)
+        gerados = Usuario.objects.filter(username__startswith=f'{self.prefixo}-')
+        alunos = list(gerados.filter(role=Usuario.Role.ALUNO).values_list('id', flat=True))
+        admin = gerados.get(username=f'{self.prefixo}-admin')
+        return alunos, admin
+
+    def _matriculas(self, total, alunos, planos):
+        hoje = timezone.localdate()
+
+        def gerar(i):
+            plano = random.choice(planos)
+            data_inicio = hoje - timedelta(days=random.randint(0, 730))
+            data_fim = data_inicio + timedelta(days=plano.duracao_dias)
+            if random.random() < 0.05:
+                situacao = 'cancelada'
+            elif data_fim < hoje:
+                situacao = 'vencida'
+            else:
+                situacao = 'suspensa' if random.random() < 0.02 else 'ativa'
+            return Matricula(
+                usuario_id=random.choice(alunos), plano=plano, data_inicio=data_inicio,
+                data_fim=data_fim, status=situacao, valor_pago=plano.preco,
+            )
+
+        self._gravar(Matricula, total, gerar)
+
+    def _frequencias(self, total, alunos, dias):
+        agora = timezone.now()
+        inicio_janela = (agora - timedelta(days=dias)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+        def gerar(i):
+            # Picos às 7h e às 18h; visitas de 45 a 120 minutos
+            entrada = inicio_janela + timedelta(
+                days=random.randrange(dias),
+                hours=min(max(random.choice((7, 18)) + random.gauss(0, 1.5), 5), 22),
+            )
+            saida = entrada + timedelta(minutes=random.randint(45, 120))
+            return Frequencia(
+                usuario_id=random.choice(alunos), data_entrada=entrada,
+                data_saida=saida if saida < agora else None,
+            )
+
+        self._gravar(Frequencia, total, gerar)
+        if total:
+            # bulk_create não passa pelo registrar_entrada: a consolidação diária é reconstruída no banco
+            inicio = time.perf_counter()
+            linhas = recalcular_periodo(inicio_janela.date(), timezone.localdate())
+            self.stdout.write(f'{linhas} frequência(s) diária(s) consolidada(s) em {time.perf_counter() - inicio:.1f}s')
+
+    def _pedidos(self, total, alunos, planos):
+        situacoes = (Pedido.STATUS_APROVADO, Pedido.STATUS_PENDENTE, Pedido.STATUS_CANCELADO, Pedido.STATUS_EXPIRADO)
+
+        def gerar(i):
+            plano = random.choice(planos)
+            situacao = random.choices(situacoes, weights=(60, 10, 15, 15))[0]
+            return Pedido(
+                usuario_id=random.choice(alunos), plano=plano, valor=plano.preco,
+                metodo=random.choice((Pedido.METODO_PIX, Pedido.METODO_CARTAO)), status=situacao,
+                mercado_pago_payment_id=10 ** 10 + i if situacao == Pedido.STATUS_APROVADO else None,
+                mercado_pago_status='approved' if situacao == Pedido.STATUS_APROVADO else '',
+            )
+
+        self._gravar(Pedido, total, gerar)
+
+    def _torneios(self, total, participantes, alunos, admin):
+        agora = timezone.now()
+        participantes = min(participantes, len(alunos))
+        for n in range(total):
+            with transaction.atomic():
+                torneio = Torneio.objects.create(
+                    nome=f'[{self.prefixo}] Torneio {n + 1}', descricao='Torneio gerado para benchmark',
+                    data_inicio_inscricoes=agora - timedelta(days=10), data_fim_inscricoes=agora + timedelta(days=5),
+                    data_inicio=agora + timedelta(days=7), max_participantes=participantes, criado_por=admin,
+                )
+                ParticipanteTorneio.objects.bulk_create([
+                    ParticipanteTorneio(torneio=torneio, usuario_id=usuario_id)
+                    for usuario_id in random.sample(alunos, participantes)
+                ], batch_size=self.lote)
+        if total:
+            self.stdout.write(f'{total} torneio(s) com {participantes} participantes')
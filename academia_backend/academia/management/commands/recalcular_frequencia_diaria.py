@@ -0,0 +1,56 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from academia.models import Frequencia
+from academia.services.frequencia_diaria import recalcular_periodo
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói a consolidação diária de frequência (FrequenciaDiaria) a partir da tabela Frequencia'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help='Data inicial (AAAA-MM-DD). Padrão: primeira frequência registrada')
+        parser.add_argument('--ate', help='Data final (AAAA-MM-DD). Padrão: hoje')
+        parser.add_argument(
+            '--dias-por-lote', type=int, default=31,
+            help='Tamanho de cada período recalculado numa transação',
+        )
+
+    def handle(self, *args, **options):
+        desde = self._data(options['desde'], '--desde')
+        ate = self._data(options['ate'], '--ate') or timezone.localdate()
+        if desde is None:
+            limites = Frequencia.objects.aggregate(primeira=Min('data_entrada'), ultima=Max('data_entrada'))
+            if limites['primeira'] is None:
+                self.stdout.write('Nenhuma frequência registrada.')
+                return
+            desde = timezone.localdate(limites['primeira'])
+        if desde > ate:
+            raise CommandError('--desde deve ser anterior a --ate')
+
+        passo = timedelta(days=max(options['dias_por_lote'], 1))
+        total = 0
+        inicio = desde
+        while inicio <= ate:
+            fim = min(inicio + passo - timedelta(days=1), ate)
+            gravadas = recalcular_periodo(inicio, fim)
+            total += gravadas
+            self.stdout.write(f'{inicio} a {fim}: {gravadas} linhas')
+            inicio = fim + timedelta(days=1)
+
+        self.stdout.write(self.style.SUCCESS(f'Consolidação recalculada de {desde} a {ate}: {total} linhas'))
+
+    def _data(self, valor, opcao):
+        if not valor:
+            return None
+        try:
+            data = parse_date(valor)
+        except ValueError:
+            data = None
+        if data is None:
+            raise CommandError(f'{opcao} deve estar no formato AAAA-MM-DD')
+        return data
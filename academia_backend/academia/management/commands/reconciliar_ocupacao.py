@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from academia.services.ocupacao import reconciliar_ocupacao
+
+
+class Command(BaseCommand):
+    help = 'Recalcula o contador de ocupação (cache) a partir das visitas em aberto na tabela Frequencia'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--intervalo', type=int, default=0,
+            help='Repetir a cada N segundos (0 = executar uma vez)',
+        )
+
+    def handle(self, *args, **options):
+        intervalo = options['intervalo']
+        while True:
+            anterior, atual = reconciliar_ocupacao()
+            self.stdout.write(f'Ocupação: {atual} (contador anterior: {anterior})')
+            if not intervalo:
+                break
+            time.sleep(intervalo)
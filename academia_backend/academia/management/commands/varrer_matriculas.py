@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from academia.services.matriculas import (
+    DIAS_LEMBRETE, TAMANHO_LOTE, emitir_lembretes_renovacao, expirar_matriculas,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Marca como vencidas as matrículas com data_fim passada, atualiza is_active_member '
+        'e emite lembretes de renovação. Idempotente; pode rodar a cada poucos minutos.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=TAMANHO_LOTE, help='Matrículas por transação')
+        parser.add_argument(
+            '--tempo-maximo', type=float, default=60,
+            help='Segundos de trabalho por execução (0 = sem limite); o restante fica para a próxima',
+        )
+        parser.add_argument(
+            '--dias-lembrete', type=int, default=DIAS_LEMBRETE,
+            help='Antecedência (dias) do lembrete de renovação',
+        )
+        parser.add_argument('--sem-lembretes', action='store_true', help='Somente vencer matrículas')
+
+    def handle(self, *args, **options):
+        lote = max(options['lote'], 1)
+        tempo_maximo = options['tempo_maximo'] or None
+
+        vencidas, concluido = expirar_matriculas(tamanho_lote=lote, tempo_maximo=tempo_maximo)
+        self.stdout.write(f'{vencidas} matrícula(s) vencida(s)' + ('' if concluido else ' (tempo esgotado)'))
+
+        if not options['sem_lembretes']:
+            lembretes, concluido = emitir_lembretes_renovacao(
+                dias=options['dias_lembrete'], tamanho_lote=lote, tempo_maximo=tempo_maximo
+            )
+            self.stdout.write(f'{lembretes} lembrete(s) de renovação' + ('' if concluido else ' (tempo esgotado)'))
+
+        self.stdout.write(self.style.SUCCESS('Varredura de matrículas concluída'))
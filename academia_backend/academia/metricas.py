@@ -0,0 +1,225 @@
+"""
+Métricas por requisição (MetricasMiddleware)
+Cada requisição ganha um RegistroRequisicao num ContextVar: as consultas SQL são medidas por
+um execute_wrapper instalado em toda conexão nova (vale também para as threads do
+sync_to_async, que herdam o contexto), as chamadas ao Mercado Pago por medir() e a
+serialização (serializer.data, que roda to_representation, mais a renderização JSON) pelo
+medidor instalado em BaseSerializer.data e por JSONRendererMedido. Ao final, a duração entra no histograma da rota (texto Prometheus em
+/api/metricas/; os valores são do processo, um conjunto por worker).
+"""
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+import json
+import threading
+from time import perf_counter
+
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from rest_framework.renderers import JSONRenderer
+from rest_framework.serializers import BaseSerializer
+
+# Limites superiores (s) dos buckets do histograma de duração
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registro = ContextVar('registro_requisicao', default=None)
+_trava = threading.Lock()
+_rotas = {}  # (rota, método) -> EstatisticasRota
+
+
+class RegistroRequisicao:
+    """Tempos e contagens de uma requisição"""
+    __slots__ = ('inicio', 'sql', 'sql_segundos', 'mercadopago', 'mercadopago_segundos', 'serializacao_segundos',
+                 'serializando')
+
+    def __init__(self):
+        self.inicio = perf_counter()
+        self.sql = self.mercadopago = 0
+        self.sql_segundos = self.mercadopago_segundos = self.serializacao_segundos = 0.0
+        self.serializando = False
+
+    def duracao(self):
+        return perf_counter() - self.inicio
+
+    def server_timing(self, total):
+        """Valor do header Server-Timing (durações em ms; 'app' é o tempo fora das demais etapas)"""
+        app = max(total - self.sql_segundos - self.mercadopago_segundos - self.serializacao_segundos, 0)
+        return ', '.join([
+            f'db;dur={self.sql_segundos * 1000:.1f};desc="{self.sql} consultas"',
+            f'mp;dur={self.mercadopago_segundos * 1000:.1f};desc="{self.mercadopago} chamadas"',
+            f'serializacao;dur={self.serializacao_segundos * 1000:.1f}',
+            f'app;dur={app * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ])
+
+    def como_dict(self, total):
+        return {
+            'total_ms': round(total * 1000, 2),
+            'db_ms': round(self.sql_segundos * 1000, 2),
+            'db_consultas': self.sql,
+            'mp_ms': round(self.mercadopago_segundos * 1000, 2),
+            'mp_chamadas': self.mercadopago,
+            'serializacao_ms': round(self.serializacao_segundos * 1000, 2),
+        }
+
+
+class EstatisticasRota:
+    """Histograma de duração e totais acumulados de uma rota"""
+    __slots__ = ('buckets', 'soma', 'contagem', 'sql', 'sql_segundos', 'mercadopago', 'mercadopago_segundos', 'erros')
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS) + 1)  # último = +Inf
+        self.soma = 0.0
+        self.contagem = self.sql = self.mercadopago = self.erros = 0
+        self.sql_segundos = self.mercadopago_segundos = 0.0
+
+
+def iniciar():
+    """Começa o registro da requisição atual; devolve (registro, token para finalizar)"""
+    registro = RegistroRequisicao()
+    return registro, _registro.set(registro)
+
+
+def finalizar(token):
+    _registro.reset(token)
+
+
+@contextmanager
+def medir(etapa):
+    """
+    Soma o tempo do bloco à etapa ('mercadopago' ou 'serializacao') da requisição atual.
+    Na serialização, só o bloco mais externo conta (serializer.data dentro de outro não soma
+    duas vezes) e o SQL disparado dentro dele (querysets avaliados por to_representation) fica
+    só em 'db'.
+    """
+    registro = _registro.get()
+    if registro is None or (etapa != 'mercadopago' and registro.serializando):
+        yield
+        return
+    inicio = perf_counter()
+    sql_antes = registro.sql_segundos
+    if etapa != 'mercadopago':
+        registro.serializando = True
+    try:
+        yield
+    finally:
+        duracao = perf_counter() - inicio
+        if etapa == 'mercadopago':
+            registro.mercadopago += 1
+            registro.mercadopago_segundos += duracao
+        else:
+            registro.serializando = False
+            registro.serializacao_segundos += max(duracao - (registro.sql_segundos - sql_antes), 0)
+
+
+def medir_sql(execute, sql, params, many, context):
+    registro = _registro.get()
+    if registro is None:
+        return execute(sql, params, many, context)
+    inicio = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        registro.sql += 1
+        registro.sql_segundos += perf_counter() - inicio
+
+
+@receiver(connection_created)
+def _instalar_medidor_sql(sender, connection, **kwargs):
+    # No início da lista: execute_wrapper() de outros monitores empilha e desempilha do fim
+    if medir_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, medir_sql)
+
+
+def observar(rota, metodo, status_code, duracao, registro):
+    with _trava:
+        estatisticas = _rotas.get((rota, metodo))
+        if estatisticas is None:
+            estatisticas = _rotas[(rota, metodo)] = EstatisticasRota()
+        estatisticas.buckets[bisect_left(BUCKETS, duracao)] += 1
+        estatisticas.soma += duracao
+        estatisticas.contagem += 1
+        estatisticas.erros += status_code >= 500
+        estatisticas.sql += registro.sql
+        estatisticas.sql_segundos += registro.sql_segundos
+        estatisticas.mercadopago += registro.mercadopago
+        estatisticas.mercadopago_segundos += registro.mercadopago_segundos
+
+
+def limpar():
+    with _trava:
+        _rotas.clear()
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _rotulos(rota, metodo, **extras):
+    valores = {'rota': rota, 'metodo': metodo, **extras}
+    return '{' + ','.join(f'{chave}="{_escapar(valor)}"' for chave, valor in valores.items()) + '}'
+
+
+def texto_prometheus():
+    """Métricas no formato de exposição de texto do Prometheus"""
+    with _trava:
+        copia = {chave: (list(e.buckets), e.soma, e.contagem, e.erros, e.sql, e.sql_segundos,
+                         e.mercadopago, e.mercadopago_segundos) for chave, e in _rotas.items()}
+
+    linhas = [
+        '# HELP academia_requisicao_segundos Duração das requisições por rota',
+        '# TYPE academia_requisicao_segundos histogram',
+    ]
+    for (rota, metodo), (buckets, soma, contagem, *_) in sorted(copia.items()):
+        acumulado = 0
+        for limite, quantidade in zip(BUCKETS + ('+Inf',), buckets):
+            acumulado += quantidade
+            linhas.append(f'academia_requisicao_segundos_bucket{_rotulos(rota, metodo, le=limite)} {acumulado}')
+        linhas.append(f'academia_requisicao_segundos_sum{_rotulos(rota, metodo)} {soma:.6f}')
+        linhas.append(f'academia_requisicao_segundos_count{_rotulos(rota, metodo)} {contagem}')
+
+    contadores = [
+        ('academia_requisicao_erros_total', 'Respostas 5xx', 3),
+        ('academia_sql_consultas_total', 'Consultas SQL executadas', 4),
+        ('academia_sql_segundos_total', 'Tempo em consultas SQL', 5),
+        ('academia_mercadopago_chamadas_total', 'Chamadas à API do Mercado Pago', 6),
+        ('academia_mercadopago_segundos_total', 'Tempo esperando o Mercado Pago', 7),
+    ]
+    for nome, descricao, indice in contadores:
+        linhas.append(f'# HELP {nome} {descricao}')
+        linhas.append(f'# TYPE {nome} counter')
+        for (rota, metodo), valores in sorted(copia.items()):
+            valor = valores[indice]
+            linhas.append(f'{nome}{_rotulos(rota, metodo)} {valor:.6f}' if isinstance(valor, float)
+                          else f'{nome}{_rotulos(rota, metodo)} {valor}')
+    return '\n'.join(linhas) + '\n'
+
+
+def linha_log(rota, metodo, status_code, total, registro):
+    return json.dumps({'rota': rota, 'metodo': metodo, 'status': status_code, **registro.como_dict(total)})
+
+
+_data_sem_medicao = BaseSerializer.data
+
+
+def _data_medido(self):
+    with medir('serializacao'):
+        return _data_sem_medicao.fget(self)
+
+
+def instalar_medidor_serializacao():
+    """
+    Mede serializer.data na etapa 'serializacao'. Serializer.data e ListSerializer.data chamam
+    super().data, então substituir a property de BaseSerializer cobre todo serializer do DRF,
+    inclusive os criados com many=True.
+    """
+    if BaseSerializer.data is _data_sem_medicao:
+        BaseSerializer.data = property(_data_medido)
+
+
+class JSONRendererMedido(JSONRenderer):
+    """JSONRenderer do DRF com o tempo de renderização somado à etapa 'serializacao'"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with medir('serializacao'):
+            return super().render(data, accepted_media_type, renderer_context)
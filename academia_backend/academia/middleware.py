@@ -1,6 +1,27 @@
+import logging
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
 from django.utils.deprecation import MiddlewareMixin
 from django.core.exceptions import DisallowedHost
 from django.conf import settings
+from django.http.request import split_domain_port
+from django.utils.functional import SimpleLazyObject, empty
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from . import metricas, paginas, perfis
+from .consultas import ConsultasRepetidasError, monitorando_testes, monitorar_requisicao
+from .hosts import validador_hosts
+
+logger = logging.getLogger(__name__)
+metricas_logger = logging.getLogger('academia.metricas')
+
+
+def _usuario_carregado(request):
+    """Usuário já resolvido pela autenticação da view, sem disparar consultas (None se não carregado)"""
+    usuario = request.__dict__.get('user')
+    if isinstance(usuario, SimpleLazyObject) and usuario._wrapped is empty:
+        return None
+    return usuario
 
 
 class DisableCSRFForAPI(MiddlewareMixin):
@@ -16,33 +37,179 @@ class DisableCSRFForAPI(MiddlewareMixin):
         return None
 
 
-class RailwayHostMiddleware(MiddlewareMixin):
+class HostPermitidoMiddleware:
     """
-    Middleware para aceitar automaticamente domínios do Railway.
-    Intercepta a validação de host antes do CommonMiddleware do Django.
+    Valida o host da requisição com o conjunto compilado de HOSTS_PERMITIDOS (academia.hosts)
+    Deve ser o primeiro middleware: com a validação feita aqui, ALLOWED_HOSTS fica em ['*']
+    e request.get_host() deixa de percorrer a lista a cada chamada. Host inválido -> 400.
     """
+    sync_capable = True
+    async_capable = True
     
-    def process_request(self, request):
-        host = request.get_host().split(':')[0]  # Remove porta se houver
-        
-        # Se o host termina com .railway.app ou .up.railway.app, adicionar a ALLOWED_HOSTS
-        if (host.endswith('.railway.app') or host.endswith('.up.railway.app')):
-            if host not in settings.ALLOWED_HOSTS:
-                settings.ALLOWED_HOSTS.append(host)
-            # Marcar que o host é válido para evitar erro do Django
-            request._railway_host_valid = True
-            return None
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+    
+    def __call__(self, request):
+        dominio, _ = split_domain_port(request._get_raw_host())
+        if not validador_hosts().permitido(dominio):
+            raise DisallowedHost(f"Host inválido: {request._get_raw_host()!r}. Adicione-o a ALLOWED_HOSTS.")
+        # No modo ASGI devolve a corrotina da próxima camada, aguardada por quem chamou
+        return self.get_response(request)
+
+
+class WhiteNoiseAsyncMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoiseMiddleware que também roda no modo ASGI
+    O original é só síncrono: no ASGI o Django passaria toda a pilha abaixo dele
+    (e as views assíncronas de pagamento) para uma thread a cada requisição.
+    Também serve as páginas pré-renderizadas pelo collectstatic (academia.paginas)
+    nas URLs públicas, com cache curto e revalidação por ETag/Last-Modified.
+    """
+    sync_capable = True
+    async_capable = True
+    
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+        # Com autorefresh (DEBUG) o dicionário não é usado: as páginas saem das views
+        if not self.autorefresh:
+            for url, caminho in paginas.arquivos_paginas():
+                self.add_file_to_dictionary(url, caminho)
+    
+    def add_cache_headers(self, headers, path, url):
+        if url in paginas.PAGINAS_ESTATICAS:
+            headers['Cache-Control'] = f'public, max-age={settings.PAGINAS_ESTATICAS_MAX_AGE}, must-revalidate'
+            # Servidas antes do XFrameOptionsMiddleware: o header das páginas HTML vem daqui
+            headers['X-Frame-Options'] = getattr(settings, 'X_FRAME_OPTIONS', 'DENY').upper()
+        else:
+            super().add_cache_headers(headers, path, url)
+    
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+    
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = self.find_file(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
+
+
+class MetricasMiddleware:
+    """
+    Mede cada requisição (academia.metricas): SQL, Mercado Pago, serialização e total.
+    Registra no histograma da rota, loga uma linha JSON (logger academia.metricas, INFO)
+    e, para staff (ou com DEBUG), devolve os tempos no header Server-Timing.
+    """
+    sync_capable = True
+    async_capable = True
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+    
+    def __call__(self, request):
+        if not getattr(settings, 'METRICAS_HABILITADAS', True):
+            return self.get_response(request)
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        registro, token = metricas.iniciar()
+        try:
+            response = self.get_response(request)
+        finally:
+            metricas.finalizar(token)
+        return self._concluir(request, response, registro)
+    
+    async def __acall__(self, request):
+        registro, token = metricas.iniciar()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metricas.finalizar(token)
+        return self._concluir(request, response, registro)
+    
+    def _concluir(self, request, response, registro):
+        total = registro.duracao()
+        rota = request.resolver_match.view_name if request.resolver_match else 'nao_resolvida'
+        metricas.observar(rota, request.method, response.status_code, total, registro)
+        if metricas_logger.isEnabledFor(logging.INFO):
+            metricas_logger.info(metricas.linha_log(rota, request.method, response.status_code, total, registro))
         
-        return None
+        if settings.DEBUG or getattr(_usuario_carregado(request), 'is_staff', False):
+            response['Server-Timing'] = registro.server_timing(total)
+        return response
+
+
+class PerfilamentoMiddleware:
+    """
+    Perfila a requisição com cProfile (academia.perfis) quando ela traz X-Profile: <PERFIS_TOKEN>
+    ou cai na amostragem de PERFIS_TAXA_AMOSTRAGEM. Header com outro valor é ignorado antes
+    da view: não perfila nem ocupa a trava do perfil.
+    """
+    sync_capable = True
+    async_capable = True
     
-    def process_exception(self, request, exception):
-        # Se for erro de DisallowedHost e o host for do Railway, permitir
-        if isinstance(exception, DisallowedHost):
-            host = request.get_host().split(':')[0]
-            if (host.endswith('.railway.app') or host.endswith('.up.railway.app')):
-                if host not in settings.ALLOWED_HOSTS:
-                    settings.ALLOWED_HOSTS.append(host)
-                # Retornar None para continuar o processamento
-                return None
-        return None
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+    
+    def __call__(self, request):
+        # No modo ASGI o cProfile veria só o event loop, não as threads das views
+        if iscoroutinefunction(self) or not getattr(settings, 'PERFIS_HABILITADOS', True):
+            return self.get_response(request)
+        motivo = perfis.motivo_perfil(request)
+        if motivo is None:
+            return self.get_response(request)
+        
+        with perfis.Perfilador() as perfilador:
+            response = self.get_response(request)
+        
+        if perfilador.ativo:
+            perfil = perfis.salvar_perfil(perfilador, request, response, motivo, _usuario_carregado(request))
+            if motivo == perfis.PerfilRequisicao.MOTIVO_HEADER:
+                response['X-Profile-Id'] = str(perfil.pk)
+        return response
 
+
+class ConsultasRepetidasMiddleware:
+    """
+    Detector de N+1: conta as consultas SELECT da requisição por padrão e, se algum
+    se repetir mais que CONSULTAS_REPETIDAS_LIMITE vezes, registra um aviso ou, com
+    CONSULTAS_REPETIDAS_ESTRITO (padrão nos testes), levanta ConsultasRepetidasError.
+    A mensagem traz a pilha do código do projeto que fez a consulta repetida.
+    """
+    sync_capable = True
+    async_capable = True
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+    
+    def __call__(self, request):
+        limite = getattr(settings, 'CONSULTAS_REPETIDAS_LIMITE', None)
+        # No modo ASGI as consultas rodam em outras threads (sync_to_async), fora do alcance do monitor
+        if (limite is None and not monitorando_testes()) or iscoroutinefunction(self):
+            return self.get_response(request)
+        
+        with monitorar_requisicao(request, limite) as monitor:
+            response = self.get_response(request)
+        
+        if limite is not None and monitor.repetidas(limite):
+            mensagem = (
+                f"{request.method} {request.path}: consulta repetida mais de {limite} vezes "
+                f"(provável N+1)\n{monitor.descrever(limite)}"
+            )
+            if getattr(settings, 'CONSULTAS_REPETIDAS_ESTRITO', False):
+                raise ConsultasRepetidasError(mensagem)
+            logger.warning(mensagem)
+        return response
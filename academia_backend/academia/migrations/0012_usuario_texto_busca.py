@@ -0,0 +1,94 @@
+# Generated by Django 5.2.8 on 2026-10-19 10:00
+
+import unicodedata
+
+from django.db import OperationalError, migrations, models
+
+# Cópias congeladas (a migração não depende do código atual de models.py e services/busca.py)
+TABELA_FTS = 'academia_usuario_busca'
+INDICE_TRIGRAM = 'academia_usuario_texto_busca_trgm'
+
+
+def normalizar_texto(texto):
+    """Remove acentos, converte para minúsculas e compacta espaços"""
+    if not texto:
+        return ''
+    decomposto = unicodedata.normalize('NFKD', str(texto))
+    sem_acentos = ''.join(c for c in decomposto if not unicodedata.combining(c))
+    return ' '.join(sem_acentos.lower().split())
+
+
+def preencher_texto_busca(apps, schema_editor):
+    Usuario = apps.get_model('academia', 'Usuario')
+    campos = ('first_name', 'last_name', 'email', 'username')
+    lote = []
+    for usuario in Usuario.objects.using(schema_editor.connection.alias).only('id', *campos).iterator(chunk_size=2000):
+        usuario.texto_busca = normalizar_texto(' '.join(getattr(usuario, c) or '' for c in campos))
+        lote.append(usuario)
+        if len(lote) >= 2000:
+            Usuario.objects.bulk_update(lote, ['texto_busca'])
+            lote = []
+    if lote:
+        Usuario.objects.bulk_update(lote, ['texto_busca'])
+
+
+def criar_indice_busca(apps, schema_editor):
+    """pg_trgm + índice GIN no PostgreSQL; tabela FTS5 com triggers no SQLite (se compilado com FTS5)"""
+    tabela = apps.get_model('academia', 'Usuario')._meta.db_table
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+            cursor.execute(
+                f'CREATE INDEX IF NOT EXISTS {INDICE_TRIGRAM} ON {tabela} USING gin (texto_busca gin_trgm_ops)'
+            )
+        elif connection.vendor == 'sqlite':
+            try:
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABELA_FTS} "
+                    f"USING fts5(texto_busca, tokenize='unicode61 remove_diacritics 2')"
+                )
+            except OperationalError:
+                return  # Sem FTS5: a busca usa o fallback
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {TABELA_FTS}_ai AFTER INSERT ON {tabela} BEGIN "
+                f"INSERT INTO {TABELA_FTS}(rowid, texto_busca) VALUES (new.id, new.texto_busca); END"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {TABELA_FTS}_ad AFTER DELETE ON {tabela} BEGIN "
+                f"DELETE FROM {TABELA_FTS} WHERE rowid = old.id; END"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {TABELA_FTS}_au AFTER UPDATE OF texto_busca ON {tabela} BEGIN "
+                f"UPDATE {TABELA_FTS} SET texto_busca = new.texto_busca WHERE rowid = new.id; END"
+            )
+            cursor.execute(f"DELETE FROM {TABELA_FTS}")
+            cursor.execute(f"INSERT INTO {TABELA_FTS}(rowid, texto_busca) SELECT id, texto_busca FROM {tabela}")
+
+
+def remover_indice_busca(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(f'DROP INDEX IF EXISTS {INDICE_TRIGRAM}')
+        elif connection.vendor == 'sqlite':
+            for sufixo in ('ai', 'ad', 'au'):
+                cursor.execute(f'DROP TRIGGER IF EXISTS {TABELA_FTS}_{sufixo}')
+            cursor.execute(f'DROP TABLE IF EXISTS {TABELA_FTS}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academia', '0011_add_cpf_field'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usuario',
+            name='texto_busca',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='Texto de Busca'),
+        ),
+        migrations.RunPython(preencher_texto_busca, migrations.RunPython.noop),
+        migrations.RunPython(criar_indice_busca, remover_indice_busca),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academia', '0012_usuario_texto_busca'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='frequencia',
+            name='evento_id',
+            field=models.CharField(blank=True, max_length=100, null=True, unique=True, verbose_name='ID do Evento de Entrada'),
+        ),
+        migrations.AddField(
+            model_name='frequencia',
+            name='evento_saida_id',
+            field=models.CharField(blank=True, db_index=True, max_length=100, null=True, verbose_name='ID do Evento de Saída'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academia', '0013_frequencia_evento_id'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='frequencia',
+            index=models.Index(condition=models.Q(('data_saida__isnull', True)), fields=['data_entrada'], name='frequencia_aberta_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academia', '0014_frequencia_aberta_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FrequenciaDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.DateField(verbose_name='Data')),
+                ('visitas', models.PositiveIntegerField(default=0, verbose_name='Visitas')),
+                ('segundos_permanencia', models.PositiveIntegerField(default=0, verbose_name='Tempo de Permanência (segundos)')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='frequencias_diarias', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Frequência Diária',
+                'verbose_name_plural': 'Frequências Diárias',
+                'ordering': ['-data'],
+                'indexes': [models.Index(fields=['data'], name='frequencia_diaria_data_idx')],
+                'unique_together': {('usuario', 'data')},
+            },
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:25
+
+import django.core.validators
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academia', '0015_frequenciadiaria'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TreinoModelo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome', models.CharField(max_length=100, verbose_name='Nome')),
+                ('descricao', models.TextField(blank=True, verbose_name='Descrição')),
+                ('data_criacao', models.DateTimeField(auto_now_add=True, verbose_name='Data de Criação')),
+                ('ativo', models.BooleanField(default=True, verbose_name='Ativo')),
+                ('criado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='modelos_treino', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Modelo de Treino',
+                'verbose_name_plural': 'Modelos de Treino',
+                'ordering': ['nome'],
+            },
+        ),
+        migrations.AddField(
+            model_name='treino',
+            name='modelo',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='treinos', to='academia.treinomodelo', verbose_name='Modelo de origem'),
+        ),
+        migrations.CreateModel(
+            name='TreinoModeloExercicio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('series', models.IntegerField(validators=[django.core.validators.MinValueValidator(1)], verbose_name='Séries')),
+                ('repeticoes', models.IntegerField(validators=[django.core.validators.MinValueValidator(1)], verbose_name='Repetições')),
+                ('peso', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True, verbose_name='Peso (kg)')),
+                ('tempo_descanso', models.IntegerField(blank=True, null=True, verbose_name='Tempo de Descanso (segundos)')),
+                ('observacoes', models.TextField(blank=True, verbose_name='Observações')),
+                ('ordem', models.IntegerField(default=1, verbose_name='Ordem')),
+                ('exercicio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='academia.exercicio')),
+                ('modelo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='exercicios', to='academia.treinomodelo')),
+            ],
+            options={
+                'verbose_name': 'Exercício do Modelo de Treino',
+                'verbose_name_plural': 'Exercícios do Modelo de Treino',
+                'ordering': ['ordem'],
+            },
+        ),
+    ]
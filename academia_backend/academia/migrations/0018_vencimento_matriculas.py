@@ -0,0 +1,22 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academia', '0017_sincronizacao'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='matricula',
+            name='lembrete_renovacao_em',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Lembrete de Renovação em'),
+        ),
+        migrations.AddIndex(
+            model_name='matricula',
+            index=models.Index(fields=['status', 'data_fim'], name='matricula_status_fim_idx'),
+        ),
+    ]
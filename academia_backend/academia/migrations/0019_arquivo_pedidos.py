@@ -0,0 +1,49 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:39
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academia', '0018_vencimento_matriculas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PedidoArquivado',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('id_publico', models.UUIDField(unique=True)),
+                ('usuario_id', models.BigIntegerField(db_index=True, verbose_name='Usuário')),
+                ('plano_id', models.BigIntegerField(verbose_name='Plano')),
+                ('valor', models.DecimalField(decimal_places=2, max_digits=8)),
+                ('metodo', models.CharField(choices=[('pix', 'PIX'), ('cartao', 'Cartão de Crédito')], max_length=10)),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('aprovado', 'Aprovado'), ('cancelado', 'Cancelado'), ('expirado', 'Expirado')], max_length=20)),
+                ('pix_payload', models.TextField(blank=True)),
+                ('pix_qr', models.TextField(blank=True)),
+                ('mercado_pago_payment_id', models.BigIntegerField(blank=True, db_index=True, null=True)),
+                ('mercado_pago_preference_id', models.CharField(blank=True, max_length=200, null=True)),
+                ('mercado_pago_status', models.CharField(blank=True, max_length=50)),
+                ('mercado_pago_status_detail', models.CharField(blank=True, max_length=100)),
+                ('mercado_pago_subscription_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('mercado_pago_subscription_status', models.CharField(blank=True, max_length=50)),
+                ('is_subscription', models.BooleanField(default=False, verbose_name='É Assinatura')),
+                ('subscription_start_date', models.DateField(blank=True, null=True, verbose_name='Data de Início da Assinatura')),
+                ('subscription_end_date', models.DateField(blank=True, null=True, verbose_name='Data de Fim da Assinatura')),
+                ('criado_em', models.DateTimeField()),
+                ('atualizado_em', models.DateTimeField()),
+                ('arquivado_em', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Arquivado em')),
+            ],
+            options={
+                'verbose_name': 'Pedido Arquivado',
+                'verbose_name_plural': 'Pedidos Arquivados',
+                'ordering': ['-criado_em'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['status', 'criado_em'], name='pedido_status_criado_idx'),
+        ),
+    ]
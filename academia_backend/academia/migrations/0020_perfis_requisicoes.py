@@ -0,0 +1,38 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academia', '0019_arquivo_pedidos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PerfilRequisicao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metodo', models.CharField(max_length=10, verbose_name='Método')),
+                ('caminho', models.CharField(max_length=500, verbose_name='Caminho')),
+                ('rota', models.CharField(blank=True, max_length=200, verbose_name='Rota')),
+                ('status_code', models.PositiveSmallIntegerField(verbose_name='Status')),
+                ('duracao_ms', models.FloatField(verbose_name='Duração (ms)')),
+                ('consultas', models.PositiveIntegerField(default=0, verbose_name='Consultas SQL')),
+                ('consultas_ms', models.FloatField(default=0, verbose_name='Tempo em SQL (ms)')),
+                ('motivo', models.CharField(choices=[('header', 'Header X-Profile'), ('amostragem', 'Amostragem')], default='header', max_length=20)),
+                ('estatisticas', models.BinaryField(verbose_name='Estatísticas (pstats)')),
+                ('sql', models.JSONField(blank=True, default=list, verbose_name='Log de SQL')),
+                ('criado_em', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Perfil de Requisição',
+                'verbose_name_plural': 'Perfis de Requisições',
+                'ordering': ['-criado_em'],
+            },
+        ),
+    ]
@@ -0,0 +1,59 @@
+from datetime import datetime, time, timedelta
+
+from django.db import migrations
+
+
+def preencher(apps, schema_editor):
+    """Consolida o histórico de Frequencia gravado antes da 0015 (que só criou a tabela vazia)"""
+    # Tudo com os modelos históricos: a migração não depende do código atual de services/
+    from django.db.models import Count, DurationField, ExpressionWrapper, F, Max, Min, Sum
+    from django.db.models.functions import TruncDate
+    from django.utils import timezone
+
+    Frequencia = apps.get_model('academia', 'Frequencia')
+    FrequenciaDiaria = apps.get_model('academia', 'FrequenciaDiaria')
+    limites = Frequencia.objects.aggregate(primeira=Min('data_entrada'), ultima=Max('data_entrada'))
+    if limites['primeira'] is None:
+        return
+    tz = timezone.get_current_timezone()
+    inicio = timezone.localdate(limites['primeira'])
+    ultima = max(timezone.localdate(limites['ultima']), timezone.localdate())
+    # Em períodos de um mês: agrega no banco (GROUP BY usuário, dia), apaga o período e regrava
+    while inicio <= ultima:
+        fim = min(inicio + timedelta(days=30), ultima)
+        agregados = (
+            Frequencia.objects.filter(
+                data_entrada__gte=timezone.make_aware(datetime.combine(inicio, time.min), tz),
+                data_entrada__lt=timezone.make_aware(datetime.combine(fim + timedelta(days=1), time.min), tz),
+            )
+            .annotate(data=TruncDate('data_entrada', tzinfo=tz))
+            .values('usuario_id', 'data')
+            .annotate(
+                visitas=Count('id'),
+                permanencia=Sum(ExpressionWrapper(F('data_saida') - F('data_entrada'), output_field=DurationField())),
+            )
+            .order_by()
+        )
+        FrequenciaDiaria.objects.filter(data__gte=inicio, data__lte=fim).delete()
+        FrequenciaDiaria.objects.bulk_create(
+            (
+                FrequenciaDiaria(
+                    usuario_id=linha['usuario_id'], data=linha['data'], visitas=linha['visitas'],
+                    segundos_permanencia=max(int(linha['permanencia'].total_seconds()), 0) if linha['permanencia'] else 0,
+                )
+                for linha in agregados.iterator(chunk_size=2000)
+            ),
+            batch_size=2000,
+        )
+        inicio = fim + timedelta(days=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academia', '0020_perfis_requisicoes'),
+    ]
+
+    operations = [
+        migrations.RunPython(preencher, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,20 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import MinValueValidator
+from django.utils import timezone
+import unicodedata
 import uuid
 
+
+def normalizar_texto(texto):
+    """Remove acentos, converte para minúsculas e compacta espaços (usado na busca)"""
+    if not texto:
+        return ''
+    decomposto = unicodedata.normalize('NFKD', str(texto))
+    sem_acentos = ''.join(c for c in decomposto if not unicodedata.combining(c))
+    return ' '.join(sem_acentos.lower().split())
+
+
 class Usuario(AbstractUser):
     """Modelo customizado de usuário para a academia"""
     
@@ -31,6 +43,11 @@ class Usuario(AbstractUser):
     especialidade = models.CharField('Especialidade', max_length=100, blank=True, null=True)
     cref = models.CharField('CREF', max_length=20, blank=True, null=True, help_text='Formato: 000000-G/UF')
     
+    # Nome/email normalizados (sem acentos, minúsculos) para a busca indexada
+    texto_busca = models.TextField('Texto de Busca', blank=True, default='', editable=False)
+    
+    CAMPOS_BUSCA = ('first_name', 'last_name', 'email', 'username')
+    
     class Meta:
         verbose_name = 'Usuário'
         verbose_name_plural = 'Usuários'
@@ -51,9 +68,17 @@ class Usuario(AbstractUser):
             return self.Role.ADMIN
         return self.role or self.Role.ALUNO
 
+    def montar_texto_busca(self) -> str:
+        partes = [getattr(self, campo) or '' for campo in self.CAMPOS_BUSCA]
+        return normalizar_texto(' '.join(partes))
+
     def save(self, *args, **kwargs):
         # Garantir que administradores tenham acesso ao admin do Django
         self.is_staff = bool((self.role == self.Role.ADMIN) or self.is_superuser)
+        self.texto_busca = self.montar_texto_busca()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and set(update_fields) & set(self.CAMPOS_BUSCA):
+            kwargs['update_fields'] = set(update_fields) | {'texto_busca'}
         super().save(*args, **kwargs)
 
     def get_dashboard_url_name(self):
@@ -102,12 +127,18 @@ class Matricula(models.Model):
     status = models.CharField('Status', max_length=20, choices=STATUS_CHOICES, default='ativa')
     valor_pago = models.DecimalField('Valor Pago', max_digits=8, decimal_places=2)
     created_at = models.DateTimeField('Criado em', auto_now_add=True)
-    updated_at = models.DateTimeField('Atualizado em', auto_now=True)
+    updated_at = models.DateTimeField('Atualizado em', auto_now=True, db_index=True)
+    # Preenchido quando o lembrete de renovação é emitido (evita lembretes repetidos)
+    lembrete_renovacao_em = models.DateTimeField('Lembrete de Renovação em', blank=True, null=True)
     
     class Meta:
         verbose_name = 'Matrícula'
         verbose_name_plural = 'Matrículas'
         ordering = ['-created_at']
+        indexes = [
+            # Varredura de vencimentos: status='ativa' AND data_fim < hoje
+            models.Index(fields=['status', 'data_fim'], name='matricula_status_fim_idx'),
+        ]
     
     def __str__(self):
         return f"{self.usuario} - {self.plano} ({self.status})"
@@ -139,6 +170,7 @@ class Exercicio(models.Model):
     video_url = models.URLField('URL do Vídeo', blank=True)
     ativo = models.BooleanField('Ativo', default=True)
     created_at = models.DateTimeField('Criado em', auto_now_add=True)
+    updated_at = models.DateTimeField('Atualizado em', auto_now=True, db_index=True)
     
     class Meta:
         verbose_name = 'Exercício'
@@ -155,7 +187,12 @@ class Treino(models.Model):
     nome = models.CharField('Nome', max_length=100)
     descricao = models.TextField('Descrição', blank=True)
     exercicios = models.ManyToManyField(Exercicio, through='TreinoExercicio')
+    modelo = models.ForeignKey(
+        'TreinoModelo', on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='treinos', verbose_name='Modelo de origem'
+    )
     data_criacao = models.DateTimeField('Data de Criação', auto_now_add=True)
+    updated_at = models.DateTimeField('Atualizado em', auto_now=True, db_index=True)
     ativo = models.BooleanField('Ativo', default=True)
     
     class Meta:
@@ -177,6 +214,7 @@ class TreinoExercicio(models.Model):
     tempo_descanso = models.IntegerField('Tempo de Descanso (segundos)', blank=True, null=True)
     observacoes = models.TextField('Observações', blank=True)
     ordem = models.IntegerField('Ordem', default=1)
+    updated_at = models.DateTimeField('Atualizado em', auto_now=True, db_index=True)
     
     class Meta:
         verbose_name = 'Exercício do Treino'
@@ -186,6 +224,45 @@ class TreinoExercicio(models.Model):
     def __str__(self):
         return f"{self.exercicio.nome} - {self.series}x{self.repeticoes}"
 
+class TreinoModelo(models.Model):
+    """Modelo de treino (programa) que professores atribuem a vários alunos"""
+    
+    nome = models.CharField('Nome', max_length=100)
+    descricao = models.TextField('Descrição', blank=True)
+    criado_por = models.ForeignKey(
+        Usuario, on_delete=models.SET_NULL, null=True, blank=True, related_name='modelos_treino'
+    )
+    data_criacao = models.DateTimeField('Data de Criação', auto_now_add=True)
+    ativo = models.BooleanField('Ativo', default=True)
+    
+    class Meta:
+        verbose_name = 'Modelo de Treino'
+        verbose_name_plural = 'Modelos de Treino'
+        ordering = ['nome']
+    
+    def __str__(self):
+        return self.nome
+
+class TreinoModeloExercicio(models.Model):
+    """Exercícios de um modelo de treino (copiados para TreinoExercicio na atribuição)"""
+    
+    modelo = models.ForeignKey(TreinoModelo, on_delete=models.CASCADE, related_name='exercicios')
+    exercicio = models.ForeignKey(Exercicio, on_delete=models.CASCADE)
+    series = models.IntegerField('Séries', validators=[MinValueValidator(1)])
+    repeticoes = models.IntegerField('Repetições', validators=[MinValueValidator(1)])
+    peso = models.DecimalField('Peso (kg)', max_digits=5, decimal_places=2, blank=True, null=True)
+    tempo_descanso = models.IntegerField('Tempo de Descanso (segundos)', blank=True, null=True)
+    observacoes = models.TextField('Observações', blank=True)
+    ordem = models.IntegerField('Ordem', default=1)
+    
+    class Meta:
+        verbose_name = 'Exercício do Modelo de Treino'
+        verbose_name_plural = 'Exercícios do Modelo de Treino'
+        ordering = ['ordem']
+    
+    def __str__(self):
+        return f"{self.exercicio.nome} - {self.series}x{self.repeticoes}"
+
 class Avaliacao(models.Model):
     """Modelo para avaliações físicas"""
     
@@ -203,6 +280,7 @@ class Avaliacao(models.Model):
     perimetro_coxa = models.DecimalField('Perímetro Coxa (cm)', max_digits=5, decimal_places=2, blank=True, null=True)
     observacoes = models.TextField('Observações', blank=True)
     created_at = models.DateTimeField('Criado em', auto_now_add=True)
+    updated_at = models.DateTimeField('Atualizado em', auto_now=True, db_index=True)
     
     class Meta:
         verbose_name = 'Avaliação'
@@ -226,11 +304,22 @@ class Frequencia(models.Model):
     data_entrada = models.DateTimeField('Data/Hora de Entrada')
     data_saida = models.DateTimeField('Data/Hora de Saída', blank=True, null=True)
     observacoes = models.TextField('Observações', blank=True)
+    # IDs de evento enviados pela catraca (garantem idempotência de reenvios)
+    evento_id = models.CharField('ID do Evento de Entrada', max_length=100, blank=True, null=True, unique=True)
+    evento_saida_id = models.CharField('ID do Evento de Saída', max_length=100, blank=True, null=True, db_index=True)
     
     class Meta:
         verbose_name = 'Frequência'
         verbose_name_plural = 'Frequências'
         ordering = ['-data_entrada']
+        indexes = [
+            # Visitas em aberto (pessoas dentro da academia): usado na reconciliação da ocupação
+            models.Index(
+                fields=['data_entrada'],
+                condition=models.Q(data_saida__isnull=True),
+                name='frequencia_aberta_idx',
+            ),
+        ]
     
     def __str__(self):
         return f"{self.usuario} - {self.data_entrada.strftime('%d/%m/%Y %H:%M')}"
@@ -242,6 +331,49 @@ class Frequencia(models.Model):
             return self.data_saida - self.data_entrada
         return None
 
+class FrequenciaDiaria(models.Model):
+    """Consolidação diária da frequência por usuário (alimenta dashboards e relatórios)"""
+
+    usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='frequencias_diarias')
+    data = models.DateField('Data')
+    visitas = models.PositiveIntegerField('Visitas', default=0)
+    segundos_permanencia = models.PositiveIntegerField('Tempo de Permanência (segundos)', default=0)
+
+    class Meta:
+        verbose_name = 'Frequência Diária'
+        verbose_name_plural = 'Frequências Diárias'
+        ordering = ['-data']
+        unique_together = ['usuario', 'data']
+        indexes = [
+            models.Index(fields=['data'], name='frequencia_diaria_data_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.usuario} - {self.data.strftime('%d/%m/%Y')} ({self.visitas} visita(s))"
+
+class RegistroExclusao(models.Model):
+    """
+    Marca de exclusão (tombstone) para a sincronização incremental (/api/sync/)
+    dono_id guarda o usuário dono do registro (sem FK: o usuário pode ter sido excluído junto)
+    """
+    
+    tipo = models.CharField('Tipo', max_length=30)
+    objeto_id = models.BigIntegerField('ID do Objeto')
+    dono_id = models.BigIntegerField('Dono', null=True, blank=True)
+    excluido_em = models.DateTimeField('Excluído em', default=timezone.now)
+    
+    class Meta:
+        verbose_name = 'Registro de Exclusão'
+        verbose_name_plural = 'Registros de Exclusão'
+        ordering = ['excluido_em']
+        indexes = [
+            models.Index(fields=['excluido_em'], name='exclusao_excluido_em_idx'),
+            models.Index(fields=['dono_id', 'excluido_em'], name='exclusao_dono_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.tipo} #{self.objeto_id} excluído em {self.excluido_em:%d/%m/%Y %H:%M}"
+
 class Pedido(models.Model):
     """Pedido de pagamento atrelado a uma matrícula/plano."""
     METODO_PIX = 'pix'
@@ -289,12 +421,54 @@ class Pedido(models.Model):
     criado_em = models.DateTimeField(auto_now_add=True)
     atualizado_em = models.DateTimeField(auto_now=True)
 
+    STATUS_FINAIS = (STATUS_APROVADO, STATUS_CANCELADO, STATUS_EXPIRADO)
+
     class Meta:
         ordering = ['-criado_em']
+        indexes = [
+            # Expiração de pendentes e arquivamento: status + criado_em
+            models.Index(fields=['status', 'criado_em'], name='pedido_status_criado_idx'),
+        ]
 
     def __str__(self):
         return f"Pedido {self.id_publico} - {self.usuario} - {self.plano} - {self.status}"
 
+class PedidoArquivado(models.Model):
+    """
+    Pedido finalizado movido da tabela Pedido após PEDIDOS_RETENCAO_DIAS (services/pedidos.py)
+    Mesmas colunas de Pedido; usuario_id/plano_id sem FK para o histórico sobreviver a exclusões.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    id_publico = models.UUIDField(unique=True)
+    usuario_id = models.BigIntegerField('Usuário', db_index=True)
+    plano_id = models.BigIntegerField('Plano')
+    valor = models.DecimalField(max_digits=8, decimal_places=2)
+    metodo = models.CharField(max_length=10, choices=Pedido.METODO_CHOICES)
+    status = models.CharField(max_length=20, choices=Pedido.STATUS_CHOICES)
+    pix_payload = models.TextField(blank=True)
+    pix_qr = models.TextField(blank=True)
+    mercado_pago_payment_id = models.BigIntegerField(null=True, blank=True, db_index=True)
+    mercado_pago_preference_id = models.CharField(max_length=200, blank=True, null=True)
+    mercado_pago_status = models.CharField(max_length=50, blank=True)
+    mercado_pago_status_detail = models.CharField(max_length=100, blank=True)
+    mercado_pago_subscription_id = models.CharField(max_length=100, blank=True, null=True)
+    mercado_pago_subscription_status = models.CharField(max_length=50, blank=True)
+    is_subscription = models.BooleanField('É Assinatura', default=False)
+    subscription_start_date = models.DateField('Data de Início da Assinatura', null=True, blank=True)
+    subscription_end_date = models.DateField('Data de Fim da Assinatura', null=True, blank=True)
+    criado_em = models.DateTimeField()
+    atualizado_em = models.DateTimeField()
+    arquivado_em = models.DateTimeField('Arquivado em', default=timezone.now)
+
+    class Meta:
+        verbose_name = 'Pedido Arquivado'
+        verbose_name_plural = 'Pedidos Arquivados'
+        ordering = ['-criado_em']
+
+    def __str__(self):
+        return f"Pedido {self.id_publico} (arquivado) - {self.status}"
+
 class Torneio(models.Model):
     """Modelo para torneios/competições internas da academia"""
     
@@ -329,6 +503,9 @@ class Torneio(models.Model):
     
     @property
     def total_participantes(self):
+        # Com os participantes pré-carregados (listagem da API) conta em memória, sem consulta
+        if 'participantes' in getattr(self, '_prefetched_objects_cache', {}):
+            return sum(1 for participante in self.participantes.all() if participante.ativo)
         return self.participantes.filter(ativo=True).count()
     
     @property
@@ -489,4 +666,38 @@ class ResultadoPartida(models.Model):
             
             if perdedor:
                 perdedor.eliminado = True
-                perdedor.save()
\ No newline at end of file
+                perdedor.save()
+
+class PerfilRequisicao(models.Model):
+    """
+    Perfil (cProfile) de uma requisição de produção, com o log de SQL (academia/perfis.py)
+    Gerado pelo header X-Profile: <PERFIS_TOKEN> ou por amostragem (PERFIS_TAXA_AMOSTRAGEM).
+    """
+
+    MOTIVO_HEADER = 'header'
+    MOTIVO_AMOSTRAGEM = 'amostragem'
+    MOTIVO_CHOICES = [
+        (MOTIVO_HEADER, 'Header X-Profile'),
+        (MOTIVO_AMOSTRAGEM, 'Amostragem'),
+    ]
+
+    usuario = models.ForeignKey(Usuario, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    metodo = models.CharField('Método', max_length=10)
+    caminho = models.CharField('Caminho', max_length=500)
+    rota = models.CharField('Rota', max_length=200, blank=True)
+    status_code = models.PositiveSmallIntegerField('Status')
+    duracao_ms = models.FloatField('Duração (ms)')
+    consultas = models.PositiveIntegerField('Consultas SQL', default=0)
+    consultas_ms = models.FloatField('Tempo em SQL (ms)', default=0)
+    motivo = models.CharField(max_length=20, choices=MOTIVO_CHOICES, default=MOTIVO_HEADER)
+    estatisticas = models.BinaryField('Estatísticas (pstats)')
+    sql = models.JSONField('Log de SQL', default=list, blank=True)
+    criado_em = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        verbose_name = 'Perfil de Requisição'
+        verbose_name_plural = 'Perfis de Requisições'
+        ordering = ['-criado_em']
+
+    def __str__(self):
+        return f"{self.metodo} {self.caminho} - {self.duracao_ms:.0f} ms"
@@ -0,0 +1,72 @@
+"""
+Páginas estáticas do frontend pré-renderizadas no collectstatic
+Home, planos, treinos, cadastro, checkout, torneio e recuperar-senha são cascas HTML que
+carregam os dados por JS: o resultado do template não depende da requisição nem do usuário.
+O collectstatic (ArmazenamentoEstatico) renderiza cada uma depois do manifesto, já com as
+URLs com hash dos assets, e grava em paginas/<rota>.html com a cópia com hash e as versões
+.gz/.br. O WhiteNoiseAsyncMiddleware serve essas cópias nas URLs públicas com ETag e
+Last-Modified, antes dos demais middlewares: a requisição não chega a nenhuma view.
+As rotas do Django continuam valendo quando não há collectstatic (DEBUG, testes).
+O {% csrf_token %} sai vazio: static/js/csrf.js preenche os formulários com o cookie csrftoken.
+"""
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.files.base import ContentFile
+from django.template.loader import render_to_string
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+PASTA = 'paginas'
+
+# URL pública -> (nome da rota, template)
+PAGINAS_ESTATICAS = {
+    '/': ('home', 'html/home.html'),
+    '/treinos/': ('treinos', 'html/treinos_frontend.html'),
+    '/planos/': ('planos', 'html/planos_frontend.html'),
+    '/cadastro/': ('cadastro', 'html/cadastro_frontend.html'),
+    '/checkout/': ('checkout', 'html/checkout_frontend.html'),
+    '/torneio/': ('torneio', 'html/torneio.html'),
+    '/recuperar-senha/': ('recuperar_senha', 'html/recuperar.html'),
+}
+
+
+def nome_arquivo(rota):
+    return f'{PASTA}/{rota}.html'
+
+
+class ArmazenamentoEstatico(CompressedManifestStaticFilesStorage):
+    """Storage do WhiteNoise (hash + gzip/brotli) que também pré-renderiza PAGINAS_ESTATICAS"""
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if not dry_run:
+            yield from self.prerenderizar_paginas()
+
+    def prerenderizar_paginas(self):
+        # Roda após o manifesto: o {% static %} dos templates já resolve para os nomes com hash
+        gerados = []
+        for rota, template in PAGINAS_ESTATICAS.values():
+            nome = nome_arquivo(rota)
+            # 'NOTPROVIDED' faz o {% csrf_token %} sair vazio, sem o aviso de contexto sem token
+            conteudo = ContentFile(render_to_string(template, {'csrf_token': 'NOTPROVIDED'}).encode())
+            nome_hash = self.hashed_name(nome, conteudo)
+            for destino in (nome, nome_hash):
+                if self.exists(destino):
+                    self.delete(destino)
+                self._save(destino, conteudo)
+            self.hashed_files[self.hash_key(nome)] = nome_hash
+            gerados += [nome, nome_hash]
+            yield nome, nome_hash, True
+        self.save_manifest()
+        for nome, comprimido in self.compress_files(gerados):
+            yield nome, comprimido, True
+
+
+def arquivos_paginas():
+    """[(URL pública, caminho do arquivo com hash)] das páginas já pré-renderizadas pelo collectstatic"""
+    if not isinstance(staticfiles_storage, ManifestStaticFilesStorage):
+        return []
+    arquivos = []
+    for url, (rota, _) in PAGINAS_ESTATICAS.items():
+        nome_hash = staticfiles_storage.hashed_files.get(nome_arquivo(rota))
+        if nome_hash and staticfiles_storage.exists(nome_hash):
+            arquivos.append((url, staticfiles_storage.path(nome_hash)))
+    return arquivos
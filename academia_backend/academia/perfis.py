@@ -0,0 +1,175 @@
+"""
+Perfilamento de requisições sob demanda (PerfilamentoMiddleware)
+Com o header X-Profile: <PERFIS_TOKEN>, ou sorteada por PERFIS_TAXA_AMOSTRAGEM, a
+requisição roda sob cProfile com o SQL registrado por execute_wrapper. O resultado vai para
+PerfilRequisicao e pode ser baixado no admin em pstats (python -m pstats, snakeviz) ou
+speedscope (https://www.speedscope.app). Um perfil por processo de cada vez: requisições
+concorrentes seguem sem perfil.
+O header é conferido com o segredo antes de perfilar (o middleware roda antes da autenticação):
+sem PERFIS_TOKEN configurado, só a amostragem vale.
+"""
+from collections import defaultdict
+import cProfile
+import marshal
+import random
+import threading
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connection
+from django.utils.crypto import constant_time_compare
+
+from .models import PerfilRequisicao
+
+MAXIMO_SQL = 500  # Consultas guardadas por perfil (as demais só entram na contagem)
+_trava = threading.Lock()
+
+
+def motivo_perfil(request):
+    """'header', 'amostragem' ou None se a requisição não deve ser perfilada"""
+    token = getattr(settings, 'PERFIS_TOKEN', '')
+    if token and constant_time_compare(request.headers.get('X-Profile', ''), token):
+        return PerfilRequisicao.MOTIVO_HEADER
+    taxa = getattr(settings, 'PERFIS_TAXA_AMOSTRAGEM', 0)
+    if taxa and random.random() < taxa:
+        return PerfilRequisicao.MOTIVO_AMOSTRAGEM
+    return None
+
+
+class Perfilador:
+    """
+    Context manager que perfila o bloco com cProfile e registra o SQL da conexão atual
+    Se outro perfil estiver em andamento, `ativo` fica False e o bloco roda normalmente.
+    """
+
+    def __init__(self):
+        self.perfil = cProfile.Profile()
+        self.sql = []
+        self.consultas = 0
+        self.consultas_segundos = 0.0
+        self.duracao = 0.0
+        self.ativo = False
+        self._contexto = None
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duracao = perf_counter() - inicio
+            self.consultas += 1
+            self.consultas_segundos += duracao
+            if len(self.sql) < MAXIMO_SQL:
+                self.sql.append({'sql': sql, 'ms': round(duracao * 1000, 3)})
+
+    def __enter__(self):
+        self.ativo = _trava.acquire(blocking=False)
+        if self.ativo:
+            self._contexto = connection.execute_wrapper(self)
+            self._contexto.__enter__()
+            self._inicio = perf_counter()
+            self.perfil.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.ativo:
+            self.perfil.disable()
+            self.duracao = perf_counter() - self._inicio
+            self._contexto.__exit__(*exc_info)
+            _trava.release()
+
+    def estatisticas(self):
+        """Bytes no formato de arquivo .pstats (o mesmo de Profile.dump_stats)"""
+        self.perfil.create_stats()
+        return marshal.dumps(self.perfil.stats)
+
+
+def salvar_perfil(perfilador, request, response, motivo, usuario=None):
+    rota = request.resolver_match.view_name if request.resolver_match else ''
+    perfil = PerfilRequisicao.objects.create(
+        usuario=usuario if getattr(usuario, 'is_authenticated', False) else None,
+        metodo=request.method,
+        caminho=request.get_full_path()[:500],
+        rota=rota[:200],
+        status_code=response.status_code,
+        duracao_ms=round(perfilador.duracao * 1000, 2),
+        consultas=perfilador.consultas,
+        consultas_ms=round(perfilador.consultas_segundos * 1000, 2),
+        motivo=motivo,
+        estatisticas=perfilador.estatisticas(),
+        sql=perfilador.sql,
+    )
+    # Retenção: só os PERFIS_MAXIMO mais recentes
+    antigos = PerfilRequisicao.objects.order_by('-criado_em', '-id').values_list('id', flat=True)[
+        getattr(settings, 'PERFIS_MAXIMO', 200):
+    ]
+    PerfilRequisicao.objects.filter(id__in=list(antigos)).delete()
+    return perfil
+
+
+def para_speedscope(estatisticas, nome, minimo=0.0005):
+    """
+    Converte estatísticas pstats num perfil 'evented' do speedscope
+    O pstats guarda só arestas chamador -> chamado, não pilhas: a árvore é reconstruída
+    a partir das raízes, repartindo o tempo de cada função entre seus chamadores na
+    proporção das chamadas (como o gprof). Ramos com menos de `minimo` do total são omitidos.
+    """
+    stats = marshal.loads(bytes(estatisticas))
+    chamados = defaultdict(list)
+    for funcao, (_, _, _, _, chamadores) in stats.items():
+        for chamador, (_, _, _, acumulado) in chamadores.items():
+            chamados[chamador].append((funcao, acumulado))
+    raizes = sorted(
+        ((funcao, valores[3]) for funcao, valores in stats.items() if not valores[4]),
+        key=lambda item: -item[1],
+    )
+    total = sum(acumulado for _, acumulado in raizes) or 1e-9
+
+    frames, indices, eventos = [], {}, []
+
+    def frame(funcao):
+        if funcao not in indices:
+            arquivo, linha, nome_funcao = funcao
+            indices[funcao] = len(frames)
+            frames.append({'name': nome_funcao, 'file': arquivo, 'line': linha})
+        return indices[funcao]
+
+    def visitar(funcao, inicio, duracao, pilha):
+        fim = inicio + duracao
+        eventos.append({'type': 'O', 'frame': frame(funcao), 'at': inicio * 1000})
+        acumulado_funcao = stats[funcao][3] or 1e-9
+        filhos = [
+            (filho, tempo * duracao / acumulado_funcao)
+            for filho, tempo in chamados.get(funcao, ())
+            if filho not in pilha
+        ]
+        soma = sum(tempo for _, tempo in filhos)
+        escala = duracao / soma if soma > duracao else 1
+        posicao = inicio
+        for filho, tempo in sorted(filhos, key=lambda item: -item[1]):
+            tempo *= escala
+            if tempo >= minimo * total and posicao < fim:
+                visitar(filho, posicao, min(tempo, fim - posicao), pilha | {filho})
+                posicao += tempo
+        eventos.append({'type': 'C', 'frame': frame(funcao), 'at': fim * 1000})
+
+    posicao = 0.0
+    for raiz, acumulado in raizes:
+        if acumulado >= minimo * total:
+            visitar(raiz, posicao, acumulado, {raiz})
+            posicao += acumulado
+
+    return {
+        '$schema': 'https://www.speedscope.app/file-format-schema.json',
+        'name': nome,
+        'exporter': 'academia.perfis',
+        'shared': {'frames': frames},
+        'profiles': [{
+            'type': 'evented',
+            'name': nome,
+            'unit': 'milliseconds',
+            'startValue': 0,
+            'endValue': posicao * 1000,
+            'events': eventos,
+        }],
+    }
@@ -1,7 +1,13 @@
 from rest_framework import serializers
 from django.contrib.auth import authenticate
+from django.contrib.auth.tokens import default_token_generator
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
+from django.utils import timezone
+from django.utils.encoding import force_str
+from django.utils.http import urlsafe_base64_decode
 from .models import (
-    Usuario, Plano, Matricula, Exercicio, Treino, TreinoExercicio, 
+    Usuario, Plano, Matricula, Exercicio, Treino, TreinoExercicio, TreinoModelo, TreinoModeloExercicio,
     Avaliacao, Frequencia, Pedido, Torneio, ParticipanteTorneio, 
     FaseTorneio, ExercicioFase, Chave, ResultadoPartida
 )
@@ -63,20 +69,37 @@ class UsuarioProfileSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'username', 'created_at', 'updated_at', 'is_superuser']
     
+    @staticmethod
+    def prefetch_matriculas_ativas():
+        """Para listagens: carrega as matrículas ativas de todos os usuários numa consulta só"""
+        return Prefetch(
+            'matriculas',
+            queryset=Matricula.objects.filter(status='ativa').select_related('plano').order_by('-data_inicio'),
+            to_attr='matriculas_ativas',
+        )
+    
+    def _matricula_ativa(self, obj):
+        # Sem o prefetch da listagem, consulta uma vez por usuário (e não uma vez por campo)
+        if not hasattr(obj, 'matriculas_ativas'):
+            obj.matriculas_ativas = list(
+                obj.matriculas.filter(status='ativa').select_related('plano').order_by('-data_inicio')[:1]
+            )
+        return obj.matriculas_ativas[0] if obj.matriculas_ativas else None
+    
     def get_plano_nome(self, obj):
-        matricula = obj.matriculas.filter(status='ativa').order_by('-data_inicio').first()
+        matricula = self._matricula_ativa(obj)
         return matricula.plano.nome if matricula else None
     
     def get_plano_id(self, obj):
-        matricula = obj.matriculas.filter(status='ativa').order_by('-data_inicio').first()
-        return matricula.plano.id if matricula else None
+        matricula = self._matricula_ativa(obj)
+        return matricula.plano_id if matricula else None
     
     def get_matricula_status(self, obj):
-        matricula = obj.matriculas.filter(status='ativa').order_by('-data_inicio').first()
+        matricula = self._matricula_ativa(obj)
         return matricula.status if matricula else None
     
     def get_matricula_data_fim(self, obj):
-        matricula = obj.matriculas.filter(status='ativa').order_by('-data_inicio').first()
+        matricula = self._matricula_ativa(obj)
         return matricula.data_fim if matricula else None
 
 class LoginSerializer(serializers.Serializer):
@@ -154,24 +177,150 @@ class TreinoExercicioSerializer(serializers.ModelSerializer):
             'observacoes', 'ordem'
         ]
 
-class TreinoSerializer(serializers.ModelSerializer):
+class TreinoExercicioEscritaSerializer(serializers.Serializer):
+    """
+    Exercício enviado na criação/edição de um treino
+    'exercicio' é validado em lote pelo TreinoSerializer (um único in_bulk para o treino todo)
+    'id' identifica uma linha existente do treino na edição
+    """
+    
+    id = serializers.IntegerField(required=False)
+    exercicio = serializers.IntegerField()
+    series = serializers.IntegerField(min_value=1, required=False, allow_null=True)
+    repeticoes = serializers.IntegerField(min_value=1, required=False, allow_null=True)
+    peso = serializers.DecimalField(max_digits=5, decimal_places=2, required=False, allow_null=True)
+    tempo_descanso = serializers.IntegerField(required=False, allow_null=True)
+    observacoes = serializers.CharField(required=False, allow_blank=True)
+    ordem = serializers.IntegerField(required=False, allow_null=True)
+
+class ExerciciosAninhadosMixin:
+    """
+    Escrita em lote dos exercícios aninhados de um treino ou modelo de treino
+    Subclasses definem modelo_exercicio (TreinoExercicio/TreinoModeloExercicio), campo_pai
+    e relacao_exercicios (nome da relação reversa usada na leitura).
+    """
+    
+    CAMPOS_EXERCICIO = ('series', 'repeticoes', 'peso', 'tempo_descanso', 'observacoes', 'ordem')
+    modelo_exercicio = None
+    campo_pai = None
+    relacao_exercicios = None
+
+    def to_representation(self, instance):
+        # Sem prefetch da view (ex.: resposta de create/update), buscar os exercícios numa única consulta
+        if self.relacao_exercicios not in getattr(instance, '_prefetched_objects_cache', {}):
+            prefetch_related_objects(
+                [instance],
+                Prefetch(self.relacao_exercicios, queryset=self.modelo_exercicio.objects.select_related('exercicio')),
+            )
+        return super().to_representation(instance)
+
+    def validate_exercicios(self, value):
+        """Valida todos os exercícios com uma única consulta"""
+        ids = {item['exercicio'] for item in value}
+        encontrados = Exercicio.objects.in_bulk(ids)
+        faltando = sorted(ids - encontrados.keys())
+        if faltando:
+            raise serializers.ValidationError(f"Exercício(s) não encontrado(s): {', '.join(map(str, faltando))}")
+        for item in value:
+            item['exercicio'] = encontrados[item['exercicio']]
+        return value
+
+    def _dados_exercicio(self, exercicio_info, ordem):
+        return {
+            'exercicio': exercicio_info['exercicio'],
+            'series': exercicio_info.get('series') or 3,
+            'repeticoes': exercicio_info.get('repeticoes') or 10,
+            'peso': exercicio_info.get('peso'),
+            'tempo_descanso': exercicio_info.get('tempo_descanso'),
+            'observacoes': exercicio_info.get('observacoes', ''),
+            'ordem': exercicio_info.get('ordem') or ordem,
+        }
+
+    def _criar_exercicios(self, pai, exercicios_data):
+        self.modelo_exercicio.objects.bulk_create([
+            self.modelo_exercicio(**{self.campo_pai: pai}, **self._dados_exercicio(exercicio_info, ordem))
+            for ordem, exercicio_info in enumerate(exercicios_data, start=1)
+        ])
+
+    def _sincronizar_exercicios(self, pai, exercicios_data):
+        """
+        Compara as linhas existentes com as enviadas e aplica as diferenças em lote:
+        linhas com 'id' (ou, sem 'id', do mesmo exercício) são atualizadas com bulk_update,
+        as novas criadas com bulk_create e as ausentes removidas com um único DELETE.
+        """
+        modelo = self.modelo_exercicio
+        existentes = {linha.id: linha for linha in modelo.objects.filter(**{self.campo_pai: pai})}
+        livres_por_exercicio = {}
+        for linha in existentes.values():
+            livres_por_exercicio.setdefault(linha.exercicio_id, []).append(linha)
+
+        atualizar, criar, mantidos = [], [], set()
+        for ordem, exercicio_info in enumerate(exercicios_data, start=1):
+            dados = self._dados_exercicio(exercicio_info, ordem)
+            linha = existentes.get(exercicio_info.get('id'))
+            if linha is None and 'id' not in exercicio_info:
+                candidatos = [l for l in livres_por_exercicio.get(dados['exercicio'].id, []) if l.id not in mantidos]
+                linha = candidatos[0] if candidatos else None
+            if linha is None or linha.id in mantidos:
+                criar.append(modelo(**{self.campo_pai: pai}, **dados))
+                continue
+            mantidos.add(linha.id)
+            for campo, valor in dados.items():
+                setattr(linha, campo, valor)
+            atualizar.append(linha)
+
+        remover = existentes.keys() - mantidos
+        if remover:
+            modelo.objects.filter(id__in=remover).delete()
+        if atualizar:
+            campos = ('exercicio',) + self.CAMPOS_EXERCICIO
+            if hasattr(modelo, 'updated_at'):
+                # bulk_update não aplica auto_now; a sincronização incremental depende dele
+                agora = timezone.now()
+                for linha in atualizar:
+                    linha.updated_at = agora
+                campos += ('updated_at',)
+            modelo.objects.bulk_update(atualizar, campos)
+        if criar:
+            modelo.objects.bulk_create(criar)
+
+    @transaction.atomic
+    def create(self, validated_data):
+        exercicios_data = validated_data.pop('exercicios', [])
+        pai = super().create(validated_data)
+        self._criar_exercicios(pai, exercicios_data)
+        return pai
+
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        exercicios_data = validated_data.pop('exercicios', None)
+        pai = super().update(instance, validated_data)
+        if exercicios_data is not None:
+            self._sincronizar_exercicios(pai, exercicios_data)
+        return pai
+
+class TreinoSerializer(ExerciciosAninhadosMixin, serializers.ModelSerializer):
     """Serializer para o modelo Treino"""
     
+    modelo_exercicio = TreinoExercicio
+    campo_pai = 'treino'
+    relacao_exercicios = 'treinoexercicio_set'
+    
     exercicios_detalhes = TreinoExercicioSerializer(
         source='treinoexercicio_set', 
         many=True, 
         read_only=True
     )
     usuario_nome = serializers.CharField(source='usuario.get_full_name', read_only=True)
-    exercicios = TreinoExercicioSerializer(many=True, write_only=True, required=False)
+    exercicios = TreinoExercicioEscritaSerializer(many=True, write_only=True, required=False)
     
     class Meta:
         model = Treino
         fields = [
             'id', 'usuario', 'usuario_nome', 'nome', 'descricao',
-            'exercicios', 'exercicios_detalhes', 'data_criacao', 'ativo'
+            'exercicios', 'exercicios_detalhes', 'modelo', 'data_criacao', 'ativo'
         ]
-        read_only_fields = ['data_criacao']
+        read_only_fields = ['data_criacao', 'modelo']
     
     def to_representation(self, instance):
         """Garantir que exercicios_detalhes seja sempre uma lista"""
@@ -180,24 +329,63 @@ class TreinoSerializer(serializers.ModelSerializer):
             representation['exercicios_detalhes'] = []
         return representation
 
-    def create(self, validated_data):
-        exercicios_data = validated_data.pop('exercicios', [])
-        treino = Treino.objects.create(**validated_data)
-        for ordem, exercicio_info in enumerate(exercicios_data, start=1):
-            exercicio = exercicio_info.get('exercicio')
-            if not exercicio:
-                continue
-            TreinoExercicio.objects.create(
-                treino=treino,
-                exercicio=exercicio,
-                series=exercicio_info.get('series') or 3,
-                repeticoes=exercicio_info.get('repeticoes') or 10,
-                peso=exercicio_info.get('peso'),
-                tempo_descanso=exercicio_info.get('tempo_descanso'),
-                observacoes=exercicio_info.get('observacoes', ''),
-                ordem=exercicio_info.get('ordem') or ordem,
+class TreinoModeloExercicioSerializer(serializers.ModelSerializer):
+    """Serializer para exercícios dentro de um modelo de treino"""
+    
+    exercicio_nome = serializers.CharField(source='exercicio.nome', read_only=True)
+    exercicio_categoria = serializers.CharField(source='exercicio.categoria', read_only=True)
+    
+    class Meta:
+        model = TreinoModeloExercicio
+        fields = [
+            'id', 'exercicio', 'exercicio_nome', 'exercicio_categoria', 'series', 'repeticoes',
+            'peso', 'tempo_descanso', 'observacoes', 'ordem'
+        ]
+
+class TreinoModeloSerializer(ExerciciosAninhadosMixin, serializers.ModelSerializer):
+    """Serializer para modelos de treino"""
+    
+    modelo_exercicio = TreinoModeloExercicio
+    campo_pai = 'modelo'
+    relacao_exercicios = 'exercicios'
+    
+    exercicios_detalhes = TreinoModeloExercicioSerializer(source='exercicios', many=True, read_only=True)
+    exercicios = TreinoExercicioEscritaSerializer(many=True, write_only=True, required=False)
+    criado_por_nome = serializers.CharField(source='criado_por.get_full_name', read_only=True, default=None)
+    
+    class Meta:
+        model = TreinoModelo
+        fields = [
+            'id', 'nome', 'descricao', 'exercicios', 'exercicios_detalhes',
+            'criado_por', 'criado_por_nome', 'data_criacao', 'ativo'
+        ]
+        read_only_fields = ['criado_por', 'data_criacao']
+
+class AtribuirTreinoModeloSerializer(serializers.Serializer):
+    """Dados para atribuir um modelo de treino a vários alunos"""
+    
+    MAX_ALUNOS = 1000
+    
+    modelo = serializers.PrimaryKeyRelatedField(queryset=TreinoModelo.objects.filter(ativo=True))
+    alunos = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=False, max_length=MAX_ALUNOS
+    )
+    nome = serializers.CharField(max_length=100, required=False, allow_blank=True)
+    desativar_anteriores = serializers.BooleanField(default=False)
+
+    def validate_alunos(self, value):
+        ids = list(dict.fromkeys(value))
+        # Só alunos ativos recebem treino (professores, administradores e contas inativas não)
+        alunos = set(
+            Usuario.objects.filter(id__in=ids, is_active=True, is_superuser=False, role=Usuario.Role.ALUNO)
+            .values_list('id', flat=True)
+        )
+        recusados = [i for i in ids if i not in alunos]
+        if recusados:
+            raise serializers.ValidationError(
+                f"Aluno(s) inexistente(s), inativo(s) ou que não são alunos: {', '.join(map(str, recusados))}"
             )
-        return treino
+        return ids
 
 class AvaliacaoSerializer(serializers.ModelSerializer):
     """Serializer para o modelo Avaliacao"""
@@ -208,6 +396,8 @@ class AvaliacaoSerializer(serializers.ModelSerializer):
         model = Avaliacao
         fields = '__all__'
         read_only_fields = ['created_at', 'imc']
+        # O aluno pode vir por nome (usuario_nome); a view resolve e grava o usuário
+        extra_kwargs = {'usuario': {'required': False}}
 
 class FrequenciaSerializer(serializers.ModelSerializer):
     """Serializer para o modelo Frequencia"""
@@ -239,6 +429,26 @@ class PasswordResetSerializer(serializers.Serializer):
             raise serializers.ValidationError("Usuário com este email não encontrado.")
         return value
 
+class PasswordResetConfirmSerializer(serializers.Serializer):
+    """Serializer para definir a senha com o uid/token do convite (importação) ou da recuperação"""
+    
+    uid = serializers.CharField()
+    token = serializers.CharField()
+    new_password = serializers.CharField(min_length=8)
+    new_password_confirm = serializers.CharField()
+    
+    def validate(self, attrs):
+        try:
+            usuario = Usuario.objects.get(pk=force_str(urlsafe_base64_decode(attrs['uid'])), is_active=True)
+        except (ValueError, OverflowError, Usuario.DoesNotExist):
+            usuario = None
+        if usuario is None or not default_token_generator.check_token(usuario, attrs['token']):
+            raise serializers.ValidationError("Link inválido ou expirado.")
+        if attrs['new_password'] != attrs['new_password_confirm']:
+            raise serializers.ValidationError("As novas senhas não coincidem.")
+        attrs['usuario'] = usuario
+        return attrs
+
 class EscolherPlanoSerializer(serializers.Serializer):
     """Serializer para escolher um plano"""
     
@@ -259,6 +469,37 @@ class DashboardSerializer(serializers.Serializer):
     treinos_recentes = TreinoSerializer(many=True, read_only=True)
     ultima_avaliacao = AvaliacaoSerializer(read_only=True)
     frequencia_mensal = serializers.IntegerField(read_only=True)
+    frequencia_semanal = serializers.IntegerField(read_only=True)
+
+class PainelAvaliacaoSerializer(serializers.Serializer):
+    """Última avaliação do aluno no painel (mesmos formatos decimais de AvaliacaoSerializer)"""
+    
+    data = serializers.DateField(source='ultima_avaliacao_data')
+    peso = serializers.DecimalField(max_digits=5, decimal_places=2, source='ultima_avaliacao_peso')
+    percentual_gordura = serializers.DecimalField(max_digits=5, decimal_places=2, source='ultima_avaliacao_gordura')
+    imc = serializers.DecimalField(max_digits=5, decimal_places=2, source='ultima_avaliacao_imc')
+    variacao_peso = serializers.DecimalField(max_digits=6, decimal_places=2)
+
+class PainelAlunoSerializer(serializers.Serializer):
+    """Linha do painel de alunos do professor (campos anotados por services.alunos.painel_alunos)"""
+    
+    id = serializers.IntegerField()
+    nome = serializers.CharField(source='get_full_name')
+    email = serializers.EmailField()
+    plano = serializers.SerializerMethodField()
+    ultima_avaliacao = serializers.SerializerMethodField()
+    treinos_ativos = serializers.IntegerField()
+    frequencia_30_dias = serializers.IntegerField()
+    
+    def get_plano(self, obj):
+        if obj.plano_fim is None:
+            return None
+        return {'nome': obj.plano_nome, 'data_fim': obj.plano_fim}
+    
+    def get_ultima_avaliacao(self, obj):
+        if obj.ultima_avaliacao_data is None:
+            return None
+        return PainelAvaliacaoSerializer(obj).data
 
 class ChangePasswordSerializer(serializers.Serializer):
     """Serializer para mudança de senha"""
@@ -360,6 +601,9 @@ class FaseTorneioSerializer(serializers.ModelSerializer):
         return obj.chaves.count()
     
     def get_chaves_concluidas(self, obj):
+        # Conta em memória com o prefetch de fases__chaves da listagem de torneios; sem ele, no banco
+        if 'chaves' in getattr(obj, '_prefetched_objects_cache', {}):
+            return sum(1 for chave in obj.chaves.all() if chave.concluida)
         return obj.chaves.filter(concluida=True).count()
 
 class TorneioSerializer(serializers.ModelSerializer):
@@ -381,6 +625,8 @@ class TorneioSerializer(serializers.ModelSerializer):
     
     def get_usuario_inscrito(self, obj):
         request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return obj.participantes.filter(usuario=request.user, ativo=True).exists()
-        return False
+        if not (request and request.user.is_authenticated):
+            return False
+        if 'participantes' in getattr(obj, '_prefetched_objects_cache', {}):
+            return any(p.usuario_id == request.user.id and p.ativo for p in obj.participantes.all())
+        return obj.participantes.filter(usuario_id=request.user.id, ativo=True).exists()
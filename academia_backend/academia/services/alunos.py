@@ -0,0 +1,101 @@
+"""
+Painel de alunos do professor (GET /api/professor/alunos/)
+Um único SELECT com subconsultas correlacionadas (Subquery/OuterRef) por indicador:
+matrícula ativa, última avaliação (com a variação de peso via LAG), treinos ativos e
+frequência dos últimos 30 dias (lida da consolidação FrequenciaDiaria).
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db.models import (
+    Count, DateField, DecimalField, F, IntegerField, OuterRef, Q, Subquery, Sum, Value, Window,
+)
+from django.db.models.functions import Coalesce, Lag
+from django.utils import timezone
+
+from ..models import Avaliacao, FrequenciaDiaria, Matricula, Treino, Usuario, normalizar_texto
+
+DATA_MINIMA = date(1900, 1, 1)
+VALOR_MINIMO = Decimal('-9999.99')
+
+# Indicadores filtráveis/ordenáveis -> (campo do filtro, campo da ordenação, tipo do valor)
+INDICADORES = {
+    'nome': ('first_name', 'first_name', str),
+    'plano_fim': ('plano_fim', 'ordem_plano_fim', date),
+    'ultima_avaliacao': ('ultima_avaliacao_data', 'ordem_ultima_avaliacao', date),
+    'peso': ('ultima_avaliacao_peso', 'ordem_peso', Decimal),
+    'variacao_peso': ('variacao_peso', 'ordem_variacao_peso', Decimal),
+    'treinos_ativos': ('treinos_ativos', 'treinos_ativos', int),
+    'frequencia_30_dias': ('frequencia_30_dias', 'frequencia_30_dias', int),
+}
+OPERADORES_FILTRO = ('gte', 'lte', 'gt', 'lt', 'exact')
+
+
+def painel_alunos(hoje=None):
+    """QuerySet de alunos ativos anotado com os indicadores do painel"""
+    hoje = hoje or timezone.localdate()
+
+    matricula_ativa = Matricula.objects.filter(
+        usuario=OuterRef('pk'), status='ativa', data_fim__gte=hoje
+    ).order_by('-data_fim', '-id')
+
+    # LAG dentro da subconsulta: o peso da avaliação anterior do mesmo aluno
+    avaliacoes = Avaliacao.objects.filter(usuario=OuterRef('pk')).annotate(
+        peso_anterior=Window(Lag('peso'), order_by=[F('data_avaliacao').asc(), F('id').asc()]),
+    ).order_by('-data_avaliacao', '-id')
+
+    treinos_ativos = (
+        Treino.objects.filter(usuario=OuterRef('pk'), ativo=True)
+        .order_by().values('usuario').annotate(total=Count('id')).values('total')
+    )
+    frequencia = (
+        FrequenciaDiaria.objects.filter(usuario=OuterRef('pk'), data__gt=hoje - timedelta(days=30))
+        .order_by().values('usuario').annotate(total=Sum('visitas')).values('total')
+    )
+    decimal = DecimalField(max_digits=6, decimal_places=2)
+
+    return Usuario.objects.filter(role=Usuario.Role.ALUNO, is_active=True).annotate(
+        plano_nome=Subquery(matricula_ativa.values('plano__nome')[:1]),
+        plano_fim=Subquery(matricula_ativa.values('data_fim')[:1], output_field=DateField()),
+        ultima_avaliacao_data=Subquery(avaliacoes.values('data_avaliacao')[:1], output_field=DateField()),
+        ultima_avaliacao_peso=Subquery(avaliacoes.values('peso')[:1], output_field=decimal),
+        ultima_avaliacao_gordura=Subquery(avaliacoes.values('percentual_gordura')[:1], output_field=decimal),
+        ultima_avaliacao_imc=Subquery(avaliacoes.values('imc')[:1], output_field=decimal),
+        variacao_peso=Subquery(
+            avaliacoes.annotate(variacao=F('peso') - F('peso_anterior')).values('variacao')[:1],
+            output_field=decimal,
+        ),
+        treinos_ativos=Coalesce(Subquery(treinos_ativos, output_field=IntegerField()), Value(0)),
+        frequencia_30_dias=Coalesce(Subquery(frequencia, output_field=IntegerField()), Value(0)),
+        # Chaves de ordenação sem NULL (a paginação por cursor compara valores)
+        ordem_plano_fim=Coalesce(F('plano_fim'), Value(DATA_MINIMA)),
+        ordem_ultima_avaliacao=Coalesce(F('ultima_avaliacao_data'), Value(DATA_MINIMA)),
+        ordem_peso=Coalesce(F('ultima_avaliacao_peso'), Value(VALOR_MINIMO), output_field=decimal),
+        ordem_variacao_peso=Coalesce(F('variacao_peso'), Value(VALOR_MINIMO), output_field=decimal),
+    )
+
+
+def filtrar_painel(queryset, parametros):
+    """
+    Aplica ?busca= e filtros por indicador: ?<indicador>__<gte|lte|gt|lt|exact>=<valor>
+    e ?sem_matricula=true / ?sem_avaliacao=true. Valores inválidos levantam ValueError/ArithmeticError.
+    """
+    busca = parametros.get('busca')
+    if busca:
+        for termo in normalizar_texto(busca).split():
+            queryset = queryset.filter(texto_busca__contains=termo)
+
+    if parametros.get('sem_matricula', '').lower() in ('1', 'true', 'sim'):
+        queryset = queryset.filter(plano_fim__isnull=True)
+    if parametros.get('sem_avaliacao', '').lower() in ('1', 'true', 'sim'):
+        queryset = queryset.filter(ultima_avaliacao_data__isnull=True)
+
+    filtros = Q()
+    for indicador, (campo, _, tipo) in INDICADORES.items():
+        for operador in OPERADORES_FILTRO:
+            valor = parametros.get(f'{indicador}__{operador}')
+            if valor in (None, ''):
+                continue
+            valor = date.fromisoformat(valor) if tipo is date else tipo(valor)
+            filtros &= Q(**{f'{campo}__{operador}': valor})
+    return queryset.filter(filtros)
@@ -0,0 +1,159 @@
+"""
+Busca indexada de usuários
+Usa índice trigram (pg_trgm) no PostgreSQL e FTS5 no SQLite (desenvolvimento)
+sobre o campo Usuario.texto_busca, que guarda nome/email sem acentos.
+"""
+from django.db import OperationalError, connections, router
+from django.db.models import FloatField, Value
+from django.db.models.expressions import RawSQL
+
+from ..models import Usuario, normalizar_texto
+
+TABELA_FTS = 'academia_usuario_busca'
+INDICE_TRIGRAM = 'academia_usuario_texto_busca_trgm'
+_fts_por_banco = {}  # alias -> FTS5 instalado (verificado uma vez por processo)
+
+
+def instalar_indice_busca(connection):
+    """
+    Cria (de forma idempotente) a estrutura de busca no banco da conexão.
+    - PostgreSQL: extensão pg_trgm + índice GIN sobre texto_busca
+    - SQLite: tabela virtual FTS5 mantida por triggers
+    Retorna False se o banco não suportar o índice (a busca usa fallback).
+    """
+    tabela = Usuario._meta.db_table
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+            cursor.execute(
+                f'CREATE INDEX IF NOT EXISTS {INDICE_TRIGRAM} '
+                f'ON {tabela} USING gin (texto_busca gin_trgm_ops)'
+            )
+        return True
+
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE name IN (%s, %s, %s, %s)",
+                [TABELA_FTS, f'{TABELA_FTS}_ai', f'{TABELA_FTS}_ad', f'{TABELA_FTS}_au'],
+            )
+            existentes = {row[0] for row in cursor.fetchall()}
+            if len(existentes) == 4:
+                return True
+            try:
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABELA_FTS} "
+                    f"USING fts5(texto_busca, tokenize='unicode61 remove_diacritics 2')"
+                )
+            except OperationalError:
+                # SQLite compilado sem FTS5
+                return False
+            # Triggers podem ter sido descartados por uma recriação da tabela (migrations)
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {TABELA_FTS}_ai AFTER INSERT ON {tabela} BEGIN "
+                f"INSERT INTO {TABELA_FTS}(rowid, texto_busca) VALUES (new.id, new.texto_busca); END"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {TABELA_FTS}_ad AFTER DELETE ON {tabela} BEGIN "
+                f"DELETE FROM {TABELA_FTS} WHERE rowid = old.id; END"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {TABELA_FTS}_au AFTER UPDATE OF texto_busca ON {tabela} BEGIN "
+                f"UPDATE {TABELA_FTS} SET texto_busca = new.texto_busca WHERE rowid = new.id; END"
+            )
+            cursor.execute(f"DELETE FROM {TABELA_FTS}")
+            cursor.execute(
+                f"INSERT INTO {TABELA_FTS}(rowid, texto_busca) SELECT id, texto_busca FROM {tabela}"
+            )
+        return True
+
+    return False
+
+
+def instalar_indices(sender, using='default', **kwargs):
+    """
+    post_migrate (AcademiaConfig.ready): reinstala o índice após cada migrate, já que no
+    SQLite uma migration que recria a tabela de usuários descarta os triggers do FTS5
+    """
+    _fts_por_banco.pop(using, None)
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    # Após um migrate de volta para antes da 0012 a coluna não existe (e o índice não deve voltar)
+    with connection.cursor() as cursor:
+        colunas = {coluna.name for coluna in connection.introspection.get_table_description(cursor, Usuario._meta.db_table)}
+    if 'texto_busca' in colunas:
+        instalar_indice_busca(connection)
+
+
+def _fts_disponivel(connection):
+    """Se a tabela FTS5 existe no banco SQLite (consulta o sqlite_master só na primeira busca)"""
+    disponivel = _fts_por_banco.get(connection.alias)
+    if disponivel is None:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [TABELA_FTS])
+            disponivel = _fts_por_banco[connection.alias] = cursor.fetchone() is not None
+    return disponivel
+
+
+def remover_indice_busca(connection):
+    """Desfaz instalar_indice_busca (usado no rollback da migration)"""
+    tabela = Usuario._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(f'DROP INDEX IF EXISTS {INDICE_TRIGRAM}')
+        elif connection.vendor == 'sqlite':
+            for sufixo in ('ai', 'ad', 'au'):
+                cursor.execute(f'DROP TRIGGER IF EXISTS {TABELA_FTS}_{sufixo}')
+            cursor.execute(f'DROP TABLE IF EXISTS {TABELA_FTS}')
+
+
+def _consulta_fts(tokens):
+    # Cada termo vira um prefixo entre aspas; termos separados por espaço = AND
+    return ' '.join('"{}"*'.format(token.replace('"', '""')) for token in tokens)
+
+
+def buscar_usuarios(termo, queryset=None):
+    """
+    Busca usuários por nome, sobrenome, email ou username.
+    A comparação ignora acentos e maiúsculas; todos os termos precisam aparecer.
+    Retorna um queryset anotado com `relevancia` (maior = melhor) e ordenado por ela.
+    """
+    if queryset is None:
+        queryset = Usuario.objects.all()
+
+    termo_normalizado = normalizar_texto(termo)
+    tokens = termo_normalizado.split()
+    if not tokens:
+        return queryset.none()
+
+    connection = connections[router.db_for_read(Usuario)]
+
+    if connection.vendor == 'sqlite' and _fts_disponivel(connection):
+        consulta = _consulta_fts(tokens)
+        tabela = Usuario._meta.db_table
+        return queryset.filter(
+            id__in=RawSQL(
+                f'SELECT rowid FROM {TABELA_FTS} WHERE {TABELA_FTS} MATCH %s',
+                (consulta,),
+            )
+        ).annotate(
+            relevancia=RawSQL(
+                f'SELECT -bm25({TABELA_FTS}) FROM {TABELA_FTS} '
+                f'WHERE {TABELA_FTS} MATCH %s AND rowid = {tabela}.id',
+                (consulta,),
+                output_field=FloatField(),
+            )
+        ).order_by('-relevancia', 'first_name', 'id')
+
+    # PostgreSQL usa o índice GIN trigram para LIKE '%termo%'; demais bancos fazem scan
+    for token in tokens:
+        queryset = queryset.filter(texto_busca__contains=token)
+
+    if connection.vendor == 'postgresql':
+        from django.contrib.postgres.search import TrigramSimilarity
+        relevancia = TrigramSimilarity('texto_busca', Value(termo_normalizado))
+    else:
+        relevancia = Value(0.0, output_field=FloatField())
+
+    return queryset.annotate(relevancia=relevancia).order_by('-relevancia', 'first_name', 'id')
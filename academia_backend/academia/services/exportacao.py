@@ -0,0 +1,136 @@
+"""
+Exportação de dados em streaming (CSV ou NDJSON, opcionalmente gzip)
+As linhas vêm de values_list().iterator(chunk_size=...) (cursor no servidor no PostgreSQL)
+e cada bloco é serializado e enviado antes do próximo ser lido: a memória do worker
+fica constante qualquer que seja o tamanho da tabela.
+"""
+import csv
+from datetime import datetime, time, timedelta
+import io
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from ..models import Frequencia, Matricula, Pedido, Usuario
+
+TAMANHO_BLOCO = 2000
+FORMATOS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+
+# tipo -> (queryset, campo de data para ?inicio=&fim=, [(coluna, lookup), ...])
+EXPORTACOES = {
+    'usuarios': (
+        lambda: Usuario.objects.all(),
+        'created_at',
+        [
+            ('id', 'id'), ('username', 'username'), ('email', 'email'),
+            ('first_name', 'first_name'), ('last_name', 'last_name'), ('cpf', 'cpf'), ('phone', 'phone'),
+            ('role', 'role'), ('is_active', 'is_active'), ('is_active_member', 'is_active_member'),
+            ('created_at', 'created_at'),
+        ],
+    ),
+    'matriculas': (
+        lambda: Matricula.objects.all(),
+        'created_at',
+        [
+            ('id', 'id'), ('usuario_id', 'usuario_id'), ('usuario_email', 'usuario__email'),
+            ('plano_id', 'plano_id'), ('plano', 'plano__nome'), ('status', 'status'),
+            ('data_inicio', 'data_inicio'), ('data_fim', 'data_fim'), ('valor_pago', 'valor_pago'),
+            ('created_at', 'created_at'),
+        ],
+    ),
+    'pedidos': (
+        lambda: Pedido.objects.all(),
+        'criado_em',
+        [
+            ('id_publico', 'id_publico'), ('usuario_id', 'usuario_id'), ('usuario_email', 'usuario__email'),
+            ('plano', 'plano__nome'), ('valor', 'valor'), ('metodo', 'metodo'), ('status', 'status'),
+            ('mercado_pago_payment_id', 'mercado_pago_payment_id'), ('is_subscription', 'is_subscription'),
+            ('criado_em', 'criado_em'), ('atualizado_em', 'atualizado_em'),
+        ],
+    ),
+    'frequencias': (
+        lambda: Frequencia.objects.all(),
+        'data_entrada',
+        [
+            ('id', 'id'), ('usuario_id', 'usuario_id'),
+            ('data_entrada', 'data_entrada'), ('data_saida', 'data_saida'),
+        ],
+    ),
+}
+
+
+def linhas_exportacao(tipo, inicio=None, fim=None):
+    """Cabeçalhos e iterador de tuplas do tipo pedido, filtrado pelas datas (inclusive)"""
+    queryset, campo_data, colunas = EXPORTACOES[tipo]
+    queryset = queryset()
+    tz = timezone.get_current_timezone()
+    if inicio:
+        desde = timezone.make_aware(datetime.combine(inicio, time.min), tz)
+        queryset = queryset.filter(**{f'{campo_data}__gte': desde})
+    if fim:
+        ate = timezone.make_aware(datetime.combine(fim + timedelta(days=1), time.min), tz)
+        queryset = queryset.filter(**{f'{campo_data}__lt': ate})
+    # Ordem da chave primária: o banco começa a devolver linhas sem ordenar a tabela inteira
+    linhas = (
+        queryset.order_by('pk')
+        .values_list(*(lookup for _, lookup in colunas))
+        .iterator(chunk_size=TAMANHO_BLOCO)
+    )
+    return [coluna for coluna, _ in colunas], linhas
+
+
+def _em_blocos(linhas):
+    bloco = []
+    for linha in linhas:
+        bloco.append(linha)
+        if len(bloco) >= TAMANHO_BLOCO:
+            yield bloco
+            bloco = []
+    if bloco:
+        yield bloco
+
+
+def _valor_csv(valor):
+    if isinstance(valor, datetime):
+        return timezone.localtime(valor).isoformat() if timezone.is_aware(valor) else valor.isoformat()
+    return '' if valor is None else valor
+
+
+def gerar_csv(cabecalhos, linhas):
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow(cabecalhos)
+    for bloco in _em_blocos(linhas):
+        escritor.writerows([_valor_csv(v) for v in linha] for linha in bloco)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def gerar_ndjson(cabecalhos, linhas):
+    codificador = DjangoJSONEncoder(ensure_ascii=False)
+    for bloco in _em_blocos(linhas):
+        yield ''.join(codificador.encode(dict(zip(cabecalhos, linha))) + '\n' for linha in bloco)
+
+
+def comprimir(partes):
+    """Comprime um iterador de textos em gzip, bloco a bloco"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for parte in partes:
+        dados = compressor.compress(parte.encode('utf-8'))
+        if dados:
+            yield dados
+    yield compressor.flush()
+
+
+def exportar(tipo, formato='csv', inicio=None, fim=None, gzip=False):
+    """Iterador com o conteúdo da exportação (str, ou bytes se gzip)"""
+    cabecalhos, linhas = linhas_exportacao(tipo, inicio, fim)
+    partes = (gerar_ndjson if formato == 'ndjson' else gerar_csv)(cabecalhos, linhas)
+    return comprimir(partes) if gzip else partes
@@ -0,0 +1,268 @@
+"""
+Registro de frequência (entradas e saídas da catraca)
+Processa eventos em lote: entradas via INSERT ... ON CONFLICT DO NOTHING e saídas casadas
+com a entrada em aberto e gravadas com UPDATE ... WHERE data_saida IS NULL.
+A consolidação diária (FrequenciaDiaria) é atualizada na mesma transação.
+"""
+from datetime import timedelta, timezone as dt_timezone
+import logging
+
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from ..models import Frequencia, Usuario
+from .frequencia_diaria import acumular_permanencia, acumular_visita, aplicar_incrementos
+from .ocupacao import ajustar_ocupacao
+
+logger = logging.getLogger(__name__)
+
+TIPO_ENTRADA = 'entrada'
+TIPO_SAIDA = 'saida'
+TIPOS_EVENTO = (TIPO_ENTRADA, TIPO_SAIDA)
+
+# Uma saída só fecha entradas abertas dentro desta janela (evita fechar visitas esquecidas)
+JANELA_VISITA = timedelta(hours=16)
+# Diferença de relógio aceita entre o dispositivo e o servidor para eventos "no futuro"
+TOLERANCIA_RELOGIO = timedelta(minutes=5)
+
+TAMANHO_LOTE = 1000
+# Linhas por UPDATE de saída (mantém o número de parâmetros abaixo do limite do SQLite)
+TAMANHO_LOTE_SAIDAS = 500
+
+
+def validar_evento(dados, janela=None):
+    """
+    Valida e normaliza um evento da catraca.
+    Formato: {"usuario": 42, "tipo": "entrada"|"saida", "data_hora": "ISO-8601", "evento_id": "..."}
+    data_hora no futuro é recusada; com `janela`, também a anterior a agora - janela.
+    Retorna (evento, None) ou (None, mensagem_de_erro).
+    """
+    if not isinstance(dados, dict):
+        return None, 'Evento deve ser um objeto JSON.'
+
+    tipo = dados.get('tipo')
+    if tipo not in TIPOS_EVENTO:
+        return None, "Campo 'tipo' deve ser 'entrada' ou 'saida'."
+
+    try:
+        usuario_id = int(dados.get('usuario'))
+    except (TypeError, ValueError):
+        return None, "Campo 'usuario' deve ser o ID numérico do usuário."
+
+    data_hora = dados.get('data_hora')
+    if data_hora:
+        data_hora = parse_datetime(str(data_hora)) if not hasattr(data_hora, 'tzinfo') else data_hora
+        if data_hora is None:
+            return None, "Campo 'data_hora' inválido (use ISO-8601)."
+        if timezone.is_naive(data_hora):
+            data_hora = timezone.make_aware(data_hora)
+        agora = timezone.now()
+        if data_hora > agora + TOLERANCIA_RELOGIO:
+            return None, "Campo 'data_hora' não pode estar no futuro."
+        if janela is not None and data_hora < agora - janela:
+            return None, "Campo 'data_hora' fora da janela de visita."
+    else:
+        data_hora = timezone.now()
+
+    evento_id = dados.get('evento_id')
+    evento_id = str(evento_id)[:100] if evento_id not in (None, '') else None
+
+    return {
+        'usuario_id': usuario_id,
+        'tipo': tipo,
+        'data_hora': data_hora,
+        'evento_id': evento_id,
+    }, None
+
+
+def processar_eventos(eventos):
+    """
+    Grava um lote de eventos já validados.
+    - Eventos repetidos (mesmo evento_id, no lote ou já gravados) são ignorados
+    - Entradas: INSERT em lote que ignora evento_id já gravado
+    - Saídas: casadas com as entradas abertas e fechadas com UPDATE ... WHERE data_saida IS NULL
+    Retorna um dicionário com o resumo do processamento.
+    """
+    resumo = {
+        'entradas_registradas': 0,
+        'saidas_registradas': 0,
+        'duplicados': 0,
+        'usuarios_invalidos': 0,
+    }
+    if not eventos:
+        return resumo
+
+    # Descartar usuários inexistentes com uma única consulta
+    usuarios_ids = {e['usuario_id'] for e in eventos}
+    existentes = set(Usuario.objects.filter(id__in=usuarios_ids).values_list('id', flat=True))
+
+    entradas, saidas = [], []
+    vistos_entrada, vistos_saida = set(), set()
+    for evento in eventos:
+        if evento['usuario_id'] not in existentes:
+            resumo['usuarios_invalidos'] += 1
+            continue
+        evento_id = evento['evento_id']
+        vistos = vistos_entrada if evento['tipo'] == TIPO_ENTRADA else vistos_saida
+        if evento_id:
+            if evento_id in vistos:
+                resumo['duplicados'] += 1
+                continue
+            vistos.add(evento_id)
+        (entradas if evento['tipo'] == TIPO_ENTRADA else saidas).append(evento)
+
+    # Eventos já gravados anteriormente (reenvio da catraca)
+    if vistos_entrada:
+        ja_gravados = set(
+            Frequencia.objects.filter(evento_id__in=vistos_entrada).values_list('evento_id', flat=True)
+        )
+        if ja_gravados:
+            resumo['duplicados'] += sum(1 for e in entradas if e['evento_id'] in ja_gravados)
+            entradas = [e for e in entradas if e['evento_id'] not in ja_gravados]
+    if vistos_saida:
+        ja_gravados = set(
+            Frequencia.objects.filter(evento_saida_id__in=vistos_saida).values_list('evento_saida_id', flat=True)
+        )
+        if ja_gravados:
+            resumo['duplicados'] += sum(1 for e in saidas if e['evento_id'] in ja_gravados)
+            saidas = [e for e in saidas if e['evento_id'] not in ja_gravados]
+
+    # Só eventos recentes mexem na ocupação atual (reenvios antigos da catraca não)
+    inicio_janela = timezone.now() - JANELA_VISITA
+    variacao_ocupacao = 0
+    consolidacao = {}
+
+    with transaction.atomic():
+        if entradas:
+            # Só as linhas realmente inseridas contam: um lote concorrente pode ter gravado o mesmo evento_id
+            inseridas = []
+            for inicio in range(0, len(entradas), TAMANHO_LOTE):
+                inseridas += _inserir_entradas(entradas[inicio:inicio + TAMANHO_LOTE])
+            resumo['entradas_registradas'] = len(inseridas)
+            resumo['duplicados'] += len(entradas) - len(inseridas)
+            for usuario_id, data_entrada in inseridas:
+                variacao_ocupacao += data_entrada >= inicio_janela
+                acumular_visita(consolidacao, usuario_id, data_entrada)
+
+        if saidas:
+            resumo['saidas_registradas'], fechadas_recentes = _registrar_saidas(
+                saidas, inicio_janela, consolidacao
+            )
+            variacao_ocupacao -= fechadas_recentes
+
+        aplicar_incrementos(consolidacao)
+
+        transaction.on_commit(lambda: ajustar_ocupacao(variacao_ocupacao))
+
+    logger.debug(f"Lote de frequência processado: {resumo}")
+    return resumo
+
+
+def _inserir_entradas(entradas):
+    """
+    INSERT ... ON CONFLICT (evento_id) DO NOTHING RETURNING (PostgreSQL e SQLite 3.35+)
+    Diferente do bulk_create(ignore_conflicts=True), devolve só as linhas inseridas:
+    [(usuario_id, data_entrada)].
+    """
+    adaptar = connection.ops.adapt_datetimefield_value
+    tabela = connection.ops.quote_name(Frequencia._meta.db_table)
+    parametros = []
+    for e in entradas:
+        parametros += [e['usuario_id'], adaptar(e['data_hora']), e['evento_id'], '']
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {tabela} (usuario_id, data_entrada, evento_id, observacoes) '
+            f'VALUES {", ".join(["(%s, %s, %s, %s)"] * len(entradas))} '
+            f'ON CONFLICT (evento_id) DO NOTHING RETURNING usuario_id, data_entrada',
+            parametros,
+        )
+        linhas = cursor.fetchall()
+    return [(usuario_id, _como_datetime(data_entrada)) for usuario_id, data_entrada in linhas]
+
+
+def _como_datetime(valor):
+    """Valor cru do RETURNING: no SQLite a data volta como texto em UTC, sem fuso"""
+    if isinstance(valor, str):
+        valor = parse_datetime(valor)
+    if timezone.is_naive(valor):
+        valor = timezone.make_aware(valor, dt_timezone.utc)
+    return valor
+
+
+def _registrar_saidas(saidas, inicio_janela, consolidacao):
+    """
+    Casa cada saída com uma entrada aberta do usuário e fecha as visitas com UPDATE em lote.
+    Para cada usuário as saídas são aplicadas em ordem cronológica: cada saída fecha
+    só a entrada aberta mais recente anterior a ela (dentro de JANELA_VISITA); entradas
+    mais antigas sem saída continuam abertas.
+    O tempo de permanência das visitas fechadas é somado em consolidacao.
+    Retorna (visitas fechadas, visitas fechadas que começaram após inicio_janela).
+    """
+    saidas = sorted(saidas, key=lambda e: e['data_hora'])
+    abertas = Frequencia.objects.filter(
+        usuario_id__in={e['usuario_id'] for e in saidas},
+        data_saida__isnull=True,
+        data_entrada__gte=saidas[0]['data_hora'] - JANELA_VISITA,
+        data_entrada__lte=saidas[-1]['data_hora'],
+    ).order_by('data_entrada').values_list('id', 'usuario_id', 'data_entrada')
+
+    abertas_por_usuario = {}
+    for frequencia_id, usuario_id, data_entrada in abertas:
+        abertas_por_usuario.setdefault(usuario_id, []).append([frequencia_id, data_entrada])
+
+    fechamentos = []  # (id da frequência, data de saída, evento_id da saída)
+    dados_fechamento = {}  # id -> (usuario_id, data_entrada, data_saida)
+    for e in saidas:
+        pendentes = abertas_por_usuario.get(e['usuario_id'])
+        if not pendentes:
+            continue
+        # pendentes está em ordem de entrada: a última dentro da janela é a visita desta saída
+        candidatas = [
+            indice for indice, (_, data_entrada) in enumerate(pendentes)
+            if e['data_hora'] - JANELA_VISITA <= data_entrada <= e['data_hora']
+        ]
+        if not candidatas:
+            continue
+        frequencia_id, data_entrada = pendentes.pop(candidatas[-1])
+        fechamentos.append((frequencia_id, e['data_hora'], e['evento_id']))
+        dados_fechamento[frequencia_id] = (e['usuario_id'], data_entrada, e['data_hora'])
+
+    fechadas_recentes = atualizadas = 0
+    for inicio in range(0, len(fechamentos), TAMANHO_LOTE_SAIDAS):
+        # Só as visitas que o UPDATE realmente fechou (outra saída concorrente pode ter chegado antes)
+        for frequencia_id in _fechar_visitas(fechamentos[inicio:inicio + TAMANHO_LOTE_SAIDAS]):
+            usuario_id, data_entrada, data_saida = dados_fechamento[frequencia_id]
+            acumular_permanencia(consolidacao, usuario_id, data_entrada, data_saida)
+            fechadas_recentes += data_entrada >= inicio_janela
+            atualizadas += 1
+    return atualizadas, fechadas_recentes
+
+
+def _fechar_visitas(fechamentos):
+    """
+    UPDATE ... SET data_saida = CASE id ... END WHERE id IN (...) AND data_saida IS NULL RETURNING id
+    Devolve os ids das visitas fechadas.
+    SQL montado diretamente: com centenas de linhas, montar o CASE pelo ORM custa mais que o próprio UPDATE.
+    """
+    adaptar = connection.ops.adapt_datetimefield_value
+    tabela = connection.ops.quote_name(Frequencia._meta.db_table)
+    casos = ' '.join(['WHEN %s THEN %s'] * len(fechamentos))
+    marcadores = ', '.join(['%s'] * len(fechamentos))
+
+    parametros = []
+    for frequencia_id, data_saida, _ in fechamentos:
+        parametros += [frequencia_id, adaptar(data_saida)]
+    for frequencia_id, _, evento_id in fechamentos:
+        parametros += [frequencia_id, evento_id]
+    parametros += [f[0] for f in fechamentos]
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {tabela} SET '
+            f'data_saida = CASE id {casos} END, '
+            f'evento_saida_id = CASE id {casos} END '
+            f'WHERE id IN ({marcadores}) AND data_saida IS NULL RETURNING id',
+            parametros,
+        )
+        return [linha[0] for linha in cursor.fetchall()]
@@ -0,0 +1,164 @@
+"""
+Consolidação diária da frequência (tabela FrequenciaDiaria)
+Uma linha por usuário e dia com visitas e tempo de permanência. Atualizada
+incrementalmente pelo registro de frequência (catraca/checkin), dia a dia quando uma
+Frequencia é salva ou excluída pelo ORM/admin (sinais em signals.py) e recalculável em
+lote a partir da tabela Frequencia (comando recalcular_frequencia_diaria, necessário
+após bulk_create ou update() em Frequencia, que não disparam sinais).
+"""
+from datetime import datetime, time, timedelta
+import logging
+
+from django.db import connection, transaction
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from ..models import Frequencia, FrequenciaDiaria
+
+logger = logging.getLogger(__name__)
+
+# Linhas por INSERT (4 parâmetros por linha, abaixo do limite do SQLite)
+TAMANHO_LOTE = 200
+
+
+def acumular_visita(acumulador, usuario_id, data_entrada):
+    """
+    Conta uma entrada no dia (local) em que ela aconteceu.
+    acumulador: dict {(usuario_id, data): [visitas, segundos]}
+    """
+    chave = (usuario_id, timezone.localdate(data_entrada))
+    acumulador.setdefault(chave, [0, 0])[0] += 1
+
+
+def acumular_permanencia(acumulador, usuario_id, data_entrada, data_saida):
+    """Soma o tempo da visita ao dia da entrada (visitas que cruzam a meia-noite ficam no dia em que começaram)"""
+    segundos = int((data_saida - data_entrada).total_seconds())
+    if segundos <= 0:
+        return
+    chave = (usuario_id, timezone.localdate(data_entrada))
+    acumulador.setdefault(chave, [0, 0])[1] += segundos
+
+
+def aplicar_incrementos(acumulador):
+    """
+    Grava os incrementos com INSERT ... ON CONFLICT (usuario_id, data) DO UPDATE
+    (suportado por PostgreSQL e SQLite). Deve rodar na mesma transação que gravou a frequência.
+    """
+    if not acumulador:
+        return 0
+    tabela = connection.ops.quote_name(FrequenciaDiaria._meta.db_table)
+    adaptar = connection.ops.adapt_datefield_value
+    itens = list(acumulador.items())
+
+    with connection.cursor() as cursor:
+        for inicio in range(0, len(itens), TAMANHO_LOTE):
+            lote = itens[inicio:inicio + TAMANHO_LOTE]
+            parametros = []
+            for (usuario_id, data), (visitas, segundos) in lote:
+                parametros += [usuario_id, adaptar(data), visitas, segundos]
+            cursor.execute(
+                f'INSERT INTO {tabela} (usuario_id, data, visitas, segundos_permanencia) '
+                f'VALUES {", ".join(["(%s, %s, %s, %s)"] * len(lote))} '
+                f'ON CONFLICT (usuario_id, data) DO UPDATE SET '
+                f'visitas = {tabela}.visitas + excluded.visitas, '
+                f'segundos_permanencia = {tabela}.segundos_permanencia + excluded.segundos_permanencia',
+                parametros,
+            )
+    return len(itens)
+
+
+def _limites_dia(data, tz):
+    inicio = timezone.make_aware(datetime.combine(data, time.min), tz)
+    return inicio, timezone.make_aware(datetime.combine(data + timedelta(days=1), time.min), tz)
+
+
+def recalcular_dias(pares):
+    """
+    Regrava as linhas de vários (usuario_id, data) a partir de Frequencia: uma consulta
+    agregada por usuário (GROUP BY dia), remoção das linhas antigas e bulk_create.
+    """
+    por_usuario = {}
+    for usuario_id, data in pares:
+        por_usuario.setdefault(usuario_id, set()).add(data)
+    tz = timezone.get_current_timezone()
+
+    with transaction.atomic():
+        for usuario_id, datas in por_usuario.items():
+            inicio_dt, _ = _limites_dia(min(datas), tz)
+            _, fim_dt = _limites_dia(max(datas), tz)
+            agregados = (
+                Frequencia.objects.filter(usuario_id=usuario_id, data_entrada__gte=inicio_dt, data_entrada__lt=fim_dt)
+                .annotate(data=TruncDate('data_entrada', tzinfo=tz))
+                .values('data')
+                .annotate(
+                    visitas=Count('id'),
+                    permanencia=Sum(ExpressionWrapper(F('data_saida') - F('data_entrada'), output_field=DurationField())),
+                )
+                .order_by()
+            )
+            novas = [
+                FrequenciaDiaria(
+                    usuario_id=usuario_id, data=linha['data'], visitas=linha['visitas'],
+                    segundos_permanencia=max(int(linha['permanencia'].total_seconds()), 0) if linha['permanencia'] else 0,
+                )
+                for linha in agregados if linha['data'] in datas
+            ]
+            FrequenciaDiaria.objects.filter(usuario_id=usuario_id, data__in=datas).delete()
+            FrequenciaDiaria.objects.bulk_create(novas)
+
+
+def recalcular_periodo(inicio, fim):
+    """
+    Reconstrói a consolidação entre as datas inicio e fim (inclusive) a partir de Frequencia.
+    Agrega no banco (GROUP BY usuário, dia), apaga o período e regrava com bulk_create.
+    Retorna o número de linhas gravadas.
+    """
+    tz = timezone.get_current_timezone()
+    inicio_dt, _ = _limites_dia(inicio, tz)
+    _, fim_dt = _limites_dia(fim, tz)
+
+    agregados = (
+        Frequencia.objects.filter(data_entrada__gte=inicio_dt, data_entrada__lt=fim_dt)
+        .annotate(data=TruncDate('data_entrada', tzinfo=tz))
+        .values('usuario_id', 'data')
+        .annotate(
+            visitas=Count('id'),
+            permanencia=Sum(ExpressionWrapper(F('data_saida') - F('data_entrada'), output_field=DurationField())),
+        )
+        .order_by()
+    )
+
+    gravadas = 0
+    with transaction.atomic():
+        FrequenciaDiaria.objects.filter(data__gte=inicio, data__lte=fim).delete()
+        lote = []
+        for linha in agregados.iterator(chunk_size=2000):
+            permanencia = linha['permanencia']
+            lote.append(FrequenciaDiaria(
+                usuario_id=linha['usuario_id'],
+                data=linha['data'],
+                visitas=linha['visitas'],
+                segundos_permanencia=max(int(permanencia.total_seconds()), 0) if permanencia else 0,
+            ))
+            if len(lote) >= 2000:
+                FrequenciaDiaria.objects.bulk_create(lote)
+                gravadas += len(lote)
+                lote = []
+        if lote:
+            FrequenciaDiaria.objects.bulk_create(lote)
+            gravadas += len(lote)
+
+    logger.info(f"Frequência diária recalculada de {inicio} a {fim}: {gravadas} linhas")
+    return gravadas
+
+
+def totais_usuario(usuario, inicio, fim=None):
+    """Soma visitas e permanência do usuário no período (no máximo uma linha por dia)"""
+    filtros = {'usuario': usuario, 'data__gte': inicio}
+    if fim is not None:
+        filtros['data__lte'] = fim
+    totais = FrequenciaDiaria.objects.filter(**filtros).aggregate(
+        visitas=Sum('visitas'), segundos=Sum('segundos_permanencia'),
+    )
+    return {'visitas': totais['visitas'] or 0, 'segundos_permanencia': totais['segundos'] or 0}
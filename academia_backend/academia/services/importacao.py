@@ -0,0 +1,400 @@
+"""
+Importação em lote de alunos (CSV ou XLSX) para a abertura de novas unidades
+As linhas são lidas e validadas em streaming e gravadas em lotes com bulk_create
+(Usuario e, se a planilha trouxer o plano, Matricula). E-mail (também o username) e CPF
+normalizados são únicos na planilha e no banco; um conflito que escape da checagem faz o
+lote ser gravado linha a linha. Senhas informadas são geradas num pool de processos
+(PBKDF2 é caro); alunos sem senha recebem senha inutilizável e um token de convite.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import csv
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from decimal import Decimal, InvalidOperation
+import io
+import itertools
+import logging
+import os
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.tokens import default_token_generator
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from ..models import Matricula, Plano, Usuario, normalizar_texto
+
+logger = logging.getLogger(__name__)
+
+TAMANHO_LOTE = 1000
+# Abaixo disso as senhas são geradas no próprio processo (o pool não compensa)
+MINIMO_SENHAS_POOL = 16
+
+# Campo -> nomes aceitos no cabeçalho (comparados sem acento/maiúsculas)
+COLUNAS = {
+    'email': ('email', 'e-mail'),
+    'first_name': ('first_name', 'nome'),
+    'last_name': ('last_name', 'sobrenome'),
+    'cpf': ('cpf',),
+    'phone': ('phone', 'telefone', 'celular'),
+    'birth_date': ('birth_date', 'data_nascimento', 'nascimento'),
+    'gender': ('gender', 'genero', 'sexo'),
+    'senha': ('senha', 'password'),
+    'plano': ('plano',),
+    'data_inicio': ('data_inicio', 'inicio'),
+    'data_fim': ('data_fim', 'fim'),
+    'valor_pago': ('valor_pago', 'valor'),
+}
+GENEROS = {
+    'male': 'male', 'masculino': 'male', 'm': 'male',
+    'female': 'female', 'feminino': 'female', 'f': 'female',
+    'other': 'other', 'outro': 'other',
+}
+
+
+class ArquivoInvalido(ValueError):
+    """Arquivo ilegível, formato não suportado ou sem a coluna de e-mail"""
+
+
+@dataclass
+class ResultadoImportacao:
+    linhas: int = 0
+    criados: int = 0
+    matriculas: int = 0
+    erros: list = field(default_factory=list)
+    convites: list = field(default_factory=list)
+
+    def erro(self, numero, email, mensagens):
+        self.erros.append({'linha': numero, 'email': email, 'erros': mensagens})
+
+    def como_dict(self):
+        return {
+            'linhas': self.linhas,
+            'criados': self.criados,
+            'matriculas': self.matriculas,
+            'rejeitados': len(self.erros),
+            'erros': self.erros,
+            'convites': self.convites,
+        }
+
+
+# ---------- Leitura ----------
+
+def _mapear_cabecalho(cabecalho):
+    aliases = {nome: campo for campo, nomes in COLUNAS.items() for nome in nomes}
+    indices = {}
+    for i, nome in enumerate(cabecalho):
+        campo = aliases.get(normalizar_texto(nome).replace(' ', '_'))
+        if campo and campo not in indices:
+            indices[campo] = i
+    if 'email' not in indices:
+        raise ArquivoInvalido('A planilha precisa de uma coluna "email".')
+    return indices
+
+
+def _ler_csv(arquivo):
+    texto = io.TextIOWrapper(arquivo, encoding='utf-8-sig', newline='')
+    primeira = texto.readline()
+    # Planilhas exportadas em português costumam usar ';'
+    separador = ';' if primeira.count(';') > primeira.count(',') else ','
+    return csv.reader(itertools.chain([primeira], texto), delimiter=separador)
+
+
+def _ler_xlsx(arquivo):
+    try:
+        import openpyxl
+    except ImportError:
+        raise ArquivoInvalido('Importação de XLSX requer o pacote openpyxl.')
+    planilha = openpyxl.load_workbook(arquivo, read_only=True, data_only=True).active
+    return planilha.iter_rows(values_only=True)
+
+
+def ler_planilha(arquivo, nome):
+    """Itera (número da linha, {campo: valor}) de um arquivo CSV ou XLSX aberto em modo binário"""
+    extensao = os.path.splitext(nome or '')[1].lower()
+    if extensao == '.xlsx':
+        linhas = _ler_xlsx(arquivo)
+    elif extensao in ('.csv', '.txt', ''):
+        linhas = _ler_csv(arquivo)
+    else:
+        raise ArquivoInvalido('Formato não suportado: use .csv ou .xlsx.')
+
+    try:
+        cabecalho = next(linhas)
+    except StopIteration:
+        raise ArquivoInvalido('Arquivo vazio.')
+    except UnicodeDecodeError:
+        raise ArquivoInvalido('O CSV deve estar em UTF-8.')
+    indices = _mapear_cabecalho(['' if c is None else str(c) for c in cabecalho])
+
+    for numero, valores in enumerate(linhas, start=2):
+        if not any(v not in (None, '') for v in valores):
+            continue
+        yield numero, {
+            campo: (valores[i] if i < len(valores) else None)
+            for campo, i in indices.items()
+        }
+
+
+# ---------- Validação ----------
+
+def _texto(valor):
+    return '' if valor is None else str(valor).strip()
+
+
+def normalizar_cpf(valor):
+    """Formata como 000.000.000-00; ValueError se o CPF for inválido"""
+    if isinstance(valor, (int, float)):
+        digitos = str(int(valor)).zfill(11)  # Célula numérica do XLSX perde os zeros à esquerda
+    else:
+        digitos = ''.join(c for c in _texto(valor) if c.isdigit())
+    if len(digitos) != 11 or digitos == digitos[0] * 11:
+        raise ValueError('CPF inválido.')
+    for posicao in (9, 10):
+        soma = sum(int(d) * peso for d, peso in zip(digitos[:posicao], range(posicao + 1, 1, -1)))
+        if int(digitos[posicao]) != (soma * 10 % 11) % 10:
+            raise ValueError('CPF inválido.')
+    return f'{digitos[:3]}.{digitos[3:6]}.{digitos[6:9]}-{digitos[9:]}'
+
+
+def _data(valor, rotulo):
+    if valor in (None, ''):
+        return None
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    texto = _texto(valor)
+    for formato in ('%Y-%m-%d', '%d/%m/%Y'):
+        try:
+            return datetime.strptime(texto, formato).date()
+        except ValueError:
+            pass
+    raise ValueError(f'{rotulo} inválida (use AAAA-MM-DD ou DD/MM/AAAA).')
+
+
+def validar_linha(dados, planos, hoje):
+    """Retorna (campos normalizados, lista de erros) para uma linha da planilha"""
+    erros = []
+    campos = {
+        'email': _texto(dados.get('email')).lower(),
+        'first_name': _texto(dados.get('first_name'))[:150],
+        'last_name': _texto(dados.get('last_name'))[:150],
+        'phone': _texto(dados.get('phone'))[:20] or None,
+        'senha': _texto(dados.get('senha')) or None,
+        'cpf': None, 'birth_date': None, 'gender': None, 'matricula': None,
+    }
+    try:
+        validate_email(campos['email'])
+    except ValidationError:
+        erros.append('E-mail inválido.' if campos['email'] else 'E-mail obrigatório.')
+    if len(campos['email']) > 150:
+        erros.append('E-mail longo demais (máximo de 150 caracteres).')  # também é o username
+    if campos['senha'] and len(campos['senha']) < 8:
+        erros.append('A senha deve ter pelo menos 8 caracteres.')
+
+    if _texto(dados.get('cpf')):
+        try:
+            campos['cpf'] = normalizar_cpf(dados['cpf'])
+        except ValueError as e:
+            erros.append(str(e))
+    try:
+        campos['birth_date'] = _data(dados.get('birth_date'), 'Data de nascimento')
+    except ValueError as e:
+        erros.append(str(e))
+    if _texto(dados.get('gender')):
+        campos['gender'] = GENEROS.get(normalizar_texto(dados['gender']))
+        if campos['gender'] is None:
+            erros.append('Gênero inválido.')
+
+    plano_informado = _texto(dados.get('plano'))
+    if plano_informado:
+        plano = planos.get(normalizar_texto(plano_informado))
+        if plano is None:
+            erros.append(f'Plano "{plano_informado}" não encontrado.')
+        else:
+            try:
+                inicio = _data(dados.get('data_inicio'), 'Data de início') or hoje
+                fim = _data(dados.get('data_fim'), 'Data de fim') or inicio + timedelta(days=plano.duracao_dias)
+                valor = dados.get('valor_pago')
+                valor = plano.preco if valor in (None, '') else Decimal(_texto(valor).replace(',', '.'))
+                if fim < inicio:
+                    raise ValueError('A data de fim deve ser posterior à de início.')
+                campos['matricula'] = {'plano': plano, 'data_inicio': inicio, 'data_fim': fim, 'valor_pago': valor}
+            except InvalidOperation:
+                erros.append('Valor pago inválido.')
+            except ValueError as e:
+                erros.append(str(e))
+    return campos, erros
+
+
+# ---------- Gravação ----------
+
+def _gerar_hashes(senhas):
+    return [make_password(senha) for senha in senhas]
+
+
+def _hashes(senhas, pool, processos):
+    if pool is None or len(senhas) < MINIMO_SENHAS_POOL:
+        return _gerar_hashes(senhas)
+    tamanho = -(-len(senhas) // processos)
+    partes = [senhas[i:i + tamanho] for i in range(0, len(senhas), tamanho)]
+    return list(itertools.chain.from_iterable(pool.map(_gerar_hashes, partes)))
+
+
+def _ja_cadastrados(lote):
+    """E-mails, usernames e CPFs do lote que já existem no banco (comparação normalizada)"""
+    emails = {campos['email'] for _, campos in lote}
+    cpfs = {campos['cpf'] for _, campos in lote if campos['cpf']}
+    emails_existentes = set(
+        Usuario.objects.annotate(email_normalizado=Lower('email'))
+        .filter(email_normalizado__in=emails).values_list('email_normalizado', flat=True)
+    )
+    # O username do aluno importado é o e-mail: um usuário antigo pode ter esse username com outro e-mail
+    usernames_existentes = set(
+        Usuario.objects.annotate(username_normalizado=Lower('username'))
+        .filter(username_normalizado__in=emails).values_list('username_normalizado', flat=True)
+    )
+    # CPFs antigos podem estar gravados sem pontuação
+    variantes = cpfs | {''.join(c for c in cpf if c.isdigit()) for cpf in cpfs}
+    cpfs_existentes = {
+        normalizar_cpf(cpf) if len(cpf) == 11 else cpf
+        for cpf in Usuario.objects.filter(cpf__in=variantes).values_list('cpf', flat=True)
+    }
+    return emails_existentes, usernames_existentes, cpfs_existentes
+
+
+def _inserir(linhas):
+    """Grava os alunos e as matrículas das linhas [(numero, campos, usuario)]; retorna as matrículas"""
+    with transaction.atomic():
+        Usuario.objects.bulk_create([usuario for _, _, usuario in linhas])
+        matriculas = [
+            Matricula(usuario=usuario, **campos['matricula'])
+            for _, campos, usuario in linhas if campos['matricula']
+        ]
+        Matricula.objects.bulk_create(matriculas)
+    return matriculas
+
+
+def _gravar_lote(lote, resultado, pool, processos, hoje):
+    emails_existentes, usernames_existentes, cpfs_existentes = _ja_cadastrados(lote)
+    validos = []
+    for numero, campos in lote:
+        erros = []
+        if campos['email'] in emails_existentes:
+            erros.append('E-mail já cadastrado.')
+        elif campos['email'] in usernames_existentes:
+            erros.append('E-mail já usado como nome de usuário por outra conta.')
+        if campos['cpf'] and campos['cpf'] in cpfs_existentes:
+            erros.append('CPF já cadastrado.')
+        if erros:
+            resultado.erro(numero, campos['email'], erros)
+        else:
+            validos.append((numero, campos))
+    if not validos:
+        return
+
+    com_senha = [campos for _, campos in validos if campos['senha']]
+    for campos, senha_hash in zip(com_senha, _hashes([c['senha'] for c in com_senha], pool, processos)):
+        campos['senha_hash'] = senha_hash
+
+    linhas = []
+    for numero, campos in validos:
+        matricula = campos['matricula']
+        usuario = Usuario(
+            username=campos['email'], email=campos['email'],
+            first_name=campos['first_name'], last_name=campos['last_name'],
+            cpf=campos['cpf'], phone=campos['phone'], birth_date=campos['birth_date'], gender=campos['gender'],
+            role=Usuario.Role.ALUNO,
+            password=campos.get('senha_hash') or make_password(None),
+            is_active_member=bool(matricula and matricula['data_inicio'] <= hoje <= matricula['data_fim']),
+        )
+        # bulk_create não chama save(): o texto de busca é montado aqui
+        usuario.texto_busca = usuario.montar_texto_busca()
+        linhas.append((numero, campos, usuario))
+
+    try:
+        matriculas = _inserir(linhas)
+        gravadas = linhas
+    except IntegrityError:
+        # Conflito não visto na checagem (cadastro concorrente, diferença de maiúsculas no banco):
+        # grava linha a linha para perder só as linhas em conflito, não o lote inteiro
+        logger.warning(f'Conflito de unicidade num lote de {len(linhas)} aluno(s); gravando linha a linha')
+        matriculas, gravadas = [], []
+        for linha in linhas:
+            numero, campos, usuario = linha
+            usuario.pk = None
+            try:
+                matriculas += _inserir([linha])
+            except IntegrityError:
+                resultado.erro(numero, campos['email'], ['E-mail, nome de usuário ou CPF já cadastrado.'])
+            else:
+                gravadas.append(linha)
+
+    resultado.criados += len(gravadas)
+    resultado.matriculas += len(matriculas)
+    for _, campos, usuario in gravadas:
+        if not campos['senha']:
+            resultado.convites.append({
+                'email': usuario.email,
+                'uid': urlsafe_base64_encode(force_bytes(usuario.pk)),
+                'token': default_token_generator.make_token(usuario),
+            })
+
+
+def importar_membros(arquivo, nome, tamanho_lote=TAMANHO_LOTE, processos=None, max_linhas=None):
+    """
+    Importa alunos de um arquivo CSV/XLSX (binário). Linhas inválidas ou duplicadas vão
+    para o relatório de erros e não impedem as demais. Retorna um ResultadoImportacao.
+    """
+    hoje = timezone.localdate()
+    processos = processos or getattr(settings, 'IMPORTACAO_PROCESSOS', None) or os.cpu_count() or 1
+    planos = {}
+    for plano in Plano.objects.all():
+        planos[str(plano.id)] = plano
+        planos.setdefault(normalizar_texto(plano.nome), plano)
+
+    resultado = ResultadoImportacao()
+    vistos_email, vistos_cpf = {}, {}
+    lote = []
+    # initializer: com 'spawn' o processo filho precisa configurar o Django antes de gerar hashes
+    pool = ProcessPoolExecutor(max_workers=processos, initializer=django.setup) if processos > 1 else None
+    try:
+        for numero, dados in ler_planilha(arquivo, nome):
+            if max_linhas and resultado.linhas >= max_linhas:
+                resultado.erro(numero, '', [f'Limite de {max_linhas} linhas atingido; o restante foi ignorado.'])
+                break
+            resultado.linhas += 1
+            campos, erros = validar_linha(dados, planos, hoje)
+            if campos['email'] in vistos_email:
+                erros.append(f'E-mail repetido (linha {vistos_email[campos["email"]]}).')
+            if campos['cpf'] and campos['cpf'] in vistos_cpf:
+                erros.append(f'CPF repetido (linha {vistos_cpf[campos["cpf"]]}).')
+            if campos['email']:
+                vistos_email.setdefault(campos['email'], numero)
+            if campos['cpf']:
+                vistos_cpf.setdefault(campos['cpf'], numero)
+            if erros:
+                resultado.erro(numero, campos['email'], erros)
+                continue
+            lote.append((numero, campos))
+            if len(lote) >= tamanho_lote:
+                _gravar_lote(lote, resultado, pool, processos, hoje)
+                lote = []
+        if lote:
+            _gravar_lote(lote, resultado, pool, processos, hoje)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    logger.info(
+        f'Importação de {nome}: {resultado.criados} aluno(s) criado(s), '
+        f'{resultado.matriculas} matrícula(s), {len(resultado.erros)} linha(s) rejeitada(s)'
+    )
+    return resultado
@@ -0,0 +1,151 @@
+"""
+Indicadores do painel administrativo (GET /api/admin/kpis/)
+Cada bloco é um aggregate/annotate agrupado no banco (TruncMonth/TruncWeek), sem
+carregar linhas no Python; a resposta inteira fica em cache por poucos segundos.
+"""
+from datetime import datetime, time, timedelta
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+from django.utils import timezone
+
+from ..models import Matricula, ParticipanteTorneio, Pedido, Torneio, Usuario
+
+logger = logging.getLogger(__name__)
+
+CACHE_PREFIXO = 'admin:kpis'
+DIAS_A_VENCER = 7
+SEMANAS_CADASTROS = 12
+TORNEIOS_RECENTES = 10
+
+
+def _inicio_do_mes(hoje, meses_atras):
+    ano, mes = divmod(hoje.year * 12 + hoje.month - 1 - meses_atras, 12)
+    return hoje.replace(year=ano, month=mes + 1, day=1)
+
+
+def _inicio_do_dia(data):
+    return timezone.make_aware(datetime.combine(data, time.min))
+
+
+def _membros(hoje):
+    """Alunos com matrícula ativa e os que vencem nos próximos DIAS_A_VENCER dias"""
+    ativas = Q(status='ativa', data_fim__gte=hoje)
+    return Matricula.objects.aggregate(
+        ativos=Count('usuario', distinct=True, filter=ativas),
+        vencendo=Count(
+            'usuario', distinct=True,
+            filter=ativas & Q(data_fim__lte=hoje + timedelta(days=DIAS_A_VENCER)),
+        ),
+    )
+
+
+def _receita_por_plano(desde):
+    """Receita mensal por plano a partir de Matricula.valor_pago (toda venda aprovada gera uma matrícula)"""
+    linhas = (
+        Matricula.objects.filter(created_at__gte=_inicio_do_dia(desde))
+        .annotate(mes=TruncMonth('created_at'))
+        .values('mes', 'plano_id', 'plano__nome')
+        .annotate(receita=Sum('valor_pago'), matriculas=Count('id'))
+        .order_by('mes', 'plano__nome')
+    )
+    return [
+        {
+            'mes': linha['mes'].strftime('%Y-%m'),
+            'plano': linha['plano_id'],
+            'plano_nome': linha['plano__nome'],
+            'receita': linha['receita'],
+            'matriculas': linha['matriculas'],
+        }
+        for linha in linhas
+    ]
+
+
+def _pedidos(desde):
+    """Pedidos do período por status (quantidade e valor)"""
+    totais = Pedido.objects.filter(criado_em__gte=_inicio_do_dia(desde)).aggregate(
+        pendentes=Count('id', filter=Q(status=Pedido.STATUS_PENDENTE)),
+        aprovados=Count('id', filter=Q(status=Pedido.STATUS_APROVADO)),
+        cancelados=Count('id', filter=Q(status=Pedido.STATUS_CANCELADO)),
+        expirados=Count('id', filter=Q(status=Pedido.STATUS_EXPIRADO)),
+        valor_pendente=Sum('valor', filter=Q(status=Pedido.STATUS_PENDENTE)),
+        valor_aprovado=Sum('valor', filter=Q(status=Pedido.STATUS_APROVADO)),
+    )
+    total = totais['pendentes'] + totais['aprovados'] + totais['cancelados'] + totais['expirados']
+    totais['taxa_aprovacao'] = round(totais['aprovados'] / total * 100, 1) if total else None
+    return totais
+
+
+def _cadastros_por_semana(hoje):
+    """Novos alunos por semana (semanas sem cadastro aparecem com zero)"""
+    inicio = hoje - timedelta(days=hoje.weekday() + 7 * (SEMANAS_CADASTROS - 1))
+    por_semana = dict(
+        Usuario.objects.filter(role=Usuario.Role.ALUNO, created_at__gte=_inicio_do_dia(inicio))
+        .annotate(semana=TruncWeek('created_at'))
+        .values('semana')
+        .annotate(total=Count('id'))
+        .values_list('semana', 'total')
+    )
+    por_semana = {semana.date(): total for semana, total in por_semana.items()}
+    return [
+        {'semana': semana.isoformat(), 'cadastros': por_semana.get(semana, 0)}
+        for semana in (inicio + timedelta(weeks=i) for i in range(SEMANAS_CADASTROS))
+    ]
+
+
+def _torneios():
+    """Inscrições ativas nos torneios mais recentes e alunos distintos participando"""
+    torneios = (
+        Torneio.objects.exclude(status='cancelado')
+        .annotate(inscritos=Count('participantes', filter=Q(participantes__ativo=True)))
+        .order_by('-data_inicio')
+        .values('id', 'nome', 'status', 'data_inicio', 'max_participantes', 'inscritos')[:TORNEIOS_RECENTES]
+    )
+    em_aberto = ParticipanteTorneio.objects.filter(
+        ativo=True, torneio__status__in=('inscricoes_abertas', 'em_andamento')
+    ).aggregate(alunos=Count('usuario', distinct=True))
+    return {
+        'alunos_participando': em_aberto['alunos'],
+        'recentes': [
+            {
+                **torneio,
+                'ocupacao': (
+                    round(torneio['inscritos'] / torneio['max_participantes'] * 100, 1)
+                    if torneio['max_participantes'] else None
+                ),
+            }
+            for torneio in torneios
+        ],
+    }
+
+
+def calcular_kpis(meses=6):
+    """Indicadores consolidados; receita e pedidos cobrem os últimos `meses` meses (incluindo o atual)"""
+    hoje = timezone.localdate()
+    desde = _inicio_do_mes(hoje, meses - 1)
+    return {
+        'gerado_em': timezone.now(),
+        'desde': desde,
+        'membros': _membros(hoje),
+        'receita_por_plano': _receita_por_plano(desde),
+        'pedidos': _pedidos(desde),
+        'cadastros_por_semana': _cadastros_por_semana(hoje),
+        'torneios': _torneios(),
+    }
+
+
+def obter_kpis(meses=6, usar_cache=True):
+    """Indicadores do painel, lidos do cache por KPIS_CACHE_TIMEOUT segundos"""
+    chave = f'{CACHE_PREFIXO}:{meses}'
+    if usar_cache:
+        resultado = cache.get(chave)
+        if resultado is not None:
+            return resultado
+
+    resultado = calcular_kpis(meses)
+    cache.set(chave, resultado, timeout=getattr(settings, 'KPIS_CACHE_TIMEOUT', 60))
+    logger.debug(f'KPIs do painel recalculados ({meses} meses)')
+    return resultado
@@ -0,0 +1,160 @@
+"""
+Mapa de calor da ocupação por dia da semana e hora (7x24)
+Os pares (data_entrada, data_saida) são lidos em blocos com values_list().iterator()
+e cada visita é expandida em faixas de uma hora com NumPy (sem laço por visita).
+Memória limitada ao tamanho do bloco; resultado em cache por período.
+"""
+from datetime import datetime, time, timedelta
+import logging
+
+import numpy as np
+from django.core.cache import cache
+from django.utils import timezone
+
+from ..models import Frequencia
+from .frequencia import JANELA_VISITA
+
+logger = logging.getLogger(__name__)
+
+DIAS_SEMANA = ['Segunda', 'Terça', 'Quarta', 'Quinta', 'Sexta', 'Sábado', 'Domingo']
+TAMANHO_BLOCO = 200_000
+# Duração assumida para visitas sem saída registrada (saída esquecida na catraca)
+DURACAO_SEM_SAIDA = timedelta(hours=1)
+CACHE_PREFIXO = 'frequencia:mapa_calor'
+# Períodos que incluem hoje mudam a cada visita; períodos fechados podem ficar mais tempo
+CACHE_TIMEOUT_ABERTO = 5 * 60
+CACHE_TIMEOUT_FECHADO = 24 * 60 * 60
+
+_SEGUNDOS_HORA = 3600
+# 01/01/1970 foi uma quinta-feira (weekday 3)
+_DIA_SEMANA_EPOCH = 3
+
+
+def _deslocamentos_locais(segundos_utc, tz):
+    """Offset do fuso (em segundos) para cada instante, resolvido uma vez por dia UTC distinto"""
+    dias = segundos_utc // 86400
+    dias_unicos, inverso = np.unique(dias, return_inverse=True)
+    offsets = np.array([
+        datetime.fromtimestamp(int(dia) * 86400 + 43200, tz).utcoffset().total_seconds()
+        for dia in dias_unicos
+    ], dtype=np.int64)
+    return offsets[inverso]
+
+
+def _acumular_bloco(entradas, saidas, tz, horas):
+    """
+    Soma em horas (vetor de 168 posições) o tempo de cada visita em cada faixa dia/hora local.
+    entradas e saidas: arrays int64 de segundos UTC.
+    """
+    inicio = entradas + _deslocamentos_locais(entradas, tz)
+    fim = inicio + (saidas - entradas)
+
+    hora_inicial = inicio // _SEGUNDOS_HORA
+    hora_final = (fim - 1) // _SEGUNDOS_HORA
+    faixas_por_visita = hora_final - hora_inicial + 1
+
+    # Expande cada visita nas horas que ela ocupa: [h0, h0+1, ..., h1]
+    visita = np.repeat(np.arange(len(inicio)), faixas_por_visita)
+    primeira_faixa = np.cumsum(faixas_por_visita) - faixas_por_visita
+    hora = hora_inicial[visita] + (np.arange(len(visita)) - primeira_faixa[visita])
+
+    # Fração da hora efetivamente ocupada (primeira e última faixas são parciais)
+    ocupado = (
+        np.minimum(fim[visita], (hora + 1) * _SEGUNDOS_HORA)
+        - np.maximum(inicio[visita], hora * _SEGUNDOS_HORA)
+    ) / _SEGUNDOS_HORA
+
+    dia_semana = (hora // 24 + _DIA_SEMANA_EPOCH) % 7
+    faixa = dia_semana * 24 + hora % 24
+    horas += np.bincount(faixa, weights=ocupado, minlength=168)
+
+
+def _ocorrencias_por_faixa(inicio, fim):
+    """Quantas vezes cada dia da semana aparece no período (para calcular médias)"""
+    dias = (fim - inicio).days + 1
+    ocorrencias = np.full(7, dias // 7, dtype=np.int64)
+    for i in range(dias % 7):
+        ocorrencias[(inicio.weekday() + i) % 7] += 1
+    return ocorrencias
+
+
+def calcular_mapa_calor(inicio, fim):
+    """
+    Calcula o mapa de calor das visitas iniciadas entre as datas inicio e fim (inclusive).
+    Retorna um dicionário com a matriz 7x24 de pessoas em média na academia, as
+    horas totais por faixa e o pico.
+    """
+    tz = timezone.get_current_timezone()
+    inicio_dt = timezone.make_aware(datetime.combine(inicio, time.min), tz)
+    fim_dt = timezone.make_aware(datetime.combine(fim + timedelta(days=1), time.min), tz)
+    agora = timezone.now()
+
+    horas = np.zeros(168, dtype=np.float64)
+    visitas = 0
+    pares = (
+        Frequencia.objects.filter(data_entrada__gte=inicio_dt, data_entrada__lt=fim_dt)
+        .order_by()
+        .values_list('data_entrada', 'data_saida')
+    )
+    entradas, saidas = [], []
+
+    def processar_bloco():
+        e = np.fromiter(entradas, dtype=np.int64, count=len(entradas))
+        s = np.fromiter(saidas, dtype=np.int64, count=len(saidas))
+        # Saídas inválidas ou além da janela de visita são limitadas a ela
+        s = np.clip(s, e + 1, e + int(JANELA_VISITA.total_seconds()))
+        _acumular_bloco(e, s, tz, horas)
+        entradas.clear()
+        saidas.clear()
+
+    padrao = DURACAO_SEM_SAIDA.total_seconds()
+    for data_entrada, data_saida in pares.iterator(chunk_size=10_000):
+        entrada = data_entrada.timestamp()
+        if data_saida is not None:
+            saida = data_saida.timestamp()
+        elif agora - data_entrada < JANELA_VISITA:
+            saida = agora.timestamp()  # Ainda na academia
+        else:
+            saida = entrada + padrao
+        entradas.append(int(entrada))
+        saidas.append(int(saida))
+        if len(entradas) >= TAMANHO_BLOCO:
+            visitas += len(entradas)
+            processar_bloco()
+    if entradas:
+        visitas += len(entradas)
+        processar_bloco()
+
+    horas = horas.reshape(7, 24)
+    ocorrencias = _ocorrencias_por_faixa(inicio, fim)
+    media = np.divide(horas, ocorrencias[:, None], out=np.zeros_like(horas), where=ocorrencias[:, None] > 0)
+
+    dia_pico, hora_pico = np.unravel_index(np.argmax(media), media.shape)
+    return {
+        'inicio': inicio.isoformat(),
+        'fim': fim.isoformat(),
+        'visitas': visitas,
+        'dias_semana': DIAS_SEMANA,
+        'media_pessoas': np.round(media, 2).tolist(),
+        'horas_totais': np.round(horas, 1).tolist(),
+        'pico': {
+            'dia_semana': DIAS_SEMANA[dia_pico],
+            'hora': int(hora_pico),
+            'media_pessoas': round(float(media[dia_pico, hora_pico]), 2),
+        } if visitas else None,
+    }
+
+
+def obter_mapa_calor(inicio, fim, usar_cache=True):
+    """Mapa de calor do período, lido do cache quando disponível"""
+    chave = f'{CACHE_PREFIXO}:{inicio.isoformat()}:{fim.isoformat()}'
+    if usar_cache:
+        resultado = cache.get(chave)
+        if resultado is not None:
+            return resultado
+
+    resultado = calcular_mapa_calor(inicio, fim)
+    timeout = CACHE_TIMEOUT_FECHADO if fim < timezone.localdate() else CACHE_TIMEOUT_ABERTO
+    cache.set(chave, resultado, timeout=timeout)
+    logger.debug(f"Mapa de calor calculado de {inicio} a {fim}: {resultado['visitas']} visitas")
+    return resultado
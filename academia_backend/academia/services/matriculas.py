@@ -0,0 +1,127 @@
+"""
+Vencimento de matrículas e lembretes de renovação
+Executado periodicamente pelo comando `varrer_matriculas`. Matrículas ativas com
+data_fim < hoje passam a 'vencida' em lotes (um UPDATE por lote), e o
+is_active_member dos alunos afetados é recalculado num UPDATE com Exists(); como o UPDATE
+não passa pelo post_save, o cache de usuário (autenticacao) dos que mudaram é invalidado
+após o commit.
+Idempotente: cada lote só seleciona o que ainda está pendente.
+"""
+from datetime import timedelta
+import logging
+import time
+
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef
+from django.dispatch import Signal
+from django.utils import timezone
+
+from ..autenticacao import invalidar_usuario
+from ..models import Matricula, Usuario
+
+logger = logging.getLogger(__name__)
+
+TAMANHO_LOTE = 5000
+DIAS_LEMBRETE = 7
+
+# Enviado uma vez por matrícula a vencer em até DIAS_LEMBRETE dias.
+# Argumentos: matriculas (lista de dicts com id, usuario_id, plano_id e data_fim)
+lembrete_renovacao = Signal()
+
+
+def atualizar_membros_ativos(usuarios_ids, hoje=None):
+    """
+    Recalcula is_active_member dos usuários (ativo = tem matrícula ativa não vencida).
+    Só grava quem mudou; retorna os ids alterados, já com a invalidação do cache agendada.
+    """
+    hoje = hoje or timezone.localdate()
+    matricula_valida = Matricula.objects.filter(usuario=OuterRef('pk'), status='ativa', data_fim__gte=hoje)
+    alterados = list(
+        Usuario.objects.filter(id__in=usuarios_ids)
+        .annotate(membro=Exists(matricula_valida))
+        .exclude(is_active_member=F('membro'))
+        .values_list('id', flat=True)
+    )
+    if alterados:
+        Usuario.objects.filter(id__in=alterados).update(
+            is_active_member=Exists(matricula_valida), updated_at=timezone.now()
+        )
+
+        def invalidar_cache():
+            for usuario_id in alterados:
+                invalidar_usuario(usuario_id)
+        transaction.on_commit(invalidar_cache)
+    return alterados
+
+
+def _em_lotes(processar_lote, tamanho_lote, tempo_maximo):
+    """Chama processar_lote() até não haver mais linhas ou o tempo acabar; retorna (total, concluido)"""
+    limite = time.monotonic() + tempo_maximo if tempo_maximo else None
+    total = 0
+    while True:
+        processadas = processar_lote(tamanho_lote)
+        total += processadas
+        if processadas < tamanho_lote:
+            return total, True
+        if limite is not None and time.monotonic() >= limite:
+            return total, False
+
+
+def expirar_matriculas(hoje=None, tamanho_lote=TAMANHO_LOTE, tempo_maximo=None):
+    """
+    Marca como 'vencida' as matrículas ativas com data_fim anterior a hoje.
+    tempo_maximo (segundos): interrompe entre lotes; a próxima execução continua de onde parou.
+    Retorna (matrículas vencidas, concluido).
+    """
+    hoje = hoje or timezone.localdate()
+
+    def processar_lote(tamanho):
+        with transaction.atomic():
+            # skip_locked: execuções simultâneas pegam lotes diferentes
+            lote = list(
+                Matricula.objects.select_for_update(skip_locked=True)
+                .filter(status='ativa', data_fim__lt=hoje)
+                .order_by('data_fim', 'id')
+                .values_list('id', 'usuario_id')[:tamanho]
+            )
+            if not lote:
+                return 0
+            ids = [matricula_id for matricula_id, _ in lote]
+            Matricula.objects.filter(id__in=ids, status='ativa').update(
+                status='vencida', updated_at=timezone.now()
+            )
+            atualizar_membros_ativos({usuario_id for _, usuario_id in lote}, hoje)
+        return len(lote)
+
+    total, concluido = _em_lotes(processar_lote, tamanho_lote, tempo_maximo)
+    if total:
+        logger.info(f'{total} matrícula(s) vencida(s) em {hoje}' + ('' if concluido else ' (interrompido)'))
+    return total, concluido
+
+
+def emitir_lembretes_renovacao(hoje=None, dias=DIAS_LEMBRETE, tamanho_lote=TAMANHO_LOTE, tempo_maximo=None):
+    """
+    Emite lembrete_renovacao para matrículas ativas que vencem em até `dias` dias e
+    ainda não receberam lembrete. Retorna (lembretes emitidos, concluido).
+    """
+    hoje = hoje or timezone.localdate()
+
+    def processar_lote(tamanho):
+        with transaction.atomic():
+            lote = list(
+                Matricula.objects.select_for_update(skip_locked=True)
+                .filter(
+                    status='ativa', data_fim__gte=hoje, data_fim__lte=hoje + timedelta(days=dias),
+                    lembrete_renovacao_em__isnull=True,
+                )
+                .order_by('data_fim', 'id')
+                .values('id', 'usuario_id', 'plano_id', 'data_fim')[:tamanho]
+            )
+            if not lote:
+                return 0
+            Matricula.objects.filter(id__in=[m['id'] for m in lote]).update(lembrete_renovacao_em=timezone.now())
+            # Receptores só rodam após o commit: nenhum lembrete sai de um lote revertido
+            transaction.on_commit(lambda: lembrete_renovacao.send(sender=Matricula, matriculas=lote))
+        return len(lote)
+
+    return _em_lotes(processar_lote, tamanho_lote, tempo_maximo)
@@ -3,13 +3,33 @@ Serviço de integração com Mercado Pago
 Suporta tanto SDK tradicional quanto MCP (Model Context Protocol) quando disponível
 """
 import mercadopago
+from mercadopago.http import HttpClient
 from django.conf import settings
 from decimal import Decimal
 import logging
 
+from ..metricas import medir
+
 logger = logging.getLogger(__name__)
 
 
+URL_API_OFICIAL = 'https://api.mercadopago.com'
+
+
+class ClienteHttpMedido(HttpClient):
+    """
+    Cliente HTTP do SDK com cada chamada registrada nas métricas da requisição
+    O SDK só conhece a API oficial: com outro MERCADOPAGO_API_URL (ex.: servidor fake) a URL é reescrita.
+    """
+    
+    def request(self, method, url, *args, **kwargs):
+        base_url = getattr(settings, 'MERCADOPAGO_API_URL', URL_API_OFICIAL).rstrip('/')
+        if base_url != URL_API_OFICIAL and url.startswith(URL_API_OFICIAL):
+            url = base_url + url[len(URL_API_OFICIAL):]
+        with medir('mercadopago'):
+            return super().request(method, url, *args, **kwargs)
+
+
 class MercadoPagoService:
     """Serviço para gerenciar pagamentos via Mercado Pago"""
     
@@ -23,7 +43,7 @@ class MercadoPagoService:
         
         # Usar SDK tradicional se MCP não estiver habilitado
         if not self.use_mcp:
-            self.sdk = mercadopago.SDK(access_token)
+            self.sdk = mercadopago.SDK(access_token, http_client=ClienteHttpMedido())
             logger.debug("Mercado Pago usando SDK tradicional")
         else:
             self.sdk = None
@@ -33,10 +53,202 @@ class MercadoPagoService:
         """Obtém o SDK, inicializando se necessário (fallback do MCP)"""
         if not self.sdk:
             logger.warning("MCP não disponível, inicializando SDK tradicional como fallback")
-            self.sdk = mercadopago.SDK(self.access_token)
+            self.sdk = mercadopago.SDK(self.access_token, http_client=ClienteHttpMedido())
             self.use_mcp = False
         return self.sdk
     
+    @property
+    def modo_teste(self):
+        """
+        Detecta modo TEST baseado no access_token
+        Tokens de teste começam com "TEST-" ou contêm "test" no nome
+        Tokens de produção começam com "APP_USR-"
+        """
+        return (
+            self.access_token.startswith("TEST-") or
+            "TEST-" in self.access_token.upper() or
+            (not self.access_token.startswith("APP_USR-") and "test" in self.access_token.lower())
+        )
+    
+    def montar_preferencia(self, pedido, usuario, plano, metodo_pagamento='pix'):
+        """
+        Monta os dados da preferência de checkout (Checkout Pro)
+        Compartilhado entre o SDK e o cliente assíncrono (services/mercadopago_async.py)
+
+        Returns:
+            dict: preference_data pronto para POST /checkout/preferences
+        """
+        # URLs de retorno - garantir que sejam URLs válidas
+        webhook_url = getattr(settings, 'MERCADOPAGO_WEBHOOK_URL', None)
+        if webhook_url:
+            base_url = str(webhook_url).rstrip('/')
+        else:
+            base_url = 'http://localhost:8000'
+        
+        # Garantir que base_url seja válido
+        if not base_url or not base_url.startswith('http'):
+            base_url = 'http://localhost:8000'
+            logger.warning(f"⚠️ MERCADOPAGO_WEBHOOK_URL inválido, usando localhost: {base_url}")
+        
+        success_url = f"{base_url}/portal/?payment=success"
+        failure_url = f"{base_url}/checkout/?pedido_id={pedido.id_publico}&payment=failed"
+        pending_url = f"{base_url}/checkout/?pedido_id={pedido.id_publico}&payment=pending"
+        
+        # Validar URLs antes de usar
+        logger.debug(f"URLs de retorno: success={success_url}, failure={failure_url}, pending={pending_url}")
+        
+        is_test = self.modo_teste
+        logger.debug(f"Modo: {'TEST' if is_test else 'PRODUÇÃO'}")
+        
+        # Preparar dados da preferência
+        # IMPORTANTE: back_urls DEVE ser definido e válido antes de auto_return
+        # O Mercado Pago valida que back_urls.success existe e é válido antes de aceitar auto_return
+        
+        # Validar que success_url está definida e válida ANTES de criar back_urls
+        if not success_url or not success_url.startswith('http'):
+            logger.error(f"❌ ERRO: success_url inválida: {success_url}")
+            raise ValueError(f"URL de sucesso inválida: {success_url}")
+        
+        # Criar back_urls com todas as URLs válidas
+        back_urls = {
+            "success": str(success_url).strip(),  # Garantir que é string e sem espaços
+            "failure": str(failure_url).strip(),
+            "pending": str(pending_url).strip()
+        }
+        
+        # Validar novamente após criar o dicionário
+        if not back_urls.get("success") or not back_urls["success"].startswith('http'):
+            logger.error(f"❌ ERRO: back_urls.success inválida após criação: {back_urls.get('success')}")
+            raise ValueError(f"back_urls.success inválida: {back_urls.get('success')}")
+        
+        logger.debug(f"back_urls criado: success={back_urls['success'][:50]}...")
+        
+        # Verificar se back_urls.success está válida ANTES de criar preference_data
+        success_url_valid = (
+            back_urls.get("success") and 
+            isinstance(back_urls["success"], str) and
+            back_urls["success"].strip().startswith('http') and 
+            len(back_urls["success"].strip()) > 10
+        )
+        
+        if not success_url_valid:
+            logger.error(f"❌ ERRO: back_urls.success inválida antes de criar preference_data")
+            logger.error(f"   Tipo: {type(back_urls.get('success'))}, Valor: {repr(back_urls.get('success'))}")
+            raise ValueError(f"back_urls.success inválida: {back_urls.get('success')}")
+        
+        # Criar preference_data com TODOS os campos de uma vez
+        # O Mercado Pago pode estar validando a estrutura completa, então vamos incluir tudo junto
+        preference_data = {
+            "items": [
+                {
+                    "title": f"Plano {plano.nome} - {plano.duracao_dias} dias",
+                    "quantity": 1,
+                    "unit_price": float(pedido.valor),
+                    "currency_id": "BRL"
+                }
+            ],
+            "external_reference": str(pedido.id_publico),
+            "back_urls": {
+                "success": str(back_urls["success"]).strip(),
+                "failure": str(back_urls["failure"]).strip(),
+                "pending": str(back_urls["pending"]).strip()
+            },
+            "notification_url": f"{base_url}/api/payments/mercadopago/webhook/",
+            "statement_descriptor": "ATHLETECH",
+            "binary_mode": False,  # False permite pagamentos pendentes (necessário para PIX e account_money)
+            "expires": False  # Não expirar a preferência
+        }
+        
+        # Adicionar auto_return apenas se NÃO for localhost
+        # O Mercado Pago pode não aceitar auto_return com URLs localhost
+        is_localhost = base_url.startswith('http://localhost') or base_url.startswith('http://127.0.0.1')
+        
+        if not is_localhost and success_url_valid:
+            preference_data["auto_return"] = "approved"
+            logger.info("✅ auto_return configurado para redirecionamento automático (não é localhost)")
+        else:
+            if is_localhost:
+                logger.info("ℹ️ auto_return não configurado - localhost detectado (Mercado Pago pode não aceitar)")
+            else:
+                logger.warning("⚠️ auto_return não configurado - success_url inválida")
+        
+        logger.debug(f"preference_data criado: auto_return={preference_data.get('auto_return', 'não configurado')}")
+        
+        # Configurar métodos de pagamento permitidos
+        # IMPORTANTE: account_money (saldo do Mercado Pago) deve estar sempre permitido
+        # Não excluir account_money explicitamente, pois ele é usado tanto para PIX quanto para saldo
+        
+        if is_test:
+            # Em modo TEST, permitir todos os métodos para facilitar testes
+            preference_data["payment_methods"] = {
+                "excluded_payment_types": [],
+                "excluded_payment_methods": [],
+                "installments": 12
+            }
+        elif metodo_pagamento == 'pix':
+            # Para PIX, excluir outros métodos para forçar PIX
+            preference_data["payment_methods"] = {
+                "excluded_payment_types": [
+                    {"id": "credit_card"},
+                    {"id": "debit_card"},
+                    {"id": "ticket"},
+                    {"id": "atm"},
+                    {"id": "prepaid_card"}
+                ],
+                "excluded_payment_methods": [],
+                "installments": 1
+            }
+            # Adicionar dados do pagador para facilitar o checkout
+            preference_data["payer"] = {
+                "email": usuario.email,
+                "name": f"{usuario.first_name or ''} {usuario.last_name or ''}".strip() or "Cliente",
+            }
+        elif metodo_pagamento == 'cartao':
+            # Para cartão, permitir credit_card, debit_card e account_money (saldo)
+            preference_data["payment_methods"] = {
+                "excluded_payment_types": [
+                    {"id": "ticket"}
+                ],
+                "excluded_payment_methods": [],
+                "installments": 12
+            }
+        else:
+            # Permitir todos os métodos (incluindo account_money)
+            preference_data["payment_methods"] = {
+                "excluded_payment_types": [],
+                "excluded_payment_methods": [],
+                "installments": 12
+            }
+        # Validar estrutura antes de enviar
+        if not preference_data.get('back_urls', {}).get('success'):
+            raise ValueError("back_urls.success não está definido ou está vazio")
+        
+        # Se auto_return estiver presente, garantir que success_url está válida
+        if 'auto_return' in preference_data:
+            success_url_final = preference_data.get('back_urls', {}).get('success', '')
+            if not success_url_final or not success_url_final.startswith('http') or len(success_url_final) < 10:
+                del preference_data['auto_return']
+                logger.warning("auto_return removido - success_url inválida")
+        return preference_data
+    
+    def url_redirecionamento(self, preference):
+        """
+        URL de redirecionamento da preferência criada
+        Em modo TEST, SEMPRE usar sandbox_init_point; em PRODUÇÃO, SEMPRE init_point
+        Isso evita o erro "Uma das partes é de teste"
+        """
+        init_point = preference.get("init_point", "")
+        sandbox_init_point = preference.get("sandbox_init_point", "")
+        if self.modo_teste:
+            redirect_url = sandbox_init_point or init_point
+            if not redirect_url:
+                logger.error("Nenhum init_point disponível em modo TEST")
+        else:
+            redirect_url = init_point or sandbox_init_point
+            if not redirect_url:
+                logger.error("Nenhum init_point disponível em modo PRODUÇÃO")
+        return redirect_url or None
+    
     def criar_checkout_preference(self, pedido, usuario, plano, metodo_pagamento='pix'):
         """
         Cria uma preferência de checkout (Checkout Pro) no Mercado Pago
@@ -53,167 +265,7 @@ class MercadoPagoService:
         """
         try:
             sdk = self._get_sdk()
-            
-            # URLs de retorno - garantir que sejam URLs válidas
-            webhook_url = getattr(settings, 'MERCADOPAGO_WEBHOOK_URL', None)
-            if webhook_url:
-                base_url = str(webhook_url).rstrip('/')
-            else:
-                base_url = 'http://localhost:8000'
-            
-            # Garantir que base_url seja válido
-            if not base_url or not base_url.startswith('http'):
-                base_url = 'http://localhost:8000'
-                logger.warning(f"⚠️ MERCADOPAGO_WEBHOOK_URL inválido, usando localhost: {base_url}")
-            
-            success_url = f"{base_url}/portal/?payment=success"
-            failure_url = f"{base_url}/checkout/?pedido_id={pedido.id_publico}&payment=failed"
-            pending_url = f"{base_url}/checkout/?pedido_id={pedido.id_publico}&payment=pending"
-            
-            # Validar URLs antes de usar
-            logger.debug(f"URLs de retorno: success={success_url}, failure={failure_url}, pending={pending_url}")
-            
-            # Detectar modo TEST baseado no access_token
-            # Tokens de teste começam com "TEST-" ou contêm "test" no nome
-            # Tokens de produção começam com "APP_USR-"
-            is_test = (
-                self.access_token.startswith("TEST-") or 
-                "TEST-" in self.access_token.upper() or
-                (not self.access_token.startswith("APP_USR-") and "test" in self.access_token.lower())
-            )
-            
-            # Log para debug
-            logger.debug(f"Modo: {'TEST' if is_test else 'PRODUÇÃO'}")
-            
-            # Preparar dados da preferência
-            # IMPORTANTE: back_urls DEVE ser definido e válido antes de auto_return
-            # O Mercado Pago valida que back_urls.success existe e é válido antes de aceitar auto_return
-            
-            # Validar que success_url está definida e válida ANTES de criar back_urls
-            if not success_url or not success_url.startswith('http'):
-                logger.error(f"❌ ERRO: success_url inválida: {success_url}")
-                raise ValueError(f"URL de sucesso inválida: {success_url}")
-            
-            # Criar back_urls com todas as URLs válidas
-            back_urls = {
-                "success": str(success_url).strip(),  # Garantir que é string e sem espaços
-                "failure": str(failure_url).strip(),
-                "pending": str(pending_url).strip()
-            }
-            
-            # Validar novamente após criar o dicionário
-            if not back_urls.get("success") or not back_urls["success"].startswith('http'):
-                logger.error(f"❌ ERRO: back_urls.success inválida após criação: {back_urls.get('success')}")
-                raise ValueError(f"back_urls.success inválida: {back_urls.get('success')}")
-            
-            logger.debug(f"back_urls criado: success={back_urls['success'][:50]}...")
-            
-            # Verificar se back_urls.success está válida ANTES de criar preference_data
-            success_url_valid = (
-                back_urls.get("success") and 
-                isinstance(back_urls["success"], str) and
-                back_urls["success"].strip().startswith('http') and 
-                len(back_urls["success"].strip()) > 10
-            )
-            
-            if not success_url_valid:
-                logger.error(f"❌ ERRO: back_urls.success inválida antes de criar preference_data")
-                logger.error(f"   Tipo: {type(back_urls.get('success'))}, Valor: {repr(back_urls.get('success'))}")
-                raise ValueError(f"back_urls.success inválida: {back_urls.get('success')}")
-            
-            # Criar preference_data com TODOS os campos de uma vez
-            # O Mercado Pago pode estar validando a estrutura completa, então vamos incluir tudo junto
-            preference_data = {
-                "items": [
-                    {
-                        "title": f"Plano {plano.nome} - {plano.duracao_dias} dias",
-                        "quantity": 1,
-                        "unit_price": float(pedido.valor),
-                        "currency_id": "BRL"
-                    }
-                ],
-                "external_reference": str(pedido.id_publico),
-                "back_urls": {
-                    "success": str(back_urls["success"]).strip(),
-                    "failure": str(back_urls["failure"]).strip(),
-                    "pending": str(back_urls["pending"]).strip()
-                },
-                "notification_url": f"{base_url}/api/payments/mercadopago/webhook/",
-                "statement_descriptor": "ATHLETECH",
-                "binary_mode": False,  # False permite pagamentos pendentes (necessário para PIX e account_money)
-                "expires": False  # Não expirar a preferência
-            }
-            
-            # Adicionar auto_return apenas se NÃO for localhost
-            # O Mercado Pago pode não aceitar auto_return com URLs localhost
-            is_localhost = base_url.startswith('http://localhost') or base_url.startswith('http://127.0.0.1')
-            
-            if not is_localhost and success_url_valid:
-                preference_data["auto_return"] = "approved"
-                logger.info("✅ auto_return configurado para redirecionamento automático (não é localhost)")
-            else:
-                if is_localhost:
-                    logger.info("ℹ️ auto_return não configurado - localhost detectado (Mercado Pago pode não aceitar)")
-                else:
-                    logger.warning("⚠️ auto_return não configurado - success_url inválida")
-            
-            logger.debug(f"preference_data criado: auto_return={preference_data.get('auto_return', 'não configurado')}")
-            
-            # Configurar métodos de pagamento permitidos
-            # IMPORTANTE: account_money (saldo do Mercado Pago) deve estar sempre permitido
-            # Não excluir account_money explicitamente, pois ele é usado tanto para PIX quanto para saldo
-            
-            if is_test:
-                # Em modo TEST, permitir todos os métodos para facilitar testes
-                preference_data["payment_methods"] = {
-                    "excluded_payment_types": [],
-                    "excluded_payment_methods": [],
-                    "installments": 12
-                }
-            elif metodo_pagamento == 'pix':
-                # Para PIX, excluir outros métodos para forçar PIX
-                preference_data["payment_methods"] = {
-                    "excluded_payment_types": [
-                        {"id": "credit_card"},
-                        {"id": "debit_card"},
-                        {"id": "ticket"},
-                        {"id": "atm"},
-                        {"id": "prepaid_card"}
-                    ],
-                    "excluded_payment_methods": [],
-                    "installments": 1
-                }
-                # Adicionar dados do pagador para facilitar o checkout
-                preference_data["payer"] = {
-                    "email": usuario.email,
-                    "name": f"{usuario.first_name or ''} {usuario.last_name or ''}".strip() or "Cliente",
-                }
-            elif metodo_pagamento == 'cartao':
-                # Para cartão, permitir credit_card, debit_card e account_money (saldo)
-                preference_data["payment_methods"] = {
-                    "excluded_payment_types": [
-                        {"id": "ticket"}
-                    ],
-                    "excluded_payment_methods": [],
-                    "installments": 12
-                }
-            else:
-                # Permitir todos os métodos (incluindo account_money)
-                preference_data["payment_methods"] = {
-                    "excluded_payment_types": [],
-                    "excluded_payment_methods": [],
-                    "installments": 12
-                }
-            # Validar estrutura antes de enviar
-            if not preference_data.get('back_urls', {}).get('success'):
-                raise ValueError("back_urls.success não está definido ou está vazio")
-            
-            # Se auto_return estiver presente, garantir que success_url está válida
-            if 'auto_return' in preference_data:
-                success_url_final = preference_data.get('back_urls', {}).get('success', '')
-                if not success_url_final or not success_url_final.startswith('http') or len(success_url_final) < 10:
-                    del preference_data['auto_return']
-                    logger.warning("auto_return removido - success_url inválida")
+            preference_data = self.montar_preferencia(pedido, usuario, plano, metodo_pagamento)
             
             # Criar preferência
             try:
@@ -233,22 +285,9 @@ class MercadoPagoService:
                 pedido.save()
                 
                 # Retornar init_point (URL de redirecionamento)
-                init_point = preference.get("init_point", "")
-                sandbox_init_point = preference.get("sandbox_init_point", "")
-                
-                # Em modo TEST, SEMPRE usar sandbox_init_point
-                # Em modo PRODUÇÃO, SEMPRE usar init_point
-                # Isso evita o erro "Uma das partes é de teste"
-                if is_test:
-                    redirect_url = sandbox_init_point or init_point
-                    if not redirect_url:
-                        logger.error("Nenhum init_point disponível em modo TEST")
-                        return None
-                else:
-                    redirect_url = init_point or sandbox_init_point
-                    if not redirect_url:
-                        logger.error("Nenhum init_point disponível em modo PRODUÇÃO")
-                        return None
+                redirect_url = self.url_redirecionamento(preference)
+                if not redirect_url:
+                    return None
                 
                 return {
                     "preference_id": preference.get("id"),
@@ -0,0 +1,154 @@
+"""
+Cliente assíncrono do Mercado Pago e acesso ao banco fora do event loop (modo ASGI)
+As views de pagamento assíncronas esperam a API com httpx.AsyncClient: enquanto uma
+resposta não chega, o mesmo worker atende outras requisições. O ORM continua síncrono e
+roda via sync_to_async num pool limitado (PAGAMENTOS_ORM_THREADS), que também limita
+as conexões abertas com o banco.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, wraps
+import logging
+import weakref
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+from ..metricas import medir
+from .mercadopago import MercadoPagoService
+
+logger = logging.getLogger(__name__)
+
+# Um AsyncClient (pool de conexões keep-alive) por event loop; some junto com o loop
+_clientes = weakref.WeakKeyDictionary()
+
+
+@lru_cache(maxsize=None)
+def _executor(threads):
+    return ThreadPoolExecutor(max_workers=threads, thread_name_prefix='orm-pagamentos')
+
+
+def _com_conexoes_validas(func):
+    """Como request_started/request_finished: descarta conexões vencidas antes e depois"""
+    @wraps(func)
+    def executar(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return executar
+
+
+async def orm(func, *args, **kwargs):
+    """Executa func (acesso ao banco) no pool limitado; com PAGAMENTOS_ORM_THREADS=0 usa o thread do Django"""
+    threads = getattr(settings, 'PAGAMENTOS_ORM_THREADS', 8)
+    if not threads:
+        return await sync_to_async(func)(*args, **kwargs)
+    executar = sync_to_async(_com_conexoes_validas(func), thread_sensitive=False, executor=_executor(threads))
+    return await executar(*args, **kwargs)
+
+
+class MercadoPagoAsync(MercadoPagoService):
+    """
+    Mesmas consultas do MercadoPagoService, com os mesmos retornos, sem bloquear o event loop
+    O payload da preferência (montar_preferencia) e a escolha do init_point são herdados.
+    """
+
+    def __init__(self):
+        access_token = getattr(settings, 'MERCADOPAGO_ACCESS_TOKEN', None)
+        if not access_token:
+            raise ValueError("MERCADOPAGO_ACCESS_TOKEN não configurado nas settings")
+        self.access_token = access_token
+        self.use_mcp = False
+        self.sdk = None
+
+    def _cliente(self):
+        import httpx  # Só necessário no modo ASGI
+
+        loop = asyncio.get_running_loop()
+        cliente = _clientes.get(loop)
+        if cliente is None or cliente.is_closed:
+            cliente = httpx.AsyncClient(
+                base_url=getattr(settings, 'MERCADOPAGO_API_URL', 'https://api.mercadopago.com'),
+                timeout=httpx.Timeout(getattr(settings, 'MERCADOPAGO_TIMEOUT', 10), connect=5),
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+            )
+            _clientes[loop] = cliente
+        return cliente
+
+    async def _requisitar(self, metodo, caminho, **kwargs):
+        """(status HTTP, corpo JSON) da API; (None, None) em erro de rede ou timeout"""
+        import httpx
+
+        headers = {'Authorization': f'Bearer {self.access_token}', **kwargs.pop('headers', {})}
+        try:
+            with medir('mercadopago'):
+                resposta = await self._cliente().request(metodo, caminho, headers=headers, **kwargs)
+        except httpx.HTTPError as e:
+            logger.error(f"Erro de comunicação com o Mercado Pago ({metodo} {caminho}): {e!r}")
+            return None, None
+        try:
+            return resposta.status_code, resposta.json()
+        except ValueError:
+            return resposta.status_code, {}
+
+    async def consultar_pagamento(self, payment_id):
+        status_http, pagamento = await self._requisitar('GET', f'/v1/payments/{payment_id}')
+        if status_http == 200:
+            return pagamento
+        logger.error(f"Erro ao consultar pagamento {payment_id}: {status_http} {pagamento}")
+        return None
+
+    async def _buscar_pagamentos(self, filtros):
+        status_http, resultado = await self._requisitar('GET', '/v1/payments/search', params=filtros)
+        if status_http == 200:
+            pagamentos = resultado.get('results', [])
+            logger.info(f"Encontrados {len(pagamentos)} pagamento(s) para {filtros}")
+            return pagamentos
+        logger.error(f"Erro ao buscar pagamentos ({filtros}): {status_http} {resultado}")
+        return None
+
+    async def buscar_pagamentos_por_preference(self, preference_id):
+        return await self._buscar_pagamentos({'preference_id': preference_id})
+
+    async def buscar_pagamentos_por_external_reference(self, external_reference):
+        return await self._buscar_pagamentos({'external_reference': str(external_reference)})
+
+    async def consultar_assinatura(self, subscription_id):
+        status_http, assinatura = await self._requisitar('GET', f'/preapproval/{subscription_id}')
+        if status_http == 200:
+            return assinatura
+        logger.error(f"Erro ao consultar assinatura {subscription_id}: {status_http} {assinatura}")
+        return None
+
+    async def criar_checkout_preference(self, pedido, usuario, plano, metodo_pagamento='pix'):
+        """
+        Cria a preferência de checkout (Checkout Pro)
+        Diferente da versão síncrona, não grava o pedido: quem chama salva preference_id pelo orm().
+
+        Returns:
+            dict: preference_id, init_point (None se a API não devolveu URL) e status, ou None em caso de erro
+        """
+        try:
+            preference_data = self.montar_preferencia(pedido, usuario, plano, metodo_pagamento)
+        except ValueError as e:
+            logger.error(f"Exceção ao montar preferência: {str(e)}")
+            return None
+
+        status_http, preference = await self._requisitar(
+            'POST', '/checkout/preferences', json=preference_data,
+            # Repetir a chamada para o mesmo pedido não cria uma segunda preferência
+            headers={'X-Idempotency-Key': str(pedido.id_publico)},
+        )
+        if status_http != 201:
+            logger.error(f"Erro ao criar preferência: {status_http} {preference}")
+            return None
+
+        logger.info(f"Preferência criada - ID: {preference.get('id')}")
+        return {
+            "preference_id": preference.get("id"),
+            "init_point": self.url_redirecionamento(preference),
+            "status": "pending"
+        }
@@ -0,0 +1,388 @@
+"""
+Servidor local que imita a API do Mercado Pago (testes de carga e de falhas sem a API real)
+Implementa o que MercadoPagoService e MercadoPagoAsync usam: POST /checkout/preferences,
+POST e GET /v1/payments, GET /v1/payments/search e POST, GET e PUT /preapproval. O comprador
+é simulado por POST /__fake/preferences/<id>/pagar: o pagamento é criado e o webhook vai
+para a notification_url da preferência. Latência, taxa de erros 5xx e webhooks duplicados
+são configuráveis (ConfiguracaoFake, ou POST /__fake/configurar com o servidor no ar).
+
+Uso: python manage.py mercadopago_fake --porta 8001, com MERCADOPAGO_API_URL=http://127.0.0.1:8001
+no backend (vale para o SDK e para o cliente assíncrono).
+"""
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, fields
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import itertools
+import json
+import logging
+import random
+import re
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+from urllib.request import Request, urlopen
+import uuid
+
+logger = logging.getLogger(__name__)
+
+STATUS_DETALHE = {
+    'approved': 'accredited',
+    'pending': 'pending_waiting_transfer',
+    'rejected': 'cc_rejected_other_reason',
+    'cancelled': 'expired',
+    'expired': 'expired',
+}
+
+
+@dataclass
+class ConfiguracaoFake:
+    latencia: float = 0.0  # Segundos de espera em cada resposta da API
+    variacao: float = 0.0  # Acréscimo aleatório (0 a variacao segundos) sobre a latência
+    taxa_erros: float = 0.0  # Fração das chamadas da API respondidas com 500
+    taxa_webhook_duplicado: float = 0.0  # Fração dos webhooks entregues duas vezes
+    atraso_webhook: float = 0.0  # Segundos entre o pagamento e a entrega do webhook
+    aprovar_apos: float = None  # Paga cada preferência sozinho após N segundos (None = só via /__fake)
+    status_pagamento: str = 'approved'  # Status dos pagamentos criados sem status explícito
+
+    def atualizar(self, dados):
+        nomes = {campo.name for campo in fields(self)}
+        for nome, valor in dados.items():
+            if nome not in nomes:
+                raise ValueError(f'Opção desconhecida: {nome}')
+            setattr(self, nome, valor)
+
+
+def _agora():
+    return datetime.now(timezone.utc).isoformat(timespec='milliseconds')
+
+
+class EstadoFake:
+    """Preferências, pagamentos e assinaturas em memória, com índices para a busca"""
+
+    def __init__(self):
+        self.trava = threading.Lock()
+        self.ids = itertools.count(90_000_000_000)
+        self.preferencias = {}
+        self.idempotencia = {}
+        self.pagamentos = {}
+        self.pagamentos_por_preferencia = {}
+        self.pagamentos_por_referencia = {}
+        self.assinaturas = {}
+        self.contadores = dict.fromkeys((
+            'requisicoes', 'erros_injetados', 'preferencias', 'pagamentos',
+            'webhooks_enviados', 'webhooks_duplicados', 'webhooks_falhos',
+        ), 0)
+
+    def contar(self, chave, quantidade=1):
+        with self.trava:
+            self.contadores[chave] += quantidade
+
+    def registrar_pagamento(self, pagamento):
+        with self.trava:
+            self.pagamentos[pagamento['id']] = pagamento
+            self.contadores['pagamentos'] += 1
+            if pagamento.get('preference_id'):
+                self.pagamentos_por_preferencia.setdefault(pagamento['preference_id'], []).append(pagamento)
+            if pagamento.get('external_reference'):
+                self.pagamentos_por_referencia.setdefault(pagamento['external_reference'], []).append(pagamento)
+
+    def buscar_pagamentos(self, filtros):
+        with self.trava:
+            if filtros.get('preference_id'):
+                pagamentos = self.pagamentos_por_preferencia.get(filtros['preference_id'], [])
+            elif filtros.get('external_reference'):
+                pagamentos = self.pagamentos_por_referencia.get(filtros['external_reference'], [])
+            else:
+                pagamentos = list(self.pagamentos.values())
+            return [
+                pagamento for pagamento in pagamentos
+                if all(str(pagamento.get(chave)) == valor for chave, valor in filtros.items()
+                       if chave in ('status', 'external_reference', 'preference_id'))
+            ]
+
+
+class ServidorMercadoPagoFake(ThreadingHTTPServer):
+    """HTTP server com um thread por conexão; webhooks saem de um pool próprio"""
+    daemon_threads = True
+    request_queue_size = 2048  # Rajadas de milhares de checkouts simultâneos
+
+    def __init__(self, endereco=('127.0.0.1', 8001), configuracao=None):
+        super().__init__(endereco, ManipuladorMercadoPagoFake)
+        self.configuracao = configuracao or ConfiguracaoFake()
+        self.estado = EstadoFake()
+        self._webhooks = ThreadPoolExecutor(max_workers=32, thread_name_prefix='webhook-fake')
+
+    @property
+    def url(self):
+        host, porta = self.server_address[:2]
+        return f'http://{host}:{porta}'
+
+    def iniciar_em_thread(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True, name='mercadopago-fake')
+        thread.start()
+        return thread
+
+    def server_close(self):
+        super().server_close()
+        self._webhooks.shutdown(wait=False, cancel_futures=True)
+
+    # ---------- Simulação do comprador e do Mercado Pago ----------
+
+    def pagar_preferencia(self, preferencia, status=None):
+        status = status or self.configuracao.status_pagamento
+        pagamento = {
+            'id': next(self.estado.ids),
+            'status': status,
+            'status_detail': STATUS_DETALHE.get(status, status),
+            'external_reference': preferencia.get('external_reference'),
+            'preference_id': preferencia['id'],
+            'transaction_amount': sum(
+                item.get('unit_price', 0) * item.get('quantity', 1) for item in preferencia.get('items', [])
+            ),
+            'currency_id': 'BRL',
+            'payment_method_id': 'pix',
+            'payment_type_id': 'bank_transfer',
+            'date_created': _agora(),
+            'date_approved': _agora() if status == 'approved' else None,
+            'live_mode': False,
+        }
+        self.estado.registrar_pagamento(pagamento)
+        self.agendar_webhook(preferencia.get('notification_url'), 'payment', pagamento['id'])
+        return pagamento
+
+    def agendar_webhook(self, url, tipo, recurso_id):
+        if not url:
+            return
+        configuracao = self.configuracao
+        corpo = {
+            'id': next(self.estado.ids),
+            'live_mode': False,
+            'type': tipo,
+            'action': f'{tipo}.created' if tipo == 'payment' else f'{tipo}.updated',
+            'api_version': 'v1',
+            'date_created': _agora(),
+            'data': {'id': str(recurso_id)},
+        }
+        self._webhooks.submit(self._entregar_webhook, url, corpo, configuracao.atraso_webhook)
+        if random.random() < configuracao.taxa_webhook_duplicado:
+            # O Mercado Pago reenvia quando a resposta demora: a cópia pode chegar junto com a original
+            self.estado.contar('webhooks_duplicados')
+            self._webhooks.submit(
+                self._entregar_webhook, url, corpo, configuracao.atraso_webhook + random.uniform(0, 0.5),
+            )
+
+    def _entregar_webhook(self, url, corpo, atraso):
+        if atraso:
+            time.sleep(atraso)
+        requisicao = Request(
+            url, data=json.dumps(corpo).encode(), method='POST',
+            headers={'Content-Type': 'application/json', 'User-Agent': 'MercadoPago Feed v2.0 payment (fake)'},
+        )
+        try:
+            with urlopen(requisicao, timeout=30) as resposta:
+                resposta.read()
+            self.estado.contar('webhooks_enviados')
+        except OSError as e:  # HTTPError (4xx/5xx do backend) também é OSError
+            self.estado.contar('webhooks_falhos')
+            logger.warning(f'Webhook {corpo["type"]} {corpo["data"]["id"]} para {url} falhou: {e}')
+
+    def agendar_aprovacao(self, preferencia):
+        def aprovar(atraso):
+            time.sleep(atraso)
+            self.pagar_preferencia(preferencia)
+        self._webhooks.submit(aprovar, self.configuracao.aprovar_apos)
+
+
+class ManipuladorMercadoPagoFake(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, como a API real
+    server_version = 'MercadoPagoFake/1.0'
+
+    ROTAS = [
+        ('POST', re.compile(r'^/checkout/preferences/?$'), 'criar_preferencia'),
+        ('GET', re.compile(r'^/checkout/preferences/(?P<id>[^/]+)$'), 'consultar_preferencia'),
+        ('POST', re.compile(r'^/v1/payments/?$'), 'criar_pagamento'),
+        ('GET', re.compile(r'^/v1/payments/search/?$'), 'buscar_pagamentos'),
+        ('GET', re.compile(r'^/v1/payments/(?P<id>\d+)$'), 'consultar_pagamento'),
+        ('POST', re.compile(r'^/preapproval/?$'), 'criar_assinatura'),
+        ('GET', re.compile(r'^/preapproval/(?P<id>[^/]+)$'), 'consultar_assinatura'),
+        ('PUT', re.compile(r'^/preapproval/(?P<id>[^/]+)$'), 'atualizar_assinatura'),
+        # Controle (sem latência nem erros injetados)
+        ('POST', re.compile(r'^/__fake/preferences/(?P<id>[^/]+)/pagar$'), 'fake_pagar'),
+        ('POST', re.compile(r'^/__fake/preapproval/(?P<id>[^/]+)/status$'), 'fake_status_assinatura'),
+        ('POST', re.compile(r'^/__fake/configurar$'), 'fake_configurar'),
+        ('GET', re.compile(r'^/__fake/estado$'), 'fake_estado'),
+    ]
+
+    def do_GET(self):
+        self._despachar('GET')
+
+    def do_POST(self):
+        self._despachar('POST')
+
+    def do_PUT(self):
+        self._despachar('PUT')
+
+    def log_message(self, formato, *args):
+        logger.debug('%s - %s', self.address_string(), formato % args)
+
+    # ---------- Infraestrutura ----------
+
+    def _despachar(self, metodo):
+        partes = urlsplit(self.path)
+        self.parametros = {chave: valores[-1] for chave, valores in parse_qs(partes.query).items()}
+        tamanho = int(self.headers.get('Content-Length') or 0)
+        corpo = self.rfile.read(tamanho) if tamanho else b''
+        try:
+            self.dados = json.loads(corpo) if corpo else {}
+        except ValueError:
+            return self._responder(400, {'message': 'JSON inválido', 'error': 'bad_request', 'status': 400})
+
+        for metodo_rota, padrao, nome in self.ROTAS:
+            encontrado = padrao.match(partes.path)
+            if metodo_rota == metodo and encontrado:
+                break
+        else:
+            return self._responder(404, {'message': 'resource not found', 'error': 'not_found', 'status': 404})
+
+        servidor = self.server
+        if not nome.startswith('fake_'):
+            servidor.estado.contar('requisicoes')
+            configuracao = servidor.configuracao
+            if configuracao.latencia or configuracao.variacao:
+                time.sleep(configuracao.latencia + random.uniform(0, configuracao.variacao))
+            if not self.headers.get('Authorization', '').startswith('Bearer '):
+                return self._responder(401, {'message': 'invalid_token', 'error': 'unauthorized', 'status': 401})
+            if random.random() < configuracao.taxa_erros:
+                servidor.estado.contar('erros_injetados')
+                return self._responder(500, {'message': 'Internal server error (injetado)', 'error': 'internal_error', 'status': 500})
+        status, resposta = getattr(self, nome)(**encontrado.groupdict())
+        self._responder(status, resposta)
+
+    def _responder(self, status, dados):
+        corpo = json.dumps(dados).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def _base_url(self):
+        return f"http://{self.headers.get('Host') or '127.0.0.1'}"
+
+    @staticmethod
+    def _nao_encontrado(recurso):
+        return 404, {'message': f'{recurso} not found', 'error': 'not_found', 'status': 404}
+
+    # ---------- API ----------
+
+    def criar_preferencia(self):
+        estado = self.server.estado
+        chave = self.headers.get('X-Idempotency-Key')
+        with estado.trava:
+            if chave and chave in estado.idempotencia:
+                return 201, estado.preferencias[estado.idempotencia[chave]]
+        identificador = f'{random.randint(100_000_000, 999_999_999)}-{uuid.uuid4()}'
+        preferencia = {
+            **self.dados,
+            'id': identificador,
+            'collector_id': 123456789,
+            'date_created': _agora(),
+            'init_point': f'{self._base_url()}/checkout/v1/redirect?pref_id={identificador}',
+            'sandbox_init_point': f'{self._base_url()}/sandbox/checkout/v1/redirect?pref_id={identificador}',
+        }
+        with estado.trava:
+            estado.preferencias[identificador] = preferencia
+            estado.contadores['preferencias'] += 1
+            if chave:
+                estado.idempotencia[chave] = identificador
+        if self.server.configuracao.aprovar_apos is not None:
+            self.server.agendar_aprovacao(preferencia)
+        return 201, preferencia
+
+    def consultar_preferencia(self, id):
+        preferencia = self.server.estado.preferencias.get(id)
+        return (200, preferencia) if preferencia else self._nao_encontrado('Preference')
+
+    def criar_pagamento(self):
+        servidor = self.server
+        status = servidor.configuracao.status_pagamento
+        pagamento = {
+            **self.dados,
+            'id': next(servidor.estado.ids),
+            'status': status,
+            'status_detail': STATUS_DETALHE.get(status, status),
+            'date_created': _agora(),
+            'date_approved': _agora() if status == 'approved' else None,
+            'live_mode': False,
+        }
+        pagamento.pop('token', None)
+        servidor.estado.registrar_pagamento(pagamento)
+        servidor.agendar_webhook(self.dados.get('notification_url'), 'payment', pagamento['id'])
+        return 201, pagamento
+
+    def consultar_pagamento(self, id):
+        pagamento = self.server.estado.pagamentos.get(int(id))
+        return (200, pagamento) if pagamento else self._nao_encontrado('Payment')
+
+    def buscar_pagamentos(self):
+        resultados = self.server.estado.buscar_pagamentos(self.parametros)
+        limite = int(self.parametros.get('limit', 30))
+        inicio = int(self.parametros.get('offset', 0))
+        return 200, {
+            'paging': {'total': len(resultados), 'limit': limite, 'offset': inicio},
+            'results': resultados[inicio:inicio + limite],
+        }
+
+    def criar_assinatura(self):
+        estado = self.server.estado
+        identificador = uuid.uuid4().hex
+        assinatura = {
+            **self.dados,
+            'id': identificador,
+            'status': self.dados.get('status', 'pending'),
+            'date_created': _agora(),
+            'next_payment_date': (datetime.now(timezone.utc) + timedelta(days=30)).isoformat(),
+            'init_point': f'{self._base_url()}/subscriptions/checkout?preapproval_id={identificador}',
+        }
+        assinatura.pop('card_token_id', None)
+        with estado.trava:
+            estado.assinaturas[identificador] = assinatura
+        return 201, assinatura
+
+    def consultar_assinatura(self, id):
+        assinatura = self.server.estado.assinaturas.get(id)
+        return (200, assinatura) if assinatura else self._nao_encontrado('Preapproval')
+
+    def atualizar_assinatura(self, id):
+        assinatura = self.server.estado.assinaturas.get(id)
+        if not assinatura:
+            return self._nao_encontrado('Preapproval')
+        assinatura.update(self.dados, last_modified=_agora())
+        self.server.agendar_webhook(assinatura.get('notification_url'), 'preapproval', id)
+        return 200, assinatura
+
+    # ---------- Controle ----------
+
+    def fake_pagar(self, id):
+        preferencia = self.server.estado.preferencias.get(id)
+        if not preferencia:
+            return self._nao_encontrado('Preference')
+        return 201, self.server.pagar_preferencia(preferencia, self.dados.get('status'))
+
+    def fake_status_assinatura(self, id):
+        self.dados = {'status': self.dados.get('status', 'authorized')}
+        return self.atualizar_assinatura(id)
+
+    def fake_configurar(self):
+        try:
+            self.server.configuracao.atualizar(self.dados)
+        except ValueError as e:
+            return 400, {'message': str(e), 'error': 'bad_request', 'status': 400}
+        return 200, asdict(self.server.configuracao)
+
+    def fake_estado(self):
+        estado = self.server.estado
+        with estado.trava:
+            contadores = dict(estado.contadores)
+        return 200, {'configuracao': asdict(self.server.configuracao), 'contadores': contadores}
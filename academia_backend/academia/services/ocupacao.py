@@ -0,0 +1,82 @@
+"""
+Ocupação atual da academia (pessoas dentro agora)
+Contador mantido no cache: incrementado nas entradas, decrementado nas saídas
+e reconciliado periodicamente com a tabela Frequencia (comando reconciliar_ocupacao).
+Leituras usam o cache (a tabela só é consultada na partida a frio).
+"""
+import logging
+import time
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from ..models import Frequencia
+
+logger = logging.getLogger(__name__)
+
+CHAVE_OCUPACAO = 'frequencia:ocupacao'
+CHAVE_ATUALIZADO_EM = 'frequencia:ocupacao:atualizado_em'
+CHAVE_TRAVA_RECONCILIACAO = 'frequencia:ocupacao:reconciliando'
+# Quanto quem não pegou a trava espera a reconciliação em andamento antes de contar por conta própria
+ESPERA_RECONCILIACAO = 0.5
+
+
+def contar_visitas_abertas():
+    """Conta as visitas em aberto dentro da janela de visita (usa o índice parcial)"""
+    from .frequencia import JANELA_VISITA
+    return Frequencia.objects.filter(
+        data_saida__isnull=True,
+        data_entrada__gte=timezone.now() - JANELA_VISITA,
+        data_entrada__lte=timezone.now(),
+    ).count()
+
+
+def reconciliar_ocupacao():
+    """Recalcula o contador a partir da tabela e grava no cache. Retorna (anterior, atual)."""
+    anterior = cache.get(CHAVE_OCUPACAO)
+    atual = contar_visitas_abertas()
+    cache.set_many({CHAVE_OCUPACAO: atual, CHAVE_ATUALIZADO_EM: timezone.now().isoformat()}, timeout=None)
+    if anterior is not None and anterior != atual:
+        logger.info(f"Ocupação reconciliada: contador {anterior} -> {atual}")
+    return anterior, atual
+
+
+def ajustar_ocupacao(variacao):
+    """Aplica uma variação ao contador (chamado após gravar entradas/saídas)"""
+    if not variacao:
+        return
+    try:
+        valor = cache.incr(CHAVE_OCUPACAO, variacao)
+    except ValueError:
+        # Contador ainda não existe: a próxima leitura/reconciliação o inicializa
+        return
+    if valor < 0:
+        cache.set(CHAVE_OCUPACAO, 0, timeout=None)
+    cache.set(CHAVE_ATUALIZADO_EM, timezone.now().isoformat(), timeout=None)
+
+
+def obter_ocupacao():
+    """
+    Lê a ocupação do cache: {'ocupacao': int, 'atualizado_em': str}
+    Só consulta a tabela na partida a frio (cache vazio): uma requisição reconcilia, protegida
+    por trava; as concorrentes esperam o contador aparecer e, se ele demorar, contam direto na
+    tabela (sem gravar no cache) em vez de responder uma ocupação inventada.
+    """
+    valores = cache.get_many([CHAVE_OCUPACAO, CHAVE_ATUALIZADO_EM])
+    if CHAVE_OCUPACAO not in valores:
+        if cache.add(CHAVE_TRAVA_RECONCILIACAO, True, timeout=30):
+            try:
+                _, atual = reconciliar_ocupacao()
+            finally:
+                cache.delete(CHAVE_TRAVA_RECONCILIACAO)
+            return {'ocupacao': atual, 'atualizado_em': timezone.now().isoformat()}
+        limite = time.monotonic() + ESPERA_RECONCILIACAO
+        while CHAVE_OCUPACAO not in valores and time.monotonic() < limite:
+            time.sleep(0.05)
+            valores = cache.get_many([CHAVE_OCUPACAO, CHAVE_ATUALIZADO_EM])
+        if CHAVE_OCUPACAO not in valores:
+            return {'ocupacao': contar_visitas_abertas(), 'atualizado_em': timezone.now().isoformat()}
+    return {
+        'ocupacao': max(valores[CHAVE_OCUPACAO], 0),
+        'atualizado_em': valores.get(CHAVE_ATUALIZADO_EM),
+    }
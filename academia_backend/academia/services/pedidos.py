@@ -0,0 +1,125 @@
+"""
+Expiração e arquivamento de pedidos (comando `manutencao_pedidos`)
+- Pedidos pendentes mais antigos que PEDIDO_PENDENTE_TTL_HORAS passam a 'expirado'
+  (um webhook aprovado depois ainda os aprova normalmente).
+- Pedidos finalizados mais antigos que PEDIDOS_RETENCAO_DIAS são copiados para
+  PedidoArquivado e removidos de Pedido, em lotes curtos (INSERT + DELETE por transação).
+O progresso de cada etapa fica em cache (PROGRESSO_CHAVE) para acompanhar a execução.
+"""
+from datetime import timedelta
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import Pedido, PedidoArquivado
+
+logger = logging.getLogger(__name__)
+
+TAMANHO_LOTE = 1000
+PROGRESSO_CHAVE = 'pedidos:manutencao:progresso'
+CAMPOS_ARQUIVADOS = [f.attname for f in PedidoArquivado._meta.concrete_fields if f.attname != 'arquivado_em']
+
+
+def limite_pendentes(agora=None):
+    return (agora or timezone.now()) - timedelta(hours=getattr(settings, 'PEDIDO_PENDENTE_TTL_HORAS', 24))
+
+
+def limite_retencao(agora=None):
+    return (agora or timezone.now()) - timedelta(days=getattr(settings, 'PEDIDOS_RETENCAO_DIAS', 730))
+
+
+def pedidos_a_expirar(agora=None):
+    return Pedido.objects.filter(status=Pedido.STATUS_PENDENTE, criado_em__lt=limite_pendentes(agora))
+
+
+def pedidos_a_arquivar(agora=None):
+    # Assinaturas aprovadas continuam consultáveis/canceláveis pelo pedido: ficam na tabela
+    return (
+        Pedido.objects.filter(status__in=Pedido.STATUS_FINAIS, criado_em__lt=limite_retencao(agora))
+        .exclude(is_subscription=True, status=Pedido.STATUS_APROVADO)
+    )
+
+
+def obter_progresso():
+    """Último progresso registrado: {etapa: {processados, total, lotes, por_segundo, concluido, atualizado_em}}"""
+    return cache.get(PROGRESSO_CHAVE, {})
+
+
+def _processar_em_lotes(etapa, queryset, processar_ids, tamanho_lote, tempo_maximo, pausa, ao_progredir):
+    """
+    Seleciona lotes de ids (SKIP LOCKED) e chama processar_ids(ids) numa transação por lote,
+    até esgotar o queryset ou o tempo; registra o progresso a cada lote. Retorna (processados, concluido).
+    """
+    total = queryset.count()
+    inicio = time.monotonic()
+    limite = inicio + tempo_maximo if tempo_maximo else None
+    processados = lotes = 0
+    concluido = False
+
+    while True:
+        with transaction.atomic():
+            ids = list(
+                queryset.select_for_update(skip_locked=True).order_by('criado_em', 'id')
+                .values_list('id', flat=True)[:tamanho_lote]
+            )
+            if ids:
+                processar_ids(ids)
+        processados += len(ids)
+        lotes += bool(ids)
+        concluido = len(ids) < tamanho_lote
+
+        decorrido = time.monotonic() - inicio
+        progresso = {
+            'processados': processados,
+            'total': max(total, processados),
+            'lotes': lotes,
+            'por_segundo': round(processados / decorrido, 1) if decorrido else None,
+            'concluido': concluido,
+            'atualizado_em': timezone.now().isoformat(),
+        }
+        cache.set(PROGRESSO_CHAVE, {**obter_progresso(), etapa: progresso}, timeout=24 * 60 * 60)
+        if ao_progredir:
+            ao_progredir(etapa, progresso)
+
+        if concluido or (limite is not None and time.monotonic() >= limite):
+            break
+        if pausa:
+            time.sleep(pausa)  # Alivia o banco entre lotes quando o sistema está sob carga
+
+    if processados:
+        logger.info(f'Pedidos - {etapa}: {processados} em {lotes} lote(s)' + ('' if concluido else ' (interrompido)'))
+    return processados, concluido
+
+
+def expirar_pedidos_pendentes(tamanho_lote=TAMANHO_LOTE, tempo_maximo=None, pausa=0, ao_progredir=None):
+    """Marca como 'expirado' os pedidos pendentes mais antigos que o TTL do PIX/preferência"""
+    def expirar(ids):
+        Pedido.objects.filter(id__in=ids, status=Pedido.STATUS_PENDENTE).update(
+            status=Pedido.STATUS_EXPIRADO, atualizado_em=timezone.now()
+        )
+
+    return _processar_em_lotes(
+        'expiracao', pedidos_a_expirar(), expirar, tamanho_lote, tempo_maximo, pausa, ao_progredir
+    )
+
+
+def arquivar_pedidos(tamanho_lote=TAMANHO_LOTE, tempo_maximo=None, pausa=0, ao_progredir=None):
+    """Move pedidos finalizados além da retenção para PedidoArquivado (cópia + exclusão no mesmo lote)"""
+    def arquivar(ids):
+        agora = timezone.now()
+        PedidoArquivado.objects.bulk_create(
+            [
+                PedidoArquivado(arquivado_em=agora, **linha)
+                for linha in Pedido.objects.filter(id__in=ids).values(*CAMPOS_ARQUIVADOS)
+            ],
+            ignore_conflicts=True,
+        )
+        Pedido.objects.filter(id__in=ids).delete()
+
+    return _processar_em_lotes(
+        'arquivamento', pedidos_a_arquivar(), arquivar, tamanho_lote, tempo_maximo, pausa, ao_progredir
+    )
@@ -0,0 +1,182 @@
+"""
+Progresso das avaliações físicas (série temporal por aluno)
+Todas as avaliações dos alunos pedidos são carregadas numa consulta e processadas
+de uma vez com NumPy: variações entre avaliações, médias móveis e inclinação da
+tendência (regressão linear) por aluno e métrica, sem laço por aluno.
+O resultado fica em cache até a próxima avaliação ser salva ou excluída.
+"""
+import hashlib
+import logging
+
+import numpy as np
+from django.core.cache import cache
+
+from ..models import Avaliacao, Usuario
+
+logger = logging.getLogger(__name__)
+
+METRICAS = (
+    'peso', 'percentual_gordura', 'massa_muscular', 'imc',
+    'perimetro_peito', 'perimetro_cintura', 'perimetro_quadril', 'perimetro_braco', 'perimetro_coxa',
+)
+# Avaliações consideradas na média móvel
+JANELA_MEDIA_MOVEL = 3
+# A inclinação é expressa em unidades da métrica a cada 30 dias
+DIAS_TENDENCIA = 30
+
+CHAVE_VERSAO = 'avaliacoes:progresso:versao'
+CACHE_TIMEOUT = 24 * 60 * 60
+
+
+def invalidar_progresso():
+    """Chamado quando uma avaliação é salva/excluída: muda a versão usada nas chaves de cache"""
+    try:
+        cache.incr(CHAVE_VERSAO)
+    except ValueError:
+        cache.set(CHAVE_VERSAO, 1, timeout=None)
+
+
+def _versao():
+    versao = cache.get(CHAVE_VERSAO)
+    if versao is None:
+        cache.add(CHAVE_VERSAO, 1, timeout=None)
+        versao = cache.get(CHAVE_VERSAO, 1)
+    return versao
+
+
+def _float(valor):
+    return np.nan if valor is None else float(valor)
+
+
+def _arredondar(matriz, casas=2):
+    """Converte para listas JSON trocando NaN por None"""
+    arredondada = np.round(matriz, casas).astype(object)
+    arredondada[np.isnan(matriz)] = None
+    return arredondada.tolist()
+
+
+def calcular_progresso(usuarios_ids, incluir_series=False):
+    """
+    Calcula o progresso de vários alunos numa passada.
+    Retorna uma lista (na ordem de usuarios_ids, só alunos com avaliações) com, por métrica:
+    valor inicial e atual, variação total e tendência a cada 30 dias.
+    incluir_series: adiciona a série completa (valores, variação e média móvel por avaliação).
+    """
+    linhas = list(
+        Avaliacao.objects.filter(usuario_id__in=usuarios_ids)
+        .order_by('usuario_id', 'data_avaliacao', 'id')
+        .values_list('usuario_id', 'data_avaliacao', *METRICAS)
+    )
+    if not linhas:
+        return []
+
+    usuarios = np.fromiter((l[0] for l in linhas), dtype=np.int64, count=len(linhas))
+    dias = np.fromiter((l[1].toordinal() for l in linhas), dtype=np.float64, count=len(linhas))
+    valores = np.array([[_float(v) for v in l[2:]] for l in linhas], dtype=np.float64)
+    validos = ~np.isnan(valores)
+    n = len(linhas)
+
+    # Início de cada grupo (aluno) e, para cada linha, o início do seu grupo
+    inicios = np.flatnonzero(np.r_[True, usuarios[1:] != usuarios[:-1]])
+    grupo = np.repeat(np.arange(len(inicios)), np.diff(np.r_[inicios, n]))
+    inicio_da_linha = inicios[grupo]
+    indices = np.arange(n)
+
+    # Variação em relação à avaliação anterior do mesmo aluno
+    variacoes = np.full_like(valores, np.nan)
+    variacoes[1:] = valores[1:] - valores[:-1]
+    variacoes[inicios] = np.nan
+
+    # Média móvel das últimas JANELA_MEDIA_MOVEL avaliações (sem cruzar alunos, ignorando vazios)
+    somas = np.vstack([np.zeros(valores.shape[1]), np.cumsum(np.where(validos, valores, 0.0), axis=0)])
+    contagens = np.vstack([np.zeros(valores.shape[1]), np.cumsum(validos, axis=0)])
+    limite = np.maximum(indices - JANELA_MEDIA_MOVEL + 1, inicio_da_linha)
+    soma_janela = somas[indices + 1] - somas[limite]
+    contagem_janela = contagens[indices + 1] - contagens[limite]
+    medias_moveis = np.divide(
+        soma_janela, contagem_janela, out=np.full_like(valores, np.nan), where=contagem_janela > 0
+    )
+
+    # Primeiro e último valor válido de cada aluno por métrica
+    primeiro = np.minimum.reduceat(np.where(validos, indices[:, None], n), inicios, axis=0)
+    ultimo = np.maximum.reduceat(np.where(validos, indices[:, None], -1), inicios, axis=0)
+    tem_valor = ultimo >= 0
+    colunas = np.arange(valores.shape[1])
+    inicial = np.where(tem_valor, valores[np.minimum(primeiro, n - 1), colunas], np.nan)
+    atual = np.where(tem_valor, valores[np.maximum(ultimo, 0), colunas], np.nan)
+
+    # Inclinação por mínimos quadrados (x em dias desde a primeira avaliação do aluno)
+    x = np.where(validos, (dias - dias[inicio_da_linha])[:, None], 0.0)
+    y = np.where(validos, valores, 0.0)
+    qtd = np.add.reduceat(validos.astype(np.float64), inicios, axis=0)
+    sx = np.add.reduceat(x, inicios, axis=0)
+    sy = np.add.reduceat(y, inicios, axis=0)
+    sxx = np.add.reduceat(x * x, inicios, axis=0)
+    sxy = np.add.reduceat(x * y, inicios, axis=0)
+    denominador = qtd * sxx - sx * sx
+    inclinacao = np.divide(
+        qtd * sxy - sx * sy, denominador,
+        out=np.full_like(denominador, np.nan), where=(qtd >= 2) & (denominador > 0),
+    ) * DIAS_TENDENCIA
+
+    variacao_total = atual - inicial
+    inicial, atual, variacao_total, inclinacao = (
+        _arredondar(m) for m in (inicial, atual, variacao_total, inclinacao)
+    )
+    if incluir_series:
+        valores_l, variacoes_l, medias_l = (_arredondar(m) for m in (valores, variacoes, medias_moveis))
+
+    por_usuario = {}
+    fins = np.r_[inicios[1:], n]
+    for g, (ini, fim) in enumerate(zip(inicios.tolist(), fins.tolist())):
+        usuario_id = int(usuarios[ini])
+        resumo = {
+            'usuario': usuario_id,
+            'avaliacoes': fim - ini,
+            'primeira_avaliacao': linhas[ini][1],
+            'ultima_avaliacao': linhas[fim - 1][1],
+            'metricas': {
+                metrica: {
+                    'inicial': inicial[g][m],
+                    'atual': atual[g][m],
+                    'variacao': variacao_total[g][m],
+                    'tendencia_30_dias': inclinacao[g][m],
+                }
+                for m, metrica in enumerate(METRICAS)
+            },
+        }
+        if incluir_series:
+            resumo['serie'] = [
+                {
+                    'data': linhas[i][1],
+                    'valores': dict(zip(METRICAS, valores_l[i])),
+                    'variacao': dict(zip(METRICAS, variacoes_l[i])),
+                    'media_movel': dict(zip(METRICAS, medias_l[i])),
+                }
+                for i in range(ini, fim)
+            ]
+        por_usuario[usuario_id] = resumo
+
+    nomes = {
+        u['id']: (f"{u['first_name']} {u['last_name']}".strip() or u['username'])
+        for u in Usuario.objects.filter(id__in=por_usuario.keys()).values('id', 'first_name', 'last_name', 'username')
+    }
+    resultado = []
+    for usuario_id in usuarios_ids:
+        resumo = por_usuario.get(usuario_id)
+        if resumo is not None:
+            resumo['usuario_nome'] = nomes.get(usuario_id, '')
+            resultado.append(resumo)
+    return resultado
+
+
+def obter_progresso(usuarios_ids, incluir_series=False):
+    """Progresso dos alunos, lido do cache enquanto nenhuma avaliação mudar"""
+    ids = ','.join(map(str, usuarios_ids))
+    assinatura = hashlib.sha1(f'{ids}|{int(incluir_series)}'.encode()).hexdigest()
+    chave = f'avaliacoes:progresso:{_versao()}:{assinatura}'
+    resultado = cache.get(chave)
+    if resultado is None:
+        resultado = calcular_progresso(usuarios_ids, incluir_series=incluir_series)
+        cache.set(chave, resultado, timeout=CACHE_TIMEOUT)
+    return resultado
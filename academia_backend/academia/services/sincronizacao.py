@@ -0,0 +1,100 @@
+"""
+Sincronização incremental para clientes móveis/offline (GET /api/sync/?since=<token>)
+Devolve só as linhas criadas/alteradas (updated_at) e as exclusões (RegistroExclusao)
+desde o token anterior, mais um novo token.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+import logging
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from ..models import RegistroExclusao, Usuario
+from ..signals import MODELOS_SINCRONIZADOS
+
+logger = logging.getLogger(__name__)
+
+# O novo token recua um pouco para cobrir transações que ainda não tinham sido confirmadas
+# (linhas repetidas na próxima sincronização são inofensivas: o cliente faz upsert por id)
+MARGEM_TOKEN = timedelta(seconds=5)
+
+
+class TokenInvalido(ValueError):
+    """Token de sincronização malformado"""
+
+
+def gerar_token(momento):
+    return str(int(momento.timestamp() * 1_000_000))
+
+
+def ler_token(token):
+    try:
+        microssegundos = int(token)
+    except (TypeError, ValueError):
+        raise TokenInvalido('Token de sincronização inválido.')
+    if microssegundos < 0:
+        raise TokenInvalido('Token de sincronização inválido.')
+    try:
+        return datetime.fromtimestamp(microssegundos / 1_000_000, tz=dt_timezone.utc)
+    except (ValueError, OverflowError, OSError):
+        # Fora do intervalo de datas suportado (ex.: since=10**20)
+        raise TokenInvalido('Token de sincronização inválido.')
+
+
+def _retencao_exclusoes():
+    return timedelta(days=getattr(settings, 'SYNC_RETENCAO_EXCLUSOES_DIAS', 90))
+
+
+def _querysets(usuario):
+    """Linhas visíveis para o usuário: professores/admins veem tudo; alunos, só o que é seu"""
+    equipe = usuario.is_superuser or usuario.get_effective_role() in (Usuario.Role.ADMIN, Usuario.Role.PROFESSOR)
+    querysets = {tipo: modelo.objects.all() for tipo, modelo in MODELOS_SINCRONIZADOS.items()}
+    if not equipe:
+        querysets['treinos'] = querysets['treinos'].filter(usuario=usuario)
+        querysets['treino_exercicios'] = querysets['treino_exercicios'].filter(treino__usuario=usuario)
+        querysets['avaliacoes'] = querysets['avaliacoes'].filter(usuario=usuario)
+        querysets['matriculas'] = querysets['matriculas'].filter(usuario=usuario)
+    return querysets, equipe
+
+
+def sincronizar(usuario, desde=None):
+    """
+    Monta a resposta da sincronização.
+    desde=None (ou anterior à retenção das marcas de exclusão) devolve tudo com completo=True:
+    o cliente deve descartar a cópia local.
+    """
+    agora = timezone.now()
+    completo = desde is None or desde < agora - _retencao_exclusoes()
+    querysets, equipe = _querysets(usuario)
+
+    dados = {}
+    for tipo, queryset in querysets.items():
+        campos = [campo.attname for campo in queryset.model._meta.concrete_fields]
+        if completo:
+            if tipo == 'exercicios':
+                queryset = queryset.filter(ativo=True)
+        else:
+            queryset = queryset.filter(updated_at__gte=desde)
+        dados[tipo] = list(queryset.order_by('updated_at', 'id').values(*campos))
+
+    excluidos = {tipo: [] for tipo in MODELOS_SINCRONIZADOS}
+    if not completo:
+        marcas = RegistroExclusao.objects.filter(excluido_em__gte=desde, tipo__in=excluidos.keys())
+        if not equipe:
+            marcas = marcas.filter(Q(dono_id=usuario.id) | Q(dono_id__isnull=True))
+        for tipo, objeto_id in marcas.values_list('tipo', 'objeto_id'):
+            excluidos[tipo].append(objeto_id)
+
+    return {
+        'token': gerar_token(agora - MARGEM_TOKEN),
+        'completo': completo,
+        'dados': dados,
+        'excluidos': excluidos,
+    }
+
+
+def limpar_exclusoes_antigas():
+    """Remove marcas de exclusão além da retenção (clientes mais antigos recebem sincronização completa)"""
+    removidas, _ = RegistroExclusao.objects.filter(excluido_em__lt=timezone.now() - _retencao_exclusoes()).delete()
+    return removidas
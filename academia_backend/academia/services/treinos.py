@@ -0,0 +1,57 @@
+"""
+Atribuição de modelos de treino a vários alunos
+Todos os Treino e TreinoExercicio são materializados com dois bulk_create numa transação.
+"""
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import Treino, TreinoExercicio, TreinoModeloExercicio
+
+logger = logging.getLogger(__name__)
+
+TAMANHO_LOTE = 1000
+
+
+@transaction.atomic
+def atribuir_modelo(modelo, alunos_ids, nome=None, desativar_anteriores=False):
+    """
+    Cria um Treino (com os exercícios do modelo) para cada aluno.
+    desativar_anteriores: desativa os treinos ativos que os alunos já tinham deste mesmo modelo.
+    Retorna a lista de treinos criados.
+    """
+    exercicios = list(TreinoModeloExercicio.objects.filter(modelo=modelo).order_by('ordem', 'id'))
+
+    if desativar_anteriores:
+        Treino.objects.filter(modelo=modelo, usuario_id__in=alunos_ids, ativo=True).update(
+            ativo=False, updated_at=timezone.now()
+        )
+
+    treinos = Treino.objects.bulk_create(
+        [
+            Treino(usuario_id=aluno_id, modelo=modelo, nome=nome or modelo.nome, descricao=modelo.descricao)
+            for aluno_id in alunos_ids
+        ],
+        batch_size=TAMANHO_LOTE,
+    )
+    TreinoExercicio.objects.bulk_create(
+        [
+            TreinoExercicio(
+                treino=treino,
+                exercicio_id=item.exercicio_id,
+                series=item.series,
+                repeticoes=item.repeticoes,
+                peso=item.peso,
+                tempo_descanso=item.tempo_descanso,
+                observacoes=item.observacoes,
+                ordem=item.ordem,
+            )
+            for treino in treinos
+            for item in exercicios
+        ],
+        batch_size=TAMANHO_LOTE,
+    )
+
+    logger.info(f"Modelo de treino '{modelo}' atribuído a {len(treinos)} aluno(s)")
+    return treinos
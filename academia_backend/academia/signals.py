@@ -0,0 +1,163 @@
+"""
+Sinais do app academia
+- Exclusões dos modelos sincronizados geram uma marca (RegistroExclusao) para o /api/sync/,
+  gravadas em lote na própria transação da exclusão
+- Avaliações salvas/excluídas invalidam o cache de progresso
+- Frequências salvas/excluídas pelo ORM (admin, shell) recalculam a consolidação do dia
+- Usuários salvos/excluídos invalidam o usuário em cache das sessões (academia.autenticacao)
+"""
+from functools import partial
+import threading
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.utils import timezone
+
+from .autenticacao import invalidar_usuario
+from .models import (
+    Avaliacao, Exercicio, Frequencia, Matricula, RegistroExclusao, Treino, TreinoExercicio, Usuario,
+)
+from .services.frequencia_diaria import recalcular_dias
+from .services.progresso import invalidar_progresso
+
+# tipo da marca de exclusão -> modelo (mesmos nomes das chaves da resposta do /api/sync/)
+MODELOS_SINCRONIZADOS = {
+    'treinos': Treino,
+    'treino_exercicios': TreinoExercicio,
+    'exercicios': Exercicio,
+    'avaliacoes': Avaliacao,
+    'matriculas': Matricula,
+}
+TIPOS_POR_MODELO = {modelo: tipo for tipo, modelo in MODELOS_SINCRONIZADOS.items()}
+
+# Estado pendente dos sinais (exclusão em andamento, dias a recalcular), por thread e conexão
+_estado = threading.local()
+
+
+# Marcas da exclusão em andamento. O Collector envia todos os pre_delete antes do primeiro DELETE
+# e os post_delete depois, dentro do mesmo atomic (com o mesmo `origin`): o pre_delete monta as
+# marcas e o último post_delete esperado grava todas num único INSERT, ainda na transação que
+# exclui as linhas (um rollback desfaz as duas coisas juntas)
+class _ExclusaoEmAndamento:
+    def __init__(self, origin):
+        self.origin = origin
+        self.marcas = {}  # (modelo, pk) -> RegistroExclusao
+        self.esperados = set()
+        self.donos_treinos = {}  # treino_id -> usuario_id dos treinos excluídos junto
+        self.excluindo = False
+
+    def adicionar(self, modelo, instance):
+        if modelo is Treino:
+            self.donos_treinos[instance.pk] = instance.usuario_id
+        # Para itens de treino dono_id guarda o treino_id até a gravação
+        dono_id = instance.treino_id if modelo is TreinoExercicio else getattr(instance, 'usuario_id', None)
+        chave = (modelo, instance.pk)
+        self.marcas[chave] = RegistroExclusao(tipo=TIPOS_POR_MODELO[modelo], objeto_id=instance.pk, dono_id=dono_id)
+        self.esperados.add(chave)
+
+    def gravar(self):
+        # Treinos fora desta exclusão (item excluído sozinho) ainda existem: consultados de uma vez
+        itens = [marca for (modelo, _), marca in self.marcas.items() if modelo is TreinoExercicio]
+        faltando = {marca.dono_id for marca in itens} - self.donos_treinos.keys()
+        if faltando:
+            self.donos_treinos.update(Treino.objects.filter(pk__in=faltando).values_list('id', 'usuario_id'))
+        for marca in itens:
+            marca.dono_id = self.donos_treinos.get(marca.dono_id)
+        RegistroExclusao.objects.bulk_create(self.marcas.values(), batch_size=500)
+
+
+def _exclusoes():
+    if not hasattr(_estado, 'exclusoes'):
+        _estado.exclusoes = {}
+    return _estado.exclusoes
+
+
+def preparar_exclusao(sender, instance, using, origin=None, **kwargs):
+    exclusoes = _exclusoes()
+    atual = exclusoes.get(using)
+    # Outra exclusão, ou a mesma repetida depois de falhar no meio (a anterior foi desfeita)
+    if atual is None or atual.origin is not origin or atual.excluindo or (sender, instance.pk) in atual.marcas:
+        atual = exclusoes[using] = _ExclusaoEmAndamento(origin)
+    atual.adicionar(sender, instance)
+
+
+def registrar_exclusao(sender, instance, using, origin=None, **kwargs):
+    exclusoes = _exclusoes()
+    atual = exclusoes.get(using)
+    chave = (sender, instance.pk)  # O Collector só zera o pk depois de todos os post_delete
+    if atual is None or atual.origin is not origin or chave not in atual.esperados:
+        # post_delete sem o pre_delete correspondente: grava só esta marca
+        avulsa = _ExclusaoEmAndamento(origin)
+        avulsa.adicionar(sender, instance)
+        avulsa.gravar()
+        return
+    atual.excluindo = True
+    atual.esperados.discard(chave)
+    if not atual.esperados:
+        del exclusoes[using]
+        atual.gravar()
+
+
+# Conectado só aos modelos sincronizados: os demais continuam com o DELETE rápido (sem carregar as linhas)
+for _modelo in MODELOS_SINCRONIZADOS.values():
+    pre_delete.connect(preparar_exclusao, sender=_modelo, dispatch_uid=f'academia_exclusao_pre_{_modelo.__name__}')
+    post_delete.connect(registrar_exclusao, sender=_modelo, dispatch_uid=f'academia_exclusao_{_modelo.__name__}')
+
+
+def avaliacao_alterada(sender, instance, **kwargs):
+    # Só após o commit: antes disso outra requisição recalcularia com os dados antigos
+    transaction.on_commit(invalidar_progresso)
+
+
+post_save.connect(avaliacao_alterada, sender=Avaliacao, dispatch_uid='academia_progresso_save')
+post_delete.connect(avaliacao_alterada, sender=Avaliacao, dispatch_uid='academia_progresso_delete')
+
+
+# O registro em lote da catraca (services/frequencia.py) grava com SQL direto e já soma os
+# incrementos: estes sinais só cobrem save()/delete() de instâncias. Os dias afetados são
+# acumulados por thread e conexão e recalculados juntos após o commit (uma exclusão em cascata
+# vira poucas consultas)
+def _dias_pendentes():
+    if not hasattr(_estado, 'dias'):
+        _estado.dias = {}
+    return _estado.dias
+
+
+def _recalcular_dias_pendentes(using):
+    pares = _dias_pendentes().pop(using, None)
+    if pares:
+        recalcular_dias(pares)
+
+
+def _marcar_dia(using, usuario_id, data_entrada):
+    _dias_pendentes().setdefault(using, set()).add((usuario_id, timezone.localdate(data_entrada)))
+    # Todos os agendamentos esvaziam o mesmo conjunto: só o primeiro a rodar recalcula. Agendar a
+    # cada marcação mantém as seguintes se o savepoint do primeiro agendamento for desfeito; pares de
+    # uma transação desfeita são recalculados no próximo commit, o que é inofensivo
+    transaction.on_commit(partial(_recalcular_dias_pendentes, using), using=using)
+
+
+def frequencia_antes_de_salvar(sender, instance, using, **kwargs):
+    # Mudança de dia/usuário numa edição: o dia antigo também precisa ser recalculado
+    if instance.pk:
+        anterior = Frequencia.objects.using(using).filter(pk=instance.pk).values_list('usuario_id', 'data_entrada').first()
+        if anterior:
+            _marcar_dia(using, *anterior)
+
+
+def frequencia_alterada(sender, instance, using, **kwargs):
+    _marcar_dia(using, instance.usuario_id, instance.data_entrada)
+
+
+pre_save.connect(frequencia_antes_de_salvar, sender=Frequencia, dispatch_uid='academia_frequencia_pre_save')
+post_save.connect(frequencia_alterada, sender=Frequencia, dispatch_uid='academia_frequencia_diaria_save')
+post_delete.connect(frequencia_alterada, sender=Frequencia, dispatch_uid='academia_frequencia_diaria_delete')
+
+
+def usuario_alterado(sender, instance, **kwargs):
+    usuario_id = instance.pk  # Após o delete() o pk da instância vira None
+    transaction.on_commit(lambda: invalidar_usuario(usuario_id))
+
+
+post_save.connect(usuario_alterado, sender=Usuario, dispatch_uid='academia_usuario_cache_save')
+post_delete.connect(usuario_alterado, sender=Usuario, dispatch_uid='academia_usuario_cache_delete')
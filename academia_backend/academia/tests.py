@@ -1,11 +1,14 @@
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
 from django.contrib.auth import get_user_model
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
-from .models import Plano, Matricula, Exercicio, Treino, Avaliacao, Frequencia
+from .consultas import OrcamentoConsultasMixin
+from .models import Plano, Matricula, Exercicio, Treino, TreinoExercicio, Avaliacao, Frequencia, FrequenciaDiaria
 from datetime import date, datetime, timedelta
 from decimal import Decimal
+import json
 
 User = get_user_model()
 
@@ -190,3 +193,1657 @@ class ViewTest(TestCase):
         })
         # Deve redirecionar após login bem-sucedido
         self.assertEqual(response.status_code, 302)
+
+class BuscaUsuarioTest(APITestCase):
+    """Testes para a busca indexada de usuários"""
+    
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username='admin', email='admin@example.com', password='testpass123', role='admin'
+        )
+        self.joao = User.objects.create_user(
+            username='joao', email='joao.silva@example.com', password='testpass123',
+            first_name='João', last_name='Silva'
+        )
+        User.objects.create_user(
+            username='maria', email='maria@example.com', password='testpass123',
+            first_name='Maria', last_name='Conceição'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+    
+    def test_busca_ignora_acentos(self):
+        """Testa que a busca encontra nomes acentuados sem acento no termo"""
+        response = self.client.get('/api/usuarios/buscar/', {'q': 'joao sil'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['id'] for r in response.data['results']], [self.joao.id])
+        
+        response = self.client.get('/api/usuarios/', {'search': 'CONCEICAO'})
+        self.assertEqual(len(response.data['results']), 1)
+    
+    def test_busca_reflete_alteracao_de_nome(self):
+        """Testa que o índice acompanha alterações no usuário"""
+        self.joao.first_name = 'Joaquim'
+        self.joao.save()
+        response = self.client.get('/api/usuarios/buscar/', {'q': 'joaquim'})
+        self.assertEqual(len(response.data['results']), 1)
+    
+    def test_avaliacao_por_nome_exige_aluno_unico_com_nome_exato(self):
+        """Testa que a avaliação por nome não cai num aluno parecido, num professor ou num homônimo"""
+        User.objects.create_user(username='mariana', email='mariana@example.com', first_name='Mariana', last_name='Silva')
+        User.objects.create_user(username='prof', email='prof@example.com', first_name='Ana', last_name='Souza', role='professor')
+        dados = {'data_avaliacao': '2024-05-01', 'peso': '70', 'altura': '175'}
+        
+        response = self.client.post('/api/avaliacoes/', {**dados, 'usuario_nome': 'Ana Souza'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post('/api/avaliacoes/', {**dados, 'usuario_nome': 'Silva'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        
+        response = self.client.post('/api/avaliacoes/', {**dados, 'usuario_nome': 'joao silva'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Avaliacao.objects.get().usuario, self.joao)
+        
+        User.objects.create_user(username='joao2', email='joao2@example.com', first_name='Joao', last_name='Silva')
+        response = self.client.post('/api/avaliacoes/', {**dados, 'usuario_nome': 'João Silva'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('usuario_nome', response.data)
+
+class FrequenciaCheckinTest(APITestCase):
+    """Testes para o registro de frequência (checkin e lote NDJSON)"""
+    
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username='admin', email='admin@example.com', password='testpass123', role='admin'
+        )
+        self.aluno = User.objects.create_user(
+            username='aluno', email='aluno@example.com', password='testpass123'
+        )
+        self.client = APIClient()
+    
+    def test_aluno_registra_entrada_e_saida(self):
+        """Testa checkin e checkout do próprio aluno"""
+        self.client.force_authenticate(self.aluno)
+        response = self.client.post('/api/frequencia/checkin/', {'tipo': 'entrada'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.post('/api/frequencia/checkin/', {'tipo': 'saida'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(Frequencia.objects.filter(usuario=self.aluno, data_saida__isnull=True).exists())
+    
+    def test_horario_do_checkin(self):
+        """Testa que o aluno não escolhe horário nem evento_id e que a equipe fica presa à janela de visita"""
+        self.client.force_authenticate(self.aluno)
+        ontem = timezone.now() - timedelta(days=1)
+        response = self.client.post('/api/frequencia/checkin/', {
+            'tipo': 'entrada', 'data_hora': ontem.isoformat(), 'evento_id': 'meu-id',
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        frequencia = Frequencia.objects.get(usuario=self.aluno)
+        self.assertLess(timezone.now() - frequencia.data_entrada, timedelta(minutes=1))
+        self.assertIsNone(frequencia.evento_id)
+        
+        self.client.force_authenticate(self.admin)
+        for data_hora in (timezone.now() + timedelta(hours=1), timezone.now() - timedelta(hours=17)):
+            response = self.client.post('/api/frequencia/checkin/', {
+                'usuario': self.aluno.id, 'tipo': 'saida', 'data_hora': data_hora.isoformat(),
+            }, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Frequencia.objects.filter(data_saida__isnull=True).count(), 1)
+    
+    def test_saida_fecha_so_a_entrada_aberta_mais_recente(self):
+        """Testa que uma saída fecha uma única visita e que os totais contam só o que foi gravado"""
+        from .services.frequencia import _inserir_entradas, processar_eventos, validar_evento
+        
+        def evento(tipo, horario, evento_id):
+            return validar_evento({'usuario': self.aluno.id, 'tipo': tipo, 'evento_id': evento_id,
+                                   'data_hora': f'2026-01-05T{horario}:00-03:00'})[0]
+        
+        resumo = processar_eventos([evento('entrada', '07:00', 'e1'), evento('entrada', '09:00', 'e2')])
+        self.assertEqual(resumo['entradas_registradas'], 2)
+        resumo = processar_eventos([evento('saida', '10:00', 's1'), evento('entrada', '11:00', 'e1')])
+        self.assertEqual(resumo['saidas_registradas'], 1)
+        self.assertEqual(resumo['entradas_registradas'], 0)
+        self.assertEqual(resumo['duplicados'], 1)
+        abertas = Frequencia.objects.filter(data_saida__isnull=True)
+        self.assertEqual([f.evento_id for f in abertas], ['e1'])
+        diaria = FrequenciaDiaria.objects.get(usuario=self.aluno)
+        self.assertEqual((diaria.visitas, diaria.segundos_permanencia), (2, 3600))
+        # Evento gravado por um lote concorrente entre a verificação e o INSERT
+        self.assertEqual(_inserir_entradas([evento('entrada', '12:00', 'e2')]), [])
+    
+    def test_aluno_nao_registra_outro_usuario(self):
+        """Testa que aluno não pode registrar frequência de terceiros"""
+        self.client.force_authenticate(self.aluno)
+        response = self.client.post('/api/frequencia/checkin/', {'usuario': self.admin.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+    
+    def test_lote_ndjson_idempotente(self):
+        """Testa que reenvios do mesmo evento_id não duplicam registros"""
+        self.client.force_authenticate(self.admin)
+        linhas = [
+            {'evento_id': 'c1-1', 'usuario': self.aluno.id, 'tipo': 'entrada', 'data_hora': '2026-01-05T07:00:00-03:00'},
+            {'evento_id': 'c1-1', 'usuario': self.aluno.id, 'tipo': 'entrada', 'data_hora': '2026-01-05T07:00:00-03:00'},
+            {'evento_id': 'c1-2', 'usuario': self.aluno.id, 'tipo': 'saida', 'data_hora': '2026-01-05T08:10:00-03:00'},
+            {'evento_id': 'c1-3', 'usuario': 999999, 'tipo': 'entrada'},
+        ]
+        corpo = '\n'.join(json.dumps(l) for l in linhas) + '\nnao-e-json\n'
+        response = self.client.post('/api/frequencia/lote/', corpo, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['entradas_registradas'], 1)
+        self.assertEqual(response.data['saidas_registradas'], 1)
+        self.assertEqual(response.data['duplicados'], 1)
+        self.assertEqual(response.data['usuarios_invalidos'], 1)
+        self.assertEqual(response.data['invalidos'], 1)
+        
+        # Reenvio completo do lote não altera nada
+        response = self.client.post('/api/frequencia/lote/', corpo, content_type='application/x-ndjson')
+        self.assertEqual(response.data['entradas_registradas'], 0)
+        self.assertEqual(Frequencia.objects.count(), 1)
+        frequencia = Frequencia.objects.get()
+        self.assertEqual(frequencia.tempo_permanencia, timedelta(minutes=70))
+
+class OcupacaoTest(APITestCase):
+    """Testes para o contador de ocupação"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.aluno = User.objects.create_user(
+            username='aluno', email='aluno@example.com', password='testpass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.aluno)
+    
+    def test_contador_acompanha_checkin_e_checkout(self):
+        """Testa que a ocupação é lida do cache após a inicialização"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        
+        self.assertEqual(self.client.get('/api/frequencia/ocupacao/').data['ocupacao'], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/frequencia/checkin/', {'tipo': 'entrada'}, format='json')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/frequencia/ocupacao/')
+        self.assertEqual(response.data['ocupacao'], 1)
+        self.assertFalse([q for q in queries if 'academia_frequencia' in q['sql']])
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/frequencia/checkin/', {'tipo': 'saida'}, format='json')
+        self.assertEqual(self.client.get('/api/frequencia/ocupacao/').data['ocupacao'], 0)
+    
+    def test_reconciliacao_corrige_contador(self):
+        """Testa que a reconciliação recalcula o contador a partir da tabela"""
+        from django.core.management import call_command
+        from io import StringIO
+        
+        Frequencia.objects.create(usuario=self.aluno, data_entrada=timezone.now())
+        self.assertEqual(self.client.get('/api/frequencia/ocupacao/').data['ocupacao'], 1)
+        Frequencia.objects.update(data_saida=timezone.now())
+        call_command('reconciliar_ocupacao', stdout=StringIO())
+        self.assertEqual(self.client.get('/api/frequencia/ocupacao/').data['ocupacao'], 0)
+    
+    def test_partida_a_frio_com_reconciliacao_em_andamento(self):
+        """Testa que quem não pega a trava conta na tabela em vez de responder ocupação 0"""
+        from unittest.mock import patch
+        from django.core.cache import cache
+        from .services import ocupacao
+        
+        Frequencia.objects.create(usuario=self.aluno, data_entrada=timezone.now())
+        cache.add(ocupacao.CHAVE_TRAVA_RECONCILIACAO, True, timeout=30)
+        with patch.object(ocupacao, 'ESPERA_RECONCILIACAO', 0):
+            resultado = ocupacao.obter_ocupacao()
+        self.assertEqual(resultado['ocupacao'], 1)
+        self.assertIsNotNone(resultado['atualizado_em'])
+        self.assertIsNone(cache.get(ocupacao.CHAVE_OCUPACAO))
+
+class FrequenciaDiariaTest(APITestCase):
+    """Testes para a consolidação diária de frequência"""
+    
+    def setUp(self):
+        self.aluno = User.objects.create_user(
+            username='aluno', email='aluno@example.com', password='testpass123'
+        )
+        self.admin = User.objects.create_user(
+            username='admin', email='admin@example.com', password='testpass123', role='admin'
+        )
+        self.client = APIClient()
+    
+    def test_checkin_atualiza_consolidacao(self):
+        """Testa que entradas e saídas atualizam a linha do dia"""
+        self.client.force_authenticate(self.admin)
+        entrada = timezone.now() - timedelta(minutes=50)
+        for tipo, data_hora in (('entrada', entrada), ('saida', entrada + timedelta(minutes=45))):
+            self.client.post('/api/frequencia/checkin/', {
+                'usuario': self.aluno.id, 'tipo': tipo, 'data_hora': data_hora.isoformat(),
+            }, format='json')
+        self.client.force_authenticate(self.aluno)
+        
+        diaria = FrequenciaDiaria.objects.get(usuario=self.aluno)
+        self.assertEqual(diaria.data, timezone.localdate(entrada))
+        self.assertEqual(diaria.visitas, 1)
+        self.assertEqual(diaria.segundos_permanencia, 45 * 60)
+        
+        response = self.client.get('/api/dashboard/')
+        self.assertEqual(response.data['frequencia_mensal'], 1)
+        self.assertEqual(response.data['frequencia_semanal'], 1)
+    
+    def test_recalculo_e_relatorio(self):
+        """Testa o comando de recálculo e o relatório agrupado"""
+        from django.core.management import call_command
+        from io import StringIO
+        
+        ontem = timezone.now() - timedelta(days=1)
+        for horas in (0, 3):
+            inicio = ontem.replace(hour=8 + horas)
+            Frequencia.objects.create(usuario=self.aluno, data_entrada=inicio, data_saida=inicio + timedelta(hours=1))
+        FrequenciaDiaria.objects.all().delete()
+        
+        call_command('recalcular_frequencia_diaria', stdout=StringIO())
+        diaria = FrequenciaDiaria.objects.get(usuario=self.aluno)
+        self.assertEqual((diaria.visitas, diaria.segundos_permanencia), (2, 7200))
+        
+        self.client.force_authenticate(self.admin)
+        response = self.client.get('/api/frequencia/relatorio/', {'agrupar': 'mes'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_visitas'], 2)
+        self.assertEqual(response.data['periodos'][0]['permanencia_media_minutos'], 60.0)
+        
+        self.client.force_authenticate(self.aluno)
+        self.assertEqual(self.client.get('/api/frequencia/relatorio/').status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_alteracoes_pelo_orm_mantem_a_consolidacao(self):
+        """Testa que criar, mover e excluir frequências pelo ORM/admin atualiza os dias afetados"""
+        ontem = timezone.now() - timedelta(days=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            primeira = Frequencia.objects.create(usuario=self.aluno, data_entrada=ontem, data_saida=ontem + timedelta(hours=1))
+            Frequencia.objects.create(usuario=self.aluno, data_entrada=ontem, data_saida=ontem + timedelta(minutes=30))
+        diaria = FrequenciaDiaria.objects.get(usuario=self.aluno)
+        self.assertEqual((diaria.visitas, diaria.segundos_permanencia), (2, 5400))
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            primeira.data_entrada = timezone.now() - timedelta(minutes=10)
+            primeira.data_saida = None
+            primeira.save()
+        self.assertEqual(
+            sorted(FrequenciaDiaria.objects.values_list('visitas', 'segundos_permanencia')), [(1, 0), (1, 1800)]
+        )
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            Frequencia.objects.all().delete()
+        self.assertFalse(FrequenciaDiaria.objects.exists())
+    
+    def test_migration_consolida_historico(self):
+        """Testa que a data migration preenche a consolidação das frequências já existentes"""
+        import importlib
+        from django.apps import apps
+        migration = importlib.import_module('academia.migrations.0021_preencher_frequencia_diaria')
+        
+        inicio = timezone.now() - timedelta(days=40)
+        Frequencia.objects.bulk_create([
+            Frequencia(usuario=self.aluno, data_entrada=inicio + timedelta(days=dias), data_saida=inicio + timedelta(days=dias, hours=1))
+            for dias in (0, 20, 39)
+        ])
+        self.assertFalse(FrequenciaDiaria.objects.exists())
+        migration.preencher(apps, None)
+        self.assertEqual(FrequenciaDiaria.objects.filter(usuario=self.aluno).count(), 3)
+        self.assertEqual(sum(FrequenciaDiaria.objects.values_list('segundos_permanencia', flat=True)), 3 * 3600)
+
+class MapaCalorTest(APITestCase):
+    """Testes para o mapa de calor da ocupação"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.admin = User.objects.create_user(
+            username='admin', email='admin@example.com', password='testpass123', role='admin'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+    
+    def test_visita_distribuida_nas_faixas_de_hora(self):
+        """Testa que uma visita de 10h30 às 12h ocupa meia faixa das 10h e a faixa das 11h"""
+        segunda = date(2024, 3, 4)
+        entrada = timezone.make_aware(datetime.combine(segunda, datetime.min.time()).replace(hour=10, minute=30))
+        Frequencia.objects.create(usuario=self.admin, data_entrada=entrada, data_saida=entrada + timedelta(minutes=90))
+        
+        response = self.client.get('/api/frequencia/mapa-calor/', {'inicio': '2024-03-04', 'fim': '2024-03-10'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['visitas'], 1)
+        self.assertEqual(response.data['media_pessoas'][0][10], 0.5)
+        self.assertEqual(response.data['media_pessoas'][0][11], 1.0)
+        self.assertEqual(sum(map(sum, response.data['media_pessoas'])), 1.5)
+        self.assertEqual(response.data['pico'], {'dia_semana': 'Segunda', 'hora': 11, 'media_pessoas': 1.0})
+
+class TreinoSerializerEscritaTest(APITestCase):
+    """Testes para criação e edição de treinos com exercícios aninhados"""
+    
+    def setUp(self):
+        self.professor = User.objects.create_user(
+            username='prof', email='prof@example.com', password='testpass123', role='professor'
+        )
+        self.aluno = User.objects.create_user(
+            username='aluno', email='aluno@example.com', password='testpass123'
+        )
+        self.exercicios = Exercicio.objects.bulk_create([
+            Exercicio(nome=f'Exercício {i}', categoria='peito', descricao='-', instrucoes='-')
+            for i in range(15)
+        ])
+        self.client = APIClient()
+        self.client.force_authenticate(self.professor)
+    
+    def _payload(self, exercicios):
+        return {
+            'usuario': self.aluno.id,
+            'nome': 'Treino A',
+            'exercicios': [{'exercicio': e.id, 'series': 4, 'repeticoes': 12} for e in exercicios],
+        }
+    
+    def _contar_consultas(self, metodo, url, payload):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, metodo)(url, payload, format='json')
+        self.assertIn(response.status_code, (status.HTTP_200_OK, status.HTTP_201_CREATED), response.data)
+        return response, len(queries)
+    
+    def test_criacao_com_numero_constante_de_consultas(self):
+        """Testa que criar um treino com 3 ou 15 exercícios custa o mesmo número de consultas"""
+        _, poucas = self._contar_consultas('post', '/api/treinos/gerenciar/', self._payload(self.exercicios[:3]))
+        response, muitas = self._contar_consultas('post', '/api/treinos/gerenciar/', self._payload(self.exercicios))
+        self.assertEqual(poucas, muitas)
+        self.assertEqual(len(response.data['exercicios_detalhes']), 15)
+    
+    def test_edicao_aplica_diferencas(self):
+        """Testa que a edição mantém, atualiza, cria e remove as linhas enviadas"""
+        response = self.client.post('/api/treinos/gerenciar/', self._payload(self.exercicios[:3]), format='json')
+        treino_id = response.data['id']
+        ids_originais = [d['id'] for d in response.data['exercicios_detalhes']]
+        
+        payload = {'exercicios': [
+            {'id': ids_originais[0], 'exercicio': self.exercicios[0].id, 'series': 5, 'repeticoes': 5},
+            {'exercicio': self.exercicios[2].id, 'series': 3, 'repeticoes': 15},
+            {'exercicio': self.exercicios[10].id},
+        ]}
+        response, consultas = self._contar_consultas('patch', f'/api/treinos/gerenciar/{treino_id}/', payload)
+        detalhes = response.data['exercicios_detalhes']
+        self.assertEqual([d['exercicio'] for d in detalhes], [self.exercicios[i].id for i in (0, 2, 10)])
+        self.assertEqual(detalhes[0]['id'], ids_originais[0])
+        self.assertEqual(detalhes[0]['series'], 5)
+        self.assertEqual(detalhes[1]['id'], ids_originais[2])
+        self.assertFalse(TreinoExercicio.objects.filter(id=ids_originais[1]).exists())
+        
+        payload = {'exercicios': [{'exercicio': e.id} for e in self.exercicios[2:]]}
+        _, consultas_todos = self._contar_consultas('patch', f'/api/treinos/gerenciar/{treino_id}/', payload)
+        self.assertEqual(consultas, consultas_todos)
+    
+    def test_exercicio_inexistente(self):
+        """Testa que um exercício inexistente invalida o treino inteiro"""
+        payload = self._payload(self.exercicios[:2])
+        payload['exercicios'].append({'exercicio': 999999})
+        response = self.client.post('/api/treinos/gerenciar/', payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Treino.objects.exists())
+
+class TreinoModeloAtribuicaoTest(APITestCase):
+    """Testes para atribuição de modelos de treino"""
+    
+    def setUp(self):
+        self.professor = User.objects.create_user(
+            username='prof', email='prof@example.com', password='testpass123', role='professor'
+        )
+        self.alunos = User.objects.bulk_create([
+            User(username=f'aluno{i}', email=f'aluno{i}@example.com', password='!') for i in range(200)
+        ])
+        exercicios = Exercicio.objects.bulk_create([
+            Exercicio(nome=f'Exercício {i}', categoria='pernas', descricao='-', instrucoes='-')
+            for i in range(12)
+        ])
+        self.client = APIClient()
+        self.client.force_authenticate(self.professor)
+        response = self.client.post('/api/treinos/modelos/', {
+            'nome': 'Hipertrofia A',
+            'exercicios': [{'exercicio': e.id, 'series': 4, 'repeticoes': 10} for e in exercicios],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.modelo_id = response.data['id']
+    
+    def test_atribuir_modelo_a_varios_alunos(self):
+        """Testa que a atribuição cria todos os treinos com número fixo de consultas"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        
+        payload = {'modelo': self.modelo_id, 'alunos': [a.id for a in self.alunos]}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/treinos/gerenciar/atribuir/', payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['treinos_criados'], 200)
+        self.assertEqual(Treino.objects.filter(modelo_id=self.modelo_id).count(), 200)
+        self.assertEqual(TreinoExercicio.objects.count(), 200 * 12)
+        # Só os INSERT em lote variam (conforme o limite de parâmetros do banco); nada é feito por aluno
+        self.assertLess(len([q for q in queries if not q['sql'].startswith('INSERT')]), 8)
+        
+        payload['desativar_anteriores'] = True
+        payload['alunos'] = [self.alunos[0].id]
+        self.client.post('/api/treinos/gerenciar/atribuir/', payload, format='json')
+        self.assertEqual(Treino.objects.filter(usuario=self.alunos[0], ativo=True).count(), 1)
+    
+    def test_aluno_inexistente(self):
+        """Testa que um aluno inexistente invalida a atribuição inteira"""
+        payload = {'modelo': self.modelo_id, 'alunos': [self.alunos[0].id, 999999]}
+        response = self.client.post('/api/treinos/gerenciar/atribuir/', payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Treino.objects.exists())
+    
+    def test_atribuicao_recusa_quem_nao_e_aluno_ativo(self):
+        """Testa que professores, administradores e contas inativas são recusados, com os ids na resposta"""
+        inativo = self.alunos[1]
+        inativo.is_active = False
+        inativo.save()
+        admin = User.objects.create_user(username='adm', email='adm@example.com', password=None, role='admin')
+        recusados = [self.professor.id, admin.id, inativo.id]
+        payload = {'modelo': self.modelo_id, 'alunos': [self.alunos[0].id, *recusados]}
+        response = self.client.post('/api/treinos/gerenciar/atribuir/', payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn(', '.join(map(str, recusados)), str(response.data['alunos']))
+        self.assertFalse(Treino.objects.exists())
+
+class ConsultasRepetidasTest(APITestCase):
+    """Testes para as listagens sem N+1 e o detector de consultas repetidas"""
+    
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username='admin', email='admin@example.com', password='testpass123', role='admin'
+        )
+        self.alunos = User.objects.bulk_create([
+            User(username=f'aluno{i}', email=f'aluno{i}@example.com', password='!') for i in range(20)
+        ])
+        planos = Plano.objects.bulk_create([
+            Plano(nome=f'Plano {i}', descricao='-', preco=Decimal('99.90')) for i in range(20)
+        ])
+        hoje = date.today()
+        Matricula.objects.bulk_create([
+            Matricula(usuario=a, plano=p, data_inicio=hoje, data_fim=hoje + timedelta(days=30), valor_pago=p.preco)
+            for a, p in zip(self.alunos, planos)
+        ])
+        Avaliacao.objects.bulk_create([
+            Avaliacao(usuario=a, data_avaliacao=hoje, peso=Decimal('70'), altura=Decimal('175')) for a in self.alunos
+        ])
+        Treino.objects.bulk_create([Treino(usuario=a, nome='Treino A') for a in self.alunos])
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+    
+    def test_listagens_sem_n_mais_1(self):
+        """Testa que as listagens carregam usuário e plano junto (o detector falharia o teste)"""
+        for url in ('/api/matriculas/', '/api/avaliacoes/', '/api/treinos/gerenciar/'):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(len(response.data['results']), 20)
+    
+    def test_detector_agrupa_consultas_por_padrao(self):
+        """Testa que consultas que só diferem nos valores contam como o mesmo padrão"""
+        from .consultas import MonitorConsultas
+        
+        with MonitorConsultas() as monitor:
+            nomes = [a.usuario.username for a in Avaliacao.objects.all()]
+        self.assertEqual(len(nomes), 20)
+        repetidas = monitor.repetidas(limite=10)
+        self.assertEqual(len(repetidas), 1)
+        self.assertEqual(repetidas[0][1], 20)
+        self.assertIn('academia_usuario', repetidas[0][0])
+
+class SincronizacaoTest(APITestCase):
+    """Testes para a sincronização incremental"""
+    
+    def setUp(self):
+        self.aluno = User.objects.create_user(
+            username='aluno', email='aluno@example.com', password='testpass123'
+        )
+        self.outro = User.objects.create_user(
+            username='outro', email='outro@example.com', password='testpass123'
+        )
+        self.exercicio = Exercicio.objects.create(nome='Supino', categoria='peito', descricao='-', instrucoes='-')
+        self.treino = Treino.objects.create(usuario=self.aluno, nome='Treino A')
+        self.item = TreinoExercicio.objects.create(treino=self.treino, exercicio=self.exercicio, series=3, repeticoes=10)
+        Treino.objects.create(usuario=self.outro, nome='Treino do outro')
+        self.client = APIClient()
+        self.client.force_authenticate(self.aluno)
+    
+    def test_sincronizacao_completa_e_incremental(self):
+        """Testa que a segunda sincronização traz só alterações e exclusões do próprio aluno"""
+        from .services.sincronizacao import gerar_token
+        
+        response = self.client.get('/api/sync/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['completo'])
+        self.assertEqual([t['id'] for t in response.data['dados']['treinos']], [self.treino.id])
+        self.assertEqual(len(response.data['dados']['treino_exercicios']), 1)
+        
+        # Token logo após a carga inicial (sem a margem) para isolar as mudanças abaixo
+        token = gerar_token(timezone.now())
+        self.treino.nome = 'Treino A (editado)'
+        self.treino.save()
+        item_id = self.item.id
+        self.item.delete()
+        Treino.objects.create(usuario=self.outro, nome='Outro treino novo')
+        
+        response = self.client.get('/api/sync/', {'since': token})
+        self.assertFalse(response.data['completo'])
+        self.assertEqual([t['nome'] for t in response.data['dados']['treinos']], ['Treino A (editado)'])
+        self.assertEqual(response.data['dados']['exercicios'], [])
+        self.assertEqual(response.data['excluidos']['treino_exercicios'], [item_id])
+    
+    def test_token_invalido(self):
+        """Testa que um token malformado ou fora do intervalo de datas é rejeitado"""
+        for token in ('abc', str(10 ** 20)):
+            response = self.client.get('/api/sync/', {'since': token})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('since', response.data)
+    
+    def test_exclusao_em_cascata_grava_marcas_em_lote(self):
+        """Testa que excluir um treino com itens grava todas as marcas num único INSERT, com o dono"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .models import RegistroExclusao
+        for exercicio in range(5):
+            TreinoExercicio.objects.create(
+                treino=self.treino, series=3, repeticoes=10,
+                exercicio=Exercicio.objects.create(nome=f'Ex {exercicio}', categoria='peito', descricao='-', instrucoes='-'),
+            )
+        # Gravadas na própria transação da exclusão, sem depender de on_commit
+        with CaptureQueriesContext(connection) as consultas:
+            with self.captureOnCommitCallbacks() as callbacks:
+                self.treino.delete()
+        self.assertEqual(callbacks, [])
+        insercoes = [q['sql'] for q in consultas.captured_queries if 'INSERT INTO "academia_registroexclusao"' in q['sql']]
+        self.assertEqual(len(insercoes), 1)
+        marcas = RegistroExclusao.objects.all()
+        self.assertEqual(set(marcas.values_list('tipo', flat=True)), {'treino_exercicios', 'treinos'})
+        self.assertEqual(marcas.count(), 7)
+        self.assertEqual(set(marcas.values_list('dono_id', flat=True)), {self.aluno.id})
+    
+    def test_exclusao_desfeita_nao_grava_marca(self):
+        """Testa que a marca de uma exclusão desfeita (savepoint) não é gravada"""
+        from django.db import transaction
+        from .models import RegistroExclusao
+        Exercicio.objects.create(nome='Remada', categoria='costas', descricao='-', instrucoes='-').delete()
+        try:
+            with transaction.atomic():
+                self.item.delete()
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertEqual(list(RegistroExclusao.objects.values_list('tipo', flat=True)), ['exercicios'])
+
+class AvaliacaoProgressoTest(APITestCase):
+    """Testes para o progresso das avaliações"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.professor = User.objects.create_user(
+            username='prof', email='prof@example.com', password='testpass123', role='professor'
+        )
+        self.aluno = User.objects.create_user(
+            username='aluno', email='aluno@example.com', password='testpass123'
+        )
+        self.outro = User.objects.create_user(
+            username='outro', email='outro@example.com', password='testpass123'
+        )
+        inicio = date(2024, 1, 1)
+        for i, peso in enumerate(('80', '78', '76')):
+            Avaliacao.objects.create(
+                usuario=self.aluno, data_avaliacao=inicio + timedelta(days=30 * i),
+                peso=Decimal(peso), altura=Decimal('180'),
+                percentual_gordura=Decimal('20') if i != 1 else None,
+            )
+        Avaliacao.objects.create(usuario=self.outro, data_avaliacao=inicio, peso=Decimal('60'), altura=Decimal('165'))
+        self.client = APIClient()
+    
+    def test_progresso_do_aluno(self):
+        """Testa variações, média móvel e tendência calculadas para o próprio aluno"""
+        self.client.force_authenticate(self.aluno)
+        response = self.client.get('/api/avaliacoes/progresso/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        progresso = response.data['results'][0]
+        self.assertEqual(progresso['avaliacoes'], 3)
+        self.assertEqual(progresso['metricas']['peso'], {
+            'inicial': 80.0, 'atual': 76.0, 'variacao': -4.0, 'tendencia_30_dias': -2.0,
+        })
+        self.assertEqual(progresso['metricas']['percentual_gordura']['tendencia_30_dias'], 0.0)
+        self.assertIsNone(progresso['metricas']['massa_muscular']['atual'])
+        serie = progresso['serie']
+        self.assertIsNone(serie[0]['variacao']['peso'])
+        self.assertEqual(serie[1]['variacao']['peso'], -2.0)
+        self.assertEqual(serie[2]['media_movel']['peso'], 78.0)
+        self.assertEqual(serie[2]['media_movel']['percentual_gordura'], 20.0)
+        
+        self.assertEqual(
+            self.client.get('/api/avaliacoes/progresso/', {'usuario': self.outro.id}).status_code,
+            status.HTTP_403_FORBIDDEN,
+        )
+    
+    def test_turma_em_uma_requisicao_e_invalidacao(self):
+        """Testa o progresso de vários alunos e a invalidação do cache ao salvar uma avaliação"""
+        self.client.force_authenticate(self.professor)
+        response = self.client.get('/api/avaliacoes/progresso/')
+        self.assertEqual([p['usuario'] for p in response.data['results']], [self.aluno.id, self.outro.id])
+        self.assertNotIn('serie', response.data['results'][0])
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            Avaliacao.objects.create(
+                usuario=self.outro, data_avaliacao=date(2024, 2, 1), peso=Decimal('62'), altura=Decimal('165')
+            )
+        response = self.client.get('/api/avaliacoes/progresso/')
+        self.assertEqual(response.data['results'][1]['metricas']['peso']['variacao'], 2.0)
+    
+    def test_turma_paginada(self):
+        """Testa que a visão da equipe pagina pelos alunos avaliados em vez de recusar turmas grandes"""
+        from unittest.mock import patch
+        from .views import AvaliacaoProgressoView
+        
+        self.client.force_authenticate(self.professor)
+        with patch.object(AvaliacaoProgressoView, 'MAX_ALUNOS', 1):
+            response = self.client.get('/api/avaliacoes/progresso/')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual([p['usuario'] for p in response.data['results']], [self.aluno.id])
+            response = self.client.get(response.data['next'])
+            self.assertEqual([p['usuario'] for p in response.data['results']], [self.outro.id])
+            self.assertIsNone(response.data['next'])
+
+class ProfessorAlunosTest(APITestCase):
+    """Testes para o painel de alunos do professor"""
+    
+    def setUp(self):
+        self.professor = User.objects.create_user(
+            username='prof', email='prof@example.com', password='testpass123', role='professor'
+        )
+        self.ana = User.objects.create_user(username='ana', email='ana@example.com', first_name='Ana', password='x')
+        self.bruno = User.objects.create_user(username='bruno', email='bruno@example.com', first_name='Bruno', password='x')
+        self.carla = User.objects.create_user(username='carla', email='carla@example.com', first_name='Carla', password='x')
+        hoje = timezone.localdate()
+        plano = Plano.objects.create(nome='Premium', descricao='-', preco=Decimal('120'))
+        Matricula.objects.create(
+            usuario=self.ana, plano=plano, data_inicio=hoje, data_fim=hoje + timedelta(days=30), valor_pago=plano.preco
+        )
+        Avaliacao.objects.create(usuario=self.ana, data_avaliacao=hoje - timedelta(days=60), peso=Decimal('70'), altura=Decimal('170'))
+        Avaliacao.objects.create(usuario=self.ana, data_avaliacao=hoje, peso=Decimal('68.5'), altura=Decimal('170'))
+        Treino.objects.create(usuario=self.ana, nome='A')
+        Treino.objects.create(usuario=self.ana, nome='B', ativo=False)
+        Treino.objects.create(usuario=self.bruno, nome='A')
+        FrequenciaDiaria.objects.bulk_create([
+            FrequenciaDiaria(usuario=self.bruno, data=hoje - timedelta(days=d), visitas=1) for d in range(5)
+        ] + [FrequenciaDiaria(usuario=self.ana, data=hoje - timedelta(days=40), visitas=3)])
+        self.client = APIClient()
+        self.client.force_authenticate(self.professor)
+    
+    def test_indicadores_em_uma_consulta(self):
+        """Testa os indicadores calculados e que a página sai de um único SELECT"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/professor/alunos/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(queries), 1)
+        
+        ana = response.data['results'][0]
+        self.assertEqual(ana['plano']['nome'], 'Premium')
+        self.assertEqual(ana['ultima_avaliacao']['peso'], '68.50')
+        self.assertEqual(ana['ultima_avaliacao']['variacao_peso'], '-1.50')
+        self.assertEqual(ana['treinos_ativos'], 1)
+        self.assertEqual(ana['frequencia_30_dias'], 0)
+        self.assertIsNone(response.data['results'][2]['plano'])
+    
+    def test_ordenacao_filtro_e_cursor(self):
+        """Testa a ordenação por indicador, os filtros e a paginação por cursor"""
+        response = self.client.get('/api/professor/alunos/', {'ordenar': '-frequencia_30_dias', 'limite': 1})
+        self.assertEqual([a['id'] for a in response.data['results']], [self.bruno.id])
+        self.assertEqual(response.data['results'][0]['frequencia_30_dias'], 5)
+        
+        proxima = self.client.get(response.data['next'])
+        self.assertEqual(len(proxima.data['results']), 1)
+        self.assertNotEqual(proxima.data['results'][0]['id'], self.bruno.id)
+        
+        response = self.client.get('/api/professor/alunos/', {'treinos_ativos__gte': 1, 'sem_matricula': 'true'})
+        self.assertEqual([a['id'] for a in response.data['results']], [self.bruno.id])
+        
+        self.assertEqual(
+            self.client.get('/api/professor/alunos/', {'ordenar': 'senha'}).status_code,
+            status.HTTP_400_BAD_REQUEST,
+        )
+
+
+class AdminKpisTest(APITestCase):
+    """Testes para os indicadores do painel administrativo"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        from .models import ParticipanteTorneio, Pedido, Torneio
+        
+        cache.clear()
+        self.admin = User.objects.create_user(
+            username='admin', email='admin@example.com', password='testpass123', role='admin'
+        )
+        hoje = timezone.localdate()
+        basico = Plano.objects.create(nome='Básico', descricao='-', preco=Decimal('80'))
+        premium = Plano.objects.create(nome='Premium', descricao='-', preco=Decimal('120'))
+        self.alunos = [
+            User.objects.create_user(username=f'aluno{i}', email=f'aluno{i}@example.com', password='x')
+            for i in range(3)
+        ]
+        for aluno, plano, dias in zip(self.alunos, [basico, premium, premium], [3, 20, -1]):
+            Matricula.objects.create(
+                usuario=aluno, plano=plano, data_inicio=hoje - timedelta(days=30),
+                data_fim=hoje + timedelta(days=dias), valor_pago=plano.preco,
+            )
+        Pedido.objects.create(usuario=self.alunos[0], plano=basico, valor=basico.preco, status=Pedido.STATUS_APROVADO)
+        Pedido.objects.create(usuario=self.alunos[1], plano=premium, valor=premium.preco)
+        torneio = Torneio.objects.create(
+            nome='Copa', descricao='-', data_inicio_inscricoes=timezone.now(),
+            data_fim_inscricoes=timezone.now() + timedelta(days=5), data_inicio=timezone.now() + timedelta(days=7),
+            max_participantes=4,
+        )
+        ParticipanteTorneio.objects.create(torneio=torneio, usuario=self.alunos[0])
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+    
+    def test_indicadores(self):
+        """Testa os indicadores agregados"""
+        response = self.client.get('/api/admin/kpis/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        
+        self.assertEqual(response.data['membros'], {'ativos': 2, 'vencendo': 1})
+        receita = {(linha['plano_nome'], linha['receita']) for linha in response.data['receita_por_plano']}
+        self.assertEqual(receita, {('Básico', Decimal('80.00')), ('Premium', Decimal('240.00'))})
+        self.assertEqual(response.data['pedidos']['pendentes'], 1)
+        self.assertEqual(response.data['pedidos']['aprovados'], 1)
+        self.assertEqual(response.data['pedidos']['taxa_aprovacao'], 50.0)
+        self.assertEqual(len(response.data['cadastros_por_semana']), 12)
+        self.assertEqual(response.data['cadastros_por_semana'][-1]['cadastros'], 3)
+        self.assertEqual(response.data['torneios']['alunos_participando'], 1)
+        self.assertEqual(response.data['torneios']['recentes'][0]['ocupacao'], 25.0)
+    
+    def test_cache_e_permissao(self):
+        """Testa que a segunda chamada vem do cache e que alunos não têm acesso"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        
+        self.client.get('/api/admin/kpis/')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/admin/kpis/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse([q for q in queries if 'academia_matricula' in q['sql']])
+        
+        self.client.force_authenticate(self.alunos[0])
+        self.assertEqual(self.client.get('/api/admin/kpis/').status_code, status.HTTP_403_FORBIDDEN)
+
+
+class VarreduraMatriculasTest(TestCase):
+    """Testes para o vencimento de matrículas e os lembretes de renovação"""
+    
+    def setUp(self):
+        hoje = timezone.localdate()
+        self.plano = Plano.objects.create(nome='Básico', descricao='-', preco=Decimal('80'))
+        self.vencido = User.objects.create_user(username='vencido', email='v@example.com', password='x', is_active_member=True)
+        self.renovado = User.objects.create_user(username='renovado', email='r@example.com', password='x', is_active_member=True)
+        self.a_vencer = User.objects.create_user(username='avencer', email='a@example.com', password='x', is_active_member=True)
+        self.matriculas_vencidas = [
+            self._matricula(self.vencido, hoje - timedelta(days=1)),
+            self._matricula(self.vencido, hoje - timedelta(days=40)),
+            self._matricula(self.renovado, hoje - timedelta(days=2)),
+        ]
+        self._matricula(self.renovado, hoje + timedelta(days=30))
+        self.proxima = self._matricula(self.a_vencer, hoje + timedelta(days=3))
+    
+    def _matricula(self, usuario, data_fim):
+        return Matricula.objects.create(
+            usuario=usuario, plano=self.plano, data_inicio=data_fim - timedelta(days=30),
+            data_fim=data_fim, valor_pago=self.plano.preco,
+        )
+    
+    def test_vence_em_lotes_e_atualiza_membros(self):
+        """Testa a transição em lotes, is_active_member e a idempotência"""
+        from .services.matriculas import expirar_matriculas
+        
+        self.assertEqual(expirar_matriculas(tamanho_lote=2), (3, True))
+        self.assertEqual(
+            set(Matricula.objects.filter(status='vencida').values_list('id', flat=True)),
+            {m.id for m in self.matriculas_vencidas},
+        )
+        self.vencido.refresh_from_db()
+        self.renovado.refresh_from_db()
+        self.a_vencer.refresh_from_db()
+        self.assertFalse(self.vencido.is_active_member)
+        self.assertTrue(self.renovado.is_active_member)
+        self.assertTrue(self.a_vencer.is_active_member)
+        
+        self.assertEqual(expirar_matriculas(), (0, True))
+    
+    def test_vencimento_invalida_usuario_em_cache(self):
+        """Testa que o UPDATE em lote invalida o cache só dos usuários cujo is_active_member mudou"""
+        from unittest.mock import patch
+        from django.core.cache import cache
+        from .autenticacao import usuario_em_cache
+        from .services import matriculas
+        
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.assertTrue(usuario_em_cache(self.vencido.id).is_active_member)
+        with patch.object(matriculas, 'invalidar_usuario', wraps=matriculas.invalidar_usuario) as invalidar:
+            with self.captureOnCommitCallbacks(execute=True):
+                matriculas.expirar_matriculas()
+        self.assertEqual([chamada.args for chamada in invalidar.call_args_list], [(self.vencido.id,)])
+        self.assertFalse(usuario_em_cache(self.vencido.id).is_active_member)
+    
+    def test_lembretes_emitidos_uma_vez(self):
+        """Testa que o comando emite o lembrete de renovação uma única vez por matrícula"""
+        from django.core.management import call_command
+        from io import StringIO
+        from .services.matriculas import lembrete_renovacao
+        
+        recebidos = []
+        receptor = lambda sender, matriculas, **kwargs: recebidos.extend(m['id'] for m in matriculas)
+        lembrete_renovacao.connect(receptor)
+        self.addCleanup(lembrete_renovacao.disconnect, receptor)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('varrer_matriculas', stdout=StringIO())
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('varrer_matriculas', stdout=StringIO())
+        
+        self.assertEqual(recebidos, [self.proxima.id])
+        self.assertEqual(Matricula.objects.filter(status='ativa').count(), 2)
+
+
+class ManutencaoPedidosTest(TestCase):
+    """Testes para a expiração e o arquivamento de pedidos"""
+    
+    def setUp(self):
+        from .models import Pedido
+        
+        self.usuario = User.objects.create_user(username='aluno', email='aluno@example.com', password='x')
+        self.plano = Plano.objects.create(nome='Básico', descricao='-', preco=Decimal('80'))
+        agora = timezone.now()
+        self.antigo_pendente = self._pedido(Pedido.STATUS_PENDENTE, agora - timedelta(hours=30))
+        self.recente_pendente = self._pedido(Pedido.STATUS_PENDENTE, agora - timedelta(hours=1))
+        self.antigos_finalizados = [
+            self._pedido(status_pedido, agora - timedelta(days=800))
+            for status_pedido in (Pedido.STATUS_APROVADO, Pedido.STATUS_CANCELADO, Pedido.STATUS_EXPIRADO)
+        ]
+        self.assinatura = self._pedido(Pedido.STATUS_APROVADO, agora - timedelta(days=800), is_subscription=True)
+    
+    def _pedido(self, status_pedido, criado_em, **extra):
+        from .models import Pedido
+        
+        pedido = Pedido.objects.create(
+            usuario=self.usuario, plano=self.plano, valor=self.plano.preco, status=status_pedido, **extra
+        )
+        Pedido.objects.filter(id=pedido.id).update(criado_em=criado_em)
+        return pedido
+    
+    def test_expira_e_arquiva_em_lotes(self):
+        """Testa a expiração, o arquivamento em lotes, o progresso e a idempotência"""
+        from django.core.management import call_command
+        from io import StringIO
+        from .models import Pedido, PedidoArquivado
+        from .services.pedidos import obter_progresso
+        
+        saida = StringIO()
+        call_command('manutencao_pedidos', lote=2, verbosity=2, stdout=saida)
+        
+        self.assertEqual(Pedido.objects.get(id=self.antigo_pendente.id).status, Pedido.STATUS_EXPIRADO)
+        self.assertEqual(Pedido.objects.get(id=self.recente_pendente.id).status, Pedido.STATUS_PENDENTE)
+        arquivados = {p.id: p for p in PedidoArquivado.objects.all()}
+        self.assertEqual(set(arquivados), {p.id for p in self.antigos_finalizados})
+        self.assertEqual(arquivados[self.antigos_finalizados[0].id].id_publico, self.antigos_finalizados[0].id_publico)
+        self.assertFalse(Pedido.objects.filter(id__in=arquivados).exists())
+        self.assertTrue(Pedido.objects.filter(id=self.assinatura.id).exists())
+        
+        progresso = obter_progresso()['arquivamento']
+        self.assertEqual((progresso['processados'], progresso['total'], progresso['lotes']), (3, 3, 2))
+        self.assertTrue(progresso['concluido'])
+        self.assertIn('arquivamento: 3/3', saida.getvalue())
+        
+        call_command('manutencao_pedidos', stdout=StringIO())
+        self.assertEqual(PedidoArquivado.objects.count(), 3)
+
+
+class AdminExportacaoTest(APITestCase):
+    """Testes para as exportações em streaming"""
+    
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username='admin', email='admin@example.com', password='testpass123', role='admin'
+        )
+        self.aluno = User.objects.create_user(username='aluno', email='aluno@example.com', first_name='José', password='x')
+        agora = timezone.now()
+        Frequencia.objects.bulk_create([
+            Frequencia(usuario=self.aluno, data_entrada=agora - timedelta(days=d)) for d in (0, 1, 10)
+        ])
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+    
+    def test_csv_e_ndjson(self):
+        """Testa o conteúdo em CSV e NDJSON e o filtro por período"""
+        import csv
+        import io
+        
+        response = self.client.get('/api/admin/exportar/usuarios/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        linhas = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(linhas[0][:3], ['id', 'username', 'email'])
+        self.assertIn('José', [linha[3] for linha in linhas[1:]])
+        
+        inicio = (timezone.localdate() - timedelta(days=2)).isoformat()
+        response = self.client.get('/api/admin/exportar/frequencias/', {'formato': 'ndjson', 'inicio': inicio})
+        registros = [json.loads(l) for l in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(len(registros), 2)
+        self.assertEqual(registros[0]['usuario_id'], self.aluno.id)
+        self.assertIn('attachment', response['Content-Disposition'])
+    
+    def test_gzip_e_validacoes(self):
+        """Testa a saída comprimida, parâmetros inválidos e a permissão"""
+        import gzip
+        
+        response = self.client.get('/api/admin/exportar/frequencias/', {'gzip': 'true'})
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        conteudo = gzip.decompress(b''.join(response.streaming_content)).decode()
+        self.assertEqual(len(conteudo.splitlines()), 4)
+        
+        self.assertEqual(self.client.get('/api/admin/exportar/senhas/').status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(
+            self.client.get('/api/admin/exportar/pedidos/', {'formato': 'xml'}).status_code,
+            status.HTTP_400_BAD_REQUEST,
+        )
+        self.client.force_authenticate(self.aluno)
+        self.assertEqual(self.client.get('/api/admin/exportar/pedidos/').status_code, status.HTTP_403_FORBIDDEN)
+
+
+class ImportacaoAlunosTest(APITestCase):
+    """Testes para a importação em lote de alunos"""
+    
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username='admin', email='admin@example.com', password='testpass123', role='admin'
+        )
+        User.objects.create_user(username='existente', email='Existente@Example.com', password='x')
+        self.plano = Plano.objects.create(nome='Básico', descricao='-', preco=Decimal('80'), duracao_dias=30)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+    
+    def _arquivo(self, conteudo, nome='alunos.csv'):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        return SimpleUploadedFile(nome, conteudo.encode('utf-8'), content_type='text/csv')
+    
+    def test_importa_valida_e_deduplica(self):
+        """Testa a criação em lote, a matrícula, os convites e o relatório de erros"""
+        conteudo = (
+            'Nome;Sobrenome;E-mail;CPF;Senha;Plano\n'
+            'José;Silva;jose@example.com;529.982.247-25;senhaSegura1;\n'
+            'Maria;Souza;MARIA@example.com;11144477735;;basico\n'
+            'Maria;Dup;maria@example.com;;;\n'
+            'Ana;;ana@example.com;123.456.789-00;;\n'
+            'Velho;;existente@example.com;;;\n'
+            'Sem;;;;;\n'
+        )
+        response = self.client.post('/api/usuarios/importar/', {'arquivo': self._arquivo(conteudo)}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['linhas'], response.data['criados'], response.data['matriculas']), (6, 2, 1))
+        self.assertEqual({e['linha'] for e in response.data['erros']}, {4, 5, 6, 7})
+        
+        jose = User.objects.get(email='jose@example.com')
+        self.assertTrue(jose.check_password('senhaSegura1'))
+        self.assertEqual(jose.texto_busca, 'jose silva jose@example.com jose@example.com')
+        maria = User.objects.get(email='maria@example.com')
+        self.assertFalse(maria.has_usable_password())
+        self.assertEqual(maria.cpf, '111.444.777-35')
+        self.assertTrue(maria.is_active_member)
+        self.assertEqual(maria.matriculas.get().data_fim, timezone.localdate() + timedelta(days=30))
+        self.assertEqual([c['email'] for c in response.data['convites']], ['maria@example.com'])
+        
+        # Reimportar o mesmo arquivo não duplica ninguém
+        response = self.client.post('/api/usuarios/importar/', {'arquivo': self._arquivo(conteudo)}, format='multipart')
+        self.assertEqual(response.data['criados'], 0)
+    
+    def test_convite_define_senha(self):
+        """Testa que o uid/token do convite define a senha uma única vez"""
+        conteudo = 'E-mail;Nome\nconvidado@example.com;Convidado\n'
+        response = self.client.post('/api/usuarios/importar/', {'arquivo': self._arquivo(conteudo)}, format='multipart')
+        convite, = response.data['convites']
+        self.client.force_authenticate(None)
+        
+        dados = {'uid': convite['uid'], 'token': convite['token'],
+                 'new_password': 'novaSenha123', 'new_password_confirm': 'novaSenha123'}
+        invalido = self.client.post('/api/auth/password-reset/confirm/', {**dados, 'token': 'x-y'})
+        self.assertEqual(invalido.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post('/api/auth/password-reset/confirm/', dados)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(User.objects.get(email='convidado@example.com').check_password('novaSenha123'))
+        reuso = self.client.post('/api/auth/password-reset/confirm/', {**dados, 'new_password': 'outraSenha1',
+                                                                       'new_password_confirm': 'outraSenha1'})
+        self.assertEqual(reuso.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    @override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+    def test_senhas_no_pool_de_processos(self):
+        """Testa a geração das senhas em processos separados, em vários lotes"""
+        import io
+        from .services.importacao import importar_membros
+        
+        linhas = ''.join(f'aluno{i}@example.com,senha{i:04d}xyz\n' for i in range(40))
+        resultado = importar_membros(io.BytesIO(f'email,senha\n{linhas}'.encode()), 'a.csv', tamanho_lote=25, processos=2)
+        self.assertEqual((resultado.criados, resultado.erros), (40, []))
+        self.assertTrue(User.objects.get(email='aluno39@example.com').check_password('senha0039xyz'))
+    
+    def test_username_ja_usado_e_conflito_no_lote(self):
+        """Testa e-mail já usado como username e que um conflito no INSERT perde só a linha em conflito"""
+        import io
+        from unittest.mock import patch
+        from .services import importacao
+        
+        User.objects.create_user(username='Pedro@example.com', email='pedro.antigo@example.com', password='x')
+        conteudo = 'email\npedro@example.com\nnovo1@example.com\n'.encode()
+        resultado = importacao.importar_membros(io.BytesIO(conteudo), 'a.csv', processos=1)
+        self.assertEqual(resultado.criados, 1)
+        self.assertEqual([e['linha'] for e in resultado.erros], [2])
+        self.assertIn('nome de usuário', resultado.erros[0]['erros'][0])
+        
+        # Sem a checagem prévia (ex.: cadastro concorrente), o IntegrityError cai na gravação linha a linha
+        User.objects.create_user(username='conflito@example.com', email='conflito.antigo@example.com', password='x')
+        conteudo = 'email\nnovo2@example.com\nconflito@example.com\nnovo3@example.com\n'.encode()
+        with patch.object(importacao, '_ja_cadastrados', return_value=(set(), set(), set())):
+            resultado = importacao.importar_membros(io.BytesIO(conteudo), 'a.csv', processos=1)
+        self.assertEqual(resultado.criados, 2)
+        self.assertEqual([e['linha'] for e in resultado.erros], [3])
+        self.assertEqual(len(resultado.convites), 2)
+        self.assertEqual(User.objects.filter(email__in=['novo2@example.com', 'novo3@example.com']).count(), 2)
+    
+    def test_arquivo_invalido(self):
+        """Testa arquivo sem coluna de e-mail e a permissão"""
+        response = self.client.post('/api/usuarios/importar/', {'arquivo': self._arquivo('nome\nJosé\n')}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.client.force_authenticate(User.objects.get(username='existente'))
+        response = self.client.post('/api/usuarios/importar/', {'arquivo': self._arquivo('email\n')}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class HostPermitidoTest(APITestCase):
+    """Testes para a validação de host compilada"""
+    
+    def test_validador(self):
+        """Testa hosts exatos, sufixos curinga e a ausência de casamento parcial"""
+        from .hosts import ValidadorHosts
+        
+        validador = ValidadorHosts(['academia.com.br', '.railway.app', '*.onrender.com'])
+        for host in ('academia.com.br', 'ACADEMIA.com.br.', 'railway.app', 'pr-1.up.railway.app', 'x.onrender.com'):
+            self.assertTrue(validador.permitido(host), host)
+        for host in ('www.academia.com.br', 'railway.app.evil.com', 'evilrailway.app', '', 'onrender.com.br'):
+            self.assertFalse(validador.permitido(host), host)
+        self.assertTrue(ValidadorHosts(['*']).permitido('qualquer.um'))
+    
+    @override_settings(HOSTS_PERMITIDOS=['testserver', '.railway.app'])
+    def test_middleware_nao_altera_configuracoes(self):
+        """Testa a resposta 400 para host inválido e que ALLOWED_HOSTS não cresce"""
+        from django.conf import settings
+        
+        antes = list(settings.ALLOWED_HOSTS)
+        for i in range(3):
+            response = self.client.get('/api/config/public/', HTTP_HOST=f'app-pr-{i}.up.railway.app')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get('/api/config/public/', HTTP_HOST='railway.app.evil.com')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(settings.ALLOWED_HOSTS, antes)
+
+
+@override_settings(MERCADOPAGO_ACCESS_TOKEN='TEST-token', PAGAMENTOS_ORM_THREADS=0)
+class PagamentosAssincronosTest(TestCase):
+    """Testes para as views de pagamento assíncronas (modo ASGI)"""
+    
+    def setUp(self):
+        from .models import Pedido
+        from rest_framework_simplejwt.tokens import RefreshToken
+        
+        self.usuario = User.objects.create_user(username='pix', email='pix@example.com', password='x')
+        self.plano = Plano.objects.create(nome='Mensal', descricao='-', preco=Decimal('99.90'), duracao_dias=30)
+        self.pedido = Pedido.objects.create(
+            usuario=self.usuario, plano=self.plano, valor=self.plano.preco, mercado_pago_preference_id='pref-1'
+        )
+        self.autorizacao = f'Bearer {RefreshToken.for_user(self.usuario).access_token}'
+    
+    async def test_status_pix_aprova_pela_preference(self):
+        """Testa a aprovação pelo pagamento da preferência e a criação da matrícula"""
+        from unittest.mock import AsyncMock, patch
+        from django.test import AsyncRequestFactory
+        from .models import Pedido
+        from .services.mercadopago_async import MercadoPagoAsync
+        from .views import PixStatusAsyncView
+        
+        view = PixStatusAsyncView.as_view()
+        request = AsyncRequestFactory().get('/', headers={'authorization': self.autorizacao})
+        pagamentos = [{'id': 555, 'status': 'rejected'}, {'id': 777, 'status': 'approved', 'status_detail': 'accredited'}]
+        with patch.object(MercadoPagoAsync, 'buscar_pagamentos_por_preference', AsyncMock(return_value=pagamentos)) as busca:
+            response = await view(request, pedido_id=self.pedido.id_publico)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(response.content)['status'], Pedido.STATUS_APROVADO)
+        busca.assert_awaited_once_with('pref-1')
+        pedido = await Pedido.objects.aget(id=self.pedido.id)
+        self.assertEqual(pedido.mercado_pago_payment_id, 777)
+        self.assertTrue(await Matricula.objects.filter(usuario=self.usuario, status='ativa').aexists())
+    
+    def test_aprovacao_trava_o_usuario(self):
+        """Testa que a aprovação trava a linha do usuário antes de verificar a matrícula e não duplica"""
+        from unittest.mock import patch
+        from django.db.models import QuerySet
+        from .views import _aprovar_pedido
+        
+        with patch.object(QuerySet, 'select_for_update', autospec=True, side_effect=QuerySet.select_for_update) as travar:
+            _aprovar_pedido(self.pedido, {'id': 777, 'status': 'approved'})
+            _aprovar_pedido(self.pedido, {'id': 777, 'status': 'approved'})
+        self.assertEqual([chamada.args[0].model for chamada in travar.call_args_list], [User, User])
+        self.assertEqual(Matricula.objects.filter(usuario=self.usuario, status='ativa').count(), 1)
+        self.usuario.refresh_from_db()
+        self.assertTrue(self.usuario.is_active_member)
+    
+    @override_settings(MERCADOPAGO_ACCESS_TOKEN='TEST-fake')
+    def test_views_sincronas_usam_as_mesmas_regras(self):
+        """Testa status PIX e verificação de retorno síncronos com as regras compartilhadas"""
+        from unittest.mock import patch
+        from .models import Pedido
+        from .services.mercadopago import MercadoPagoService
+        
+        self.client.defaults['HTTP_AUTHORIZATION'] = self.autorizacao
+        rejeitado = [{'id': 555, 'status': 'expired'}]
+        with patch.object(MercadoPagoService, 'buscar_pagamentos_por_preference', return_value=rejeitado):
+            response = self.client.get(f'/api/payments/pix/status/{self.pedido.id_publico}/')
+        self.assertEqual(response.json()['status'], Pedido.STATUS_EXPIRADO)
+        self.assertFalse(Matricula.objects.exists())
+        
+        self.pedido.status = Pedido.STATUS_PENDENTE
+        self.pedido.mercado_pago_payment_id = None
+        self.pedido.save()
+        aprovado = {'id': 777, 'status': 'approved', 'status_detail': 'accredited'}
+        with patch.object(MercadoPagoService, 'consultar_pagamento', return_value=aprovado), \
+                patch.object(MercadoPagoService, 'buscar_pagamentos_por_external_reference', return_value=[]):
+            response = self.client.post('/api/payments/verificar-retorno/', {'payment_id': '777'})
+        dados = response.json()
+        self.assertTrue(dados['success'])
+        self.assertTrue(dados['matricula_criada'])
+        self.pedido.refresh_from_db()
+        self.assertEqual((self.pedido.status, self.pedido.mercado_pago_payment_id), (Pedido.STATUS_APROVADO, 777))
+    
+    async def test_exige_autenticacao(self):
+        """Testa 401 sem token e 404 para pedido de outro usuário"""
+        from django.test import AsyncRequestFactory
+        from rest_framework_simplejwt.tokens import RefreshToken
+        from .views import PixStatusAsyncView
+        
+        view = PixStatusAsyncView.as_view()
+        response = await view(AsyncRequestFactory().get('/'), pedido_id=self.pedido.id_publico)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        
+        outro = await User.objects.acreate(username='outro', email='outro@example.com')
+        request = AsyncRequestFactory().get('/', headers={'authorization': f'Bearer {RefreshToken.for_user(outro).access_token}'})
+        response = await view(request, pedido_id=self.pedido.id_publico)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+    
+    async def test_middlewares_no_modo_asgi(self):
+        """Testa a pilha de middlewares em modo assíncrono (host inválido continua 400)"""
+        response = await self.async_client.get('/api/config/public/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = await self.async_client.get('/api/config/public/', headers={'host': 'invalido.exemplo.com'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class MetricasTest(APITestCase):
+    """Testes para o Server-Timing e o endpoint de métricas"""
+    
+    def setUp(self):
+        from . import metricas
+        
+        metricas.limpar()
+        self.admin = User.objects.create_user(username='adm', email='adm@example.com', password='x', role='admin')
+        self.aluno = User.objects.create_user(username='aluno', email='aluno@example.com', password='x')
+    
+    @override_settings(DEBUG=False)
+    def test_server_timing_apenas_para_staff(self):
+        """Testa o header com tempos de SQL/serialização para staff e a ausência para alunos"""
+        self.client.force_authenticate(self.aluno)
+        response = self.client.get('/api/auth/user/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('Server-Timing', response)
+        
+        self.client.force_authenticate(self.admin)
+        response = self.client.get('/api/usuarios/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        timing = response['Server-Timing']
+        for etapa in ('db;dur=', 'mp;dur=', 'serializacao;dur=', 'total;dur='):
+            self.assertIn(etapa, timing)
+        self.assertNotIn('desc="0 consultas"', timing)
+    
+    def test_serializacao_inclui_to_representation(self):
+        """Testa que serializer.data conta como serialização (uma vez, mesmo aninhado) e o SQL dentro dele só como db"""
+        import time
+        from rest_framework import serializers as drf_serializers
+        from . import metricas
+        
+        class Lento(drf_serializers.Serializer):
+            nome = drf_serializers.CharField()
+            
+            def to_representation(self, instance):
+                time.sleep(0.02)
+                list(User.objects.all())
+                return super().to_representation(instance)
+        
+        class Externo(drf_serializers.Serializer):
+            def to_representation(self, instance):
+                return {'itens': Lento(instance, many=True).data}
+        
+        registro, token = metricas.iniciar()
+        try:
+            Externo([{'nome': 'a'}, {'nome': 'b'}]).data
+        finally:
+            metricas.finalizar(token)
+        self.assertEqual(registro.sql, 2)
+        self.assertGreaterEqual(registro.serializacao_segundos, 0.04)
+        self.assertLess(registro.serializacao_segundos + registro.sql_segundos, registro.duracao())
+    
+    @override_settings(METRICAS_TOKEN='segredo')
+    def test_endpoint_prometheus(self):
+        """Testa o histograma por rota e a proteção por token"""
+        self.client.force_authenticate(self.aluno)
+        self.client.get('/api/auth/user/')
+        self.client.force_authenticate(None)
+        
+        self.assertEqual(self.client.get('/api/metricas/').status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.get('/api/metricas/', HTTP_AUTHORIZATION='Bearer segredo')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        texto = response.content.decode()
+        self.assertIn('# TYPE academia_requisicao_segundos histogram', texto)
+        self.assertIn('academia_requisicao_segundos_count{rota="user_profile",metodo="GET"} 1', texto)
+        self.assertIn('academia_requisicao_segundos_bucket{rota="user_profile",metodo="GET",le="+Inf"} 1', texto)
+        self.assertIn('academia_sql_consultas_total{rota="user_profile",metodo="GET"}', texto)
+
+
+class PerfilamentoTest(APITestCase):
+    """Testes para o perfilamento sob demanda (X-Profile)"""
+    
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username='adm', email='adm@example.com', password='x', role='admin', is_superuser=True
+        )
+        self.aluno = User.objects.create_user(username='aluno', email='aluno@example.com', password='x')
+    
+    @override_settings(PERFIS_TOKEN='segredo')
+    def test_header_com_token_gera_perfil(self):
+        """Testa o perfil com SQL para o header com o segredo, a recusa antes da view e os downloads do admin"""
+        import marshal
+        from unittest.mock import patch
+        from . import perfis
+        from .models import PerfilRequisicao
+        
+        self.client.force_authenticate(self.aluno)
+        with patch.object(perfis, 'Perfilador', side_effect=AssertionError('perfilou sem o token')):
+            for valor in ('1', 'segred', 'segredo '):
+                self.assertEqual(self.client.get('/api/auth/user/', HTTP_X_PROFILE=valor).status_code, status.HTTP_200_OK)
+        self.assertFalse(PerfilRequisicao.objects.exists())
+        with override_settings(PERFIS_TOKEN=''):
+            self.client.get('/api/auth/user/', HTTP_X_PROFILE='')
+        self.assertFalse(PerfilRequisicao.objects.exists())
+        
+        self.client.force_authenticate(self.admin)
+        response = self.client.get('/api/usuarios/', HTTP_X_PROFILE='segredo')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        perfil = PerfilRequisicao.objects.get(pk=response['X-Profile-Id'])
+        self.assertEqual(perfil.rota, 'usuario-list')
+        self.assertGreater(perfil.consultas, 0)
+        self.assertTrue(any('academia_usuario' in consulta['sql'] for consulta in perfil.sql))
+        self.assertTrue(marshal.loads(bytes(perfil.estatisticas)))
+        
+        self.client.force_login(self.admin)
+        pstats = self.client.get(f'/admin/academia/perfilrequisicao/{perfil.pk}/pstats/')
+        self.assertEqual(pstats.status_code, status.HTTP_200_OK)
+        speedscope = self.client.get(f'/admin/academia/perfilrequisicao/{perfil.pk}/speedscope/')
+        dados = json.loads(speedscope.content)
+        eventos = dados['profiles'][0]['events']
+        self.assertTrue(eventos)
+        self.assertEqual(sum(1 if e['type'] == 'O' else -1 for e in eventos), 0)
+        self.assertEqual(self.client.get('/admin/academia/perfilrequisicao/').status_code, status.HTTP_200_OK)
+    
+    @override_settings(PERFIS_TAXA_AMOSTRAGEM=1.0, PERFIS_MAXIMO=2)
+    def test_amostragem_e_retencao(self):
+        """Testa a amostragem sem header e o limite de perfis guardados"""
+        from .models import PerfilRequisicao
+        
+        for _ in range(3):
+            self.client.get('/api/config/public/')
+        self.assertEqual(PerfilRequisicao.objects.filter(motivo=PerfilRequisicao.MOTIVO_AMOSTRAGEM).count(), 2)
+
+
+class PopularCargaTest(TestCase):
+    """Testes do comando popular_carga (dados em volume para benchmarks)"""
+    
+    def test_gera_volumes_em_escala(self):
+        """Testa os volumes gerados, o login do usuário de carga e a consolidação da frequência"""
+        from io import StringIO
+        from django.core.management import call_command
+        from .models import ParticipanteTorneio, Pedido, Torneio
+        
+        argumentos = dict(usuarios=30, matriculas=40, frequencias=60, pedidos=25, torneios=2,
+                          participantes=8, lote=7, stdout=StringIO())
+        call_command('popular_carga', **argumentos)
+        
+        self.assertEqual(User.objects.filter(username__startswith='carga-').count(), 30)
+        self.assertEqual(Matricula.objects.count(), 40)
+        self.assertEqual(Frequencia.objects.count(), 60)
+        self.assertEqual(Pedido.objects.count(), 25)
+        self.assertEqual(Torneio.objects.count(), 2)
+        self.assertEqual(ParticipanteTorneio.objects.count(), 16)
+        self.assertEqual(sum(FrequenciaDiaria.objects.values_list('visitas', flat=True)), 60)
+        admin = User.objects.get(username='carga-admin')
+        self.assertTrue(admin.is_staff)
+        self.assertTrue(admin.check_password('carga12345'))
+        self.assertIn('carga', User.objects.get(username='carga-0').texto_busca)
+        
+        # Repetir sem --limpar não duplica; com --limpar regrava
+        from django.core.management.base import CommandError
+        with self.assertRaises(CommandError):
+            call_command('popular_carga', **argumentos)
+        call_command('popular_carga', limpar=True, **argumentos)
+        self.assertEqual(User.objects.filter(username__startswith='carga-').count(), 30)
+        self.assertEqual(Torneio.objects.count(), 2)
+
+
+class MercadoPagoFakeTest(TestCase):
+    """Testes do servidor fake do Mercado Pago com o MercadoPagoService (SDK) apontado para ele"""
+    
+    def setUp(self):
+        from .services.mercadopago_fake import ServidorMercadoPagoFake
+        self.servidor = ServidorMercadoPagoFake(('127.0.0.1', 0))
+        self.servidor.iniciar_em_thread()
+        self.addCleanup(self.servidor.server_close)
+        self.addCleanup(self.servidor.shutdown)
+        self.usuario = User.objects.create_user(username='comprador', email='comprador@example.com', password='x')
+        self.plano = Plano.objects.create(nome='Fake', descricao='d', preco=Decimal('99.90'), duracao_dias=30)
+    
+    def _aguardar(self, condicao, segundos=5):
+        import time
+        limite = time.monotonic() + segundos
+        while not condicao() and time.monotonic() < limite:
+            time.sleep(0.02)
+        return condicao()
+    
+    def test_checkout_pagamento_webhook_e_falhas(self):
+        """Testa preferência, pagamento simulado, busca, webhooks duplicados e erros injetados"""
+        from urllib.request import Request, urlopen
+        from .models import Pedido
+        from .services.mercadopago import MercadoPagoService
+        
+        with self.settings(MERCADOPAGO_API_URL=self.servidor.url, MERCADOPAGO_ACCESS_TOKEN='TEST-fake',
+                           MERCADOPAGO_WEBHOOK_URL=self.servidor.url):
+            servico = MercadoPagoService()
+            pedido = Pedido.objects.create(usuario=self.usuario, plano=self.plano, valor=self.plano.preco)
+            dados = servico.criar_pagamento_pix(pedido, self.usuario, self.plano)
+            self.assertTrue(dados['init_point'].startswith(self.servidor.url))
+            pedido.refresh_from_db()
+            self.assertEqual(pedido.mercado_pago_preference_id, dados['preference_id'])
+            
+            self.servidor.configuracao.taxa_webhook_duplicado = 1.0
+            requisicao = Request(f"{self.servidor.url}/__fake/preferences/{dados['preference_id']}/pagar",
+                                 data=b'{}', method='POST', headers={'Content-Type': 'application/json'})
+            with urlopen(requisicao) as resposta:
+                pagamento = json.loads(resposta.read())
+            
+            encontrados = servico.buscar_pagamentos_por_preference(dados['preference_id'])
+            self.assertEqual([p['id'] for p in encontrados], [pagamento['id']])
+            consultado = servico.consultar_pagamento(pagamento['id'])
+            self.assertEqual(consultado['status'], 'approved')
+            self.assertEqual(consultado['external_reference'], str(pedido.id_publico))
+            self.assertIsNone(servico.consultar_pagamento(123))
+            
+            # Original + duplicata entregues à notification_url (aqui o próprio fake, que responde 404)
+            contadores = self.servidor.estado.contadores
+            self.assertEqual(contadores['webhooks_duplicados'], 1)
+            self.assertTrue(self._aguardar(lambda: contadores['webhooks_falhos'] + contadores['webhooks_enviados'] == 2))
+            
+            self.servidor.configuracao.taxa_erros = 1.0
+            self.assertIsNone(servico.consultar_pagamento(pagamento['id']))
+            self.assertGreater(contadores['erros_injetados'], 0)
+
+
+def _criar_alunos_em_torneio(cls, quantidade=15):
+    """Admin, plano e alunos matriculados e inscritos num torneio (dados dos testes de consultas)"""
+    from .models import ParticipanteTorneio, Torneio
+    cls.admin = User.objects.create_user(username='adm', email='adm@example.com', password=None, role='admin')
+    cls.plano = Plano.objects.create(nome='Mensal', descricao='d', preco=Decimal('99.90'), duracao_dias=30)
+    cls.alunos = [
+        User.objects.create_user(username=f'aluno{i}', email=f'aluno{i}@example.com', password=None)
+        for i in range(quantidade)
+    ]
+    agora = timezone.now()
+    torneio = Torneio.objects.create(
+        nome='Copa', descricao='d', data_inicio_inscricoes=agora, data_fim_inscricoes=agora,
+        data_inicio=agora, max_participantes=16, criado_por=cls.admin,
+    )
+    for aluno in cls.alunos:
+        Matricula.objects.create(usuario=aluno, plano=cls.plano, data_inicio=date.today(),
+                                 data_fim=date.today() + timedelta(days=30), valor_pago=Decimal('99.90'))
+        ParticipanteTorneio.objects.create(torneio=torneio, usuario=aluno)
+    from .views import gerar_chaves_torneio
+    gerar_chaves_torneio(torneio)
+
+
+class OrcamentoConsultasTest(APITestCase):
+    """Testes do inspetor de consultas: pilha de origem, contagem por teste e orçamentos por endpoint"""
+    
+    @classmethod
+    def setUpTestData(cls):
+        _criar_alunos_em_torneio(cls)
+    
+    def test_pilha_de_origem_no_n_mais_um(self):
+        """Testa a impressão digital do N+1 e a pilha que aponta a linha que o causou"""
+        from .consultas import MonitorConsultas
+        
+        with MonitorConsultas(limite=10) as monitor:
+            nomes = [m.plano.nome for m in Matricula.objects.all()]  # N+1 proposital
+        self.assertEqual(len(nomes), 15)
+        (padrao, vezes), = monitor.repetidas(10)
+        self.assertEqual(vezes, 15)
+        self.assertIn('academia_plano', padrao)
+        self.assertIn('academia/tests.py', monitor.descrever(10))
+        self.assertIn('m.plano.nome', monitor.descrever(10))
+    
+    def test_serializer_de_torneio_sem_prefetch(self):
+        """Testa que sem prefetch os campos calculados consultam só o necessário (sem carregar as relações)"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from rest_framework.test import APIRequestFactory
+        from .models import FaseTorneio, Torneio
+        from .serializers import FaseTorneioSerializer, TorneioSerializer
+        
+        request = APIRequestFactory().get('/')
+        request.user = self.alunos[0]
+        torneio = Torneio.objects.get()
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertTrue(TorneioSerializer(context={'request': request}).get_usuario_inscrito(torneio))
+        self.assertEqual(len(consultas), 1)
+        self.assertIn('LIMIT 1', consultas[0]['sql'])
+        
+        fase = FaseTorneio.objects.filter(torneio=torneio).first()
+        fase.chaves.update(concluida=False)
+        fase.chaves.filter(pk=fase.chaves.first().pk).update(concluida=True)
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(FaseTorneioSerializer().get_chaves_concluidas(fase), 1)
+        self.assertEqual(len(consultas), 1)
+        self.assertIn('COUNT(', consultas[0]['sql'])
+    
+    def test_mixin_falha_no_orcamento_e_no_n_mais_um_do_teste(self):
+        """Testa o mixin: orçamento estourado e N+1 fora das requisições falham o teste"""
+        import unittest
+        from .consultas import OrcamentoConsultasMixin
+        admin = self.admin
+        
+        class Interno(OrcamentoConsultasMixin, unittest.TestCase):
+            orcamento_consultas = {'usuario-list': 1, '/api/planos/': 50}
+            
+            def test_orcamento(self):
+                cliente = APIClient()
+                cliente.force_authenticate(admin)
+                self.assertEqual(cliente.get('/api/planos/').status_code, 200)
+                cliente.get('/api/usuarios/')
+            
+            def test_n_mais_um(self):
+                [m.plano.nome for m in Matricula.objects.all()]
+            
+            def test_dentro_do_limite(self):
+                [m.plano.nome for m in Matricula.objects.all()[:5]]
+        
+        resultados = {}
+        for nome in ('test_orcamento', 'test_n_mais_um', 'test_dentro_do_limite'):
+            resultado = unittest.TestResult()
+            Interno(nome).run(resultado)
+            resultados[nome] = '\n'.join(mensagem for _, mensagem in resultado.failures + resultado.errors)
+        self.assertIn('usuario-list', resultados['test_orcamento'])
+        self.assertIn('orçamento 1', resultados['test_orcamento'])
+        self.assertNotIn('/api/planos/ (', resultados['test_orcamento'])
+        self.assertIn('provável N+1', resultados['test_n_mais_um'])
+        self.assertIn('academia/tests.py', resultados['test_n_mais_um'])
+        self.assertEqual(resultados['test_dentro_do_limite'], '')
+
+
+class OrcamentoEndpointsTest(OrcamentoConsultasMixin, APITestCase):
+    """Orçamentos de consultas dos endpoints principais (não podem crescer com o número de linhas)"""
+    orcamento_consultas = {
+        'user_profile': 1,
+        'plano-list': 2,
+        'usuario-list': 3,
+        'matricula-list': 2,
+        'torneio-list': 12,
+    }
+    
+    @classmethod
+    def setUpTestData(cls):
+        _criar_alunos_em_torneio(cls)
+    
+    def test_endpoints_dentro_do_orcamento(self):
+        """Testa os endpoints com 15 alunos matriculados e inscritos num torneio"""
+        self.client.force_authenticate(self.admin)
+        for caminho in ('/api/auth/user/', '/api/planos/', '/api/usuarios/', '/api/matriculas/', '/api/torneios/'):
+            response = self.client.get(caminho)
+            self.assertEqual(response.status_code, status.HTTP_200_OK, caminho)
+        self.client.force_authenticate(self.alunos[0])
+        torneios = self.client.get('/api/torneios/').json()
+        torneios = torneios.get('results', torneios)
+        self.assertTrue(torneios[0]['usuario_inscrito'])
+        self.assertEqual(torneios[0]['total_participantes'], 15)
+
+
+@override_settings(
+    SESSION_ENGINE='django.contrib.sessions.backends.cached_db',
+    AUTHENTICATION_BACKENDS=['academia.autenticacao.BackendUsuarioEmCache'],
+)
+class SessaoEmCacheTest(TestCase):
+    """Testes para a sessão (cached_db) e o usuário em cache nas páginas com sessão (configuração com REDIS_URL)"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.admin = User.objects.create_user(
+            username='admin', email='admin@example.com', password=None, role='admin'
+        )
+        self.client.force_login(self.admin)
+    
+    def test_paginas_sem_consultas_de_autenticacao(self):
+        """Testa que, após a primeira leitura, sessão e usuário vêm do cache"""
+        self.assertEqual(self.client.get('/portal/admin/').status_code, 200)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/portal/admin/').status_code, 200)
+            response = self.client.get('/portal/')
+        self.assertRedirects(response, '/portal/admin/', fetch_redirect_response=False)
+    
+    def test_save_invalida_usuario_em_cache(self):
+        """Testa que a alteração do usuário aparece na requisição seguinte"""
+        self.assertEqual(self.client.get('/portal/admin/').status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.admin.role = User.Role.PROFESSOR
+            self.admin.save()
+        self.assertRedirects(self.client.get('/portal/admin/'), '/portal/professor/', fetch_redirect_response=False)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.admin.is_active = False
+            self.admin.save()
+        response = self.client.get('/portal/admin/')
+        self.assertFalse(response.wsgi_request.user.is_authenticated)
+
+
+class SessaoSemRedisTest(TestCase):
+    """Testes para a sessão sem REDIS_URL (cache por processo, que não é compartilhado entre os workers)"""
+    
+    def setUp(self):
+        from django.conf import settings
+        if settings.REDIS_URL:
+            self.skipTest('REDIS_URL configurado: sessão e usuário em cache')
+        self.admin = User.objects.create_user(
+            username='admin', email='admin@example.com', password=None, role='admin', is_staff=True
+        )
+        self.client.force_login(self.admin)
+    
+    def test_sessao_e_usuario_lidos_do_banco(self):
+        """Testa que alterações feitas fora deste processo (update, sessão apagada) valem na requisição seguinte"""
+        from django.contrib.sessions.models import Session
+        self.assertEqual(self.client.get('/portal/admin/').status_code, 200)
+        
+        User.objects.filter(pk=self.admin.pk).update(role=User.Role.ALUNO, is_staff=False)
+        self.assertRedirects(self.client.get('/portal/admin/'), '/portal/', fetch_redirect_response=False)
+        
+        Session.objects.all().delete()
+        response = self.client.get('/portal/')
+        self.assertFalse(response.wsgi_request.user.is_authenticated)
+
+
+class PaginasPreRenderizadasTest(TestCase):
+    """Testes para as páginas estáticas pré-renderizadas no collectstatic"""
+    
+    def setUp(self):
+        import shutil
+        import tempfile
+        from io import StringIO
+        from django.core.management import call_command
+        raiz = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, raiz, ignore_errors=True)
+        configuracao = override_settings(STATIC_ROOT=raiz, STORAGES={
+            'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+            'staticfiles': {'BACKEND': 'academia.paginas.ArmazenamentoEstatico'},
+        })
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+        call_command('collectstatic', interactive=False, stdout=StringIO())
+        self.client = Client()
+    
+    def test_home_servida_pelo_whitenoise(self):
+        """Testa a home pré-renderizada, com assets com hash, compressão e revalidação por ETag"""
+        from whitenoise.middleware import WhiteNoiseFileResponse
+        with self.assertNumQueries(0):
+            response = self.client.get('/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertIsInstance(response, WhiteNoiseFileResponse)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('must-revalidate', response['Cache-Control'])
+        self.assertEqual(response['X-Frame-Options'], 'DENY')
+        self.assertNotIn('sessionid', response.cookies)
+        
+        response = self.client.get('/')
+        html = b''.join(response.streaming_content).decode()
+        self.assertRegex(html, r'/static/css/styles\.[0-9a-f]{12}\.css')
+        self.assertIn('href="/planos/"', html)
+        self.assertNotIn('{%', html)
+        self.assertEqual(self.client.get('/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+    
+    def test_todas_as_paginas_e_redirecionamento_por_papel(self):
+        """Testa que as páginas estáticas saem do WhiteNoise e o portal continua numa view"""
+        from whitenoise.middleware import WhiteNoiseFileResponse
+        from .paginas import PAGINAS_ESTATICAS
+        for url in PAGINAS_ESTATICAS:
+            response = self.client.get(url)
+            self.assertIsInstance(response, WhiteNoiseFileResponse, url)
+            self.assertEqual(response['X-Frame-Options'], 'DENY', url)
+        self.assertNotIsInstance(self.client.get('/portal/'), WhiteNoiseFileResponse)
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import (
@@ -7,11 +8,18 @@ from rest_framework_simplejwt.views import (
 )
 from . import views
 
+
+def _pagamento(sincrona, assincrona):
+    """View assíncrona quando o servidor roda em ASGI (PAGAMENTOS_ASSINCRONOS), senão a APIView"""
+    return (assincrona if settings.PAGAMENTOS_ASSINCRONOS else sincrona).as_view()
+
+
 # Router para ViewSets
 router = DefaultRouter()
 router.register(r'planos', views.PlanoViewSet)
 router.register(r'usuarios', views.UsuarioViewSet)
 router.register(r'matriculas', views.MatriculaViewSet, basename='matricula')
+router.register(r'treinos/modelos', views.TreinoModeloViewSet, basename='treino-modelo')
 router.register(r'treinos/gerenciar', views.TreinoManageViewSet, basename='treino-gerenciar')
 router.register(r'torneios', views.TorneioViewSet, basename='torneio')
 router.register(r'participantes-torneio', views.ParticipanteTorneioViewSet, basename='participante-torneio')
@@ -35,22 +43,35 @@ urlpatterns = [
     path('auth/user/', views.UserProfileView.as_view(), name='user_profile'),
     path('auth/check-email/', views.CheckEmailView.as_view(), name='check_email'),
     path('auth/password-reset/', views.PasswordResetView.as_view(), name='password_reset'),
+    path('auth/password-reset/confirm/', views.PasswordResetConfirmView.as_view(), name='password_reset_confirm'),
     
     # URLs específicas da academia
     path('config/public/', views.ConfigPublicaView.as_view(), name='config_public'),
     path('dashboard/', views.DashboardView.as_view(), name='dashboard'),
+    path('admin/kpis/', views.AdminKpisView.as_view(), name='admin_kpis'),
+    path('admin/exportar/<str:tipo>/', views.AdminExportacaoView.as_view(), name='admin_exportar'),
     path('planos/escolher/', views.EscolherPlanoView.as_view(), name='escolher_plano'),
     path('treinos/', views.TreinoListView.as_view(), name='treinos'),
     path('treinos/<int:pk>/', views.TreinoDetailView.as_view(), name='treino_detail'),
     path('exercicios/', views.ExercicioListView.as_view(), name='exercicios'),
     path('avaliacoes/', views.AvaliacaoListView.as_view(), name='avaliacoes'),
+    path('avaliacoes/progresso/', views.AvaliacaoProgressoView.as_view(), name='avaliacoes_progresso'),
+    path('frequencia/checkin/', views.FrequenciaCheckinView.as_view(), name='frequencia_checkin'),
+    path('frequencia/lote/', views.FrequenciaLoteView.as_view(), name='frequencia_lote'),
+    path('professor/alunos/', views.ProfessorAlunosView.as_view(), name='professor_alunos'),
+    path('sync/', views.SincronizacaoView.as_view(), name='sync'),
+    path('metricas/', views.metricas_prometheus, name='metricas'),
+    path('frequencia/relatorio/', views.FrequenciaRelatorioView.as_view(), name='frequencia_relatorio'),
+    path('frequencia/mapa-calor/', views.FrequenciaMapaCalorView.as_view(), name='frequencia_mapa_calor'),
+    path('frequencia/ocupacao/', views.OcupacaoView.as_view(), name='frequencia_ocupacao'),
+    path('frequencia/ocupacao/stream/', views.OcupacaoStreamView.as_view(), name='frequencia_ocupacao_stream'),
 
-    path('payments/pix/initiate/', views.PixInitiateView.as_view(), name='pix_initiate'),
-    path('payments/pix/status/<uuid:pedido_id>/', views.PixStatusView.as_view(), name='pix_status'),
+    path('payments/pix/initiate/', _pagamento(views.PixInitiateView, views.PixInitiateAsyncView), name='pix_initiate'),
+    path('payments/pix/status/<uuid:pedido_id>/', _pagamento(views.PixStatusView, views.PixStatusAsyncView), name='pix_status'),
     path('payments/pix/confirm/<uuid:pedido_id>/', views.PixConfirmView.as_view(), name='pix_confirm'),
-    path('payments/cartao/initiate/', views.CartaoInitiateView.as_view(), name='cartao_initiate'),
-    path('payments/assinatura/status/<uuid:pedido_id>/', views.AssinaturaStatusView.as_view(), name='assinatura_status'),
+    path('payments/cartao/initiate/', _pagamento(views.CartaoInitiateView, views.CartaoInitiateAsyncView), name='cartao_initiate'),
+    path('payments/assinatura/status/<uuid:pedido_id>/', _pagamento(views.AssinaturaStatusView, views.AssinaturaStatusAsyncView), name='assinatura_status'),
     path('payments/assinatura/cancelar/<uuid:pedido_id>/', views.AssinaturaCancelarView.as_view(), name='assinatura_cancelar'),
     path('payments/mercadopago/webhook/', views.MercadoPagoWebhookView.as_view(), name='mercadopago_webhook'),
-    path('payments/verificar-retorno/', views.VerificarPagamentoRetornoView.as_view(), name='verificar_pagamento_retorno'),
+    path('payments/verificar-retorno/', _pagamento(views.VerificarPagamentoRetornoView, views.VerificarPagamentoRetornoAsyncView), name='verificar_pagamento_retorno'),
 ]
@@ -1,23 +1,33 @@
+import asyncio
 from datetime import timedelta
+import json
 import os
 
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.http import HttpResponse, JsonResponse
 from django.shortcuts import render, redirect
 from django.urls import reverse
 from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 from django.views.generic import TemplateView
 from rest_framework import permissions, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.generics import ListAPIView, RetrieveAPIView, ListCreateAPIView
+from rest_framework.pagination import CursorPagination
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 from rest_framework.views import APIView
+from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework_simplejwt.tokens import RefreshToken
-from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.exceptions import AuthenticationFailed, NotAuthenticated, PermissionDenied, ValidationError
 
 from .models import (
     Usuario,
@@ -26,8 +36,10 @@ from .models import (
     Exercicio,
     Treino,
     TreinoExercicio,
+    TreinoModelo,
     Avaliacao,
     Frequencia,
+    FrequenciaDiaria,
     Pedido,
     Torneio,
     ParticipanteTorneio,
@@ -35,6 +47,7 @@ from .models import (
     ExercicioFase,
     Chave,
     ResultadoPartida,
+    normalizar_texto,
 )
 from .serializers import (
     UsuarioSerializer,
@@ -44,12 +57,16 @@ from .serializers import (
     MatriculaSerializer,
     ExercicioSerializer,
     TreinoSerializer,
+    TreinoModeloSerializer,
+    AtribuirTreinoModeloSerializer,
     AvaliacaoSerializer,
     FrequenciaSerializer,
     CheckEmailSerializer,
     PasswordResetSerializer,
+    PasswordResetConfirmSerializer,
     EscolherPlanoSerializer,
     DashboardSerializer,
+    PainelAlunoSerializer,
     ChangePasswordSerializer,
     PedidoSerializer,
     TorneioSerializer,
@@ -59,13 +76,34 @@ from .serializers import (
     ChaveSerializer,
     ResultadoPartidaSerializer,
 )
+from .metricas import texto_prometheus
 from .permissions import IsAcademiaAdmin, IsProfessorOrAdmin
+from .services.alunos import INDICADORES as INDICADORES_PAINEL, filtrar_painel, painel_alunos
+from .services.busca import buscar_usuarios
+from .services.frequencia import (
+    JANELA_VISITA,
+    TAMANHO_LOTE as TAMANHO_LOTE_FREQUENCIA,
+    processar_eventos,
+    validar_evento,
+)
+from .services.exportacao import EXPORTACOES, FORMATOS as FORMATOS_EXPORTACAO, exportar
+from .services.frequencia_diaria import totais_usuario
+from .services.importacao import ArquivoInvalido, importar_membros
+from .services.kpis import obter_kpis
+from .services.mercadopago_async import MercadoPagoAsync, orm
+from .services.mapa_calor import obter_mapa_calor
+from .services.ocupacao import obter_ocupacao
+from .services.progresso import METRICAS as METRICAS_PROGRESSO, obter_progresso
+from .services.sincronizacao import TokenInvalido, ler_token, sincronizar
+from .services.treinos import atribuir_modelo
 
 # Função auxiliar compartilhada para criar matrícula
 def criar_matricula_se_necessario(pedido):
     """
     Função auxiliar para criar matrícula se pagamento foi aprovado
     e ainda não existe matrícula ativa. Usada por múltiplas views.
+    A linha do usuário fica travada (select_for_update) entre a verificação e a criação:
+    webhooks duplicados e consultas de status simultâneas do mesmo aluno passam um de cada vez.
     """
     import logging
     logger = logging.getLogger(__name__)
@@ -75,33 +113,149 @@ def criar_matricula_se_necessario(pedido):
         logger.debug(f"Pedido {pedido.id_publico} não está aprovado (status: {pedido.status})")
         return
     
-    # Verificar se já existe matrícula ativa
-    if Matricula.objects.filter(usuario=pedido.usuario, status='ativa').exists():
-        # Garantir que o usuário está ativo
-        if not pedido.usuario.is_active_member:
-            pedido.usuario.is_active_member = True
-            pedido.usuario.save()
-            logger.info(f"Usuário {pedido.usuario.email} ativado como membro")
-        return
-    
-    # Criar nova matrícula
-    data_inicio = pedido.subscription_start_date or timezone.now().date()
-    data_fim = pedido.subscription_end_date or (data_inicio + timedelta(days=pedido.plano.duracao_dias))
-    
-    matricula = Matricula.objects.create(
-        usuario=pedido.usuario,
-        plano=pedido.plano,
-        data_inicio=data_inicio,
-        data_fim=data_fim,
-        valor_pago=pedido.valor,
-        status='ativa'
-    )
-    
-    # Ativar usuário como membro
-    pedido.usuario.is_active_member = True
-    pedido.usuario.save()
+    with transaction.atomic():
+        usuario = Usuario.objects.select_for_update().get(pk=pedido.usuario_id)
+        pedido.usuario = usuario
+        
+        # Verificar se já existe matrícula ativa
+        if Matricula.objects.filter(usuario=usuario, status='ativa').exists():
+            # Garantir que o usuário está ativo
+            if not usuario.is_active_member:
+                usuario.is_active_member = True
+                usuario.save()
+                logger.info(f"Usuário {usuario.email} ativado como membro")
+            return
+        
+        # Criar nova matrícula
+        data_inicio = pedido.subscription_start_date or timezone.now().date()
+        data_fim = pedido.subscription_end_date or (data_inicio + timedelta(days=pedido.plano.duracao_dias))
+        
+        matricula = Matricula.objects.create(
+            usuario=usuario,
+            plano=pedido.plano,
+            data_inicio=data_inicio,
+            data_fim=data_fim,
+            valor_pago=pedido.valor,
+            status='ativa'
+        )
+        
+        # Ativar usuário como membro
+        usuario.is_active_member = True
+        usuario.save()
     
-    logger.info(f"Matrícula criada (ID: {matricula.id}) e usuário {pedido.usuario.email} ativado")
+    logger.info(f"Matrícula criada (ID: {matricula.id}) e usuário {usuario.email} ativado")
+
+
+# ---------------------------------------------------------------------------
+# Regras de pagamento compartilhadas pelas views síncronas (APIView) e assíncronas
+# (modo ASGI): mapeamento de status do Mercado Pago e ativação da matrícula. As views
+# só consultam o Mercado Pago (SDK ou httpx) e chamam estas funções.
+# ---------------------------------------------------------------------------
+
+def _pedido_do_usuario(usuario, pedido_id):
+    return Pedido.objects.select_related('plano', 'usuario').filter(id_publico=pedido_id, usuario=usuario).first()
+
+
+def _dados_pedido(pedido, **extras):
+    return {**PedidoSerializer(pedido).data, **extras}
+
+
+def _aprovar_pedido(pedido, payment):
+    """Grava o pagamento aprovado no pedido e cria a matrícula (na mesma transação)"""
+    payment_id = payment.get('id')
+    if payment_id and str(payment_id).isdigit():
+        pedido.mercado_pago_payment_id = int(payment_id)
+    pedido.status = Pedido.STATUS_APROVADO
+    pedido.mercado_pago_status = 'approved'
+    pedido.mercado_pago_status_detail = payment.get('status_detail', '')
+    with transaction.atomic():
+        pedido.save()
+        criar_matricula_se_necessario(pedido)
+
+
+def _primeiro_aprovado(payments):
+    return next((payment for payment in payments or [] if payment.get('status') == 'approved'), None)
+
+
+def _pagamento_aprovado(payment, payment_id):
+    """VerificarPagamentoRetornoView: o pagamento consultado pelo payment_id, se aprovado (None caso contrário)"""
+    if payment and payment.get('status') == 'approved':
+        return {**payment, 'id': payment.get('id') or int(payment_id)}
+    return None
+
+
+def _aplicar_pagamento(pedido, payment):
+    """PixStatusView: atualiza o pedido pelo status do pagamento consultado"""
+    mp_status = payment.get('status')
+    if mp_status == 'approved':
+        _aprovar_pedido(pedido, payment)
+    else:
+        if mp_status in ['cancelled', 'rejected']:
+            pedido.status = Pedido.STATUS_CANCELADO
+        elif mp_status == 'expired':
+            pedido.status = Pedido.STATUS_EXPIRADO
+        pedido.mercado_pago_status = mp_status
+        pedido.mercado_pago_status_detail = payment.get('status_detail', '')
+        pedido.save()
+    return _dados_pedido(pedido)
+
+
+def _aplicar_pagamentos_preference(pedido, payments):
+    """PixStatusView: pagamentos da preferência (retorno do Checkout Pro antes do webhook)"""
+    aprovado = _primeiro_aprovado(payments)
+    if aprovado:
+        _aprovar_pedido(pedido, aprovado)
+        return _dados_pedido(pedido)
+    for payment in payments:
+        mp_status = payment.get('status')
+        if mp_status in ['cancelled', 'rejected', 'expired']:
+            pedido.status = Pedido.STATUS_EXPIRADO if mp_status == 'expired' else Pedido.STATUS_CANCELADO
+            pedido.mercado_pago_payment_id = payment.get('id')
+            pedido.mercado_pago_status = mp_status
+            pedido.save()
+            break
+    return _dados_pedido(pedido)
+
+
+def _aplicar_assinatura(pedido, subscription):
+    """AssinaturaStatusView: atualiza o pedido pelo status da assinatura"""
+    mp_status = subscription.get('status')
+    if mp_status in ['authorized', 'active']:
+        pedido.status = Pedido.STATUS_APROVADO
+    elif mp_status in ['cancelled', 'paused']:
+        pedido.status = Pedido.STATUS_CANCELADO
+    elif mp_status == 'pending':
+        pedido.status = Pedido.STATUS_PENDENTE
+    pedido.mercado_pago_subscription_status = mp_status
+    pedido.save()
+    criar_matricula_se_necessario(pedido)
+    return _dados_pedido(pedido)
+
+
+def _pedido_para_verificacao(usuario, payment_id, preference_id):
+    """VerificarPagamentoRetornoView: pedido pelo payment_id ou preference_id da URL, senão o último pendente"""
+    pedidos = Pedido.objects.select_related('plano', 'usuario').filter(usuario=usuario)
+    pedido = None
+    if payment_id and str(payment_id).isdigit():
+        pedido = pedidos.filter(mercado_pago_payment_id=int(payment_id)).first()
+    if not pedido and preference_id:
+        pedido = pedidos.filter(mercado_pago_preference_id=preference_id).first()
+    if not pedido:
+        pedido = pedidos.filter(status=Pedido.STATUS_PENDENTE).order_by('-criado_em').first()
+    return pedido
+
+
+def _confirmar_retorno(pedido, payment):
+    _aprovar_pedido(pedido, payment)
+    pedido.refresh_from_db()
+    return {
+        'success': True,
+        'message': 'Pagamento processado com sucesso',
+        'pedido': PedidoSerializer(pedido).data,
+        'matricula_criada': Matricula.objects.filter(usuario=pedido.usuario, status='ativa').exists(),
+        'usuario_ativo': pedido.usuario.is_active_member,
+    }
+
 
 class RegisterView(APIView):
     permission_classes = [permissions.AllowAny]
@@ -195,6 +349,20 @@ class PasswordResetView(APIView):
             })
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+class PasswordResetConfirmView(APIView):
+    """View para definir a senha com o uid/token (convites da importação de alunos)"""
+    
+    permission_classes = [permissions.AllowAny]
+    
+    def post(self, request):
+        serializer = PasswordResetConfirmSerializer(data=request.data)
+        if serializer.is_valid():
+            user = serializer.validated_data['usuario']
+            user.set_password(serializer.validated_data['new_password'])
+            user.save()  # A nova senha invalida o token
+            return Response({'message': 'Senha definida com sucesso!'})
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
 class ChangePasswordView(APIView):
     """View para mudança de senha"""
     
@@ -224,15 +392,11 @@ class UsuarioViewSet(viewsets.ModelViewSet):
         if role:
             queryset = queryset.filter(role=role)
         
-        # Filtrar por busca
+        # Filtrar por busca (índice trigram/FTS, ordenado por relevância)
         search = self.request.query_params.get('search', None)
         if search:
-            queryset = queryset.filter(
-                Q(first_name__icontains=search) |
-                Q(last_name__icontains=search) |
-                Q(email__icontains=search)
-            )
-        return queryset
+            queryset = buscar_usuarios(search, queryset)
+        return queryset.prefetch_related(UsuarioProfileSerializer.prefetch_matriculas_ativas())
     
     def get_serializer_class(self):
         """Retorna o serializer apropriado baseado na ação"""
@@ -251,13 +415,63 @@ class UsuarioViewSet(viewsets.ModelViewSet):
             from rest_framework.permissions import IsAuthenticated
             return [IsAuthenticated()]
         
-        # Para list/retrieve, permitir professores e admins verem usuários
-        if self.action in ['list', 'retrieve']:
+        # Para list/retrieve/buscar, permitir professores e admins verem usuários
+        if self.action in ['list', 'retrieve', 'buscar']:
             return [IsProfessorOrAdmin()]
         
         # Para outras ações (create, update, etc), requer IsAcademiaAdmin
         return [IsAcademiaAdmin()]
     
+    @action(detail=False, methods=['get'])
+    def buscar(self, request):
+        """
+        Busca rápida de usuários (autocomplete do admin e seleção de aluno nas avaliações)
+        Parâmetros: q (texto), role (opcional), limite (padrão 10, máximo 50)
+        """
+        termo = request.query_params.get('q', '')
+        try:
+            limite = min(max(int(request.query_params.get('limite', 10)), 1), 50)
+        except (TypeError, ValueError):
+            limite = 10
+        
+        queryset = Usuario.objects.all()
+        role = request.query_params.get('role')
+        if role:
+            queryset = queryset.filter(role=role)
+        
+        resultados = buscar_usuarios(termo, queryset).values(
+            'id', 'first_name', 'last_name', 'email', 'role', 'relevancia'
+        )[:limite]
+        return Response({
+            'results': [
+                {
+                    'id': r['id'],
+                    'nome': f"{r['first_name']} {r['last_name']}".strip() or r['email'],
+                    'email': r['email'],
+                    'role': r['role'],
+                    'relevancia': r['relevancia'],
+                }
+                for r in resultados
+            ]
+        })
+    
+    @action(detail=False, methods=['post'])
+    def importar(self, request):
+        """
+        Importação em lote de alunos (admin): multipart com 'arquivo' (.csv ou .xlsx)
+        Retorna o relatório com as linhas rejeitadas e os convites dos alunos sem senha
+        """
+        arquivo = request.FILES.get('arquivo')
+        if arquivo is None:
+            raise ValidationError({'arquivo': 'Envie o arquivo .csv ou .xlsx no campo "arquivo".'})
+        try:
+            resultado = importar_membros(
+                arquivo.file, arquivo.name, max_linhas=getattr(settings, 'IMPORTACAO_MAX_LINHAS', 20000)
+            )
+        except ArquivoInvalido as e:
+            raise ValidationError({'arquivo': str(e)})
+        return Response(resultado.como_dict())
+    
     def create(self, request, *args, **kwargs):
         """Método customizado para criar usuários"""
         # Usar UsuarioSerializer para criação
@@ -458,9 +672,10 @@ class MatriculaViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         user = self.request.user
+        queryset = Matricula.objects.select_related('usuario', 'plano')
         if getattr(user, 'is_academia_admin', False) or getattr(user, 'is_superuser', False):
-            return Matricula.objects.all()
-        return Matricula.objects.filter(usuario=user)
+            return queryset
+        return queryset.filter(usuario=user)
 
 class ExercicioListView(ListAPIView):
     """View para listar exercícios"""
@@ -497,7 +712,7 @@ class TreinoListView(ListAPIView):
         return Treino.objects.filter(
             usuario=self.request.user, 
             ativo=True
-        ).prefetch_related(
+        ).select_related('usuario').prefetch_related(
             'treinoexercicio_set',
             'treinoexercicio_set__exercicio'
         ).order_by('-data_criacao')
@@ -515,13 +730,48 @@ class TreinoDetailView(RetrieveAPIView):
 class TreinoManageViewSet(viewsets.ModelViewSet):
     """ViewSet para gerenciamento de treinos por administradores e professores"""
     
-    queryset = Treino.objects.all().prefetch_related(
+    queryset = Treino.objects.all().select_related('usuario').prefetch_related(
         'treinoexercicio_set',
         'treinoexercicio_set__exercicio'
     )
     serializer_class = TreinoSerializer
     permission_classes = [IsProfessorOrAdmin]
 
+    @action(detail=False, methods=['post'], url_path='atribuir')
+    def atribuir(self, request):
+        """
+        Atribui um modelo de treino a vários alunos de uma vez
+        POST /api/treinos/gerenciar/atribuir/ {"modelo": id, "alunos": [ids], "nome": "...", "desativar_anteriores": false}
+        """
+        serializer = AtribuirTreinoModeloSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        dados = serializer.validated_data
+        treinos = atribuir_modelo(
+            dados['modelo'],
+            dados['alunos'],
+            nome=dados.get('nome') or None,
+            desativar_anteriores=dados['desativar_anteriores'],
+        )
+        return Response({
+            'modelo': dados['modelo'].id,
+            'treinos_criados': len(treinos),
+            'treinos': [{'id': t.id, 'usuario': t.usuario_id} for t in treinos],
+        }, status=status.HTTP_201_CREATED)
+
+
+class TreinoModeloViewSet(viewsets.ModelViewSet):
+    """ViewSet para modelos de treino (programas atribuídos a vários alunos)"""
+    
+    queryset = TreinoModelo.objects.all().select_related('criado_por').prefetch_related(
+        'exercicios',
+        'exercicios__exercicio'
+    )
+    serializer_class = TreinoModeloSerializer
+    permission_classes = [IsProfessorOrAdmin]
+    
+    def perform_create(self, serializer):
+        serializer.save(criado_por=self.request.user)
+
 
 class BaseRoleRequiredMixin(LoginRequiredMixin, UserPassesTestMixin):
     allowed_roles: tuple[str, ...] = ()
@@ -770,204 +1020,59 @@ class VerificarPagamentoRetornoView(APIView):
         Verifica o último pedido pendente do usuário e processa se foi aprovado
         Também verifica parâmetros da URL (payment_id, preference_id) que o Mercado Pago pode retornar
         """
+        import logging
+        logger = logging.getLogger(__name__)
+        
+        # Verificar se há parâmetros na URL que o Mercado Pago retorna
+        payment_id_url = request.data.get('payment_id') or request.query_params.get('payment_id')
+        preference_id_url = request.data.get('preference_id') or request.query_params.get('preference_id')
         try:
             from .services.mercadopago import MercadoPagoService
-            import logging
-            logger = logging.getLogger(__name__)
-            
-            # Verificar se há parâmetros na URL que o Mercado Pago retorna
-            payment_id_url = request.data.get('payment_id') or request.query_params.get('payment_id')
-            preference_id_url = request.data.get('preference_id') or request.query_params.get('preference_id')
-            status_url = request.data.get('status') or request.query_params.get('status')
             
             logger.info(f"🔍 Verificando pagamento para usuário {request.user.email}")
-            if payment_id_url:
-                logger.info(f"   Payment ID da URL: {payment_id_url}")
-            if preference_id_url:
-                logger.info(f"   Preference ID da URL: {preference_id_url}")
-            if status_url:
-                logger.info(f"   Status da URL: {status_url}")
-            
-            # Buscar pedido - primeiro tentar por payment_id/preference_id da URL, depois último pendente
-            pedido = None
-            if payment_id_url:
-                try:
-                    payment_id_int = int(payment_id_url) if str(payment_id_url).isdigit() else None
-                    if payment_id_int:
-                        pedido = Pedido.objects.filter(
-                            usuario=request.user,
-                            mercado_pago_payment_id=payment_id_int
-                        ).first()
-                        if pedido:
-                            logger.info(f"   Pedido encontrado por payment_id da URL: {pedido.id_publico}")
-                except (ValueError, TypeError):
-                    pass
-            
-            if not pedido and preference_id_url:
-                pedido = Pedido.objects.filter(
-                    usuario=request.user,
-                    mercado_pago_preference_id=preference_id_url
-                ).first()
-                if pedido:
-                    logger.info(f"   Pedido encontrado por preference_id da URL: {pedido.id_publico}")
-            
-            # Se não encontrou pelos parâmetros da URL, buscar último pedido pendente
-            if not pedido:
-                pedido = Pedido.objects.filter(
-                    usuario=request.user,
-                    status=Pedido.STATUS_PENDENTE
-                ).order_by('-criado_em').first()
-                if pedido:
-                    logger.info(f"   Usando último pedido pendente: {pedido.id_publico}")
-            
+            # Pedido pelo payment_id/preference_id da URL, senão o último pendente
+            pedido = _pedido_para_verificacao(request.user, payment_id_url, preference_id_url)
             if not pedido:
                 return Response({
                     'success': False,
                     'message': 'Nenhum pedido encontrado'
                 }, status=404)
             
-            logger.info(f"🔍 Verificando pagamento do pedido {pedido.id_publico}")
-            logger.info(f"   Payment ID: {pedido.mercado_pago_payment_id}")
-            logger.info(f"   Preference ID: {pedido.mercado_pago_preference_id}")
-            logger.info(f"   Status atual: {pedido.status}")
-            
             mp_service = MercadoPagoService()
-            pagamento_processado = False
+            aprovado = None
             
-            # Estratégia 1: Se tiver payment_id (da URL ou do pedido), consultar diretamente
-            payment_id_para_consultar = payment_id_url or (pedido.mercado_pago_payment_id and str(pedido.mercado_pago_payment_id))
-            if payment_id_para_consultar:
-                try:
-                    payment_id_int = int(payment_id_para_consultar) if str(payment_id_para_consultar).isdigit() else None
-                    if payment_id_int:
-                        logger.info(f"   Consultando pagamento pelo payment_id: {payment_id_int}")
-                        payment = mp_service.consultar_pagamento(payment_id_int)
-                        if payment:
-                            logger.info(f"   Status do pagamento: {payment.get('status')}")
-                            if payment.get('status') == 'approved':
-                                pedido.mercado_pago_payment_id = payment_id_int
-                                pedido.status = Pedido.STATUS_APROVADO
-                                pedido.mercado_pago_status = 'approved'
-                                pedido.mercado_pago_status_detail = payment.get('status_detail', '')
-                                pedido.save()
-                                self._criar_matricula_se_necessario(pedido)
-                                pagamento_processado = True
-                                logger.info(f"✅ Pagamento aprovado e matrícula criada para pedido {pedido.id_publico}")
-                        else:
-                            logger.warning(f"   Pagamento não encontrado no Mercado Pago")
-                except (ValueError, TypeError) as e:
-                    logger.warning(f"   Erro ao processar payment_id: {e}")
+            # Estratégia 1: payment_id (da URL ou do pedido), consultado diretamente
+            payment_id = payment_id_url or pedido.mercado_pago_payment_id
+            if payment_id and str(payment_id).isdigit():
+                aprovado = _pagamento_aprovado(mp_service.consultar_pagamento(int(payment_id)), payment_id)
             
-            # Estratégia 2: Se não processou e tiver preference_id, buscar pagamentos pela preference
-            if not pagamento_processado and pedido.mercado_pago_preference_id:
-                logger.info(f"   Buscando pagamentos pela preference_id: {pedido.mercado_pago_preference_id}")
-                payments = mp_service.buscar_pagamentos_por_preference(pedido.mercado_pago_preference_id)
-                if payments:
-                    logger.info(f"   Encontrados {len(payments)} pagamento(s)")
-                    # Buscar primeiro pagamento aprovado
-                    for payment in payments:
-                        payment_status = payment.get('status')
-                        logger.info(f"   Verificando pagamento {payment.get('id')} - Status: {payment_status}")
-                        if payment_status == 'approved':
-                            payment_id = payment.get('id')
-                            if payment_id:
-                                try:
-                                    pedido.mercado_pago_payment_id = int(payment_id) if str(payment_id).isdigit() else None
-                                    logger.info(f"   Payment ID {payment_id} salvo no pedido")
-                                except (ValueError, TypeError) as e:
-                                    logger.warning(f"   Erro ao salvar payment_id: {e}")
-                            
-                            pedido.status = Pedido.STATUS_APROVADO
-                            pedido.mercado_pago_status = 'approved'
-                            pedido.mercado_pago_status_detail = payment.get('status_detail', '')
-                            pedido.save()
-                            
-                            # Criar matrícula automaticamente
-                            self._criar_matricula_se_necessario(pedido)
-                            pagamento_processado = True
-                            logger.info(f"✅ Pagamento aprovado encontrado e matrícula criada para pedido {pedido.id_publico}")
-                            break
-                else:
-                    logger.warning(f"   Nenhum pagamento encontrado para preference_id: {pedido.mercado_pago_preference_id}")
+            # Estratégia 2: pagamentos da preference
+            if aprovado is None and pedido.mercado_pago_preference_id:
+                aprovado = _primeiro_aprovado(mp_service.buscar_pagamentos_por_preference(pedido.mercado_pago_preference_id))
             
-            # Estratégia 3: Se ainda não processou, buscar por external_reference (id_publico)
-            if not pagamento_processado:
-                logger.info(f"   Buscando pagamentos por external_reference: {pedido.id_publico}")
-                payments = mp_service.buscar_pagamentos_por_external_reference(pedido.id_publico)
-                if payments:
-                    logger.info(f"   Encontrados {len(payments)} pagamento(s) por external_reference")
-                    # Buscar primeiro pagamento aprovado
-                    for payment in payments:
-                        payment_status = payment.get('status')
-                        logger.info(f"   Verificando pagamento {payment.get('id')} - Status: {payment_status}")
-                        if payment_status == 'approved':
-                            payment_id = payment.get('id')
-                            if payment_id:
-                                try:
-                                    pedido.mercado_pago_payment_id = int(payment_id) if str(payment_id).isdigit() else None
-                                    logger.info(f"   Payment ID {payment_id} salvo no pedido")
-                                except (ValueError, TypeError) as e:
-                                    logger.warning(f"   Erro ao salvar payment_id: {e}")
-                            
-                            pedido.status = Pedido.STATUS_APROVADO
-                            pedido.mercado_pago_status = 'approved'
-                            pedido.mercado_pago_status_detail = payment.get('status_detail', '')
-                            pedido.save()
-                            
-                            # Criar matrícula automaticamente
-                            self._criar_matricula_se_necessario(pedido)
-                            pagamento_processado = True
-                            logger.info(f"✅ Pagamento aprovado encontrado por external_reference e matrícula criada para pedido {pedido.id_publico}")
-                            break
+            # Estratégia 3: pagamentos pelo external_reference (id_publico)
+            if aprovado is None:
+                aprovado = _primeiro_aprovado(mp_service.buscar_pagamentos_por_external_reference(pedido.id_publico))
             
-            if pagamento_processado:
-                # Recarregar pedido para ter dados atualizados
-                pedido.refresh_from_db()
-                
-                # Verificar se matrícula foi criada
-                matricula_ativa = Matricula.objects.filter(
-                    usuario=pedido.usuario,
-                    status='ativa'
-                ).first()
-                
-                logger.info(f"✅ Resumo do processamento:")
-                logger.info(f"   - Pedido: {pedido.id_publico} - Status: {pedido.status}")
-                logger.info(f"   - Matrícula criada: {'Sim' if matricula_ativa else 'Não'}")
-                logger.info(f"   - Usuário ativo: {pedido.usuario.is_active_member}")
-                
-                return Response({
-                    'success': True,
-                    'message': 'Pagamento processado com sucesso',
-                    'pedido': PedidoSerializer(pedido).data,
-                    'matricula_criada': matricula_ativa is not None,
-                    'usuario_ativo': pedido.usuario.is_active_member
-                })
-            else:
-                # Mesmo se não processou, retornar informações do pedido
-                logger.warning(f"⚠️ Pagamento ainda não foi aprovado para pedido {pedido.id_publico}")
-                return Response({
-                    'success': False,
-                    'message': 'Pagamento ainda não foi aprovado',
-                    'pedido': PedidoSerializer(pedido).data,
-                    'sugestao': 'O pagamento pode estar pendente. Tente novamente em alguns segundos ou aguarde o processamento automático.'
-                })
+            if aprovado:
+                logger.info(f"✅ Pagamento aprovado e matrícula verificada para pedido {pedido.id_publico}")
+                return Response(_confirmar_retorno(pedido, aprovado))
+            
+            # Mesmo se não processou, retornar informações do pedido
+            logger.warning(f"⚠️ Pagamento ainda não foi aprovado para pedido {pedido.id_publico}")
+            return Response({
+                'success': False,
+                'message': 'Pagamento ainda não foi aprovado',
+                'pedido': _dados_pedido(pedido),
+                'sugestao': 'O pagamento pode estar pendente. Tente novamente em alguns segundos ou aguarde o processamento automático.'
+            })
                 
         except Exception as e:
-            import logging
-            logger = logging.getLogger(__name__)
             logger.error(f"Erro ao verificar pagamento: {str(e)}", exc_info=True)
             return Response({
                 'success': False,
                 'message': f'Erro ao verificar pagamento: {str(e)}'
             }, status=500)
-    
-    def _criar_matricula_se_necessario(self, pedido):
-        """Usa função auxiliar compartilhada"""
-        criar_matricula_se_necessario(pedido)
-    
-    def _criar_matricula_se_necessario(self, pedido):
-        """Usa função auxiliar compartilhada"""
-        criar_matricula_se_necessario(pedido)
 
 class AvaliacaoListView(ListCreateAPIView):
     """View para listar avaliações do usuário e permitir cadastro por professores"""
@@ -978,12 +1083,13 @@ class AvaliacaoListView(ListCreateAPIView):
     def get_queryset(self):
         user = self.request.user
         effective_role = user.get_effective_role() if hasattr(user, 'get_effective_role') else None
+        queryset = Avaliacao.objects.select_related('usuario')
         if user.is_superuser or effective_role in (Usuario.Role.ADMIN, Usuario.Role.PROFESSOR):
             aluno_id = self.request.query_params.get('usuario')
             if aluno_id:
-                return Avaliacao.objects.filter(usuario_id=aluno_id)
-            return Avaliacao.objects.all()
-        return Avaliacao.objects.filter(usuario=user)
+                return queryset.filter(usuario_id=aluno_id)
+            return queryset
+        return queryset.filter(usuario=user)
     
     def perform_create(self, serializer):
         user = self.request.user
@@ -1001,18 +1107,20 @@ class AvaliacaoListView(ListCreateAPIView):
                 nome_normalizado = aluno_nome.strip()
                 if not nome_normalizado:
                     raise ValidationError({'usuario_nome': 'Informe o nome completo do aluno.'})
-                partes = nome_normalizado.split()
-                primeiro_nome = partes[0]
-                restante = " ".join(partes[1:]) if len(partes) > 1 else ''
-                consulta = Usuario.objects.filter(
-                    Q(first_name__iexact=primeiro_nome) |
-                    Q(username__iexact=nome_normalizado)
-                )
-                if restante:
-                    consulta = consulta.filter(Q(last_name__icontains=restante) | Q(username__iexact=nome_normalizado))
-                aluno = consulta.first()
-                if not aluno:
+                # A busca indexada só reduz os candidatos: o nome completo (ou username) tem que
+                # ser igual, sem acentos/maiúsculas, e identificar um único aluno
+                alvo = normalizar_texto(nome_normalizado)
+                candidatos = buscar_usuarios(alvo, Usuario.objects.filter(role=Usuario.Role.ALUNO))
+                encontrados = [
+                    candidato for candidato in candidatos
+                    if alvo in (normalizar_texto(f'{candidato.first_name} {candidato.last_name}'),
+                                normalizar_texto(candidato.username))
+                ]
+                if len(encontrados) > 1:
+                    raise ValidationError({'usuario_nome': 'Mais de um aluno com esse nome; informe o ID do aluno.'})
+                if not encontrados:
                     raise Usuario.DoesNotExist
+                aluno = encontrados[0]
             else:
                 raise ValidationError({'usuario': 'Informe o ID ou o nome completo do aluno.'})
         except Usuario.DoesNotExist:
@@ -1056,24 +1164,405 @@ class DashboardView(APIView):
             usuario=user
         ).first()
         
-        # Frequência do mês atual
-        inicio_mes = timezone.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        frequencia_mensal = Frequencia.objects.filter(
-            usuario=user,
-            data_entrada__gte=inicio_mes
-        ).count()
+        # Frequência do mês e da semana atuais (soma da consolidação diária)
+        hoje = timezone.localdate()
+        frequencia_mensal = totais_usuario(user, hoje.replace(day=1))['visitas']
+        frequencia_semanal = totais_usuario(user, hoje - timedelta(days=hoje.weekday()))['visitas']
         
         data = {
             'usuario': user,
             'matricula_ativa': matricula_ativa,
             'treinos_recentes': treinos_recentes,
             'ultima_avaliacao': ultima_avaliacao,
-            'frequencia_mensal': frequencia_mensal
+            'frequencia_mensal': frequencia_mensal,
+            'frequencia_semanal': frequencia_semanal,
         }
         
         serializer = DashboardSerializer(data)
         return Response(serializer.data)
 
+class AdminKpisView(APIView):
+    """
+    Indicadores do painel administrativo numa única resposta (agregados no banco, em cache)
+    GET /api/admin/kpis/?meses=6
+    """
+    permission_classes = [IsAcademiaAdmin]
+    MAX_MESES = 24
+
+    def get(self, request):
+        try:
+            meses = int(request.query_params.get('meses', 6))
+        except ValueError:
+            raise ValidationError({'detail': "'meses' deve ser um número inteiro."})
+        if not 1 <= meses <= self.MAX_MESES:
+            raise ValidationError({'detail': f"'meses' deve estar entre 1 e {self.MAX_MESES}."})
+        return Response(obter_kpis(meses))
+
+class AdminExportacaoView(APIView):
+    """
+    Exportação em streaming (admin), com memória constante
+    GET /api/admin/exportar/<usuarios|matriculas|pedidos|frequencias>/?formato=csv|ndjson&gzip=true&inicio=&fim=
+    """
+    permission_classes = [IsAcademiaAdmin]
+
+    def get(self, request, tipo):
+        from django.http import Http404, StreamingHttpResponse
+        from django.utils.dateparse import parse_date
+
+        if tipo not in EXPORTACOES:
+            raise Http404
+        params = request.query_params
+        formato = params.get('formato', 'csv')
+        if formato not in FORMATOS_EXPORTACAO:
+            raise ValidationError({'detail': "'formato' deve ser 'csv' ou 'ndjson'."})
+        try:
+            inicio = parse_date(params['inicio']) if params.get('inicio') else None
+            fim = parse_date(params['fim']) if params.get('fim') else None
+        except ValueError:
+            inicio = fim = None
+        if (params.get('inicio') and inicio is None) or (params.get('fim') and fim is None):
+            raise ValidationError({'detail': 'Datas devem estar no formato AAAA-MM-DD.'})
+        gzip = params.get('gzip', '').lower() in ('1', 'true', 'sim')
+
+        content_type, extensao = FORMATOS_EXPORTACAO[formato]
+        nome = f"{tipo}_{timezone.localdate():%Y%m%d}.{extensao}"
+        if gzip:
+            content_type, nome = 'application/gzip', f'{nome}.gz'
+
+        response = StreamingHttpResponse(
+            exportar(tipo, formato, inicio=inicio, fim=fim, gzip=gzip), content_type=content_type
+        )
+        response['Content-Disposition'] = f'attachment; filename="{nome}"'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+class AvaliacaoProgressoView(APIView):
+    """
+    Progresso das avaliações (variações, médias móveis e tendência por métrica)
+    GET /api/avaliacoes/progresso/?usuario=<id>          -> um aluno, com a série completa
+    GET /api/avaliacoes/progresso/?usuarios=<id>,<id>    -> vários alunos (professor/admin)
+    GET /api/avaliacoes/progresso/                       -> aluno: o próprio; professor/admin: todos avaliados,
+                                                            em páginas de MAX_ALUNOS (próxima em "next", ?apos=<id>)
+    ?series=true inclui a série completa também para vários alunos
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    MAX_ALUNOS = 1000
+
+    def get(self, request):
+        user = request.user
+        effective_role = user.get_effective_role() if hasattr(user, 'get_effective_role') else None
+        equipe = user.is_superuser or effective_role in (Usuario.Role.ADMIN, Usuario.Role.PROFESSOR)
+        params = request.query_params
+        incluir_series = params.get('series', '').lower() in ('1', 'true', 'sim')
+        proxima = None
+
+        try:
+            if params.get('usuario'):
+                usuarios_ids = [int(params['usuario'])]
+                incluir_series = True
+            elif params.get('usuarios'):
+                usuarios_ids = list(dict.fromkeys(int(i) for i in params['usuarios'].split(',') if i.strip()))
+            elif equipe:
+                # Keyset por usuario_id: cada página é uma consulta pelo índice, sem OFFSET
+                usuarios_ids = list(
+                    Avaliacao.objects.filter(usuario_id__gt=int(params.get('apos', 0)))
+                    .order_by('usuario_id').values_list('usuario_id', flat=True).distinct()[:self.MAX_ALUNOS + 1]
+                )
+                if len(usuarios_ids) > self.MAX_ALUNOS:
+                    usuarios_ids = usuarios_ids[:self.MAX_ALUNOS]
+                    proxima = replace_query_param(request.build_absolute_uri(), 'apos', usuarios_ids[-1])
+            else:
+                usuarios_ids = [user.id]
+                incluir_series = True
+        except ValueError:
+            raise ValidationError({'detail': 'IDs de usuário devem ser numéricos.'})
+
+        if not equipe and usuarios_ids != [user.id]:
+            raise PermissionDenied('Você só pode ver o seu próprio progresso.')
+        if len(usuarios_ids) > self.MAX_ALUNOS:
+            raise ValidationError({'detail': f'Informe no máximo {self.MAX_ALUNOS} alunos em ?usuarios=.'})
+
+        alunos = obter_progresso(usuarios_ids, incluir_series=incluir_series)
+        return Response({'count': len(alunos), 'next': proxima, 'metricas': METRICAS_PROGRESSO, 'results': alunos})
+
+# ==================== VIEWS PARA PROFESSOR ====================
+
+class PainelAlunosPagination(CursorPagination):
+    """Paginação por cursor (keyset) na ordenação escolhida em ?ordenar="""
+    page_size = 50
+    page_size_query_param = 'limite'
+    max_page_size = 200
+
+    def get_ordering(self, request, queryset, view):
+        return view.get_ordenacao()
+
+
+class ProfessorAlunosView(ListAPIView):
+    """
+    Painel de alunos do professor: plano ativo, última avaliação, treinos ativos e frequência em 30 dias
+    GET /api/professor/alunos/?ordenar=-frequencia_30_dias&treinos_ativos__gte=1&busca=ana
+    Tudo calculado num único SELECT (ver services/alunos.py); paginação por cursor.
+    """
+    serializer_class = PainelAlunoSerializer
+    permission_classes = [IsProfessorOrAdmin]
+    pagination_class = PainelAlunosPagination
+
+    def get_ordenacao(self):
+        ordenar = self.request.query_params.get('ordenar', 'nome')
+        indicador = ordenar.lstrip('-')
+        if indicador not in INDICADORES_PAINEL:
+            raise ValidationError({'ordenar': f"Use um de: {', '.join(INDICADORES_PAINEL)} (prefixo '-' para decrescente)."})
+        prefixo = '-' if ordenar.startswith('-') else ''
+        return (f'{prefixo}{INDICADORES_PAINEL[indicador][1]}', f'{prefixo}id')
+
+    def get_queryset(self):
+        try:
+            return filtrar_painel(painel_alunos(), self.request.query_params)
+        except (ValueError, ArithmeticError):
+            raise ValidationError({'detail': 'Valor de filtro inválido.'})
+
+# ==================== VIEWS PARA FREQUÊNCIA ====================
+
+class FrequenciaCheckinView(APIView):
+    """
+    Registra uma entrada ou saída (recepção, app ou catraca individual)
+    Alunos só podem registrar a própria frequência, no horário do servidor; professores e
+    admins, de qualquer usuário, com data_hora (dentro da janela de visita) e evento_id
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        dados = dict(request.data.items()) if hasattr(request.data, 'items') else {}
+        dados.setdefault('tipo', 'entrada')
+        dados.setdefault('usuario', request.user.id)
+        equipe = IsProfessorOrAdmin().has_permission(request, self)
+        if not equipe:
+            # O horário da frequência do aluno é o da requisição (alimenta consolidação, mapa de calor e KPIs)
+            dados.pop('data_hora', None)
+            dados.pop('evento_id', None)
+
+        evento, erro = validar_evento(dados, janela=JANELA_VISITA)
+        if erro:
+            return Response({'detail': erro}, status=status.HTTP_400_BAD_REQUEST)
+
+        if evento['usuario_id'] != request.user.id and not equipe:
+            raise PermissionDenied('Você só pode registrar a sua própria frequência.')
+
+        resumo = processar_eventos([evento])
+        if resumo['usuarios_invalidos']:
+            return Response({'detail': 'Usuário não encontrado.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        registrado = bool(resumo['entradas_registradas'] or resumo['saidas_registradas'])
+        if evento['tipo'] == 'saida' and not registrado and not resumo['duplicados']:
+            return Response({'detail': 'Nenhuma entrada em aberto para este usuário.'}, status=status.HTTP_409_CONFLICT)
+
+        return Response({
+            'usuario': evento['usuario_id'],
+            'tipo': evento['tipo'],
+            'data_hora': evento['data_hora'],
+            'evento_id': evento['evento_id'],
+            'duplicado': bool(resumo['duplicados']),
+        }, status=status.HTTP_201_CREATED if registrado else status.HTTP_200_OK)
+
+
+class FrequenciaLoteView(APIView):
+    """
+    Ingestão em lote de eventos da catraca no formato NDJSON (um evento JSON por linha)
+    O corpo é lido linha a linha e gravado em blocos, sem carregar o lote inteiro em memória
+    """
+    permission_classes = [IsAcademiaAdmin]
+    MAX_ERROS_DETALHADOS = 100
+
+    def post(self, request):
+        import json
+
+        resumo = {
+            'recebidos': 0,
+            'entradas_registradas': 0,
+            'saidas_registradas': 0,
+            'duplicados': 0,
+            'usuarios_invalidos': 0,
+            'invalidos': 0,
+        }
+        erros = []
+        bloco = []
+
+        def gravar_bloco():
+            parcial = processar_eventos(bloco)
+            for chave, valor in parcial.items():
+                resumo[chave] += valor
+            bloco.clear()
+
+        for numero, linha in enumerate(request.stream or [], start=1):
+            linha = linha.strip()
+            if not linha:
+                continue
+            resumo['recebidos'] += 1
+            try:
+                evento, erro = validar_evento(json.loads(linha))
+            except (ValueError, UnicodeDecodeError):
+                evento, erro = None, 'JSON inválido.'
+            if erro:
+                resumo['invalidos'] += 1
+                if len(erros) < self.MAX_ERROS_DETALHADOS:
+                    erros.append({'linha': numero, 'erro': erro})
+                continue
+            bloco.append(evento)
+            if len(bloco) >= TAMANHO_LOTE_FREQUENCIA:
+                gravar_bloco()
+
+        if bloco:
+            gravar_bloco()
+
+        return Response({**resumo, 'erros': erros}, status=status.HTTP_200_OK)
+
+
+def _periodo_da_requisicao(request, dias_padrao, maximo):
+    """Lê ?inicio=&fim= (AAAA-MM-DD); padrão: os últimos dias_padrao dias até hoje"""
+    from django.utils.dateparse import parse_date
+
+    hoje = timezone.localdate()
+    try:
+        inicio = parse_date(request.query_params.get('inicio', '')) or hoje - timedelta(days=dias_padrao - 1)
+        fim = parse_date(request.query_params.get('fim', '')) or hoje
+    except ValueError:
+        raise ValidationError({'detail': 'Datas devem estar no formato AAAA-MM-DD.'})
+    if inicio > fim:
+        raise ValidationError({'detail': "'inicio' deve ser anterior a 'fim'."})
+    if fim - inicio > maximo:
+        raise ValidationError({'detail': f'Período máximo é de {maximo.days} dias.'})
+    return inicio, fim
+
+
+class FrequenciaRelatorioView(APIView):
+    """
+    Relatório de frequência da academia (admin), lido da consolidação diária
+    GET /api/frequencia/relatorio/?inicio=AAAA-MM-DD&fim=AAAA-MM-DD&agrupar=dia|semana|mes
+    """
+    permission_classes = [IsAcademiaAdmin]
+    AGRUPAMENTOS = ('dia', 'semana', 'mes')
+
+    def get(self, request):
+        from django.db.models.functions import TruncMonth, TruncWeek
+
+        inicio, fim = _periodo_da_requisicao(request, dias_padrao=30, maximo=timedelta(days=731))
+
+        agrupar = request.query_params.get('agrupar', 'dia')
+        if agrupar not in self.AGRUPAMENTOS:
+            raise ValidationError({'detail': "'agrupar' deve ser 'dia', 'semana' ou 'mes'."})
+
+        linhas = FrequenciaDiaria.objects.filter(data__gte=inicio, data__lte=fim)
+        if agrupar == 'semana':
+            linhas = linhas.annotate(periodo=TruncWeek('data'))
+        elif agrupar == 'mes':
+            linhas = linhas.annotate(periodo=TruncMonth('data'))
+        else:
+            linhas = linhas.annotate(periodo=F('data'))
+
+        periodos = (
+            linhas.values('periodo')
+            .annotate(
+                total_visitas=Sum('visitas'),
+                alunos_distintos=Count('usuario', distinct=True),
+                total_segundos=Sum('segundos_permanencia'),
+            )
+            .order_by('periodo')
+        )
+
+        resultado = []
+        for p in periodos:
+            resultado.append({
+                'periodo': p['periodo'],
+                'visitas': p['total_visitas'],
+                'alunos_distintos': p['alunos_distintos'],
+                'permanencia_media_minutos': (
+                    round(p['total_segundos'] / p['total_visitas'] / 60, 1) if p['total_visitas'] else 0
+                ),
+            })
+
+        return Response({
+            'inicio': inicio,
+            'fim': fim,
+            'agrupar': agrupar,
+            'total_visitas': sum(p['visitas'] for p in resultado),
+            'periodos': resultado,
+        })
+
+
+class FrequenciaMapaCalorView(APIView):
+    """
+    Mapa de calor da ocupação por dia da semana e hora (admin, para escala de equipe)
+    GET /api/frequencia/mapa-calor/?inicio=AAAA-MM-DD&fim=AAAA-MM-DD
+    """
+    permission_classes = [IsAcademiaAdmin]
+
+    def get(self, request):
+        inicio, fim = _periodo_da_requisicao(request, dias_padrao=90, maximo=timedelta(days=366 * 5))
+        return Response(obter_mapa_calor(inicio, fim))
+
+
+class SincronizacaoView(APIView):
+    """
+    Sincronização incremental para o app móvel/offline
+    GET /api/sync/                 -> tudo (completo=true) + token
+    GET /api/sync/?since=<token>   -> só o que mudou/foi excluído desde o token
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        since = request.query_params.get('since')
+        try:
+            desde = ler_token(since) if since else None
+        except TokenInvalido as exc:
+            raise ValidationError({'since': str(exc)})
+        return Response(sincronizar(request.user, desde))
+
+
+class OcupacaoView(APIView):
+    """Ocupação atual da academia (lida do cache, sem consultar a tabela de frequência)"""
+    permission_classes = []  # Público - apenas a contagem
+
+    def get(self, request):
+        return Response(obter_ocupacao())
+
+
+class OcupacaoStreamView(APIView):
+    """
+    Stream SSE da ocupação para telões (EventSource)
+    Envia um evento a cada mudança; a conexão é encerrada após OCUPACAO_SSE_DURACAO_MAXIMA
+    segundos e o navegador reconecta sozinho. Desabilitado por padrão (ocupa um worker síncrono).
+    """
+    permission_classes = []
+
+    def get(self, request):
+        import json
+        import time
+        from django.http import Http404, StreamingHttpResponse
+
+        if not getattr(settings, 'OCUPACAO_SSE_HABILITADO', False):
+            raise Http404
+
+        intervalo = max(getattr(settings, 'OCUPACAO_SSE_INTERVALO', 2), 1)
+        duracao_maxima = getattr(settings, 'OCUPACAO_SSE_DURACAO_MAXIMA', 300)
+
+        def eventos():
+            yield f'retry: {intervalo * 1000}\n\n'
+            ultimo = None
+            fim = time.monotonic() + duracao_maxima
+            while time.monotonic() < fim:
+                atual = obter_ocupacao()
+                if atual['ocupacao'] != ultimo:
+                    ultimo = atual['ocupacao']
+                    yield f'event: ocupacao\ndata: {json.dumps(atual)}\n\n'
+                else:
+                    yield ': keep-alive\n\n'
+                time.sleep(intervalo)
+
+        response = StreamingHttpResponse(eventos(), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
 class PixInitiateView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
@@ -1129,133 +1618,38 @@ class PixStatusView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request, pedido_id):
-        try:
-            pedido = Pedido.objects.get(id_publico=pedido_id, usuario=request.user)
-        except Pedido.DoesNotExist:
+        pedido = _pedido_do_usuario(request.user, pedido_id)
+        if pedido is None:
             return Response({'detail': 'Pedido não encontrado'}, status=404)
         
-        # Se tiver payment_id do Mercado Pago, consultar status atualizado
-        if pedido.mercado_pago_payment_id:
+        # Com payment_id consulta o pagamento; sem ele, os pagamentos da preference (o usuário
+        # voltou do Mercado Pago antes do webhook)
+        consultar = pedido.mercado_pago_payment_id or (
+            pedido.mercado_pago_preference_id and pedido.status == Pedido.STATUS_PENDENTE
+        )
+        if consultar:
             try:
                 from .services.mercadopago import MercadoPagoService
                 mp_service = MercadoPagoService()
-                payment = mp_service.consultar_pagamento(pedido.mercado_pago_payment_id)
-                
-                if payment:
-                    # Atualizar status do pedido baseado no status do Mercado Pago
-                    mp_status = payment.get('status')
-                    if mp_status == 'approved':
-                        pedido.status = Pedido.STATUS_APROVADO
-                        pedido.mercado_pago_payment_id = payment.get('id')
-                        pedido.save()
-                        # Criar matrícula automaticamente quando pagamento é aprovado
-                        # Funciona tanto em ambiente de teste quanto produção
-                        self._criar_matricula_se_necessario(pedido)
-                    elif mp_status in ['cancelled', 'rejected']:
-                        pedido.status = Pedido.STATUS_CANCELADO
-                    elif mp_status == 'expired':
-                        pedido.status = Pedido.STATUS_EXPIRADO
-                    
-                    pedido.mercado_pago_status = mp_status
-                    pedido.mercado_pago_status_detail = payment.get('status_detail', '')
-                    pedido.save()
+                if pedido.mercado_pago_payment_id:
+                    payment = mp_service.consultar_pagamento(pedido.mercado_pago_payment_id)
+                    if payment:
+                        return Response(_aplicar_pagamento(pedido, payment))
+                else:
+                    payments = mp_service.buscar_pagamentos_por_preference(pedido.mercado_pago_preference_id)
+                    if payments:
+                        return Response(_aplicar_pagamentos_preference(pedido, payments))
             except (ValueError, ImportError):
                 pass  # Ignorar se Mercado Pago não estiver configurado
         
-        # Se não tiver payment_id mas tiver preference_id, buscar pagamentos aprovados
-        # Isso é importante quando o usuário retorna do Mercado Pago e o webhook ainda não foi recebido
-        elif pedido.mercado_pago_preference_id and pedido.status == Pedido.STATUS_PENDENTE:
-            try:
-                from .services.mercadopago import MercadoPagoService
-                mp_service = MercadoPagoService()
-                payments = mp_service.buscar_pagamentos_por_preference(pedido.mercado_pago_preference_id)
-                
-                if payments:
-                    # Buscar primeiro pagamento aprovado
-                    approved_payment = None
-                    for payment in payments:
-                        if payment.get('status') == 'approved':
-                            approved_payment = payment
-                            break
-                    
-                    if approved_payment:
-                        # IMPORTANTE: Atualizar pedido com payment_id e status
-                        payment_id = approved_payment.get('id')
-                        if payment_id:
-                            try:
-                                pedido.mercado_pago_payment_id = int(payment_id) if str(payment_id).isdigit() else None
-                                import logging
-                                logger_mp = logging.getLogger(__name__)
-                                logger_mp.info(f"Payment ID {payment_id} encontrado e salvo para pedido {pedido.id_publico}")
-                            except (ValueError, TypeError) as e:
-                                import logging
-                                logger_mp = logging.getLogger(__name__)
-                                logger_mp.warning(f"Erro ao salvar payment_id: {e}")
-                        
-                        pedido.status = Pedido.STATUS_APROVADO
-                        pedido.mercado_pago_status = 'approved'
-                        pedido.mercado_pago_status_detail = approved_payment.get('status_detail', '')
-                        pedido.save()
-                        # Criar matrícula automaticamente
-                        self._criar_matricula_se_necessario(pedido)
-                    else:
-                        # Verificar se há pagamento pendente ou rejeitado
-                        for payment in payments:
-                            status = payment.get('status')
-                            if status in ['cancelled', 'rejected']:
-                                pedido.status = Pedido.STATUS_CANCELADO
-                                pedido.mercado_pago_payment_id = payment.get('id')
-                                pedido.mercado_pago_status = status
-                                pedido.save()
-                                break
-                            elif status == 'expired':
-                                pedido.status = Pedido.STATUS_EXPIRADO
-                                pedido.mercado_pago_payment_id = payment.get('id')
-                                pedido.mercado_pago_status = status
-                                pedido.save()
-                                break
-            except (ValueError, ImportError) as e:
-                import logging
-                logger_mp = logging.getLogger(__name__)
-                logger_mp.warning(f"Erro ao buscar pagamentos por preference: {e}")
-                pass  # Ignorar se Mercado Pago não estiver configurado
-        
-        return Response(PedidoSerializer(pedido).data)
-    
-    def _criar_matricula_se_necessario(self, pedido):
-        """Cria matrícula se pagamento foi aprovado e ainda não existe matrícula ativa"""
-        from datetime import timedelta
-        from django.utils import timezone
-        
-        # Verificar se já existe matrícula ativa para este pedido
-        matricula_existente = Matricula.objects.filter(
-            usuario=pedido.usuario,
-            status='ativa'  # Status da matrícula
-        ).first()
-        
-        if not matricula_existente:
-            data_inicio = pedido.subscription_start_date or timezone.now().date()
-            data_fim = pedido.subscription_end_date or (data_inicio + timedelta(days=pedido.plano.duracao_dias))
-            
-            Matricula.objects.create(
-                usuario=pedido.usuario,
-                plano=pedido.plano,  # Garante que o plano selecionado seja salvo
-                data_inicio=data_inicio,
-                data_fim=data_fim,
-                valor_pago=pedido.valor,
-                status='ativa'
-            )
-            
-            # Ativar usuário como membro
-            pedido.usuario.is_active_member = True
-            pedido.usuario.save()
+        return Response(_dados_pedido(pedido))
 
 class PixConfirmView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request, pedido_id):
         try:
-            pedido = Pedido.objects.get(id_publico=pedido_id, usuario=request.user)
+            pedido = Pedido.objects.select_related('plano').get(id_publico=pedido_id, usuario=request.user)
         except Pedido.DoesNotExist:
             return Response({'detail': 'Pedido não encontrado'}, status=404)
 
@@ -1268,37 +1662,9 @@ class PixConfirmView(APIView):
         
         # Criar matrícula automaticamente quando pagamento é aprovado
         # Funciona tanto em ambiente de teste quanto produção
-        self._criar_matricula_se_necessario(pedido)
+        criar_matricula_se_necessario(pedido)
         
         return Response(PedidoSerializer(pedido).data)
-    
-    def _criar_matricula_se_necessario(self, pedido):
-        """Cria matrícula se assinatura foi autorizada e ainda não existe matrícula ativa"""
-        from datetime import timedelta
-        from django.utils import timezone
-        
-        # Verificar se já existe matrícula ativa para este pedido
-        matricula_existente = Matricula.objects.filter(
-            usuario=pedido.usuario,
-            status='ativa'  # Status da matrícula
-        ).first()
-        
-        if not matricula_existente:
-            data_inicio = pedido.subscription_start_date or timezone.now().date()
-            data_fim = pedido.subscription_end_date or (data_inicio + timedelta(days=pedido.plano.duracao_dias))
-            
-            Matricula.objects.create(
-                usuario=pedido.usuario,
-                plano=pedido.plano,  # Garante que o plano selecionado seja salvo
-                data_inicio=data_inicio,
-                data_fim=data_fim,
-                valor_pago=pedido.valor,
-                status='ativa'
-            )
-            
-            # Ativar usuário como membro
-            pedido.usuario.is_active_member = True
-            pedido.usuario.save()
 
 
 class CartaoInitiateView(APIView):
@@ -1370,38 +1736,21 @@ class AssinaturaStatusView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request, pedido_id):
-        try:
-            pedido = Pedido.objects.get(id_publico=pedido_id, usuario=request.user)
-        except Pedido.DoesNotExist:
+        pedido = _pedido_do_usuario(request.user, pedido_id)
+        if pedido is None:
             return Response({'detail': 'Pedido não encontrado'}, status=404)
         
         # Se tiver subscription_id do Mercado Pago, consultar status atualizado
         if pedido.mercado_pago_subscription_id:
             try:
                 from .services.mercadopago import MercadoPagoService
-                mp_service = MercadoPagoService()
-                subscription = mp_service.consultar_assinatura(pedido.mercado_pago_subscription_id)
-                
+                subscription = MercadoPagoService().consultar_assinatura(pedido.mercado_pago_subscription_id)
                 if subscription:
-                    # Atualizar status do pedido baseado no status da assinatura
-                    mp_status = subscription.get('status')
-                    if mp_status in ['authorized', 'active']:
-                        pedido.status = Pedido.STATUS_APROVADO
-                        pedido.save()
-                        # Criar matrícula automaticamente quando assinatura é autorizada
-                        # Funciona tanto em ambiente de teste quanto produção
-                        self._criar_matricula_se_necessario(pedido)
-                    elif mp_status in ['cancelled', 'paused']:
-                        pedido.status = Pedido.STATUS_CANCELADO
-                    elif mp_status == 'pending':
-                        pedido.status = Pedido.STATUS_PENDENTE
-                    
-                    pedido.mercado_pago_subscription_status = mp_status
-                    pedido.save()
+                    return Response(_aplicar_assinatura(pedido, subscription))
             except (ValueError, ImportError):
                 pass  # Ignorar se Mercado Pago não estiver configurado
         
-        return Response(PedidoSerializer(pedido).data)
+        return Response(_dados_pedido(pedido))
 
 
 class AssinaturaCancelarView(APIView):
@@ -1410,7 +1759,7 @@ class AssinaturaCancelarView(APIView):
 
     def post(self, request, pedido_id):
         try:
-            pedido = Pedido.objects.get(id_publico=pedido_id, usuario=request.user)
+            pedido = Pedido.objects.select_related('plano').get(id_publico=pedido_id, usuario=request.user)
         except Pedido.DoesNotExist:
             return Response({'detail': 'Pedido não encontrado'}, status=404)
         
@@ -1434,7 +1783,7 @@ class AssinaturaCancelarView(APIView):
                 Matricula.objects.filter(
                     usuario=pedido.usuario,
                     status='ativa'
-                ).update(status=Matricula.STATUS_CANCELADA)
+                ).update(status=Matricula.STATUS_CANCELADA, updated_at=timezone.now())
                 
                 return Response(PedidoSerializer(pedido).data)
             else:
@@ -1489,7 +1838,7 @@ class MercadoPagoWebhookView(APIView):
                     Matricula.objects.filter(
                         usuario=pedido.usuario,
                         status='ativa'
-                    ).update(status=Matricula.STATUS_CANCELADA)
+                    ).update(status=Matricula.STATUS_CANCELADA, updated_at=timezone.now())
                 elif mp_status == 'pending':
                     pedido.status = Pedido.STATUS_PENDENTE
                     pedido.save()
@@ -1508,7 +1857,7 @@ class MercadoPagoWebhookView(APIView):
                     Matricula.objects.filter(
                         usuario=pedido.usuario,
                         status='ativa'
-                    ).update(status=Matricula.STATUS_SUSPENSA)
+                    ).update(status=Matricula.STATUS_SUSPENSA, updated_at=timezone.now())
             
             else:
                 # Webhook de pagamento único
@@ -1547,28 +1896,8 @@ class MercadoPagoWebhookView(APIView):
             return Response({'detail': f'Erro ao processar webhook: {str(e)}'}, status=500)
     
     def _criar_matricula_se_necessario(self, pedido):
-        """Cria matrícula se pagamento foi aprovado e ainda não existe matrícula ativa"""
-        from datetime import timedelta
-        from django.utils import timezone
-        
-        # Verificar se já existe matrícula ativa para este pedido
-        matricula_existente = Matricula.objects.filter(
-            usuario=pedido.usuario,
-            status='ativa'  # Status da matrícula
-        ).first()
-        
-        if not matricula_existente:
-            data_inicio = pedido.subscription_start_date or timezone.now().date()
-            data_fim = pedido.subscription_end_date or (data_inicio + timedelta(days=pedido.plano.duracao_dias))
-            
-            Matricula.objects.create(
-                usuario=pedido.usuario,
-                plano=pedido.plano,
-                data_inicio=data_inicio,
-                data_fim=data_fim,
-                valor_pago=pedido.valor,
-                status='ativa'
-            )
+        """Usa função auxiliar compartilhada (trava o usuário contra webhooks duplicados)"""
+        criar_matricula_se_necessario(pedido)
     
     def _renovar_matricula(self, pedido):
         """Renova matrícula quando pagamento recorrente é aprovado"""
@@ -1590,6 +1919,215 @@ class MercadoPagoWebhookView(APIView):
             # Criar nova matrícula se não existir
             self._criar_matricula_se_necessario(pedido)
 
+
+# ---------------------------------------------------------------------------
+# Pagamentos assíncronos (modo ASGI, PAGAMENTOS_ASSINCRONOS)
+# Mesmo contrato e mesmas regras (funções _aplicar_* acima) das APIViews de pagamento, mas a
+# espera pelo Mercado Pago não prende o worker: o checkout escala com I/O, não com
+# WEB_CONCURRENCY. O banco é acessado em blocos síncronos curtos via orm() (pool limitado de threads).
+# ---------------------------------------------------------------------------
+
+def _criar_pedido_pendente(usuario, plano_id, metodo):
+    try:
+        plano = Plano.objects.filter(id=plano_id, ativo=True).first()
+    except (ValueError, TypeError):
+        plano = None
+    if plano is None:
+        return None
+    return Pedido.objects.create(
+        usuario=usuario,
+        plano=plano,
+        valor=plano.preco,
+        metodo=metodo,
+        status=Pedido.STATUS_PENDENTE,
+        is_subscription=False,  # Checkout Pro cria pagamentos únicos
+    )
+
+
+def _registrar_preferencia(pedido, checkout, **extras):
+    pedido.mercado_pago_preference_id = str(checkout['preference_id'])
+    pedido.save(update_fields=['mercado_pago_preference_id', 'atualizado_em'])
+    return _dados_pedido(pedido, **extras)
+
+
+class PagamentoAsyncView(View):
+    """
+    Base das views de pagamento assíncronas: autenticação como nas APIViews
+    (JWT no header Authorization ou sessão) e respostas JSON
+    """
+    
+    @classmethod
+    def as_view(cls, **initkwargs):
+        return csrf_exempt(super().as_view(**initkwargs))
+    
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            resultado = await orm(JWTAuthentication().authenticate, request)
+        except AuthenticationFailed as e:
+            return JsonResponse(e.detail if isinstance(e.detail, dict) else {'detail': e.detail}, status=401)
+        if resultado:
+            request.user = resultado[0]
+        elif hasattr(request, 'auser'):
+            request.user = await request.auser()
+        if not getattr(request, 'user', None) or not request.user.is_authenticated:
+            return JsonResponse({'detail': str(NotAuthenticated.default_detail)}, status=401)
+        return await super().dispatch(request, *args, **kwargs)
+    
+    def dados(self, request):
+        if request.content_type == 'application/json':
+            try:
+                return json.loads(request.body or b'{}')
+            except ValueError:
+                return {}
+        return request.POST
+
+
+class PixInitiateAsyncView(PagamentoAsyncView):
+    async def post(self, request):
+        pedido = await orm(_criar_pedido_pendente, request.user, self.dados(request).get('plano_id'), Pedido.METODO_PIX)
+        if pedido is None:
+            return JsonResponse({'detail': 'Plano inválido'}, status=400)
+        
+        try:
+            mp_service = MercadoPagoAsync()
+        except ValueError as e:
+            return JsonResponse({'detail': f'Erro ao processar pagamento: {str(e)}'}, status=500)
+        checkout = await mp_service.criar_checkout_preference(pedido, request.user, pedido.plano, 'pix')
+        if not checkout:
+            return JsonResponse({'detail': 'Erro ao criar pagamento PIX'}, status=500)
+        dados = await orm(
+            _registrar_preferencia, pedido, checkout,
+            init_point=checkout['init_point'], preference_id=checkout['preference_id'],
+        )
+        if not checkout['init_point']:
+            return JsonResponse({'detail': 'Erro ao criar pagamento PIX'}, status=500)
+        return JsonResponse(dados, status=201)
+
+
+class CartaoInitiateAsyncView(PagamentoAsyncView):
+    async def post(self, request):
+        pedido = await orm(_criar_pedido_pendente, request.user, self.dados(request).get('plano_id'), Pedido.METODO_CARTAO)
+        if pedido is None:
+            return JsonResponse({'detail': 'Plano inválido'}, status=400)
+        
+        try:
+            mp_service = MercadoPagoAsync()
+        except ValueError as e:
+            return JsonResponse({'detail': str(e)}, status=400)
+        checkout = await mp_service.criar_checkout_preference(pedido, request.user, pedido.plano, 'cartao')
+        if not checkout:
+            return JsonResponse({'detail': 'Erro ao criar checkout no Mercado Pago'}, status=500)
+        dados = await orm(
+            _registrar_preferencia, pedido, checkout,
+            init_point=checkout['init_point'], preference_id=checkout['preference_id'],
+        )
+        if not checkout['init_point']:
+            return JsonResponse({'detail': 'Erro ao criar checkout no Mercado Pago'}, status=500)
+        return JsonResponse(dados, status=201)
+
+
+class PixStatusAsyncView(PagamentoAsyncView):
+    async def get(self, request, pedido_id):
+        pedido = await orm(_pedido_do_usuario, request.user, pedido_id)
+        if pedido is None:
+            return JsonResponse({'detail': 'Pedido não encontrado'}, status=404)
+        
+        consultar = pedido.mercado_pago_payment_id or (
+            pedido.mercado_pago_preference_id and pedido.status == Pedido.STATUS_PENDENTE
+        )
+        try:
+            mp_service = MercadoPagoAsync() if consultar else None
+        except ValueError:
+            mp_service = None  # Ignorar se Mercado Pago não estiver configurado
+        
+        if mp_service and pedido.mercado_pago_payment_id:
+            payment = await mp_service.consultar_pagamento(pedido.mercado_pago_payment_id)
+            if payment:
+                return JsonResponse(await orm(_aplicar_pagamento, pedido, payment))
+        elif mp_service:
+            payments = await mp_service.buscar_pagamentos_por_preference(pedido.mercado_pago_preference_id)
+            if payments:
+                return JsonResponse(await orm(_aplicar_pagamentos_preference, pedido, payments))
+        return JsonResponse(await orm(_dados_pedido, pedido))
+
+
+class AssinaturaStatusAsyncView(PagamentoAsyncView):
+    async def get(self, request, pedido_id):
+        pedido = await orm(_pedido_do_usuario, request.user, pedido_id)
+        if pedido is None:
+            return JsonResponse({'detail': 'Pedido não encontrado'}, status=404)
+        
+        if pedido.mercado_pago_subscription_id:
+            try:
+                subscription = await MercadoPagoAsync().consultar_assinatura(pedido.mercado_pago_subscription_id)
+            except ValueError:
+                subscription = None  # Ignorar se Mercado Pago não estiver configurado
+            if subscription:
+                return JsonResponse(await orm(_aplicar_assinatura, pedido, subscription))
+        return JsonResponse(await orm(_dados_pedido, pedido))
+
+
+class VerificarPagamentoRetornoAsyncView(PagamentoAsyncView):
+    async def post(self, request):
+        import logging
+        logger = logging.getLogger(__name__)
+        
+        dados = self.dados(request)
+        payment_id_url = dados.get('payment_id') or request.GET.get('payment_id')
+        preference_id_url = dados.get('preference_id') or request.GET.get('preference_id')
+        try:
+            pedido = await orm(_pedido_para_verificacao, request.user, payment_id_url, preference_id_url)
+            if not pedido:
+                return JsonResponse({'success': False, 'message': 'Nenhum pedido encontrado'}, status=404)
+            
+            mp_service = MercadoPagoAsync()
+            aprovado = None
+            
+            # Estratégia 1: payment_id (da URL ou do pedido)
+            payment_id = payment_id_url or pedido.mercado_pago_payment_id
+            if payment_id and str(payment_id).isdigit():
+                payment = await mp_service.consultar_pagamento(int(payment_id))
+                if payment and payment.get('status') == 'approved':
+                    aprovado = {**payment, 'id': payment.get('id') or int(payment_id)}
+            
+            # Estratégias 2 e 3: pagamentos da preference e do external_reference, consultados em paralelo
+            if aprovado is None:
+                consultas = [mp_service.buscar_pagamentos_por_external_reference(pedido.id_publico)]
+                if pedido.mercado_pago_preference_id:
+                    consultas.insert(0, mp_service.buscar_pagamentos_por_preference(pedido.mercado_pago_preference_id))
+                for payments in await asyncio.gather(*consultas):
+                    aprovado = _primeiro_aprovado(payments)
+                    if aprovado:
+                        break
+            
+            if aprovado:
+                logger.info(f"✅ Pagamento aprovado e matrícula verificada para pedido {pedido.id_publico}")
+                return JsonResponse(await orm(_confirmar_retorno, pedido, aprovado))
+            
+            logger.warning(f"⚠️ Pagamento ainda não foi aprovado para pedido {pedido.id_publico}")
+            return JsonResponse({
+                'success': False,
+                'message': 'Pagamento ainda não foi aprovado',
+                'pedido': await orm(_dados_pedido, pedido),
+                'sugestao': 'O pagamento pode estar pendente. Tente novamente em alguns segundos ou aguarde o processamento automático.'
+            })
+        except Exception as e:
+            logger.error(f"Erro ao verificar pagamento: {str(e)}", exc_info=True)
+            return JsonResponse({
+                'success': False,
+                'message': f'Erro ao verificar pagamento: {str(e)}'
+            }, status=500)
+
+
+def metricas_prometheus(request):
+    """Histogramas de latência e totais por rota (texto Prometheus) - staff ou Bearer METRICAS_TOKEN"""
+    token = getattr(settings, 'METRICAS_TOKEN', '')
+    autorizado = bool(token) and constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}')
+    if not (autorizado or request.user.is_staff):
+        return HttpResponse(status=403)
+    return HttpResponse(texto_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 def login_view(request):
     if request.method == 'POST':
         identifier = request.POST.get('email')
@@ -1733,7 +2271,15 @@ class TorneioViewSet(viewsets.ModelViewSet):
         status_filter = self.request.query_params.get('status', None)
         if status_filter:
             queryset = queryset.filter(status=status_filter)
-        return queryset.prefetch_related('participantes', 'fases', 'fases__chaves', 'fases__exercicios')
+        # Tudo o que o TorneioSerializer aninha (participantes, chaves e resultados com os usuários)
+        return queryset.select_related('criado_por').prefetch_related(
+            'participantes__usuario',
+            'fases__exercicios__exercicio',
+            'fases__chaves__participante1__usuario',
+            'fases__chaves__participante2__usuario',
+            'fases__chaves__vencedor__usuario',
+            'fases__chaves__resultado',
+        )
     
     def get_permissions(self):
         """Permissões baseadas na ação"""
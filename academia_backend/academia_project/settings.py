@@ -2,6 +2,7 @@ from pathlib import Path
 from datetime import timedelta
 from decouple import config
 import os
+import sys
 import dj_database_url
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -10,31 +11,36 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # Quick-start development settings - unsuitable for production
 SECRET_KEY = config('SECRET_KEY', default='dev-secret-key-change-me')
 DEBUG = config('DEBUG', default=False, cast=bool)
+TESTANDO = len(sys.argv) > 1 and sys.argv[1] == 'test'  # manage.py test
 
-# ALLOWED_HOSTS - aceita domínios do Railway automaticamente
-ALLOWED_HOSTS = config(
+# Hosts permitidos: validados por academia.middleware.HostPermitidoMiddleware com um
+# conjunto compilado (academia.hosts). '.dominio' ou '*.dominio' aceitam qualquer subdomínio.
+HOSTS_PERMITIDOS = config(
     'ALLOWED_HOSTS',
     default='localhost,127.0.0.1,testserver',
     cast=lambda v: [h.strip() for h in v.split(',') if h.strip()]
 )
 
 # Garantir que localhost e 127.0.0.1 sempre estejam na lista (desenvolvimento)
-for host in ['localhost', '127.0.0.1']:
-    if host not in ALLOWED_HOSTS:
-        ALLOWED_HOSTS.append(host)
+for host in ['localhost', '127.0.0.1', '[::1]']:
+    if host not in HOSTS_PERMITIDOS:
+        HOSTS_PERMITIDOS.append(host)
 
 # Adicionar domínio do Railway se fornecido via variável de ambiente
 railway_domain = config('RAILWAY_PUBLIC_DOMAIN', default='')
-if railway_domain and railway_domain not in ALLOWED_HOSTS:
-    ALLOWED_HOSTS.append(railway_domain)
+if railway_domain and railway_domain not in HOSTS_PERMITIDOS:
+    HOSTS_PERMITIDOS.append(railway_domain)
 
-# Se estiver rodando no Railway (detectado pela variável PORT),
-# aceitar qualquer domínio .railway.app e .up.railway.app
-# Isso é seguro porque o Railway isola os containers
+# Se estiver rodando no Railway (detectado pela variável PORT), aceitar os domínios
+# gerados (*.railway.app, *.up.railway.app e previews). Isso é seguro porque o Railway
+# isola os containers. HOSTS_CURINGA acrescenta outros sufixos (separados por vírgula).
 if os.environ.get('PORT') or os.environ.get('RAILWAY_ENVIRONMENT'):
-    # Em produção no Railway, vamos usar uma validação customizada
-    # O middleware RailwayHostMiddleware vai permitir domínios do Railway
-    pass
+    HOSTS_PERMITIDOS.append('.railway.app')
+HOSTS_PERMITIDOS += config('HOSTS_CURINGA', default='', cast=lambda v: [h.strip() for h in v.split(',') if h.strip()])
+
+# O Django só compara com '*': a validação real é feita pelo HostPermitidoMiddleware
+# (primeiro da lista MIDDLEWARE), sem percorrer nem alterar listas por requisição.
+ALLOWED_HOSTS = ['*']
 
 # Application definition
 INSTALLED_APPS = [
@@ -56,17 +62,20 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'academia.middleware.HostPermitidoMiddleware',  # Valida o host (HOSTS_PERMITIDOS compilado)
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'academia.middleware.WhiteNoiseAsyncMiddleware',  # WhiteNoise que também roda no modo ASGI
+    'academia.middleware.MetricasMiddleware',  # Server-Timing, log estruturado e histogramas por rota
+    'academia.middleware.PerfilamentoMiddleware',  # cProfile sob demanda (X-Profile: <PERFIS_TOKEN>)
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
-    'academia.middleware.RailwayHostMiddleware',  # Aceita domínios do Railway automaticamente
     'academia.middleware.DisableCSRFForAPI',  # Desabilita CSRF para rotas /api/
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'academia.middleware.ConsultasRepetidasMiddleware',  # Detector de N+1 (desligado em produção)
 ]
 
 ROOT_URLCONF = 'academia_project.urls'
@@ -135,6 +144,38 @@ else:
         }
     }
 
+# Cache
+# Com REDIS_URL o cache é compartilhado entre os workers (necessário para o contador de ocupação)
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'athletech',
+        }
+    }
+
+# Só com REDIS_URL: sessões em cache com gravação no banco (cached_db), sem consultar o banco na
+# leitura, e o usuário das requisições com sessão (portal, dashboards, admin) também vindo do cache
+# (academia.autenticacao), invalidado a cada save(); alterações feitas com update() em lote
+# aparecem em até USUARIO_CACHE_TIMEOUT segundos.
+# Sem Redis o cache é por processo: um logout ou uma alteração do usuário num worker não chegaria
+# aos demais, então sessão e usuário continuam lidos do banco
+if REDIS_URL:
+    SESSION_ENGINE = config('SESSION_ENGINE', default='django.contrib.sessions.backends.cached_db')
+    AUTHENTICATION_BACKENDS = ['academia.autenticacao.BackendUsuarioEmCache']
+else:
+    SESSION_ENGINE = config('SESSION_ENGINE', default='django.contrib.sessions.backends.db')
+    AUTHENTICATION_BACKENDS = ['django.contrib.auth.backends.ModelBackend']
+USUARIO_CACHE_TIMEOUT = config('USUARIO_CACHE_TIMEOUT', default=300, cast=int)
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',},
@@ -153,7 +194,17 @@ USE_TZ = True
 STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 STATICFILES_DIRS = [BASE_DIR / 'static']
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+# Nomes com hash e versões gzip/brotli (WhiteNoise); o collectstatic também pré-renderiza as
+# páginas estáticas do frontend (academia.paginas). Nos testes não há manifesto: storage simples
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {
+        'BACKEND': 'academia.paginas.ArmazenamentoEstatico' if not TESTANDO
+        else 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+# Páginas pré-renderizadas são servidas em URLs fixas: cache curto, revalidado por ETag/Last-Modified
+PAGINAS_ESTATICAS_MAX_AGE = config('PAGINAS_ESTATICAS_MAX_AGE', default=60, cast=int)
 
 # Media files
 MEDIA_URL = '/media/'
@@ -169,7 +220,7 @@ REST_FRAMEWORK = {
         'rest_framework.authentication.SessionAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': ['rest_framework.permissions.IsAuthenticated'],
-    'DEFAULT_RENDERER_CLASSES': ['rest_framework.renderers.JSONRenderer'],
+    'DEFAULT_RENDERER_CLASSES': ['academia.metricas.JSONRendererMedido'],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
 }
@@ -229,6 +280,62 @@ MERCADOPAGO_ACCESS_TOKEN = config('MERCADOPAGO_ACCESS_TOKEN', default='')
 MERCADOPAGO_PUBLIC_KEY = config('MERCADOPAGO_PUBLIC_KEY', default='')
 MERCADOPAGO_WEBHOOK_URL = config('MERCADOPAGO_WEBHOOK_URL', default='http://localhost:8000')
 MERCADOPAGO_USE_MCP = config('MERCADOPAGO_USE_MCP', default=False, cast=bool)
+# API usada pelo SDK e pelo cliente assíncrono (services/mercadopago_async.py) e timeout das chamadas em segundos
+# Para testes de carga/falhas sem a API real: python manage.py mercadopago_fake e MERCADOPAGO_API_URL=http://127.0.0.1:8001
+MERCADOPAGO_API_URL = config('MERCADOPAGO_API_URL', default='https://api.mercadopago.com')
+MERCADOPAGO_TIMEOUT = config('MERCADOPAGO_TIMEOUT', default=10, cast=int)
+
+# Ocupação (stream SSE para telões; mantém um worker ocupado por conexão)
+OCUPACAO_SSE_HABILITADO = config('OCUPACAO_SSE_HABILITADO', default=False, cast=bool)
+OCUPACAO_SSE_INTERVALO = config('OCUPACAO_SSE_INTERVALO', default=2, cast=int)
+OCUPACAO_SSE_DURACAO_MAXIMA = config('OCUPACAO_SSE_DURACAO_MAXIMA', default=300, cast=int)
+
+# Sincronização incremental (/api/sync/): por quantos dias as exclusões ficam registradas.
+# Clientes com token mais antigo recebem uma sincronização completa.
+SYNC_RETENCAO_EXCLUSOES_DIAS = config('SYNC_RETENCAO_EXCLUSOES_DIAS', default=90, cast=int)
+
+# Manutenção de pedidos (python manage.py manutencao_pedidos): pendentes expiram após o TTL
+# do PIX/preferência; finalizados saem da tabela Pedido para PedidoArquivado após a retenção
+PEDIDO_PENDENTE_TTL_HORAS = config('PEDIDO_PENDENTE_TTL_HORAS', default=24, cast=int)
+PEDIDOS_RETENCAO_DIAS = config('PEDIDOS_RETENCAO_DIAS', default=730, cast=int)
+
+# Importação de alunos (POST /api/usuarios/importar/ e python manage.py importar_alunos)
+IMPORTACAO_MAX_LINHAS = config('IMPORTACAO_MAX_LINHAS', default=20000, cast=int)
+IMPORTACAO_PROCESSOS = config('IMPORTACAO_PROCESSOS', default=0, cast=int)  # 0 = número de CPUs
+
+# Indicadores do painel administrativo (/api/admin/kpis/): segundos em cache
+KPIS_CACHE_TIMEOUT = config('KPIS_CACHE_TIMEOUT', default=60, cast=int)
+
+# Servidor: 'wsgi' (gunicorn síncrono) ou 'asgi' (uvicorn, start.sh com SERVIDOR=asgi).
+# No ASGI as rotas de pagamento usam views assíncronas: a espera pelo Mercado Pago não prende
+# o worker, e o ORM delas roda num pool de PAGAMENTOS_ORM_THREADS threads (0 = thread do Django)
+SERVIDOR = config('SERVIDOR', default='wsgi')
+PAGAMENTOS_ASSINCRONOS = config('PAGAMENTOS_ASSINCRONOS', default=SERVIDOR == 'asgi', cast=bool)
+PAGAMENTOS_ORM_THREADS = config('PAGAMENTOS_ORM_THREADS', default=8, cast=int)
+
+# Métricas por requisição (academia.metricas): Server-Timing para staff, uma linha JSON por
+# requisição no logger academia.metricas (nível INFO) e histogramas por rota em /api/metricas/,
+# liberado para staff ou com o header Authorization: Bearer <METRICAS_TOKEN>
+METRICAS_HABILITADAS = config('METRICAS_HABILITADAS', default=True, cast=bool)
+METRICAS_TOKEN = config('METRICAS_TOKEN', default='')
+
+# Perfilamento sob demanda (academia.perfis): quem envia X-Profile: <PERFIS_TOKEN> tem a requisição
+# rodando sob cProfile (vazio desliga o header); uma fração das requisições também pode ser
+# perfilada por amostragem (0.001 = 0,1%).
+# Os perfis ficam no admin (PerfilRequisicao), limitados aos PERFIS_MAXIMO mais recentes
+PERFIS_HABILITADOS = config('PERFIS_HABILITADOS', default=True, cast=bool)
+PERFIS_TOKEN = config('PERFIS_TOKEN', default='')
+PERFIS_TAXA_AMOSTRAGEM = config('PERFIS_TAXA_AMOSTRAGEM', default=0.0, cast=float)
+PERFIS_MAXIMO = config('PERFIS_MAXIMO', default=200, cast=int)
+
+# Detector de N+1: a mesma consulta repetida mais que o limite numa requisição
+# gera um aviso no log (DEBUG) ou falha a requisição (testes). None desliga.
+CONSULTAS_REPETIDAS_LIMITE = config(
+    'CONSULTAS_REPETIDAS_LIMITE',
+    default=10 if (DEBUG or TESTANDO) else None,
+    cast=lambda v: int(v) if v not in (None, '') else None,
+)
+CONSULTAS_REPETIDAS_ESTRITO = config('CONSULTAS_REPETIDAS_ESTRITO', default=TESTANDO, cast=bool)
 
 # Neon Auth settings
 STACK_PROJECT_ID = config('STACK_PROJECT_ID', default='')
@@ -7,6 +7,7 @@ from django.views.generic import TemplateView
 from django.views.static import serve as static_serve
 
 from academia import views as academia_views
+from academia.paginas import PAGINAS_ESTATICAS
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -14,19 +15,19 @@ urlpatterns = [
     # URLs da API
     path('api/', include('academia.urls')),
     
-    # URLs para servir as páginas HTML do frontend do usuário
-    path('', TemplateView.as_view(template_name='html/home.html'), name='home'),
+    # Páginas estáticas do frontend: em produção servidas pré-renderizadas pelo WhiteNoise
+    # (academia.paginas); as views só atendem quando não há collectstatic (DEBUG, testes)
+    *[
+        path(url.lstrip('/'), TemplateView.as_view(template_name=template), name=rota)
+        for url, (rota, template) in PAGINAS_ESTATICAS.items()
+    ],
+    
+    # Páginas com sessão (redirecionam pelo papel do usuário)
     path('login/', academia_views.login_view, name='login'),
     path('logout/', academia_views.logout_view, name='logout'),
     path('portal/', academia_views.AlunoPortalPage.as_view(), name='portal'),
     path('portal/admin/', academia_views.AdminDashboardPage.as_view(), name='portal_admin_dashboard'),
     path('portal/professor/', academia_views.ProfessorDashboardPage.as_view(), name='portal_professor_dashboard'),
-    path('treinos/', TemplateView.as_view(template_name='html/treinos_frontend.html'), name='treinos'),
-    path('planos/', TemplateView.as_view(template_name='html/planos_frontend.html'), name='planos'),
-    path('cadastro/', TemplateView.as_view(template_name='html/cadastro_frontend.html'), name='cadastro'),
-    path('checkout/', TemplateView.as_view(template_name='html/checkout_frontend.html'), name='checkout'),
-    path('torneio/', TemplateView.as_view(template_name='html/torneio.html'), name='torneio'),
-    path('recuperar-senha/', TemplateView.as_view(template_name='html/recuperar.html'), name='recuperar_senha'),
     path('robots.txt', static_serve, {'path': 'robots.txt', 'document_root': settings.STATIC_ROOT}),
     path('sitemap.xml', static_serve, {'path': 'sitemap.xml', 'document_root': settings.STATIC_ROOT}),
     
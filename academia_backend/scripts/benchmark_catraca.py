@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+"""
+Benchmark da ingestão de frequência (POST /api/frequencia/lote/)
+Gera um feed simulado de catraca (entradas em horário de pico, saídas 45-120 min
+depois e ~2% de reenvios duplicados) e envia em lotes NDJSON pelo client do Django.
+Tudo roda dentro de uma transação desfeita no final: o banco não é alterado.
+
+Uso:
+    python scripts/benchmark_catraca.py --usuarios 2000 --eventos 50000 --lote 2000
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import timedelta
+
+# Configurar Django
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'academia_project.settings')
+
+import django
+django.setup()
+
+from django.db import transaction
+from django.test import Client
+from django.utils import timezone
+
+from academia.models import Usuario
+
+
+class RollbackBenchmark(Exception):
+    """Usada para desfazer a transação ao final do benchmark"""
+
+
+def gerar_feed(usuarios_ids, total_eventos, taxa_duplicados=0.02):
+    """Gera eventos de catraca em ordem cronológica, como um controlador enviaria"""
+    inicio_dia = timezone.now().replace(hour=6, minute=0, second=0, microsecond=0) - timedelta(days=1)
+    eventos = []
+    sequencia = 0
+    while len(eventos) < total_eventos:
+        usuario_id = random.choice(usuarios_ids)
+        # Picos às 7h e às 18h
+        pico = random.choice((1, 12))
+        entrada = inicio_dia + timedelta(hours=pico + random.gauss(0, 1), minutes=random.randint(0, 59))
+        saida = entrada + timedelta(minutes=random.randint(45, 120))
+        for tipo, data_hora in (('entrada', entrada), ('saida', saida)):
+            sequencia += 1
+            eventos.append({
+                'evento_id': f'catraca-01-{sequencia}',
+                'usuario': usuario_id,
+                'tipo': tipo,
+                'data_hora': data_hora.isoformat(),
+            })
+    eventos = eventos[:total_eventos]
+    eventos.sort(key=lambda e: e['data_hora'])
+
+    duplicados = random.sample(eventos, int(len(eventos) * taxa_duplicados))
+    for evento in duplicados:
+        eventos.insert(random.randint(0, len(eventos)), dict(evento))
+    return eventos
+
+
+def executar(args):
+    client = Client()
+    with transaction.atomic():
+        admin = Usuario.objects.create_user(
+            username='benchmark-admin', email='benchmark-admin@example.com',
+            password=None, role=Usuario.Role.ADMIN,
+        )
+        Usuario.objects.bulk_create(
+            [
+                Usuario(username=f'benchmark-{i}', email=f'benchmark-{i}@example.com', password='!')
+                for i in range(args.usuarios)
+            ],
+            batch_size=1000,
+        )
+        usuarios_ids = list(
+            Usuario.objects.filter(username__startswith='benchmark-').exclude(id=admin.id).values_list('id', flat=True)
+        )
+        client.force_login(admin)
+
+        print(f"🧪 Gerando feed com {args.eventos} eventos para {len(usuarios_ids)} usuários...")
+        eventos = gerar_feed(usuarios_ids, args.eventos)
+
+        totais = {}
+        inicio = time.perf_counter()
+        for i in range(0, len(eventos), args.lote):
+            corpo = '\n'.join(json.dumps(e) for e in eventos[i:i + args.lote])
+            response = client.post(
+                '/api/frequencia/lote/', corpo,
+                content_type='application/x-ndjson', secure=True,
+            )
+            if response.status_code != 200:
+                print(f"❌ Lote {i // args.lote} falhou: HTTP {response.status_code}")
+                break
+            for chave, valor in response.json().items():
+                if isinstance(valor, int):
+                    totais[chave] = totais.get(chave, 0) + valor
+        duracao = time.perf_counter() - inicio
+
+        print(f"⏱️  {len(eventos)} eventos em {duracao:.2f}s -> {len(eventos) / duracao:,.0f} eventos/s")
+        for chave, valor in totais.items():
+            print(f"   {chave}: {valor}")
+
+        raise RollbackBenchmark
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--usuarios', type=int, default=2000)
+    parser.add_argument('--eventos', type=int, default=50000)
+    parser.add_argument('--lote', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    random.seed(args.seed)
+    try:
+        executar(args)
+    except RollbackBenchmark:
+        print("🧹 Transação desfeita, nenhum dado foi mantido.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,278 @@
+#!/usr/bin/env python
+"""
+Benchmark dos endpoints principais sobre dados em volume de produção
+Popule antes com `python manage.py popular_carga` (50 mil usuários, 200 mil matrículas,
+1 milhão de frequências, 500 mil pedidos, torneios de 256 participantes). Cada endpoint é
+chamado --repeticoes vezes com o usuário do papel adequado (aluno, professor ou admin), após
+--aquecimento chamadas descartadas; mede latência p50/p95/p99, consultas SQL por requisição e
+pico de memória alocada (tracemalloc, numa requisição extra para não distorcer a latência).
+
+Por padrão usa o client do Django no próprio processo. Com --url as requisições vão para um
+servidor já em execução (ex.: gunicorn local): as consultas vêm do header Server-Timing
+(respostas de staff ou com DEBUG) e a memória não é medida.
+
+O resultado vai para um JSON (--saida) com o commit atual; --comparar com o JSON de outro
+commit lista as diferenças e termina com código 1 se algum p95 piorou além de --tolerancia %
+ou se algum endpoint passou a fazer mais consultas.
+
+Uso:
+    python scripts/benchmark_endpoints.py --saida bench-$(git rev-parse --short HEAD).json
+    python scripts/benchmark_endpoints.py --comparar bench-anterior.json --apenas kpis,usuarios
+    python scripts/benchmark_endpoints.py --url http://127.0.0.1:8000 --repeticoes 200
+"""
+
+import argparse
+import http.client
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+# Configurar Django
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'academia_project.settings')
+
+import django
+django.setup()
+
+from django.db import connection
+from django.test import Client
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from academia.models import Frequencia, Matricula, Pedido, Torneio, Usuario
+
+# (nome, papel, caminho); {aluno_id}, {inicio} e {fim} são preenchidos em tempo de execução
+ENDPOINTS = [
+    ('perfil', 'aluno', '/api/auth/user/'),
+    ('planos', 'aluno', '/api/planos/'),
+    ('dashboard', 'aluno', '/api/dashboard/'),
+    ('treinos', 'aluno', '/api/treinos/'),
+    ('avaliacoes', 'aluno', '/api/avaliacoes/'),
+    ('matriculas', 'aluno', '/api/matriculas/'),
+    ('torneios', 'aluno', '/api/torneios/'),
+    ('sync', 'aluno', '/api/sync/'),
+    ('ocupacao', 'aluno', '/api/frequencia/ocupacao/'),
+    ('professor_alunos', 'professor', '/api/professor/alunos/?limite=50'),
+    ('progresso', 'professor', '/api/avaliacoes/progresso/?usuario={aluno_id}'),
+    ('usuarios', 'admin', '/api/usuarios/?search=silva'),
+    ('usuarios_buscar', 'admin', '/api/usuarios/buscar/?q=ana'),
+    ('kpis', 'admin', '/api/admin/kpis/?meses=6'),
+    ('frequencia_relatorio', 'admin', '/api/frequencia/relatorio/?inicio={inicio}&fim={fim}&agrupar=semana'),
+    ('mapa_calor', 'admin', '/api/frequencia/mapa-calor/?inicio={inicio}&fim={fim}'),
+    ('exportar_frequencias', 'admin', '/api/admin/exportar/frequencias/?formato=csv&inicio={fim}&fim={fim}'),
+]
+
+CONSULTAS_SERVER_TIMING = re.compile(r'desc="(\d+) consultas"')
+
+
+def commit_atual():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def usuarios_benchmark(prefixo):
+    """Admin, professor e aluno gerados pelo popular_carga (ou os primeiros de cada papel)"""
+    usuarios = {}
+    for papel, username in (('admin', f'{prefixo}-admin'), ('professor', f'{prefixo}-professor'),
+                            ('aluno', f'{prefixo}-0')):
+        usuario = (Usuario.objects.filter(username=username).first()
+                   or Usuario.objects.filter(role=papel, is_active=True).order_by('id').first())
+        if usuario is None:
+            raise SystemExit(f"❌ Nenhum usuário com papel {papel}: rode `python manage.py popular_carga`")
+        usuarios[papel] = usuario
+    return usuarios
+
+
+class ContadorConsultas:
+    """execute_wrapper que só conta (CaptureQueriesContext guardaria o SQL de cada chamada)"""
+
+    def __init__(self):
+        self.total = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.total += 1
+        return execute(sql, params, many, context)
+
+
+class ClienteLocal:
+    """Requisições pelo client do Django, no mesmo processo"""
+    mede_memoria = True
+
+    def __init__(self):
+        self.client = Client()
+
+    def get(self, caminho, token):
+        contador = ContadorConsultas()
+        with connection.execute_wrapper(contador):
+            response = self.client.get(caminho, secure=True, headers={'authorization': f'Bearer {token}'})
+            # Respostas em streaming (exportação) só terminam de consultar ao serem consumidas
+            corpo = b''.join(response.streaming_content) if response.streaming else response.content
+        return response.status_code, len(corpo), contador.total
+
+
+class ClienteRemoto:
+    """Requisições HTTP para um servidor em execução, numa conexão keep-alive"""
+    mede_memoria = False
+
+    def __init__(self, url):
+        partes = urlsplit(url)
+        classe = http.client.HTTPSConnection if partes.scheme == 'https' else http.client.HTTPConnection
+        self.conexao = classe(partes.netloc, timeout=120)
+
+    def get(self, caminho, token):
+        self.conexao.request('GET', caminho, headers={'Authorization': f'Bearer {token}'})
+        response = self.conexao.getresponse()
+        corpo = response.read()
+        encontrado = CONSULTAS_SERVER_TIMING.search(response.getheader('Server-Timing') or '')
+        return response.status, len(corpo), int(encontrado.group(1)) if encontrado else None
+
+
+def percentil(amostras, p):
+    """Percentil p (0-100) por interpolação linear, como numpy.percentile"""
+    ordenadas = sorted(amostras)
+    if len(ordenadas) == 1:
+        return ordenadas[0]
+    posicao = (len(ordenadas) - 1) * p / 100
+    base = int(posicao)
+    proxima = min(base + 1, len(ordenadas) - 1)
+    return ordenadas[base] + (ordenadas[proxima] - ordenadas[base]) * (posicao - base)
+
+
+def medir_endpoint(cliente, caminho, token, repeticoes, aquecimento):
+    for _ in range(aquecimento):
+        cliente.get(caminho, token)
+
+    duracoes, consultas, status_codes, tamanho = [], [], set(), 0
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        status_code, tamanho, total_consultas = cliente.get(caminho, token)
+        duracoes.append((time.perf_counter() - inicio) * 1000)
+        status_codes.add(status_code)
+        if total_consultas is not None:
+            consultas.append(total_consultas)
+
+    memoria_kb = None
+    if cliente.mede_memoria:
+        tracemalloc.start()
+        try:
+            cliente.get(caminho, token)
+            memoria_kb = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+        finally:
+            tracemalloc.stop()
+
+    return {
+        'caminho': caminho,
+        'status': sorted(status_codes),
+        'repeticoes': repeticoes,
+        'p50_ms': round(percentil(duracoes, 50), 2),
+        'p95_ms': round(percentil(duracoes, 95), 2),
+        'p99_ms': round(percentil(duracoes, 99), 2),
+        'media_ms': round(statistics.fmean(duracoes), 2),
+        'max_ms': round(max(duracoes), 2),
+        'consultas': max(consultas) if consultas else None,
+        'memoria_pico_kb': memoria_kb,
+        'bytes': tamanho,
+    }
+
+
+def comparar(atual, anterior, tolerancia):
+    """Imprime as diferenças e devolve a lista de regressões"""
+    regressoes = []
+    print(f"\n📊 Comparação com {anterior.get('commit') or 'anterior'}")
+    for nome, resultado in atual['endpoints'].items():
+        antes = anterior.get('endpoints', {}).get(nome)
+        if not antes:
+            print(f"   {nome:<22} (novo)")
+            continue
+        variacao = (resultado['p95_ms'] - antes['p95_ms']) / antes['p95_ms'] * 100 if antes['p95_ms'] else 0
+        consultas = ''
+        if resultado['consultas'] is not None and antes.get('consultas') is not None:
+            consultas = f"  consultas {antes['consultas']} -> {resultado['consultas']}"
+            if resultado['consultas'] > antes['consultas']:
+                regressoes.append(f"{nome}: consultas {antes['consultas']} -> {resultado['consultas']}")
+        if variacao > tolerancia:
+            regressoes.append(f"{nome}: p95 {antes['p95_ms']} -> {resultado['p95_ms']} ms (+{variacao:.0f}%)")
+        marca = '🔺' if variacao > tolerancia else ('🔻' if variacao < -tolerancia else '  ')
+        print(f"{marca} {nome:<22} p95 {antes['p95_ms']:>9.2f} -> {resultado['p95_ms']:>9.2f} ms "
+              f"({variacao:+.0f}%){consultas}")
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeticoes', type=int, default=50)
+    parser.add_argument('--aquecimento', type=int, default=3)
+    parser.add_argument('--apenas', help='Nomes de endpoints separados por vírgula')
+    parser.add_argument('--prefixo', default='carga', help='Prefixo dos usuários do popular_carga')
+    parser.add_argument('--url', help='Servidor em execução (ex.: http://127.0.0.1:8000); padrão: client do Django')
+    parser.add_argument('--saida', help='Arquivo JSON com os resultados')
+    parser.add_argument('--comparar', help='JSON de uma execução anterior')
+    parser.add_argument('--tolerancia', type=float, default=20.0, help='Piora de p95 aceita, em %%')
+    args = parser.parse_args()
+
+    usuarios = usuarios_benchmark(args.prefixo)
+    tokens = {papel: str(RefreshToken.for_user(usuario).access_token) for papel, usuario in usuarios.items()}
+    hoje = timezone.localdate()
+    valores = {'aluno_id': usuarios['aluno'].id, 'inicio': hoje - timedelta(days=30), 'fim': hoje}
+    selecionados = set(args.apenas.split(',')) if args.apenas else None
+    cliente = ClienteRemoto(args.url) if args.url else ClienteLocal()
+
+    volumes = {
+        'usuarios': Usuario.objects.count(),
+        'matriculas': Matricula.objects.count(),
+        'frequencias': Frequencia.objects.count(),
+        'pedidos': Pedido.objects.count(),
+        'torneios': Torneio.objects.count(),
+    }
+    print(f"🧪 {connection.vendor}, " + ', '.join(f'{valor} {nome}' for nome, valor in volumes.items()))
+
+    resultado = {
+        'commit': commit_atual(),
+        'data': timezone.now().isoformat(),
+        'banco': connection.vendor,
+        'alvo': args.url or 'django.test.Client',
+        'volumes': volumes,
+        'repeticoes': args.repeticoes,
+        'endpoints': {},
+    }
+    for nome, papel, caminho in ENDPOINTS:
+        if selecionados and nome not in selecionados:
+            continue
+        medicao = medir_endpoint(
+            cliente, caminho.format(**valores), tokens[papel], args.repeticoes, args.aquecimento,
+        )
+        resultado['endpoints'][nome] = medicao
+        alerta = '' if medicao['status'] == [200] else f"  ⚠️ HTTP {medicao['status']}"
+        memoria = f"{medicao['memoria_pico_kb']:>9.1f} KB" if medicao['memoria_pico_kb'] is not None else ''
+        print(f"⏱️  {nome:<22} p50 {medicao['p50_ms']:>8.2f}  p95 {medicao['p95_ms']:>8.2f}  "
+              f"p99 {medicao['p99_ms']:>8.2f} ms  {medicao['consultas'] if medicao['consultas'] is not None else '-':>4} "
+              f"consultas {memoria}{alerta}")
+
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as arquivo:
+            json.dump(resultado, arquivo, indent=2, ensure_ascii=False)
+        print(f"💾 Resultados em {args.saida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as arquivo:
+            regressoes = comparar(resultado, json.load(arquivo), args.tolerancia)
+        if regressoes:
+            print("❌ Regressões:\n   " + '\n   '.join(regressoes))
+            sys.exit(1)
+        print("✅ Sem regressões")
+
+
+if __name__ == '__main__':
+    main()
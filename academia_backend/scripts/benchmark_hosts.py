@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+"""
+Benchmark da validação de host
+Compara o caminho antigo (RailwayHostMiddleware: busca linear em ALLOWED_HOSTS, append do
+host novo e validate_host do Django sobre a lista crescente) com o ValidadorHosts compilado
+(academia.hosts), para N hosts distintos de preview do Railway e requisições repetidas.
+
+Uso:
+    python scripts/benchmark_hosts.py --hosts 10000 --requisicoes 50000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+# Configurar Django
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'academia_project.settings')
+
+import django
+django.setup()
+
+from django.http.request import validate_host
+
+from academia.hosts import ValidadorHosts
+
+HOSTS_BASE = ['localhost', '127.0.0.1', 'academia.exemplo.com.br', 'www.academia.exemplo.com.br']
+
+
+def caminho_antigo(hosts_requisicoes):
+    """Reproduz o RailwayHostMiddleware removido: lista global mutada + validate_host linear"""
+    allowed_hosts = list(HOSTS_BASE)
+    for host in hosts_requisicoes:
+        if host.endswith('.railway.app') or host.endswith('.up.railway.app'):
+            if host not in allowed_hosts:
+                allowed_hosts.append(host)
+        if not validate_host(host, allowed_hosts):
+            raise AssertionError(host)
+    return len(allowed_hosts)
+
+
+def caminho_compilado(hosts_requisicoes):
+    validador = ValidadorHosts(HOSTS_BASE + ['.railway.app'])
+    for host in hosts_requisicoes:
+        if not validador.permitido(host):
+            raise AssertionError(host)
+    return len(validador.exatos) + len(validador.sufixos)
+
+
+def medir(nome, funcao, hosts_requisicoes):
+    inicio = time.perf_counter()
+    tamanho = funcao(hosts_requisicoes)
+    duracao = time.perf_counter() - inicio
+    por_requisicao = duracao / len(hosts_requisicoes) * 1e6
+    print(f"⏱️  {nome:<10} {duracao:8.3f}s  {por_requisicao:8.2f} µs/req  (lista/conjunto final: {tamanho})")
+    return duracao
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--hosts', type=int, default=10000, help='Hosts de preview distintos')
+    parser.add_argument('--requisicoes', type=int, default=50000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    previews = [f'app-pr-{i}-{random.randrange(16 ** 6):06x}.up.railway.app' for i in range(args.hosts)]
+    # Cada host aparece ao menos uma vez; o restante são requisições repetidas e domínio próprio
+    hosts_requisicoes = previews + random.choices(
+        previews + HOSTS_BASE, k=max(args.requisicoes - len(previews), 0)
+    )
+    random.shuffle(hosts_requisicoes)
+
+    print(f"🧪 {len(hosts_requisicoes)} requisições, {args.hosts} hosts distintos")
+    antigo = medir('antigo', caminho_antigo, hosts_requisicoes)
+    compilado = medir('compilado', caminho_compilado, hosts_requisicoes)
+    print(f"🚀 {antigo / compilado:,.0f}x mais rápido")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+"""
+Cenário de carga: checkouts PIX simultâneos até a aprovação, contra o Mercado Pago fake
+Cada comprador virtual faz POST /api/payments/pix/initiate/, "paga" a preferência no fake
+(POST /__fake/preferences/<id>/pagar, que dispara o webhook) e consulta
+/api/payments/pix/status/<pedido>/ até o pedido ficar aprovado. Ao final confere no banco
+que cada comprador tem exatamente uma matrícula ativa (webhooks duplicados e consultas de
+status concorrentes não podem criar duas).
+
+Pré-requisitos, com o mesmo banco deste processo:
+    python manage.py mercadopago_fake --porta 8001 --latencia 150 --variacao 100 --erros 0.02 --webhook-duplicado 0.3
+    MERCADOPAGO_API_URL=http://127.0.0.1:8001 MERCADOPAGO_ACCESS_TOKEN=TEST-fake \\
+        MERCADOPAGO_WEBHOOK_URL=http://127.0.0.1:8000 gunicorn academia_project.wsgi -w 4 --threads 8 -b 127.0.0.1:8000
+    (ou SERVIDOR=asgi ./start.sh para as views de pagamento assíncronas)
+
+Uso:
+    python scripts/carga_checkout_pix.py --checkouts 1000 --concorrencia 1000 --saida checkout.json
+"""
+
+import argparse
+import http.client
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+# Configurar Django
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'academia_project.settings')
+
+import django
+django.setup()
+
+from django.contrib.auth.hashers import make_password
+from django.db.models import Count, Q
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from academia.models import Matricula, Pedido, Plano, Usuario
+
+
+class Conexao:
+    """Conexão HTTP keep-alive de um comprador; reabre se o servidor fechar"""
+
+    def __init__(self, url):
+        self.partes = urlsplit(url)
+        self.conexao = None
+
+    def requisitar(self, metodo, caminho, dados=None, token=None):
+        headers = {'Content-Type': 'application/json'}
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        corpo = json.dumps(dados) if dados is not None else None
+        for tentativa in range(2):
+            if self.conexao is None:
+                classe = http.client.HTTPSConnection if self.partes.scheme == 'https' else http.client.HTTPConnection
+                self.conexao = classe(self.partes.netloc, timeout=120)
+            try:
+                self.conexao.request(metodo, caminho, body=corpo, headers=headers)
+                resposta = self.conexao.getresponse()
+                conteudo = resposta.read()
+                break
+            except (http.client.HTTPException, OSError):
+                self.conexao.close()
+                self.conexao = None
+                if tentativa:
+                    raise
+        try:
+            return resposta.status, json.loads(conteudo) if conteudo else {}
+        except ValueError:
+            return resposta.status, {}
+
+
+def preparar_compradores(quantidade, prefixo):
+    """Cria (uma vez) os compradores e remove pedidos/matrículas de execuções anteriores"""
+    existentes = set(Usuario.objects.filter(username__startswith=f'{prefixo}-').values_list('username', flat=True))
+    senha = make_password(None)
+    novos = [
+        Usuario(username=f'{prefixo}-{i}', email=f'{prefixo}-{i}@example.com', password=senha,
+                first_name='Comprador', last_name=str(i))
+        for i in range(quantidade) if f'{prefixo}-{i}' not in existentes
+    ]
+    for usuario in novos:
+        usuario.texto_busca = usuario.montar_texto_busca()
+    Usuario.objects.bulk_create(novos, batch_size=1000)
+    compradores = list(Usuario.objects.filter(username__in=[f'{prefixo}-{i}' for i in range(quantidade)]))
+    Pedido.objects.filter(usuario__in=compradores).delete()
+    Matricula.objects.filter(usuario__in=compradores).delete()
+    return [(usuario.id, str(RefreshToken.for_user(usuario).access_token)) for usuario in compradores]
+
+
+def checkout(args, plano_id, token, inicio_sinal):
+    """Um comprador: initiate -> pagar no fake -> polling do status. Devolve o registro de tempos"""
+    inicio_sinal.wait()
+    app, fake = Conexao(args.url), Conexao(args.fake)
+    registro = {'etapa': 'initiate', 'initiate_ms': None, 'status_ms': [], 'aprovacao_ms': None}
+
+    comeco = time.perf_counter()
+    status_http, pedido = app.requisitar('POST', '/api/payments/pix/initiate/', {'plano_id': plano_id}, token)
+    registro['initiate_ms'] = (time.perf_counter() - comeco) * 1000
+    if status_http != 201 or not pedido.get('preference_id'):
+        registro['erro'] = f'initiate HTTP {status_http}: {pedido.get("detail", "")}'
+        return registro
+
+    registro['etapa'] = 'pagamento'
+    status_http, _ = fake.requisitar('POST', f"/__fake/preferences/{pedido['preference_id']}/pagar", {'status': 'approved'})
+    if status_http != 201:
+        registro['erro'] = f'pagar HTTP {status_http}'
+        return registro
+    pago_em = time.perf_counter()
+
+    registro['etapa'] = 'aprovacao'
+    limite = pago_em + args.timeout
+    while time.perf_counter() < limite:
+        comeco = time.perf_counter()
+        status_http, dados = app.requisitar('GET', f"/api/payments/pix/status/{pedido['id_publico']}/", token=token)
+        registro['status_ms'].append((time.perf_counter() - comeco) * 1000)
+        if status_http == 200 and dados.get('status') == Pedido.STATUS_APROVADO:
+            registro['aprovacao_ms'] = (time.perf_counter() - pago_em) * 1000
+            registro['etapa'] = 'concluido'
+            return registro
+        time.sleep(args.intervalo)
+    registro['erro'] = f'não aprovado em {args.timeout}s'
+    return registro
+
+
+def percentis(amostras):
+    if not amostras:
+        return None
+    ordenadas = sorted(amostras)
+
+    def p(percentil):
+        return round(ordenadas[min(int(len(ordenadas) * percentil / 100), len(ordenadas) - 1)], 1)
+
+    return {'n': len(ordenadas), 'p50_ms': p(50), 'p95_ms': p(95), 'p99_ms': p(99), 'max_ms': round(ordenadas[-1], 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:8000', help='Backend em execução')
+    parser.add_argument('--fake', default='http://127.0.0.1:8001', help='Mercado Pago fake (manage.py mercadopago_fake)')
+    parser.add_argument('--checkouts', type=int, default=1000)
+    parser.add_argument('--concorrencia', type=int, default=1000, help='Compradores ao mesmo tempo')
+    parser.add_argument('--plano', type=int, help='ID do plano (padrão: o primeiro ativo)')
+    parser.add_argument('--intervalo', type=float, default=0.5, help='Segundos entre consultas de status')
+    parser.add_argument('--timeout', type=float, default=120, help='Segundos até desistir da aprovação')
+    parser.add_argument('--prefixo', default='checkout')
+    parser.add_argument('--saida', help='Arquivo JSON com os resultados')
+    args = parser.parse_args()
+
+    plano = Plano.objects.get(pk=args.plano) if args.plano else Plano.objects.filter(ativo=True).first()
+    if plano is None:
+        raise SystemExit('❌ Nenhum plano ativo: rode scripts/create_initial_data.py ou popular_carga')
+    status_http, estado_inicial = Conexao(args.fake).requisitar('GET', '/__fake/estado')
+    if status_http != 200:
+        raise SystemExit(f'❌ Mercado Pago fake não respondeu em {args.fake}')
+
+    print(f"🧪 Preparando {args.checkouts} compradores (plano {plano.nome})...")
+    compradores = preparar_compradores(args.checkouts, args.prefixo)
+
+    inicio_sinal = threading.Event()
+    with ThreadPoolExecutor(max_workers=args.concorrencia) as executor:
+        futuros = [executor.submit(checkout, args, plano.id, token, inicio_sinal) for _, token in compradores]
+        print(f"🚀 {len(futuros)} checkouts, {args.concorrencia} simultâneos")
+        inicio = time.perf_counter()
+        inicio_sinal.set()
+        registros = [futuro.result() for futuro in futuros]
+    duracao = time.perf_counter() - inicio
+
+    ids = [usuario_id for usuario_id, _ in compradores]
+    matriculas_ativas = (
+        Usuario.objects.filter(id__in=ids)
+        .annotate(ativas=Count('matriculas', filter=Q(matriculas__status='ativa')))
+        .values_list('ativas', flat=True)
+    )
+    _, estado_final = Conexao(args.fake).requisitar('GET', '/__fake/estado')
+    contadores = {
+        chave: valor - estado_inicial['contadores'].get(chave, 0)
+        for chave, valor in estado_final['contadores'].items()
+    }
+    falhas = {}
+    for registro in registros:
+        if registro.get('erro'):
+            falhas[registro['etapa']] = falhas.get(registro['etapa'], 0) + 1
+
+    resultado = {
+        'checkouts': len(registros),
+        'concorrencia': args.concorrencia,
+        'duracao_s': round(duracao, 2),
+        'aprovados': sum(registro['etapa'] == 'concluido' for registro in registros),
+        'falhas_por_etapa': falhas,
+        'exemplos_erros': sorted({registro['erro'] for registro in registros if registro.get('erro')})[:10],
+        'initiate': percentis([r['initiate_ms'] for r in registros if r['initiate_ms'] is not None]),
+        'status': percentis([ms for r in registros for ms in r['status_ms']]),
+        'pagamento_ate_aprovacao': percentis([r['aprovacao_ms'] for r in registros if r['aprovacao_ms'] is not None]),
+        'compradores_sem_matricula': sum(ativas == 0 for ativas in matriculas_ativas),
+        'compradores_com_matriculas_duplicadas': sum(ativas > 1 for ativas in matriculas_ativas),
+        'mercadopago_fake': {'configuracao': estado_final['configuracao'], 'contadores': contadores},
+    }
+
+    print(f"⏱️  {resultado['aprovados']}/{resultado['checkouts']} aprovados em {duracao:.1f}s "
+          f"({resultado['checkouts'] / duracao:.0f} checkouts/s)")
+    for etapa in ('initiate', 'status', 'pagamento_ate_aprovacao'):
+        if resultado[etapa]:
+            medidas = resultado[etapa]
+            print(f"   {etapa:<24} p50 {medidas['p50_ms']:>8.1f}  p95 {medidas['p95_ms']:>8.1f}  "
+                  f"p99 {medidas['p99_ms']:>8.1f} ms  (n={medidas['n']})")
+    print(f"   Mercado Pago fake: {contadores}")
+    for erro in resultado['exemplos_erros']:
+        print(f"   ⚠️ {erro}")
+
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as arquivo:
+            json.dump(resultado, arquivo, indent=2, ensure_ascii=False)
+        print(f"💾 Resultados em {args.saida}")
+
+    inconsistentes = resultado['compradores_sem_matricula'] + resultado['compradores_com_matriculas_duplicadas']
+    if falhas or inconsistentes:
+        print(f"❌ {sum(falhas.values())} checkout(s) com falha, {resultado['compradores_sem_matricula']} sem matrícula, "
+              f"{resultado['compradores_com_matriculas_duplicadas']} com matrícula duplicada")
+        sys.exit(1)
+    print("✅ Todos os checkouts aprovados com exatamente uma matrícula ativa")
+
+
+if __name__ == '__main__':
+    main()
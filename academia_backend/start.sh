@@ -7,6 +7,19 @@ echo "🚀 Iniciando aplicação AthleTech..."
 # Adicionar diretórios do Python ao PATH (para ambientes Nix)
 export PATH="$HOME/.local/bin:/nix/store/*/bin:$PATH"
 
+# Modo ASGI (SERVIDOR=asgi): uvicorn com as views de pagamento assíncronas (PAGAMENTOS_ASSINCRONOS)
+if [ "${SERVIDOR:-wsgi}" = "asgi" ]; then
+    echo "🌐 Iniciando servidor Uvicorn (ASGI) na porta ${PORT:-8000}..."
+    exec python -m uvicorn academia_project.asgi:application \
+        --host 0.0.0.0 \
+        --port ${PORT:-8000} \
+        --workers ${WEB_CONCURRENCY:-2} \
+        --proxy-headers \
+        --forwarded-allow-ips '*' \
+        --timeout-keep-alive 5 \
+        --log-level info
+fi
+
 # Usar python -m gunicorn que sempre funciona quando gunicorn está instalado
 echo "🌐 Iniciando servidor Gunicorn na porta ${PORT:-8000}..."
 exec python -m gunicorn academia_project.wsgi:application \
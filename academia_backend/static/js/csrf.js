@@ -0,0 +1,38 @@
+/**
+ * Token CSRF dos formulários POST das páginas pré-renderizadas
+ * As páginas estáticas (academia/paginas.py) são geradas no collectstatic, sem o token
+ * embutido: ele é lido do cookie csrftoken, criado pelo login com sessão do Django.
+ * Sem o cookie não há sessão para encerrar: o logout só limpa o JWT (user-menu.js) e vai ao login.
+ */
+
+(function () {
+  const match = document.cookie.match(/(?:^|;\s*)csrftoken=([^;]+)/);
+  const token = match ? decodeURIComponent(match[1]) : '';
+
+  document.querySelectorAll('form').forEach((form) => {
+    if (form.method.toLowerCase() !== 'post') return;
+    let campo = form.querySelector('input[name="csrfmiddlewaretoken"]');
+
+    if (!token) {
+      if (form.getAttribute('action') && form.getAttribute('action').includes('/logout/')) {
+        if (campo) campo.remove();
+        form.method = 'get';
+        form.action = '/login/';
+        const mensagem = document.createElement('input');
+        mensagem.type = 'hidden';
+        mensagem.name = 'message';
+        mensagem.value = 'logout_success';
+        form.appendChild(mensagem);
+      }
+      return;
+    }
+
+    if (!campo) {
+      campo = document.createElement('input');
+      campo.type = 'hidden';
+      campo.name = 'csrfmiddlewaretoken';
+      form.prepend(campo);
+    }
+    if (!campo.value) campo.value = token;
+  });
+})();